@@ -0,0 +1,93 @@
+import time
+from datetime import date
+from datetime import time as clock_time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from attendance.models import AttendanceActivity
+from employee.models import Employee
+from horilla.filters import python_search_lookup, search_queryset
+
+
+class Rollback(Exception):
+    pass
+
+
+SEARCH_FIELDS = [
+    "employee_id__get_full_name",
+    "employee_id",
+    "employee_id__employee_work_info__department_id__department",
+    "attendance_date",
+    "clock_in",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the generic search on a seeded attendance activity table, "
+        "compiled to database lookups against scanning the rows in Python. "
+        "Every row created is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=100000,
+            help="Attendance activities to seed (default 100000)",
+        )
+        parser.add_argument(
+            "--search",
+            default="a",
+            help="Text searched in every field (default a)",
+        )
+
+    def handle(self, *args, **options):
+        employees = list(Employee.objects.entire()[:200])
+        if not employees:
+            raise CommandError("The benchmark needs employees.")
+        search = options["search"].lower()
+
+        self.stdout.write(f"{'field':<60} {'rows':>7} {'db ms':>8} {'python ms':>10}")
+        try:
+            with transaction.atomic():
+                start = date(2000, 1, 1)
+                AttendanceActivity.objects.bulk_create(
+                    [
+                        AttendanceActivity(
+                            employee_id=employees[index % len(employees)],
+                            attendance_date=start
+                            + timedelta(days=index // len(employees)),
+                            clock_in=clock_time(index % 24, index % 60),
+                        )
+                        for index in range(options["rows"])
+                    ],
+                    batch_size=5000,
+                )
+                queryset = AttendanceActivity.objects.entire()
+                for search_field in SEARCH_FIELDS:
+                    self.measure(queryset, search_field, search)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def measure(self, queryset, search_field, search):
+        started = time.perf_counter()
+        db_count = search_queryset(queryset, search_field, search).count()
+        db_elapsed = time.perf_counter() - started
+        # The former behaviour, every row evaluated in Python
+        started = time.perf_counter()
+        python_count = queryset.filter(
+            **python_search_lookup(queryset, "", queryset.model, search_field, search)
+        ).count()
+        python_elapsed = time.perf_counter() - started
+        if db_count != python_count:
+            self.stderr.write(
+                f"{search_field}: {db_count} rows found, {python_count} in Python"
+            )
+        self.stdout.write(
+            f"{search_field:<60} {db_count:>7} {db_elapsed * 1000:>8.0f} "
+            f"{python_elapsed * 1000:>10.0f}"
+        )
@@ -0,0 +1,105 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from attendance.methods.hour_account import compute_hour_account, recompute_hour_account
+from attendance.methods.utils import MONTH_MAPPING, format_time
+from attendance.models import Attendance, AttendanceOverTime
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild or verify the hour accounts (AttendanceOverTime) from the attendances"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report the hour accounts that differ from the attendances",
+        )
+        parser.add_argument("--employee", type=int, help="Employee id to process")
+        parser.add_argument("--year", type=int, help="Year to process (e.g., 2024)")
+        parser.add_argument("--month", type=int, help="Month number to process (1-12)")
+
+    def get_accounts(self, options):
+        """
+        Returns the (employee_id, year, month) of every attendance month and
+        existing hour account matching the options
+        """
+        attendances = Attendance.objects.entire()
+        accounts = AttendanceOverTime.objects.entire()
+        if options["employee"]:
+            attendances = attendances.filter(employee_id=options["employee"])
+            accounts = accounts.filter(employee_id=options["employee"])
+        if options["year"]:
+            attendances = attendances.filter(attendance_date__year=options["year"])
+            accounts = accounts.filter(year=options["year"])
+        keys = set(
+            attendances.annotate(
+                year=ExtractYear("attendance_date"),
+                month=ExtractMonth("attendance_date"),
+            )
+            .values_list("employee_id", "year", "month")
+            .distinct()
+        )
+        for employee_id, year, month in accounts.values_list(
+            "employee_id", "year", "month"
+        ):
+            if str(year).isdigit() and month in MONTH_MAPPING:
+                keys.add((employee_id, int(year), MONTH_MAPPING[month]))
+        if options["month"]:
+            keys = {key for key in keys if key[2] == options["month"]}
+        return sorted(keys)
+
+    def handle(self, *args, **options):
+        if options["month"] and not 1 <= options["month"] <= 12:
+            raise CommandError("Month should be between 1 and 12.")
+
+        keys = self.get_accounts(options)
+        if not options["verify"]:
+            for key in keys:
+                recompute_hour_account(*key)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(keys)} hour accounts."))
+            return
+
+        stored = {}
+        for account in AttendanceOverTime.objects.entire().filter(
+            employee_id__in={key[0] for key in keys}
+        ):
+            if str(account.year).isdigit() and account.month in MONTH_MAPPING:
+                stored[
+                    (
+                        account.employee_id_id,
+                        int(account.year),
+                        MONTH_MAPPING[account.month],
+                    )
+                ] = (account.worked_hours, account.pending_hours, account.overtime)
+        mismatches = 0
+        for key in keys:
+            expected = tuple(
+                format_time(value) for value in compute_hour_account(*key) or (0, 0, 0)
+            )
+            found = stored.get(key)
+            if found is None:
+                mismatches += 1
+                self.stdout.write(
+                    f"Employee {key[0]} {key[1]}-{key[2]:02d}: hour account missing"
+                )
+            elif found != expected:
+                mismatches += 1
+                self.stdout.write(
+                    f"Employee {key[0]} {key[1]}-{key[2]:02d}: stored "
+                    f"worked/pending/overtime {'/'.join(found)}, expected "
+                    f"{'/'.join(expected)}"
+                )
+        if mismatches:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{mismatches} of {len(keys)} hour accounts differ from the "
+                    "attendances, run without --verify to rebuild them."
+                )
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"All {len(keys)} hour accounts are consistent.")
+            )
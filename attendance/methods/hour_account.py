@@ -0,0 +1,280 @@
+"""
+hour_account.py
+
+Maintenance of the monthly hour accounts (AttendanceOverTime).
+
+An attendance contributes to the hour account of its month with
+    worked seconds   : min(minimum_hour, at_work_second), validated and not on leave
+    required seconds : minimum_hour, validated and not on leave
+    overtime seconds : approved_overtime_second
+Saving or deleting an attendance applies the difference between the old and the
+new contribution of that row to its account, instead of rescanning the month.
+
+Queryset updates of these fields rebuild the accounts of the old and new months of
+the updated rows (see attendance.signals).
+
+Bulk imports can wrap their work in ``defer_hour_account_updates()``, the
+touched (employee, year, month) accounts are then rebuilt once on exit.
+"""
+
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from django.apps import apps
+from django.db import transaction
+
+from attendance.methods.utils import format_time, strtime_seconds
+
+_hour_account_locals = threading.local()
+
+# Attendance fields an hour account is derived from
+HOUR_ACCOUNT_FIELDS = (
+    "employee_id",
+    "attendance_date",
+    "attendance_validated",
+    "minimum_hour",
+    "at_work_second",
+    "approved_overtime_second",
+)
+
+
+def _account_key(employee_id, attendance_date):
+    return (employee_id, attendance_date.year, attendance_date.month)
+
+
+def _month_range(year, month):
+    start_date = date(year, month, 1)
+    if month == 12:
+        return start_date, date(year + 1, 1, 1) - timedelta(days=1)
+    return start_date, date(year, month + 1, 1) - timedelta(days=1)
+
+
+def approved_leave_dates(employee_id, start_date, end_date):
+    """
+    Returns the set of dates between start and end date covered by the approved
+    leave requests of the employee
+    """
+    if not apps.is_installed("leave"):
+        return set()
+    LeaveRequest = apps.get_model("leave", "LeaveRequest")
+    leave_dates = set()
+    for leave_start, leave_end in (
+        LeaveRequest.objects.entire()
+        .filter(
+            employee_id=employee_id,
+            status="approved",
+            start_date__lte=end_date,
+            end_date__gte=start_date,
+        )
+        .values_list("start_date", "end_date")
+    ):
+        current_date = max(leave_start, start_date)
+        while current_date <= min(leave_end, end_date):
+            leave_dates.add(current_date)
+            current_date += timedelta(days=1)
+    return leave_dates
+
+
+def attendance_contribution(attendance, on_leave=False):
+    """
+    Returns the (worked, required, overtime) seconds the attendance adds to the
+    hour account of its month
+    """
+    overtime_second = attendance.approved_overtime_second or 0
+    if not attendance.attendance_validated or on_leave:
+        return 0, 0, overtime_second
+    required_second = strtime_seconds(attendance.minimum_hour)
+    worked_second = min(required_second, attendance.at_work_second or 0)
+    return worked_second, required_second, overtime_second
+
+
+def _get_account(employee_id, year, month):
+    """
+    Returns the locked AttendanceOverTime of the month, creating it if missing
+    """
+    from attendance.models import AttendanceOverTime
+
+    month_name = date(year, month, 1).strftime("%B").lower()
+    account = (
+        AttendanceOverTime.objects.entire()
+        .select_for_update()
+        .filter(employee_id=employee_id, month=month_name, year=year)
+        .first()
+    )
+    if account is None:
+        account, _created = AttendanceOverTime.objects.entire().get_or_create(
+            employee_id_id=employee_id, month=month_name, year=year
+        )
+    return account
+
+
+def _save_account(account, worked_second, pending_second, overtime_second):
+    account.worked_hours = format_time(worked_second)
+    account.pending_hours = format_time(pending_second)
+    account.overtime = format_time(overtime_second)
+    account.save()
+
+
+def apply_hour_account_delta(employee_id, attendance_date, worked, required, overtime):
+    """
+    Adds the given seconds to the hour account of the attendance date's month
+    """
+    if not (worked or required or overtime):
+        return
+    key = _account_key(employee_id, attendance_date)
+    dirty_accounts = getattr(_hour_account_locals, "dirty_accounts", None)
+    if dirty_accounts is not None:
+        dirty_accounts.add(key)
+        return
+    with transaction.atomic():
+        account = _get_account(*key)
+        _save_account(
+            account,
+            (account.hour_account_second or 0) + worked,
+            (account.hour_pending_second or 0) + required - worked,
+            (account.overtime_second or 0) + overtime,
+        )
+
+
+def update_hour_account(previous, attendance, deleted=False):
+    """
+    Applies the change of an attendance row to the hour accounts.
+
+    Args:
+        previous: the attendance as stored before the change, None on create
+        attendance: the attendance after the change
+        deleted: True when the attendance was removed
+    """
+    dirty_accounts = getattr(_hour_account_locals, "dirty_accounts", None)
+    if dirty_accounts is not None:
+        for row in (previous, attendance):
+            if row is not None:
+                dirty_accounts.add(
+                    _account_key(row.employee_id_id, row.attendance_date)
+                )
+        return
+
+    leave_checks = {}
+
+    def contribution(row):
+        if not row.attendance_validated:
+            return attendance_contribution(row)
+        key = (row.employee_id_id, row.attendance_date)
+        if key not in leave_checks:
+            leave_checks[key] = bool(approved_leave_dates(*key, row.attendance_date))
+        return attendance_contribution(row, leave_checks[key])
+
+    deltas = {}
+    if previous is not None:
+        key = (previous.employee_id_id, previous.attendance_date)
+        deltas[key] = [-value for value in contribution(previous)]
+    if not deleted:
+        key = (attendance.employee_id_id, attendance.attendance_date)
+        current = deltas.setdefault(key, [0, 0, 0])
+        for index, value in enumerate(contribution(attendance)):
+            current[index] += value
+
+    if not deleted:
+        key = _account_key(attendance.employee_id_id, attendance.attendance_date)
+        if previous is None or key != _account_key(
+            previous.employee_id_id, previous.attendance_date
+        ):
+            # Every attendance has an hour account for its month, even an empty one
+            with transaction.atomic():
+                _get_account(*key)
+    for (employee_id, attendance_date), delta in deltas.items():
+        apply_hour_account_delta(employee_id, attendance_date, *delta)
+
+
+def compute_hour_account(employee_id, year, month):
+    """
+    Returns the (worked, pending, overtime) seconds of the month computed from
+    every attendance of the employee, None when the month has no attendance
+    """
+    from attendance.models import Attendance
+
+    start_date, end_date = _month_range(year, month)
+    attendances = list(
+        Attendance.objects.entire().filter(
+            employee_id=employee_id,
+            attendance_date__range=(start_date, end_date),
+        )
+    )
+    if not attendances:
+        return None
+    leave_dates = approved_leave_dates(employee_id, start_date, end_date)
+    worked_second = required_second = overtime_second = 0
+    for attendance in attendances:
+        worked, required, overtime = attendance_contribution(
+            attendance, attendance.attendance_date in leave_dates
+        )
+        worked_second += worked
+        required_second += required
+        overtime_second += overtime
+    return worked_second, required_second - worked_second, overtime_second
+
+
+def recompute_hour_account(employee_id, year, month):
+    """
+    Rebuilds the hour account of the month from scratch and returns it
+    """
+    from attendance.models import AttendanceOverTime
+
+    values = compute_hour_account(employee_id, year, month)
+    with transaction.atomic():
+        if values is None:
+            account = (
+                AttendanceOverTime.objects.entire()
+                .select_for_update()
+                .filter(
+                    employee_id=employee_id,
+                    month=date(year, month, 1).strftime("%B").lower(),
+                    year=year,
+                )
+                .first()
+            )
+            if account is None:
+                return None
+            values = (0, 0, 0)
+        else:
+            account = _get_account(employee_id, year, month)
+        _save_account(account, *values)
+    return account
+
+
+def mark_hour_account_dirty(employee_id, attendance_date):
+    """
+    Queues the hour account of the date's month for a rebuild, immediately
+    when no deferred block is active
+    """
+    key = _account_key(employee_id, attendance_date)
+    dirty_accounts = getattr(_hour_account_locals, "dirty_accounts", None)
+    if dirty_accounts is not None:
+        dirty_accounts.add(key)
+    else:
+        recompute_hour_account(*key)
+
+
+@contextmanager
+def defer_hour_account_updates():
+    """
+    Collects the hour accounts touched inside the block and rebuilds each of
+    them once when the outermost block exits
+
+    Usage:
+        with defer_hour_account_updates():
+            for row in rows:
+                clock_in(...)
+    """
+    if getattr(_hour_account_locals, "dirty_accounts", None) is not None:
+        yield
+        return
+    _hour_account_locals.dirty_accounts = set()
+    try:
+        yield
+    finally:
+        dirty_accounts = _hour_account_locals.dirty_accounts
+        _hour_account_locals.dirty_accounts = None
+        for key in sorted(dirty_accounts):
+            recompute_hour_account(*key)
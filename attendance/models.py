@@ -13,10 +13,10 @@ from datetime import date, datetime, timedelta
 from django.apps import apps
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models import Q
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from attendance.methods.hour_account import update_hour_account
 from attendance.methods.utils import (
     MONTH_MAPPING,
     attendance_date_validate,
@@ -38,6 +38,19 @@ from horilla_audit.models import HorillaAuditInfo, HorillaAuditLog
 # to skip the migration issue with the old migrations
 _validate_time_in_minutes = validate_time_in_minutes
 
+_shift_day_ids = {}
+
+
+def get_shift_day_id(attendance_date):
+    """
+    Returns the id of the EmployeeShiftDay of the date, the few shift days are
+    looked up once per process
+    """
+    day = attendance_date.strftime("%A").lower()
+    if day not in _shift_day_ids:
+        _shift_day_ids[day] = EmployeeShiftDay.objects.get(day=day).pk
+    return _shift_day_ids[day]
+
 
 # Create your models here.
 
@@ -378,47 +391,29 @@ class Attendance(HorillaModel):
 
     def save(self, *args, **kwargs):
         self.update_attendance_overtime()
-        self.attendance_day = EmployeeShiftDay.objects.get(
-            day=self.attendance_date.strftime("%A").lower()
-        )
+        self.attendance_day_id = get_shift_day_id(self.attendance_date)
         prev_attendance_approved = False
         self.adjust_minimum_hour()
 
         # Handle overtime cutoff and auto-approval
         self.handle_overtime_conditions()
 
+        prev_state = None
         if self.pk is not None:
             # Get the previous values of the boolean field
-            prev_state = Attendance.objects.get(pk=self.pk)
+            prev_state = Attendance.objects.entire().filter(pk=self.pk).first()
+        if prev_state is not None:
             prev_attendance_approved = prev_state.attendance_overtime_approve
 
-        # super().save(*args, **kwargs)  #commend this line, it take too much time to complete
-        employee_ot = self.employee_id.employee_overtime.filter(
-            month=self.attendance_date.strftime("%B").lower(),
-            year=self.attendance_date.year,
-        ).first()
-        if employee_ot:
-            # Update if exists
-            self.update_ot(employee_ot)
-        else:
-            # Create and update in one call
-            employee_ot = self.create_ot()
-            self.update_ot(employee_ot)
         approved = self.attendance_overtime_approve
-        attendance_account = self.employee_id.employee_overtime.filter(
-            month=self.attendance_date.strftime("%B").lower(),
-            year=self.attendance_date.year,
-        ).first()
-        total_ot_seconds = attendance_account.overtime_second
         if approved and prev_attendance_approved is False:
             self.approved_overtime_second = self.overtime_second
-            total_ot_seconds = total_ot_seconds + self.approved_overtime_second
         elif not approved:
-            total_ot_seconds = total_ot_seconds - self.approved_overtime_second
             self.approved_overtime_second = 0
-        attendance_account.overtime = format_time(total_ot_seconds)
-        attendance_account.save()
         super().save(*args, **kwargs)
+        # Apply the difference of this row to the hour account instead of
+        # rescanning the month
+        update_hour_account(prev_state, self)
 
     def serialize(self):
         """
@@ -452,92 +447,14 @@ class Attendance(HorillaModel):
             AttendanceActivity.objects.filter(
                 attendance_date=self.attendance_date, employee_id=self.employee_id
             ).delete()
-            employee_ot = self.employee_id.employee_overtime.filter(
-                month=self.attendance_date.strftime("%B").lower(),
-                year=self.attendance_date.strftime("%Y"),
-            )
-        if employee_ot.exists():
-            self.update_ot(employee_ot.first())
+        prev_state = Attendance.objects.entire().filter(pk=self.pk).first()
         # Call the superclass delete() method to delete the object
-        super().delete(*args, **kwargs)
+        result = super().delete(*args, **kwargs)
 
         # Perform additional operations after deleting the object
-
-    def create_ot(self):
-        """
-        Create a new Hour Account instance if it doesn't exist for a specific month and year.
-        Returns:
-            AttendanceOverTime: The created or fetched AttendanceOverTime instance.
-        """
-        # Create or fetch the AttendanceOverTime instance
-        employee_ot, created = AttendanceOverTime.objects.get_or_create(
-            employee_id=self.employee_id,
-            month=self.attendance_date.strftime("%B").lower(),
-            year=self.attendance_date.year,
-        )
-
-        # Update only if the fields are available
-        if self.attendance_overtime_approve:
-            employee_ot.overtime = self.attendance_overtime
-
-        if self.attendance_validated:
-            employee_ot.hour_account = self.attendance_worked_hour
-
-        employee_ot.save()
-        return employee_ot
-
-    def update_ot(self, employee_ot):
-        """
-        Update the hour account for the given employee.
-
-        Args:
-            employee_ot (obj): AttendanceOverTime instance
-        """
-        if apps.is_installed("leave"):
-            approved_leave_requests = self.employee_id.leaverequest_set.filter(
-                start_date__lte=self.attendance_date,
-                end_date__gte=self.attendance_date,
-                status="approved",
-            )
-        else:
-            approved_leave_requests = []
-
-        # Create exclude condition using Q objects
-        exclude_condition = Q()
-        if approved_leave_requests:
-            # Combine multiple conditions for the exclude clause
-            for leave in approved_leave_requests:
-                exclude_condition |= Q(
-                    attendance_date__range=(leave.start_date, leave.end_date)
-                )
-
-        # Filter month attendances in a single query
-        month_attendances = (
-            Attendance.objects.filter(
-                employee_id=self.employee_id,
-                attendance_date__month=self.attendance_date.month,
-                attendance_date__year=self.attendance_date.year,
-                attendance_validated=True,
-            )
-            .exclude(exclude_condition)
-            .values("minimum_hour", "at_work_second")
-        )
-
-        # Calculate hour balance and hours pending in a single loop
-        hour_balance = 0
-        minimum_hour_second = 0
-        for attendance in month_attendances:
-            required_work_second = strtime_seconds(attendance["minimum_hour"])
-            at_work_second = min(required_work_second, attendance["at_work_second"])
-            hour_balance += at_work_second
-            minimum_hour_second += required_work_second
-
-        hours_pending = minimum_hour_second - hour_balance
-        employee_ot.worked_hours = format_time(hour_balance)
-        employee_ot.pending_hours = format_time(hours_pending)
-        employee_ot.save()
-
-        return employee_ot
+        if prev_state is not None:
+            update_hour_account(prev_state, None, deleted=True)
+        return result
 
     def clean(self, *args, **kwargs):
         super().clean(*args, **kwargs)
@@ -1,11 +1,7 @@
 import datetime
-import sys
-
-import pytz
-from apscheduler.schedulers.background import BackgroundScheduler
-from django.conf import settings
 
 from base.backends import logger
+from horilla.horilla_jobs import register_job
 
 
 def create_work_record():
@@ -47,26 +43,12 @@ def create_work_record():
         print(f"No new work records to create for {date}.")
 
 
-if not any(
-    cmd in sys.argv
-    for cmd in ["makemigrations", "migrate", "compilemessages", "flush", "shell"]
-):
-    """
-    Initializes and starts background tasks using APScheduler when the server is running.
-    """
-    scheduler = BackgroundScheduler(timezone=pytz.timezone(settings.TIME_ZONE))
-
-    scheduler.add_job(
-        create_work_record, "interval", minutes=30, misfire_grace_time=3600 * 3
-    )
-    scheduler.add_job(
-        create_work_record,
-        "cron",
-        hour=0,
-        minute=30,
-        misfire_grace_time=3600 * 9,
-        id="create_daily_work_record",
-        replace_existing=True,
-    )
-
-    scheduler.start()
+register_job(create_work_record, "interval", minutes=30, misfire_grace_time=3600 * 3)
+register_job(
+    create_work_record,
+    "cron",
+    job_id="attendance.scheduler.create_daily_work_record",
+    hour=0,
+    minute=30,
+    misfire_grace_time=3600 * 9,
+)
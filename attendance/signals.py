@@ -3,15 +3,22 @@
 from datetime import datetime, timedelta
 
 from django.apps import apps
-from django.db.models.signals import post_migrate, post_save, pre_delete
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
+from attendance.methods.hour_account import (
+    HOUR_ACCOUNT_FIELDS,
+    defer_hour_account_updates,
+    mark_hour_account_dirty,
+)
 from attendance.methods.utils import strtime_seconds
 from attendance.models import Attendance, AttendanceGeneralSetting, WorkRecords
 from base.models import Company, PenaltyAccounts
 from employee.models import Employee
+from horilla.horilla_middlewares import _thread_locals
 from horilla.methods import get_horilla_model_class
+from horilla.signals import post_bulk_update, pre_bulk_update
 
 
 @receiver(post_save, sender=Attendance)
@@ -82,6 +89,64 @@ def handle_attendance_deletion(sender, instance, **kwargs):
             workrecord.delete()
 
 
+@receiver(post_save, sender="leave.LeaveRequest")
+@receiver(post_delete, sender="leave.LeaveRequest")
+def refresh_leave_hour_accounts(sender, instance, **kwargs):
+    """
+    Approved leave days do not count in the hour account, rebuild the hour
+    accounts of the months the leave request covers
+    """
+    if not (instance.start_date and instance.end_date):
+        return
+    attendance_months = (
+        Attendance.objects.entire()
+        .filter(
+            employee_id=instance.employee_id_id,
+            attendance_date__range=(instance.start_date, instance.end_date),
+            attendance_validated=True,
+        )
+        .dates("attendance_date", "month")
+    )
+    for month_start in attendance_months:
+        mark_hour_account_dirty(instance.employee_id_id, month_start)
+
+
+@receiver(pre_bulk_update, sender=Attendance)
+def hour_account_pre_bulk_update(sender, queryset, *args, **kwargs):
+    """
+    Captures the hour account months of the attendances a queryset update
+    changes, before the update moves them
+    """
+    fields = set(kwargs.get("kwargs") or {})
+    if not fields.intersection(HOUR_ACCOUNT_FIELDS):
+        return
+    records = getattr(_thread_locals, "hour_account_bulk_records", {})
+    records[id(queryset)] = list(
+        queryset.values_list("id", "employee_id", "attendance_date")
+    )
+    _thread_locals.hour_account_bulk_records = records
+
+
+@receiver(post_bulk_update, sender=Attendance)
+def hour_account_post_bulk_update(sender, queryset, *args, **kwargs):
+    """
+    Rebuilds the hour accounts of the attendances changed by a queryset update,
+    in their previous and current months
+    """
+    records = getattr(_thread_locals, "hour_account_bulk_records", {})
+    previous = records.pop(id(queryset), None)
+    if not previous:
+        return
+    current = (
+        Attendance.objects.entire()
+        .filter(id__in=[row[0] for row in previous])
+        .values_list("id", "employee_id", "attendance_date")
+    )
+    with defer_hour_account_updates():
+        for _id, employee_id, attendance_date in previous + list(current):
+            mark_hour_account_dirty(employee_id, attendance_date)
+
+
 # @receiver(post_migrate)
 def add_missing_attendance_to_workrecord(sender, **kwargs):
     if sender.label not in ["attendance", "leave"]:
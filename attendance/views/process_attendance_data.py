@@ -9,6 +9,10 @@ from datetime import datetime
 
 import pandas as pd
 
+from attendance.methods.hour_account import (
+    defer_hour_account_updates,
+    mark_hour_account_dirty,
+)
 from attendance.models import Attendance
 from base.models import EmployeeShift, WorkType
 from employee.models import Employee
@@ -207,4 +211,10 @@ def process_attendance_data(attendance_dicts):
             error_list.append(attendance_data)
     if attendance_list:
         Attendance.objects.bulk_create(attendance_list)
+        # bulk_create skips Attendance.save, rebuild the touched hour accounts once
+        with defer_hour_account_updates():
+            for attendance in attendance_list:
+                mark_hour_account_dirty(
+                    attendance.employee_id_id, attendance.attendance_date
+                )
     return error_list
@@ -140,6 +140,7 @@ def create_announcement(request):
                         verb_fr="Vous avez été mentionné dans une annonce.",
                         redirect="/",
                         icon="chatbox-ellipses",
+                        defer=True,
                     )
 
             send_notification(
@@ -15,8 +15,10 @@ class BaseConfig(AppConfig):
 
     def ready(self) -> None:
         from base import signals
+        from base.horilla_company_manager import prepare_company_managers
 
         super().ready()
+        prepare_company_managers()
         try:
             from base.models import EmployeeShiftDay
 
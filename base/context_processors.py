@@ -4,14 +4,21 @@ context_processor.py
 This module is used to register context processor`
 """
 
+import copy
 import re
+from collections import defaultdict
+from functools import wraps
 
 from django.apps import apps
 from django.contrib import messages
+from django.core.cache import cache as CACHE
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.http import HttpResponse
 from django.urls import path, reverse
 from django.utils.translation import gettext_lazy as _
 
+from base.horilla_company_manager import get_selected_company
 from base.models import Company, TrackLateComeEarlyOut
 from base.urls import urlpatterns
 from employee.models import (
@@ -23,6 +30,58 @@ from employee.models import (
 from horilla import horilla_apps
 from horilla.decorators import hx_request_required, login_required, permission_required
 from horilla.methods import get_horilla_model_class
+from horilla.signals import post_bulk_update
+
+CONTEXT_PROCESSOR_CACHE_TIMEOUT = 60 * 5
+
+# model label -> cache keys of the context processors reading that model
+_context_cache_keys = defaultdict(set)
+
+
+def cached_context_processor(key, models=(), timeout=CONTEXT_PROCESSOR_CACHE_TIMEOUT):
+    """
+    Caches the context returned by a context processor that reads settings
+    type records, per selected company, until a record of one of the models
+    changes (save, delete or queryset update) or the timeout expires.
+
+    Only for context processors whose result does not depend on the user.
+
+    Args:
+        key: cache key of the context processor
+        models: labels of the models the context processor reads
+            (e.g., "attendance.AttendanceGeneralSetting")
+        timeout: seconds after which the context is built again
+    """
+    cache_key = f"context-processor-{key}"
+    for model in models:
+        _context_cache_keys[model].add(cache_key)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(request):
+            company = get_selected_company() or "all"
+            contexts = CACHE.get(cache_key) or {}
+            if company not in contexts:
+                contexts[company] = func(request)
+                CACHE.set(cache_key, contexts, timeout)
+            return copy.copy(contexts[company])
+
+        return wrapper
+
+    return decorator
+
+
+@receiver(post_save, dispatch_uid="invalidate_context_processor_cache_save")
+@receiver(post_delete, dispatch_uid="invalidate_context_processor_cache_delete")
+@receiver(post_bulk_update, dispatch_uid="invalidate_context_processor_cache_update")
+def invalidate_context_processor_cache(sender, **kwargs):
+    """
+    Drops the cached contexts reading the model of the changed records
+    """
+    meta = getattr(sender, "_meta", None)
+    cache_keys = meta and _context_cache_keys.get(meta.label)
+    if cache_keys:
+        CACHE.delete_many(list(cache_keys))
 
 
 class AllCompany:
@@ -48,14 +107,21 @@ def get_last_section(path):
     return last_section
 
 
+@cached_context_processor("companies", models=["base.Company"])
+def _all_companies(request):
+    return {
+        "companies": [
+            [company.id, company.company, company.icon.url, False]
+            for company in Company.objects.all()
+        ]
+    }
+
+
 def get_companies(request):
     """
     This method will return the history additional field form
     """
-    companies = list(
-        [company.id, company.company, company.icon.url, False]
-        for company in Company.objects.all()
-    )
+    companies = copy.deepcopy(_all_companies(request)["companies"])
     companies = [
         [
             "all",
@@ -180,6 +246,9 @@ def white_labelling_company(request):
         }
 
 
+@cached_context_processor(
+    "resignation_request_enabled", models=["offboarding.OffboardingGeneralSetting"]
+)
 def resignation_request_enabled(request):
     """
     Check weather resignation_request enabled of not in offboarding
@@ -196,6 +265,9 @@ def resignation_request_enabled(request):
     return {"enabled_resignation_request": enabled_resignation_request}
 
 
+@cached_context_processor(
+    "timerunner_enabled", models=["attendance.AttendanceGeneralSetting"]
+)
 def timerunner_enabled(request):
     """
     Check weather resignation_request enabled of not in offboarding
@@ -212,6 +284,9 @@ def timerunner_enabled(request):
     return {"enabled_timerunner": enabled_timerunner}
 
 
+@cached_context_processor(
+    "intial_notice_period", models=["payroll.PayrollGeneralSetting"]
+)
 def intial_notice_period(request):
     """
     Check weather resignation_request enabled of not in offboarding
@@ -228,6 +303,9 @@ def intial_notice_period(request):
     return {"get_initial_notice_period": initial}
 
 
+@cached_context_processor(
+    "check_candidate_self_tracking", models=["recruitment.RecruitmentGeneralSetting"]
+)
 def check_candidate_self_tracking(request):
     """
     This method is used to get the candidate self tracking is enabled or not
@@ -246,6 +324,10 @@ def check_candidate_self_tracking(request):
     return {"check_candidate_self_tracking": candidate_self_tracking}
 
 
+@cached_context_processor(
+    "check_candidate_self_tracking_rating",
+    models=["recruitment.RecruitmentGeneralSetting"],
+)
 def check_candidate_self_tracking_rating(request):
     """
     This method is used to check enabled/disabled of rating option
@@ -263,6 +345,9 @@ def check_candidate_self_tracking_rating(request):
     return {"check_candidate_self_tracking_rating": rating_option}
 
 
+@cached_context_processor(
+    "get_initial_prefix", models=["employee.EmployeeGeneralSetting"]
+)
 def get_initial_prefix(request):
     """
     This method is used to get the initial prefix
@@ -283,17 +368,27 @@ def biometric_app_exists(request):
     return {"biometric_app_exists": biometric_app_exists}
 
 
+@cached_context_processor(
+    "late_come_early_out_tracking", models=["base.TrackLateComeEarlyOut"]
+)
 def enable_late_come_early_out_tracking(request):
     tracking = TrackLateComeEarlyOut.objects.first()
     enable = tracking.is_enable if tracking else True
     return {"tracking": enable, "late_come_early_out_tracking": enable}
 
 
+@cached_context_processor(
+    "profile_edit_enabled", models=["employee.ProfileEditFeature"]
+)
+def _profile_edit_enabled(request):
+    profile_edit = ProfileEditFeature.objects.filter().first()
+    return {"profile_edit_enabled": bool(profile_edit and profile_edit.is_enabled)}
+
+
 def enable_profile_edit(request):
     from accessibility.accessibility import ACCESSBILITY_FEATURE
 
-    profile_edit = ProfileEditFeature.objects.filter().first()
-    enable = True if profile_edit and profile_edit.is_enabled else False
+    enable = _profile_edit_enabled(request)["profile_edit_enabled"]
     if enable:
         if not any(item[0] == "profile_edit" for item in ACCESSBILITY_FEATURE):
             ACCESSBILITY_FEATURE.append(("profile_edit", _("Profile Edit Access")))
@@ -0,0 +1,251 @@
+"""
+base/exports.py
+
+Streaming export engine shared by the export views.
+
+The records are read with .iterator() in chunks of EXPORT_CHUNK_SIZE, the
+forward relations of the exported columns are joined with select_related and
+only the exported fields are loaded when every column is a database field.
+The rows are written one by one, xlsx with the constant memory mode of
+xlsxwriter into a temporary file, csv straight into a StreamingHttpResponse.
+Exports of more than EXPORT_BACKGROUND_ROWS rows are written by a background
+thread into the file of an ExportJob, downloaded once it completed.
+"""
+
+import csv
+import logging
+import tempfile
+import threading
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+import xlsxwriter
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files import File
+from django.db import connection, transaction
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.utils import timezone
+
+from base.models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_BACKGROUND_ROWS = getattr(settings, "HORILLA_EXPORT_BACKGROUND_ROWS", 20000)
+# Finished export jobs and their files are deleted after this long
+EXPORT_RETENTION = timedelta(days=1)
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CONTENT_TYPES = {"xlsx": XLSX_CONTENT_TYPE, "csv": "text/csv"}
+
+
+def export_query_plan(model, paths):
+    """
+    Returns the select_related paths of the column paths and the fields to
+    load with only(), None when a column reads a relation or a computed
+    attribute which can need any field of its record
+    """
+    related = set()
+    only = {model._meta.pk.name}
+    for path in paths:
+        current = model
+        chain = []
+        parts = path.split("__")
+        for index, part in enumerate(parts):
+            try:
+                field = current._meta.get_field(part)
+            except FieldDoesNotExist:
+                only = None
+                break
+            if field.many_to_one or field.one_to_one:
+                chain.append(part)
+                related.add("__".join(chain))
+                current = field.related_model
+                if index == len(parts) - 1:
+                    only = None
+                continue
+            if field.is_relation or index != len(parts) - 1:
+                only = None
+                break
+            if only is not None:
+                only.add("__".join(chain + [part]))
+    return sorted(related), only
+
+
+def iter_export_rows(queryset, paths, cell, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields the row of every record, cell(record, path) returns the value of
+    a column
+    """
+    related, only = export_query_plan(queryset.model, paths)
+    if related:
+        queryset = queryset.select_related(*related)
+    if only is not None:
+        queryset = queryset.only(*only)
+    for record in queryset.iterator(chunk_size=chunk_size):
+        yield [cell(record, path) for path in paths]
+
+
+def xlsx_value(value):
+    if value is None or isinstance(value, (str, bool, int, float, Decimal)):
+        return value
+    return str(value)
+
+
+def write_xlsx(file, headers, rows, column_width=18):
+    """
+    Writes the rows into the file with a constant memory workbook, returns
+    the number of rows written
+    """
+    workbook = xlsxwriter.Workbook(
+        file,
+        {
+            "constant_memory": True,
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+        },
+    )
+    worksheet = workbook.add_worksheet("Sheet1")
+    header_format = workbook.add_format(
+        {"bold": True, "align": "center", "valign": "vcenter", "border": 1}
+    )
+    cell_format = workbook.add_format({"align": "center"})
+    if headers:
+        worksheet.set_column(0, len(headers) - 1, column_width, cell_format)
+    worksheet.write_row(0, 0, [str(header) for header in headers], header_format)
+    count = 0
+    for count, row in enumerate(rows, 1):
+        worksheet.write_row(count, 0, [xlsx_value(value) for value in row])
+    workbook.close()
+    return count
+
+
+class Echo:
+    """
+    File like object handing back what the csv writer writes
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(headers, rows):
+    """
+    Yields the csv lines of the headers and the rows
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow([str(header) for header in headers])
+    for row in rows:
+        yield writer.writerow(["" if value is None else value for value in row])
+
+
+def write_export(file, export_format, headers, rows):
+    """
+    Writes the export into the binary file
+    """
+    if export_format == "csv":
+        for line in stream_csv(headers, rows):
+            file.write(line.encode())
+    else:
+        write_xlsx(file, headers, rows)
+
+
+def run_export_job(job_id, queryset, headers, paths, cell, export_format):
+    """
+    Writes the export of the job into its file
+    """
+    ExportJob.objects.filter(pk=job_id).update(status="running")
+    job = ExportJob.objects.get(pk=job_id)
+
+    def counted(rows):
+        for count, row in enumerate(rows, 1):
+            if not count % EXPORT_CHUNK_SIZE:
+                ExportJob.objects.filter(pk=job_id).update(processed_rows=count)
+            yield row
+
+    try:
+        with tempfile.TemporaryFile() as file:
+            rows = counted(iter_export_rows(queryset, paths, cell))
+            write_export(file, export_format, headers, rows)
+            file.seek(0)
+            # The stored name is not guessable, the download view names the file
+            job.file.save(f"{uuid.uuid4().hex}.{export_format}", File(file), save=False)
+        ExportJob.objects.filter(pk=job_id).update(
+            file=job.file.name,
+            status="completed",
+            processed_rows=job.total_rows,
+            finished_at=timezone.now(),
+        )
+    except Exception as error:
+        logger.exception("Export %s failed", job_id)
+        ExportJob.objects.filter(pk=job_id).update(
+            status="failed", error=str(error), finished_at=timezone.now()
+        )
+    finally:
+        connection.close()
+
+
+def start_export_job(user, queryset, headers, paths, cell, file_name, export_format):
+    """
+    Creates the export job and writes it on a background thread once the
+    current transaction commits
+    """
+    job = ExportJob.objects.create(
+        created_by=user,
+        file_name=f"{file_name}.{export_format}",
+        total_rows=queryset.count(),
+    )
+    transaction.on_commit(
+        lambda: threading.Thread(
+            target=run_export_job,
+            args=(job.pk, queryset, headers, paths, cell, export_format),
+            daemon=True,
+        ).start()
+    )
+    return job
+
+
+def export_response(
+    request, queryset, headers, paths, cell, file_name, export_format="xlsx"
+):
+    """
+    Returns the download of the export, or redirects to the progress of its
+    background job when it has more than EXPORT_BACKGROUND_ROWS rows
+    """
+    if queryset.count() > EXPORT_BACKGROUND_ROWS:
+        job = start_export_job(
+            request.user, queryset, headers, paths, cell, file_name, export_format
+        )
+        return redirect("export-job", job_id=job.pk)
+
+    rows = iter_export_rows(queryset, paths, cell)
+    if export_format == "csv":
+        response = StreamingHttpResponse(
+            stream_csv(headers, rows), content_type=CONTENT_TYPES["csv"]
+        )
+    else:
+        file = tempfile.TemporaryFile()
+        write_export(file, export_format, headers, rows)
+        file.seek(0)
+        response = FileResponse(file, content_type=CONTENT_TYPES[export_format])
+    response["Content-Disposition"] = (
+        f'attachment; filename="{file_name}.{export_format}"'
+    )
+    return response
+
+
+def delete_expired_export_jobs():
+    """
+    Deletes the finished export jobs older than EXPORT_RETENTION with their
+    files
+    """
+    expired = ExportJob.objects.filter(
+        status__in=["completed", "failed"],
+        finished_at__lt=timezone.now() - EXPORT_RETENTION,
+    )
+    for job in expired:
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
@@ -3,12 +3,20 @@ horilla_company_manager.py
 """
 
 import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Coroutine, Sequence
 
-from django.db import models
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection, models
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
 from django.db.models.query import QuerySet
 
 from horilla.horilla_middlewares import _thread_locals
+from horilla.horilla_settings import APPS
 from horilla.signals import post_bulk_update, pre_bulk_update
 
 logger = logging.getLogger(__name__)
@@ -30,11 +38,219 @@ def update(self, *args, **kwargs):
 setattr(QuerySet, "update", update)
 
 
+_selected_company = ContextVar("horilla_selected_company", default=None)
+_company_models = []
+_company_filters = {}
+
+COMPANY_MODELS = {
+    "base": ["shiftrequest", "worktyperequest"],
+    "employee": [
+        "employee",
+        "disciplinaryaction",
+        "employeebankdetails",
+        "employeeworkinformation",
+    ],
+    "horilla_documents": ["documentrequest"],
+    "recruitment": ["recruitment", "candidate"],
+    "leave": [
+        "leaverequest",
+        "restrictleave",
+        "availableleave",
+        "leaveallocationrequest",
+        "compensatoryleaverequest",
+    ],
+    "asset": ["assetassignment", "assetrequest"],
+    "attendance": [
+        "attendance",
+        "attendanceactivity",
+        "attendanceovertime",
+        "workrecords",
+    ],
+    "payroll": [
+        "contract",
+        "loanaccount",
+        "payslip",
+        "reimbursement",
+    ],
+    "helpdesk": ["ticket"],
+    "offboarding": ["offboarding"],
+    "pms": ["employeeobjective"],
+}
+
+
+def set_selected_company(company_id):
+    """
+    Sets the company selected on the current request, returns the token to
+    reset it with
+    """
+    return _selected_company.set(str(company_id) if company_id else None)
+
+
+def reset_selected_company(token):
+    """
+    Restores the selected company to its value before set_selected_company
+    """
+    _selected_company.reset(token)
+
+
+def get_selected_company():
+    """
+    Returns the id of the company the current request is scoped to, None for
+    all companies.
+
+    Falls back to the session of the thread local request for code that runs
+    outside CompanyMiddleware with a request of its own.
+    """
+    company_id = _selected_company.get()
+    if company_id is None:
+        request = getattr(_thread_locals, "request", None)
+        session = getattr(request, "session", None)
+        company_id = session.get("selected_company") if session else None
+    if not company_id or company_id == "all":
+        return None
+    return str(company_id)
+
+
+def get_company_models():
+    """
+    Returns the models that only show the records of the selected company
+    """
+    if not _company_models:
+        _company_models.extend(
+            apps.get_model(app_label, model)
+            for app_label, models_ in COMPANY_MODELS.items()
+            if apps.is_installed(app_label)
+            for model in models_
+        )
+    return _company_models
+
+
+def get_company_filter(model, company_id):
+    """
+    Returns the Q filtering the model by the company, None when the model is
+    not company scoped. Built once per (model, company).
+    """
+    key = (model, company_id)
+    if key in _company_filters:
+        return _company_filters[key]
+    company_filter = None
+    manager = getattr(model, "objects", None)
+    lookup = (
+        "company_id"
+        if getattr(model, "company_id", None)
+        else (
+            getattr(manager, "related_company_field", None)
+            if isinstance(manager, HorillaCompanyManager)
+            else None
+        )
+    )
+    if model._meta.app_label in APPS and lookup:
+        company_filter = Q(**{lookup: company_id})
+        if model not in get_company_models():
+            # Shared records without a company are visible to every company
+            company_filter |= Q(**{f"{lookup}__isnull": True})
+    _company_filters[key] = company_filter
+    return company_filter
+
+
+def company_lookup_fans_out(model, lookup):
+    """
+    Returns True when filtering the model through the lookup path joins a
+    multi-valued relation, so a row can come back more than once
+    """
+    opts = model._meta
+    for part in lookup.split(LOOKUP_SEP):
+        try:
+            field = opts.get_field(part)
+        except FieldDoesNotExist:
+            break
+        if field.many_to_many or field.one_to_many:
+            return True
+        if not field.is_relation:
+            break
+        opts = field.related_model._meta
+    return False
+
+
+def get_manager_query_count():
+    """
+    Returns the (manager calls, manager queries) counted on the current request
+    """
+    return (
+        getattr(_thread_locals, "company_manager_calls", 0),
+        getattr(_thread_locals, "company_manager_queries", 0),
+    )
+
+
+def reset_manager_query_count():
+    """
+    Resets the per request company manager counters
+    """
+    _thread_locals.company_manager_calls = 0
+    _thread_locals.company_manager_queries = 0
+
+
+def _count_query(execute, sql, params, many, context):
+    _thread_locals.company_manager_queries = (
+        getattr(_thread_locals, "company_manager_queries", 0) + 1
+    )
+    return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_manager_queries(call=False):
+    """
+    Counts the queries run inside the block, and the manager call when call is
+    set, while DEBUG is on. Nested blocks count their queries once.
+    """
+    if not settings.DEBUG:
+        yield
+        return
+    if call:
+        _thread_locals.company_manager_calls = (
+            getattr(_thread_locals, "company_manager_calls", 0) + 1
+        )
+    if getattr(_thread_locals, "counting_manager_queries", False):
+        yield
+        return
+    _thread_locals.counting_manager_queries = True
+    try:
+        with connection.execute_wrapper(_count_query):
+            yield
+    finally:
+        _thread_locals.counting_manager_queries = False
+
+
+class HorillaCompanyQuerySet(QuerySet):
+    """
+    Queryset of HorillaCompanyManager, the queries run when it is evaluated are
+    counted by count_manager_queries
+    """
+
+    def _fetch_all(self):
+        with count_manager_queries():
+            super()._fetch_all()
+
+    def count(self):
+        with count_manager_queries():
+            return super().count()
+
+    def exists(self):
+        with count_manager_queries():
+            return super().exists()
+
+    def aggregate(self, *args, **kwargs):
+        with count_manager_queries():
+            return super().aggregate(*args, **kwargs)
+
+
 class HorillaCompanyManager(models.Manager):
     """
     HorillaCompanyManager
     """
 
+    _queryset_class = HorillaCompanyQuerySet
+
     def __init__(self, related_company_field=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.related_company_field = related_company_field
@@ -42,32 +258,55 @@ class HorillaCompanyManager(models.Manager):
             "employee_id",
             "requested_employee_id",
         ]
+        self._company_scope = None
+
+    def prepare_company_scope(self):
+        """
+        Decides from the model structure whether the company filter needs a
+        distinct() and which employee relations need the is_active filter
+        """
+        company_lookup = (
+            "company_id"
+            if getattr(self.model, "company_id", None)
+            else self.related_company_field
+        )
+        self._company_scope = {
+            "distinct": bool(company_lookup)
+            and company_lookup_fans_out(self.model, company_lookup),
+            "active_filter": {
+                f"{field.name}__is_active": True
+                for field in self.model._meta.fields
+                if isinstance(field, models.ForeignKey)
+                and field.name in self.check_fields
+            },
+        }
+        return self._company_scope
+
+    @property
+    def company_scope(self):
+        """
+        The company scope of the model, prepared once when the apps are ready
+        """
+        return self._company_scope or self.prepare_company_scope()
 
     def get_queryset(self):
         """
         get_queryset method
         """
 
-        queryset = super().get_queryset()
-        request = getattr(_thread_locals, "request", None)
-        selected_company = None
-        if request is not None:
-            selected_company = request.session.get("selected_company")
-        try:
-            queryset = (
-                queryset.filter(self.model.company_filter)
-                if selected_company != "all" and selected_company
-                else queryset
-            )
-        except Exception as e:
-            logger.error(e)
-        try:
-            has_duplicates = queryset.count() != queryset.distinct().count()
-            if has_duplicates:
-                queryset = queryset.distinct()
-        except:
-            pass
-        return queryset
+        with count_manager_queries(call=True):
+            queryset = super().get_queryset()
+            company_id = get_selected_company()
+            company_filter = company_id and get_company_filter(self.model, company_id)
+            if company_filter:
+                try:
+                    queryset = queryset.filter(company_filter)
+                except Exception as e:
+                    logger.error(e)
+                else:
+                    if self.company_scope["distinct"]:
+                        queryset = queryset.distinct()
+            return queryset
 
     def all(self):
         """
@@ -76,25 +315,13 @@ class HorillaCompanyManager(models.Manager):
         queryset = []
         try:
             queryset = self.get_queryset()
-            if queryset.exists():
-                try:
-                    model_name = queryset.model._meta.model_name
-                    if model_name == "employee":
-                        request = getattr(_thread_locals, "request", None)
-                        if not getattr(request, "is_filtering", None):
-                            queryset = queryset.filter(is_active=True)
-                    else:
-                        for field in queryset.model._meta.fields:
-                            if isinstance(field, models.ForeignKey):
-                                if field.name in self.check_fields:
-                                    related_model_is_active_filter = {
-                                        f"{field.name}__is_active": True
-                                    }
-                                    queryset = queryset.filter(
-                                        **related_model_is_active_filter
-                                    )
-                except:
-                    pass
+            with count_manager_queries():
+                if queryset.model._meta.model_name == "employee":
+                    request = getattr(_thread_locals, "request", None)
+                    if not getattr(request, "is_filtering", None):
+                        queryset = queryset.filter(is_active=True)
+                elif self.company_scope["active_filter"]:
+                    queryset = queryset.filter(**self.company_scope["active_filter"])
         except:
             pass
         return queryset
@@ -110,3 +337,13 @@ class HorillaCompanyManager(models.Manager):
         """
         queryset = super().get_queryset()
         return queryset  # No filtering applied
+
+
+def prepare_company_managers():
+    """
+    Prepares the company scope of every model using HorillaCompanyManager
+    """
+    for model in apps.get_models():
+        for manager in model._meta.managers:
+            if isinstance(manager, HorillaCompanyManager):
+                manager.prepare_company_scope()
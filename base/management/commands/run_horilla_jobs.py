@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from horilla.horilla_jobs import (
+    LEADER_JOB,
+    JobRunner,
+    autodiscover_jobs,
+    get_runner_id,
+    run_job,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the scheduled jobs of every app, only one runner executes them at a time"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--list",
+            action="store_true",
+            help="List the registered jobs with their last run metrics",
+        )
+        parser.add_argument(
+            "--run",
+            metavar="JOB_ID",
+            help="Run a single job once and exit (e.g., leave.scheduler.leave_reset)",
+        )
+
+    def handle(self, *args, **options):
+        from base.models import HorillaJob
+
+        jobs = autodiscover_jobs()
+        if options["list"]:
+            metrics = {job.name: job for job in HorillaJob.objects.all()}
+            for job_id in sorted(jobs):
+                job = metrics.get(job_id)
+                if job is None:
+                    self.stdout.write(f"{job_id}: never run")
+                    continue
+                self.stdout.write(
+                    f"{job_id}: runs {job.run_count}, failures {job.failure_count}, "
+                    f"last started {job.last_started_at}, "
+                    f"last duration {job.last_duration or 0:.2f}s"
+                    + (" (failed)" if job.last_error else "")
+                )
+            leader = HorillaJob.objects.filter(name=LEADER_JOB).first()
+            if leader and leader.locked_by:
+                self.stdout.write(
+                    f"Leader: {leader.locked_by} until {leader.locked_until}"
+                )
+            return
+
+        if options["run"]:
+            job = jobs.get(options["run"])
+            if job is None:
+                raise CommandError(f"Job '{options['run']}' is not registered.")
+            if not run_job(job, get_runner_id()):
+                raise CommandError(f"Job '{job.id}' is running on another runner.")
+            self.stdout.write(self.style.SUCCESS(f"Job '{job.id}' finished."))
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Starting the job runner with {len(jobs)} jobs.")
+        )
+        try:
+            JobRunner(jobs).run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Job runner stopped.")
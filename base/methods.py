@@ -5,8 +5,6 @@ import os
 import random
 from datetime import date, datetime, time, timedelta
 
-import pandas as pd
-import pdfkit
 from django.apps import apps
 from django.conf import settings
 from django.contrib.auth.models import Group
@@ -14,14 +12,18 @@ from django.contrib.staticfiles import finders
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.paginator import Paginator
 from django.db import models
-from django.db.models import ForeignKey, ManyToManyField, OneToOneField, Q
+from django.db.models import ForeignKey, ManyToManyField, OneToOneField
 from django.db.models.functions import Lower
 from django.forms.models import ModelChoiceField
 from django.http import HttpResponse
 from django.template.loader import render_to_string
 from django.utils.translation import gettext as _
 
-from base.models import Company, CompanyLeaves, DynamicPagination, Holidays
+from base.exports import export_response
+from base.models import Company, DynamicPagination
+from base.pdf_rendering import render_pdf
+from base.working_calendar import get_working_calendar
+from employee.methods.reporting_hierarchy import subordinate_ids
 from employee.models import Employee, EmployeeWorkInformation
 from horilla.horilla_apps import NESTED_SUBORDINATE_VISIBILITY
 from horilla.horilla_middlewares import _thread_locals
@@ -49,32 +51,10 @@ def filtersubordinates(request, queryset, perm=None, field="employee_id"):
     if not request:
         return queryset
     if NESTED_SUBORDINATE_VISIBILITY:
-        current_managers = [
-            request.user.employee_get.id,
-        ]
-        all_subordinates = Q(
-            **{
-                f"{field}__employee_work_info__reporting_manager_id__in": current_managers
-            }
+        return queryset.filter(
+            **{f"{field}__in": subordinate_ids(request.user.employee_get.id)}
         )
 
-        while True:
-            sub_managers = queryset.filter(
-                **{
-                    f"{field}__employee_work_info__reporting_manager_id__in": current_managers
-                }
-            ).values_list(f"{field}__id", flat=True)
-            if not sub_managers.exists():
-                break
-            current_managers = sub_managers
-            all_subordinates |= Q(
-                **{
-                    f"{field}__employee_work_info__reporting_manager_id__in": sub_managers
-                }
-            )
-
-        return queryset.filter(all_subordinates)
-
     manager = Employee.objects.filter(employee_user_id=user).first()
 
     if field:
@@ -124,30 +104,7 @@ def filtersubordinatesemployeemodel(request, queryset, perm=None):
         return queryset
 
     if NESTED_SUBORDINATE_VISIBILITY:
-        # Initialize the set of subordinates with the current manager(s)
-        current_managers = [
-            request.user.employee_get.id,
-        ]
-        all_subordinates = Q(
-            employee_work_info__reporting_manager_id__in=current_managers
-        )
-
-        # Iteratively find subordinates in the chain
-        while True:
-            sub_managers = queryset.filter(
-                employee_work_info__reporting_manager_id__in=current_managers
-            ).values_list("id", flat=True)
-
-            if not sub_managers.exists():
-                break
-
-            current_managers = sub_managers
-            all_subordinates |= Q(
-                employee_work_info__reporting_manager_id__in=sub_managers
-            )
-
-        # Apply the filter to the queryset
-        return queryset.filter(all_subordinates).distinct()
+        return queryset.filter(id__in=subordinate_ids(request.user.employee_get.id))
 
     manager = Employee.objects.filter(employee_user_id=user).first()
     queryset = queryset.filter(employee_work_info__reporting_manager_id=manager)
@@ -486,7 +443,10 @@ def closest_numbers(numbers: list, input_number: int) -> tuple:
     return (previous_number, next_number)
 
 
-def format_export_value(value, employee):
+def export_formats(employee):
+    """
+    Returns the (time format, date format) of the employee's company
+    """
     work_info = EmployeeWorkInformation.objects.filter(employee_id=employee).first()
     time_format = (
         work_info.company_id.time_format
@@ -498,6 +458,11 @@ def format_export_value(value, employee):
         if work_info and work_info.company_id
         else "MMM. D, YYYY"
     )
+    return time_format, date_format
+
+
+def format_export_value(value, employee, formats=None):
+    time_format, date_format = formats or export_formats(employee)
 
     if isinstance(value, time):
         # Convert the string to a datetime.time object
@@ -550,14 +515,13 @@ def export_data(request, model, form_class, filter_class, file_name, perm=None):
         "early_out": _("Early Out"),
     }
     employee = request.user.employee_get
+    formats = export_formats(employee)
 
     selected_columns = []
     today_date = date.today().strftime("%Y-%m-%d")
-    file_name = f"{file_name}_{today_date}.xlsx"
-    data_export = {}
+    file_name = f"{file_name}_{today_date}"
 
     form = form_class()
-    model_fields = model._meta.get_fields()
     export_objects = filter_class(request.GET).qs
     if perm:
         export_objects = filtersubordinates(request, export_objects, perm)
@@ -575,47 +539,36 @@ def export_data(request, model, form_class, filter_class, file_name, perm=None):
         if value in selected_fields:
             selected_columns.append((value, key))
 
-    for field_name, verbose_name in selected_columns:
-        if field_name in selected_fields:
-            data_export[verbose_name] = []
-            for obj in export_objects:
-                value = obj
-                nested_attributes = field_name.split("__")
-                for attr in nested_attributes:
-                    value = getattr(value, attr, None)
-                    if value is None:
-                        break
-                if value is True:
-                    value = _("Yes")
-                elif value is False:
-                    value = _("No")
-                if value in fields_mapping:
-                    value = fields_mapping[value]
-                if value == "None":
-                    value = " "
-                if field_name == "month":
-                    value = _(value.title())
-
-                # Check if the type of 'value' is time
-                value = format_export_value(value, employee)
-                data_export[verbose_name].append(value)
-
-    data_frame = pd.DataFrame(data=data_export)
-    styled_data_frame = data_frame.style.applymap(
-        lambda x: "text-align: center", subset=pd.IndexSlice[:, :]
+    def export_cell(obj, field_name):
+        value = obj
+        nested_attributes = field_name.split("__")
+        for attr in nested_attributes:
+            value = getattr(value, attr, None)
+            if value is None:
+                break
+        if value is True:
+            value = _("Yes")
+        elif value is False:
+            value = _("No")
+        if value in fields_mapping:
+            value = fields_mapping[value]
+        if value == "None":
+            value = " "
+        if field_name == "month":
+            value = _(value.title())
+
+        # Check if the type of 'value' is time
+        return format_export_value(value, employee, formats)
+
+    return export_response(
+        request,
+        export_objects,
+        [verbose_name for _field_name, verbose_name in selected_columns],
+        [field_name for field_name, _verbose_name in selected_columns],
+        export_cell,
+        file_name,
     )
 
-    response = HttpResponse(content_type="application/ms-excel")
-    response["Content-Disposition"] = f'attachment; filename="{file_name}"'
-
-    writer = pd.ExcelWriter(response, engine="xlsxwriter")
-    styled_data_frame.to_excel(writer, index=False, sheet_name="Sheet1")
-    worksheet = writer.sheets["Sheet1"]
-    worksheet.set_column("A:Z", 18)
-    writer.close()
-
-    return response
-
 
 def reload_queryset(fields):
     """
@@ -771,11 +724,8 @@ def is_holiday(date):
     Returns:
         Holidays or bool: The Holidays object if the date is a holiday, otherwise False.
     """
-    # Get holidays that either match the exact date range or are recurring
-    holiday = Holidays.objects.filter(
-        Q(start_date__lte=date, end_date__gte=date)
-        | Q(recurring=True, start_date__month=date.month, start_date__day=date.day)
-    ).first()
+    # Holidays covering the date or recurring on the same day
+    holiday = get_working_calendar().holiday_on(date)
     return holiday if holiday else False
 
 
@@ -787,24 +737,7 @@ def is_company_leave(input_date):
     Returns:
         CompanyLeaves or bool: The CompanyLeaves object if the date is a company leave, otherwise False.
     """
-    # Calculate the week number within the month (0-4) and weekday (0 for Monday to 6 for Sunday)
-    first_day_of_month = input_date.replace(day=1)
-    adjusted_day = (
-        input_date.day + first_day_of_month.weekday()
-    )  # Adjust day based on first day of the month
-    date_week_no = (adjusted_day - 1) // 7  # Calculate the week number (0-based)
-    date_week_day = input_date.weekday()  # Get weekday (0 for Monday to 6 for Sunday)
-
-    # Query for company leaves that match the week number and weekday
-    company_leave = CompanyLeaves.objects.filter(
-        Q(
-            based_on_week=None, based_on_week_day=date_week_day
-        )  # Match week-independent leaves
-        | Q(
-            based_on_week=date_week_no, based_on_week_day=date_week_day
-        )  # Match specific week and weekday
-    ).first()
-
+    company_leave = get_working_calendar().company_leave_on(input_date)
     return company_leave if company_leave else False
 
 
@@ -838,59 +771,16 @@ def get_holiday_dates(range_start: date, range_end: date) -> list:
     """
     :return: this functions returns a list of all holiday dates.
     """
-    pay_range_dates = get_date_range(start_date=range_start, end_date=range_end)
-    query = Q()
-    for check_date in pay_range_dates:
-        query |= Q(start_date__lte=check_date, end_date__gte=check_date)
-    holidays = Holidays.objects.filter(query)
-    holiday_dates = set([])
-    for holiday in holidays:
-        holiday_dates = holiday_dates | (
-            set(
-                get_date_range(start_date=holiday.start_date, end_date=holiday.end_date)
-            )
-        )
-    return list(set(holiday_dates))
+    return get_working_calendar().holiday_dates_in(range_start, range_end)
 
 
 def get_company_leave_dates(year):
     """
     :return: This function returns a list of all company leave dates
     """
-    company_leaves = CompanyLeaves.objects.all()
-    company_leave_dates = []
-    for company_leave in company_leaves:
-        based_on_week = company_leave.based_on_week
-        based_on_week_day = company_leave.based_on_week_day
-        for month in range(1, 13):
-            if based_on_week is not None:
-                # Set Sunday as the first day of the week
-                calendar.setfirstweekday(6)
-                month_calendar = calendar.monthcalendar(year, month)
-                weeks = month_calendar[int(based_on_week)]
-                weekdays_in_weeks = [day for day in weeks if day != 0]
-                for day in weekdays_in_weeks:
-                    leave_date = datetime.strptime(
-                        f"{year}-{month:02}-{day:02}", "%Y-%m-%d"
-                    ).date()
-                    if (
-                        leave_date.weekday() == int(based_on_week_day)
-                        and leave_date not in company_leave_dates
-                    ):
-                        company_leave_dates.append(leave_date)
-            else:
-                # Set Monday as the first day of the week
-                calendar.setfirstweekday(0)
-                month_calendar = calendar.monthcalendar(year, month)
-                for week in month_calendar:
-                    if week[int(based_on_week_day)] != 0:
-                        leave_date = datetime.strptime(
-                            f"{year}-{month:02}-{week[int(based_on_week_day)]:02}",
-                            "%Y-%m-%d",
-                        ).date()
-                        if leave_date not in company_leave_dates:
-                            company_leave_dates.append(leave_date)
-    return company_leave_dates
+    return get_working_calendar().company_leave_dates_in(
+        date(year, 1, 1), date(year, 12, 31)
+    )
 
 
 def get_working_days(start_date, end_date):
@@ -901,32 +791,12 @@ def get_working_days(start_date, end_date):
         start_date (_type_): the start date from the data needed
         end_date (_type_): the end date till the date needed
     """
-
-    holiday_dates = get_holiday_dates(start_date, end_date)
-
-    # appending company/holiday leaves
-    # Note: Duplicate entry may exist
-    company_leave_dates = (
-        list(
-            set(
-                get_company_leave_dates(start_date.year)
-                + get_company_leave_dates(end_date.year)
-            )
-        )
-        + holiday_dates
+    working_calendar = get_working_calendar()
+    # company/holiday leave dates between the start and end date
+    company_leave_dates = working_calendar.non_working_dates_in(start_date, end_date)
+    working_days_between_ranges = working_calendar.working_days_between(
+        start_date, end_date
     )
-
-    date_range = get_date_range(start_date, end_date)
-
-    # making unique list of company/holiday leave dates then filtering
-    # the leave dates only between the start and end date
-    company_leave_dates = [
-        date
-        for date in list(set(company_leave_dates))
-        if start_date <= date <= end_date
-    ]
-
-    working_days_between_ranges = list(set(date_range) - set(company_leave_dates))
     total_working_days = len(working_days_between_ranges)
 
     return {
@@ -995,23 +865,7 @@ def template_pdf(template, context={}, html=False, filename="payslip.pdf"):
         HttpResponse: A response with the generated PDF file or raw HTML.
     """
     try:
-        bootstrap_css = '<link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">'
-        html_content = f"{bootstrap_css}\n{template}"
-
-        pdf_options = {
-            "page-size": "A4",
-            "margin-top": "10mm",
-            "margin-bottom": "10mm",
-            "margin-left": "10mm",
-            "margin-right": "10mm",
-            "encoding": "UTF-8",
-            "enable-local-file-access": None,
-            "dpi": 300,
-            "zoom": 1.3,
-            "footer-center": "[page]/[topage]",
-        }
-
-        pdf = pdfkit.from_string(html_content, False, options=pdf_options)
+        pdf = render_pdf(template)
 
         response = HttpResponse(pdf, content_type="application/pdf")
         response["Content-Disposition"] = f"inline; filename={filename}"
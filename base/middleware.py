@@ -2,30 +2,25 @@
 middleware.py
 """
 
-from django.apps import apps
+import logging
+
 from django.contrib import messages
 from django.contrib.auth import logout
-from django.core.cache import cache
-from django.db.models import Q
 from django.shortcuts import redirect
 from django.utils.translation import gettext_lazy as _
 
 from base.backends import ConfiguredEmailBackend
 from base.context_processors import AllCompany
-from base.horilla_company_manager import HorillaCompanyManager
-from base.models import Company, ShiftRequest, WorkTypeRequest
-from employee.models import (
-    DisciplinaryAction,
-    Employee,
-    EmployeeBankDetails,
-    EmployeeWorkInformation,
+from base.horilla_company_manager import (
+    get_manager_query_count,
+    reset_manager_query_count,
+    reset_selected_company,
+    set_selected_company,
 )
+from base.models import Company
 from horilla.horilla_apps import TWO_FACTORS_AUTHENTICATION
-from horilla.horilla_settings import APPS
-from horilla.methods import get_horilla_model_class
-from horilla_documents.models import DocumentRequest
 
-CACHE_KEY = "horilla_company_models_cache_key"
+logger = logging.getLogger(__name__)
 
 
 class CompanyMiddleware:
@@ -97,101 +92,44 @@ class CompanyMiddleware:
                 "id": all_company.id,
             }
 
-    def _add_company_filter(self, model, company_id):
-        """
-        Add company filter to the model if applicable.
-        """
-        is_company_model = model in self._get_company_models()
-        company_field = getattr(model, "company_id", None)
-        is_horilla_manager = isinstance(model.objects, HorillaCompanyManager)
-        related_company_field = getattr(model.objects, "related_company_field", None)
-
-        if is_company_model:
-            if company_field:
-                model.add_to_class("company_filter", Q(company_id=company_id))
-            elif is_horilla_manager and related_company_field:
-                model.add_to_class(
-                    "company_filter", Q(**{related_company_field: company_id})
-                )
-        else:
-            if company_field:
-                model.add_to_class(
-                    "company_filter",
-                    Q(company_id=company_id) | Q(company_id__isnull=True),
-                )
-            elif is_horilla_manager and related_company_field:
-                model.add_to_class(
-                    "company_filter",
-                    Q(**{related_company_field: company_id})
-                    | Q(**{f"{related_company_field}__isnull": True}),
-                )
-
-    def _get_company_models(self):
-        """
-        Retrieve the list of models that are company-specific.
-        """
-        company_models = cache.get(CACHE_KEY)
-
-        if company_models is None:
-            company_models = [
-                Employee,
-                ShiftRequest,
-                WorkTypeRequest,
-                DocumentRequest,
-                DisciplinaryAction,
-                EmployeeBankDetails,
-                EmployeeWorkInformation,
-            ]
-
-            app_model_mappings = {
-                "recruitment": ["recruitment", "candidate"],
-                "leave": [
-                    "leaverequest",
-                    "restrictleave",
-                    "availableleave",
-                    "leaveallocationrequest",
-                    "compensatoryleaverequest",
-                ],
-                "asset": ["assetassignment", "assetrequest"],
-                "attendance": [
-                    "attendance",
-                    "attendanceactivity",
-                    "attendanceovertime",
-                    "workrecords",
-                ],
-                "payroll": [
-                    "contract",
-                    "loanaccount",
-                    "payslip",
-                    "reimbursement",
-                ],
-                "helpdesk": ["ticket"],
-                "offboarding": ["offboarding"],
-                "pms": ["employeeobjective"],
-            }
-
-            for app_label, models in app_model_mappings.items():
-                if apps.is_installed(app_label):
-                    company_models.extend(
-                        [get_horilla_model_class(app_label, model) for model in models]
-                    )
-
-            cache.set(CACHE_KEY, company_models)
-
-        return company_models
-
     def __call__(self, request):
+        token = None
         if getattr(request, "user", False) and not request.user.is_anonymous:
             company_id = self._get_company_id(request)
             self._set_company_session(request, company_id)
+            # The company filter of each model is built from this request local
+            # value by HorillaCompanyManager, the model classes are not touched
+            token = set_selected_company(getattr(company_id, "id", None))
 
-            app_models = [
-                model for model in apps.get_models() if model._meta.app_label in APPS
-            ]
-            for model in app_models:
-                self._add_company_filter(model, company_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                reset_selected_company(token)
+        return response
+
+
+class CompanyManagerQueryCountMiddleware:
+    """
+    Debug middleware reporting how many queries HorillaCompanyManager and its
+    querysets ran while serving the request.
+    """
 
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reset_manager_query_count()
         response = self.get_response(request)
+        calls, queries = get_manager_query_count()
+        response["X-Company-Manager-Queries"] = f"{queries}/{calls}"
+        logger.debug(
+            "%s %s: %s company manager queries in %s calls",
+            request.method,
+            request.path,
+            queries,
+            calls,
+        )
         return response
 
 
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.21 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("base", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HorillaJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=150, unique=True)),
+                ("locked_by", models.CharField(blank=True, default="", max_length=150)),
+                ("locked_until", models.DateTimeField(blank=True, null=True)),
+                ("last_started_at", models.DateTimeField(blank=True, null=True)),
+                ("last_finished_at", models.DateTimeField(blank=True, null=True)),
+                ("last_duration", models.FloatField(blank=True, null=True)),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("run_count", models.PositiveIntegerField(default=0)),
+                ("failure_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Scheduled Job",
+                "verbose_name_plural": "Scheduled Jobs",
+                "ordering": ["name"],
+            },
+        ),
+    ]
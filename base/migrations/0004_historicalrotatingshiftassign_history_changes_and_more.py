@@ -0,0 +1,33 @@
+# Generated by Django 4.2.21 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("base", "0003_horillajob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="historicalrotatingshiftassign",
+            name="history_changes",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="historicalrotatingworktypeassign",
+            name="history_changes",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="historicalshiftrequest",
+            name="history_changes",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="historicalworktyperequest",
+            name="history_changes",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1863,4 +1863,77 @@ class NotificationSound(models.Model):
     sound_enabled = models.BooleanField(default=False)
 
 
+class HorillaJob(models.Model):
+    """
+    Lease and run metrics of a scheduled job, the row is also used to elect the
+    single job runner that executes the schedules
+    """
+
+    name = models.CharField(max_length=150, unique=True)
+    locked_by = models.CharField(max_length=150, blank=True, default="")
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_finished_at = models.DateTimeField(null=True, blank=True)
+    last_duration = models.FloatField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    run_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+    objects = models.Manager()
+
+    class Meta:
+        ordering = ["name"]
+        verbose_name = _("Scheduled Job")
+        verbose_name_plural = _("Scheduled Jobs")
+
+    def __str__(self):
+        return self.name
+
+
+class ExportJob(models.Model):
+    """
+    Export too large to be written while the request waits, written by
+    base/exports.py on a background thread and downloaded once completed
+    """
+
+    STATUS_CHOICES = [
+        ("queued", _("Queued")),
+        ("running", _("Running")),
+        ("completed", _("Completed")),
+        ("failed", _("Failed")),
+    ]
+
+    created_by = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="export_jobs"
+    )
+    file_name = models.CharField(max_length=255)
+    file = models.FileField(upload_to="base/exports/", blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    objects = models.Manager()
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.file_name} ({self.status})"
+
+    def is_finished(self):
+        """
+        Whether the job stopped, successfully or not
+        """
+        return self.status in ("completed", "failed")
+
+    def progress(self):
+        """
+        Percentage of the rows already written
+        """
+        if not self.total_rows:
+            return 100 if self.status == "completed" else 0
+        return int(self.processed_rows * 100 / self.total_rows)
+
+
 User.add_to_class("is_new_employee", models.BooleanField(default=False))
@@ -0,0 +1,231 @@
+"""
+base/pdf_rendering.py
+
+PDF rendering service of the documents and payslips.
+
+wkhtmltopdf renders every document in a process of its own, at most
+PDF_WORKERS of them run at once through the threads of the rendering pool.
+The stylesheet is inlined from the static files and the remote stylesheets and
+scripts are left out of the html, so a render never waits on the network.
+The rendered PDFs are stored under the hash of their html and options, a
+document rendered again with the same content is read back from the storage.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+
+import pdfkit
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PDF_WORKERS = getattr(settings, "HORILLA_PDF_WORKERS", None) or min(
+    4, os.cpu_count() or 1
+)
+PDF_STYLESHEET = getattr(
+    settings, "HORILLA_PDF_STYLESHEET", "bootstrap/bootstrap.min.css"
+)
+PDF_CACHE_DIR = "base/pdf_cache"
+# Cached PDFs are deleted after this long
+PDF_CACHE_RETENTION = timedelta(days=7)
+PDF_OPTIONS = {
+    "page-size": "A4",
+    "margin-top": "10mm",
+    "margin-bottom": "10mm",
+    "margin-left": "10mm",
+    "margin-right": "10mm",
+    "encoding": "UTF-8",
+    "enable-local-file-access": None,  # Required to load local CSS/images
+    "dpi": 300,
+    "zoom": 1.3,
+    "footer-center": "[page]/[topage]",
+}
+# Change it when the rendering changes outside of the html and the options,
+# the PDFs cached before are not read anymore
+PDF_TEMPLATE_VERSION = "1"
+
+REMOTE_RESOURCE = re.compile(
+    r"<link\b[^>]*\bhref\s*=\s*[\"']?(?:https?:)?//[^>]*>"
+    r"|<script\b[^>]*\bsrc\s*=\s*[\"']?(?:https?:)?//[^>]*>\s*</script\s*>",
+    re.IGNORECASE,
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def pdf_executor():
+    """
+    Returns the rendering pool of the process
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=PDF_WORKERS, thread_name_prefix="pdf-rendering"
+            )
+    return _executor
+
+
+@lru_cache(maxsize=None)
+def pdf_stylesheet():
+    """
+    Returns the PDF_STYLESHEET static file as a style tag
+    """
+    path = finders.find(PDF_STYLESHEET)
+    if not path:
+        logger.warning("PDF stylesheet %s is not found", PDF_STYLESHEET)
+        return ""
+    with open(path, encoding="utf-8") as file:
+        return f"<style>{file.read()}</style>"
+
+
+def pdf_html(html, stylesheet=True):
+    """
+    Returns the html to render, with the stylesheet inlined and without the
+    remote stylesheets and scripts
+    """
+    html = REMOTE_RESOURCE.sub("", html)
+    if stylesheet:
+        html = f"{pdf_stylesheet()}\n{html}"
+    return html
+
+
+def pdf_cache_key(html):
+    """
+    Returns the content address of the PDF of the html
+    """
+    digest = hashlib.sha256()
+    digest.update(PDF_TEMPLATE_VERSION.encode())
+    digest.update(repr(sorted(PDF_OPTIONS.items())).encode())
+    digest.update(html.encode())
+    return digest.hexdigest()
+
+
+def pdf_cache_path(key):
+    return f"{PDF_CACHE_DIR}/{key}.pdf"
+
+
+def _render(html, cache):
+    """
+    Returns the PDF of the prepared html, runs in the rendering pool
+    """
+    if not cache:
+        return pdfkit.from_string(html, False, options=PDF_OPTIONS)
+    path = pdf_cache_path(pdf_cache_key(html))
+    if default_storage.exists(path):
+        with default_storage.open(path, "rb") as file:
+            return file.read()
+    pdf = pdfkit.from_string(html, False, options=PDF_OPTIONS)
+    try:
+        if not default_storage.exists(path):
+            default_storage.save(path, ContentFile(pdf))
+    except OSError as e:
+        logger.warning("Caching the PDF %s failed: %s", path, e)
+    return pdf
+
+
+def render_pdf(html, stylesheet=True, cache=True):
+    """
+    Returns the PDF of the html
+    """
+    return pdf_executor().submit(_render, pdf_html(html, stylesheet), cache).result()
+
+
+def _result(future, return_exceptions):
+    try:
+        return future.result()
+    except Exception as error:
+        if not return_exceptions:
+            raise
+        return error
+
+
+def render_pdfs(htmls, stylesheet=True, cache=True, return_exceptions=False):
+    """
+    Yields the PDFs of the htmls in their order, rendered in parallel. Only a
+    few htmls are read ahead of the PDF yielded, so the htmls can be a
+    generator over any number of documents.
+
+    With return_exceptions, the error of a PDF that fails to render, or given
+    in place of its html, is yielded in its place and the following PDFs still
+    render.
+    """
+    executor = pdf_executor()
+    pending = deque()
+    for html in htmls:
+        if isinstance(html, Exception):
+            future = Future()
+            future.set_exception(html)
+        else:
+            future = executor.submit(_render, pdf_html(html, stylesheet), cache)
+        pending.append(future)
+        if len(pending) > PDF_WORKERS * 2:
+            yield _result(pending.popleft(), return_exceptions)
+    while pending:
+        yield _result(pending.popleft(), return_exceptions)
+
+
+class ZipBuffer:
+    """
+    Write only file collecting what the zip file writes, zipfile falls back
+    to data descriptors as it cannot seek in it
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(files):
+    """
+    Yields the bytes of a zip of the (name, content) files, file by file
+    """
+    buffer = ZipBuffer()
+    # PDFs are compressed already
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, content in files:
+            archive.writestr(name, content)
+            yield buffer.pop()
+    yield buffer.pop()
+
+
+def delete_expired_pdfs():
+    """
+    Deletes the cached PDFs older than PDF_CACHE_RETENTION
+    """
+    try:
+        _directories, files = default_storage.listdir(PDF_CACHE_DIR)
+    except FileNotFoundError:
+        return
+    expiry = timezone.now() - PDF_CACHE_RETENTION
+    for name in files:
+        path = f"{PDF_CACHE_DIR}/{name}"
+        try:
+            if default_storage.get_modified_time(path) < expiry:
+                default_storage.delete(path)
+        except FileNotFoundError:
+            continue
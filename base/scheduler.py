@@ -1,10 +1,9 @@
 import calendar
-import sys
 from datetime import date, datetime, timedelta
 
-from apscheduler.schedulers.background import BackgroundScheduler
 from django.urls import reverse
 
+from horilla.horilla_jobs import register_job
 from notifications.signals import notify
 
 
@@ -435,67 +434,30 @@ def recurring_holiday():
         recurring_holiday.save()
 
 
-if not any(
-    cmd in sys.argv
-    for cmd in ["makemigrations", "migrate", "compilemessages", "flush", "shell"]
-):
-    scheduler = BackgroundScheduler()
-
-    # Add jobs with next_run_time set to the end of the previous job
-    try:
-        scheduler.add_job(rotate_shift, "interval", hours=4, id="job1")
-    except:
-        pass
-
-    try:
-        scheduler.add_job(
-            rotate_work_type,
-            "interval",
-            hours=4,
-            id="job2",
-        )
-    except:
-        pass
-
-    try:
-        scheduler.add_job(
-            undo_shift,
-            "interval",
-            hours=4,
-            id="job3",
-        )
-    except:
-        pass
-
-    try:
-        scheduler.add_job(
-            switch_shift,
-            "interval",
-            hours=4,
-            id="job4",
-        )
-    except:
-        pass
-
-    try:
-        scheduler.add_job(
-            undo_work_type,
-            "interval",
-            hours=4,
-            id="job6",
-        )
-    except:
-        pass
-
-    try:
-        scheduler.add_job(
-            switch_work_type,
-            "interval",
-            hours=4,
-            id="job5",
-        )
-    except:
-        pass
+def delete_expired_exports():
+    """
+    Deletes the expired background exports and their files
+    """
+    from base.exports import delete_expired_export_jobs
+
+    delete_expired_export_jobs()
+
+
+def delete_expired_pdf_cache():
+    """
+    Deletes the expired cached PDFs
+    """
+    from base.pdf_rendering import delete_expired_pdfs
+
+    delete_expired_pdfs()
+
 
-    scheduler.add_job(recurring_holiday, "interval", hours=4)
-    scheduler.start()
+register_job(rotate_shift, "interval", hours=4)
+register_job(rotate_work_type, "interval", hours=4)
+register_job(undo_shift, "interval", hours=4)
+register_job(switch_shift, "interval", hours=4)
+register_job(undo_work_type, "interval", hours=4)
+register_job(switch_work_type, "interval", hours=4)
+register_job(recurring_holiday, "interval", hours=4)
+register_job(delete_expired_exports, "interval", hours=1)
+register_job(delete_expired_pdf_cache, "interval", hours=24)
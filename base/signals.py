@@ -8,13 +8,15 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.signals import user_login_failed
 from django.db.models import Max, Q
-from django.db.models.signals import m2m_changed, post_migrate, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
 from django.dispatch import receiver
 from django.http import Http404
 from django.shortcuts import redirect, render
 
-from base.models import Announcement, PenaltyAccounts
+from base.models import Announcement, CompanyLeaves, Holidays, PenaltyAccounts
+from base.working_calendar import invalidate_working_calendar
 from horilla.methods import get_horilla_model_class
+from horilla.signals import post_bulk_update
 
 
 @receiver(post_save, sender=PenaltyAccounts)
@@ -67,6 +69,19 @@ def create_deduction_cutleave_from_penalty(sender, instance, created, **kwargs):
             available.save()
 
 
+@receiver(post_save, sender=Holidays)
+@receiver(post_delete, sender=Holidays)
+@receiver(post_bulk_update, sender=Holidays)
+@receiver(post_save, sender=CompanyLeaves)
+@receiver(post_delete, sender=CompanyLeaves)
+@receiver(post_bulk_update, sender=CompanyLeaves)
+def refresh_working_calendar(sender, **kwargs):
+    """
+    Drop the materialized working calendar when holidays or company leaves change
+    """
+    invalidate_working_calendar()
+
+
 # @receiver(post_migrate)
 def clean_work_records(sender, **kwargs):
     if sender.label not in ["attendance"]:
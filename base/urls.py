@@ -1070,6 +1070,12 @@ urlpatterns = [
         "company-leave-filter", views.company_leave_filter, name="company-leave-filter"
     ),
     path("view-penalties", views.view_penalties, name="view-penalties"),
+    path("export-job/<int:job_id>/", views.export_job, name="export-job"),
+    path(
+        "export-job-download/<int:job_id>/",
+        views.export_job_download,
+        name="export-job-download",
+    ),
 ]
 
 urlpatterns.append(
@@ -141,6 +141,7 @@ from base.models import (
     EmployeeShift,
     EmployeeShiftSchedule,
     EmployeeType,
+    ExportJob,
     Holidays,
     HorillaMailTemplate,
     JobPosition,
@@ -4885,18 +4886,17 @@ def shift_request_approve(request, id):
     if shift_request.reallocate_to:
         recipients.append(shift_request.reallocate_to.employee_user_id)
 
-    for recipient in recipients:
-        notify.send(
-            user.employee_get,
-            recipient=recipient,
-            verb="Your shift request has been approved.",
-            verb_ar="تمت الموافقة على طلبك للوردية.",
-            verb_de="Ihr Schichtantrag wurde genehmigt.",
-            verb_es="Se ha aprobado su solicitud de turno.",
-            verb_fr="Votre demande de quart a été approuvée.",
-            redirect=reverse("shift-request-view") + f"?id={shift_request.id}",
-            icon="checkmark",
-        )
+    notify.send(
+        user.employee_get,
+        recipient=recipients,
+        verb="Your shift request has been approved.",
+        verb_ar="تمت الموافقة على طلبك للوردية.",
+        verb_de="Ihr Schichtantrag wurde genehmigt.",
+        verb_es="Se ha aprobado su solicitud de turno.",
+        verb_fr="Votre demande de quart a été approuvée.",
+        redirect=reverse("shift-request-view") + f"?id={shift_request.id}",
+        icon="checkmark",
+    )
 
     return HttpResponseRedirect(request.META.get("HTTP_REFERER", "/"))
 
@@ -7489,6 +7489,29 @@ def view_penalties(request):
     return render(request, "penalty/penalty_view.html", {"records": records})
 
 
+@login_required
+def export_job(request, job_id):
+    """
+    This method is used to render the progress of a background export
+    """
+    job = get_object_or_404(ExportJob, pk=job_id, created_by=request.user)
+    template = "base/export_job.html"
+    if request.headers.get("HX-Request"):
+        template = "base/export_job_status.html"
+    return render(request, template, {"job": job})
+
+
+@login_required
+def export_job_download(request, job_id):
+    """
+    This method is used to download the file of a completed export
+    """
+    job = get_object_or_404(
+        ExportJob, pk=job_id, created_by=request.user, status="completed"
+    )
+    return FileResponse(job.file.open("rb"), as_attachment=True, filename=job.file_name)
+
+
 def protected_media(request, path):
     page_urls = [
         "/login",
@@ -0,0 +1,274 @@
+"""
+working_calendar.py
+
+Company aware working day calendar.
+
+The holiday and company leave days of a year are materialized once per company
+and kept in memory and in Django's cache. Saving or deleting a Holidays or
+CompanyLeaves record bumps the calendar version, which drops the materialized
+years of the processes sharing that cache. The version is read once per
+request. A materialized year also expires after CACHE_TIMEOUT seconds in
+memory and in the cache, so a process with its own local cache picks up the
+changes of another one within two minutes. Lookups on a materialized year
+never hit the database.
+"""
+
+import calendar
+import threading
+import time
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from horilla.horilla_middlewares import _thread_locals
+
+CACHE_KEY = "horilla_working_calendar"
+VERSION_CACHE_KEY = f"{CACHE_KEY}_version"
+CACHE_TIMEOUT = 60
+
+_years = {}
+_years_version = {"version": None}
+_years_lock = threading.Lock()
+
+
+def get_calendar_version():
+    """
+    Returns the current calendar version shared through Django's cache, kept on
+    the current request so the cache is read once per request
+    """
+    request = getattr(_thread_locals, "request", None)
+    version = getattr(request, "_working_calendar_version", None)
+    if version is not None:
+        return version
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = 1
+        cache.add(VERSION_CACHE_KEY, version, None)
+    if request is not None:
+        request._working_calendar_version = version
+    return version
+
+
+def invalidate_working_calendar():
+    """
+    Drop every materialized calendar year in this process and in the processes
+    sharing Django's cache
+    """
+    try:
+        version = cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        version = 2
+        cache.set(VERSION_CACHE_KEY, version, None)
+    request = getattr(_thread_locals, "request", None)
+    if request is not None:
+        # The rest of the request sees its own change
+        request._working_calendar_version = version
+    with _years_lock:
+        _years.clear()
+
+
+def get_company_key():
+    """
+    Returns the company whose holidays and company leaves apply to the current
+    request, "all" when no company is selected
+    """
+    request = getattr(_thread_locals, "request", None)
+    session = getattr(request, "session", None)
+    selected_company = session.get("selected_company") if session else None
+    if not selected_company or selected_company == "all":
+        return "all"
+    return str(selected_company)
+
+
+def _date_range(start_date, end_date):
+    return [
+        start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)
+    ]
+
+
+def company_leave_dates_on_year(company_leave, year):
+    """
+    Returns the dates of the year covered by a CompanyLeaves rule.
+
+    Rules with a week use Sunday as the first day of the week, rules without a
+    week repeat on every matching weekday.
+    """
+    week_day = int(company_leave.based_on_week_day)
+    leave_dates = []
+    for month in range(1, 13):
+        if company_leave.based_on_week is not None:
+            weeks = calendar.Calendar(firstweekday=6).monthdayscalendar(year, month)
+            week_no = int(company_leave.based_on_week)
+            if week_no >= len(weeks):
+                continue
+            leave_dates.extend(
+                date(year, month, day)
+                for day in weeks[week_no]
+                if day and date(year, month, day).weekday() == week_day
+            )
+        else:
+            weeks = calendar.Calendar(firstweekday=0).monthdayscalendar(year, month)
+            leave_dates.extend(
+                date(year, month, week[week_day]) for week in weeks if week[week_day]
+            )
+    return leave_dates
+
+
+class CalendarYear:
+    """
+    The holiday and company leave days of a company for one year
+    """
+
+    def __init__(self, company_key, year):
+        from base.models import CompanyLeaves, Holidays
+
+        self.year = year
+        year_start = date(year, 1, 1)
+        year_end = date(year, 12, 31)
+        company_filter = Q()
+        if company_key != "all":
+            company_filter = Q(company_id=company_key) | Q(company_id__isnull=True)
+
+        self.holidays = {}
+        self.recurring_holidays = {}
+        self.holiday_dates = {}
+        for holiday in (
+            Holidays.objects.entire()
+            .filter(company_filter)
+            .filter(
+                Q(end_date__gte=year_start) | Q(end_date__isnull=True),
+                start_date__lte=year_end,
+            )
+            .order_by("id")
+        ):
+            self.holidays[holiday.pk] = holiday
+            end_date = holiday.end_date or holiday.start_date
+            for holiday_date in _date_range(
+                max(holiday.start_date, year_start), min(end_date, year_end)
+            ):
+                self.holiday_dates.setdefault(holiday_date, holiday.pk)
+        for holiday in (
+            Holidays.objects.entire()
+            .filter(company_filter)
+            .filter(recurring=True)
+            .order_by("id")
+        ):
+            self.holidays.setdefault(holiday.pk, holiday)
+            self.recurring_holidays.setdefault(
+                (holiday.start_date.month, holiday.start_date.day), holiday.pk
+            )
+
+        self.company_leaves = {}
+        self.company_leave_dates = {}
+        for company_leave in (
+            CompanyLeaves.objects.entire().filter(company_filter).order_by("id")
+        ):
+            self.company_leaves[company_leave.pk] = company_leave
+            for leave_date in company_leave_dates_on_year(company_leave, year):
+                self.company_leave_dates.setdefault(leave_date, company_leave.pk)
+
+        self.non_working_dates = frozenset(self.holiday_dates) | frozenset(
+            self.company_leave_dates
+        )
+
+
+class WorkingCalendar:
+    """
+    Working day lookups of a company served from materialized calendar years
+    """
+
+    def __init__(self, company_key=None):
+        self.company_key = company_key or get_company_key()
+        self.version = get_calendar_version()
+        if _years_version["version"] != self.version:
+            # Another process changed the holidays or company leaves
+            with _years_lock:
+                _years.clear()
+                _years_version["version"] = self.version
+
+    def get_year(self, year):
+        """
+        Returns the materialized CalendarYear, building and caching it on a miss
+        """
+        key = (self.company_key, year)
+        calendar_year, loaded_at = _years.get(key, (None, 0))
+        if calendar_year is None or time.monotonic() - loaded_at > CACHE_TIMEOUT:
+            cache_key = f"{CACHE_KEY}_{self.company_key}_{year}_{self.version}"
+            calendar_year = cache.get(cache_key)
+            if calendar_year is None:
+                calendar_year = CalendarYear(self.company_key, year)
+                cache.set(cache_key, calendar_year, CACHE_TIMEOUT)
+            with _years_lock:
+                _years[key] = (calendar_year, time.monotonic())
+        return calendar_year
+
+    def holiday_on(self, check_date):
+        """
+        Returns the Holidays instance on the date, including recurring holidays
+        """
+        calendar_year = self.get_year(check_date.year)
+        holiday_id = calendar_year.holiday_dates.get(
+            check_date
+        ) or calendar_year.recurring_holidays.get((check_date.month, check_date.day))
+        return calendar_year.holidays.get(holiday_id)
+
+    def company_leave_on(self, check_date):
+        """
+        Returns the CompanyLeaves instance covering the date
+        """
+        calendar_year = self.get_year(check_date.year)
+        return calendar_year.company_leaves.get(
+            calendar_year.company_leave_dates.get(check_date)
+        )
+
+    def is_working_day(self, check_date):
+        """
+        Returns True when the date is neither a holiday nor a company leave
+        """
+        return check_date not in self.get_year(check_date.year).non_working_dates
+
+    def _dates_in(self, start_date, end_date, attr):
+        dates = []
+        for year in range(start_date.year, end_date.year + 1):
+            dates.extend(
+                check_date
+                for check_date in getattr(self.get_year(year), attr)
+                if start_date <= check_date <= end_date
+            )
+        return sorted(dates)
+
+    def holiday_dates_in(self, start_date, end_date):
+        """
+        Returns the holiday dates between the start and end date
+        """
+        return self._dates_in(start_date, end_date, "holiday_dates")
+
+    def company_leave_dates_in(self, start_date, end_date):
+        """
+        Returns the company leave dates between the start and end date
+        """
+        return self._dates_in(start_date, end_date, "company_leave_dates")
+
+    def non_working_dates_in(self, start_date, end_date):
+        """
+        Returns the holiday and company leave dates between the start and end date
+        """
+        return self._dates_in(start_date, end_date, "non_working_dates")
+
+    def working_days_between(self, start_date, end_date):
+        """
+        Returns the working dates between the start and end date
+        """
+        return [
+            check_date
+            for check_date in _date_range(start_date, end_date)
+            if self.is_working_day(check_date)
+        ]
+
+
+def get_working_calendar():
+    """
+    Returns the WorkingCalendar of the company selected on the current request
+    """
+    return WorkingCalendar()
@@ -8,9 +8,11 @@ Functions:
     biometric_is_installed(request): Checks if the biometric system is installed.
 """
 
+from base.context_processors import cached_context_processor
 from base.models import BiometricAttendance
 
 
+@cached_context_processor("biometric_is_installed", models=["base.BiometricAttendance"])
 def biometric_is_installed(_request):
     """
     Check if the biometric system is installed.
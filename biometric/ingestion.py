@@ -0,0 +1,772 @@
+"""
+biometric/ingestion.py
+
+Ingestion pipeline of the biometric attendance logs.
+
+The devices are read concurrently, at most BIOMETRIC_FETCH_WORKERS at once.
+Every punch read is stored in BiometricPunch, unique per device, device user
+and time, so a log read twice or replayed stores its punches only once. The
+fetch marker of a device moves on once its punches are stored. The stored
+punches are then folded into the attendance activities and attendances of
+their employee the way clock_in and clock_out mark them, with the state of
+the employee loaded once, the activities written in bulk and every
+attendance saved once for all of its punches.
+"""
+
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+
+import pytz
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from zk import ZK
+
+from attendance.methods.hour_account import defer_hour_account_updates
+from attendance.methods.utils import (
+    activity_datetime,
+    format_time,
+    overtime_calculation,
+    strtime_seconds,
+)
+from attendance.models import Attendance, AttendanceActivity, get_shift_day_id
+from attendance.views.clock_in_out import early_out, late_come
+from attendance.views.views import attendance_validate
+from base.models import EmployeeShiftSchedule
+from employee.methods.methods import chunked
+from employee.models import Employee, EmployeeWorkInformation
+
+from .anviz import CrossChexCloudAPI
+from .cosec import COSECBiometric
+from .dahua import DahuaAPI
+from .etimeoffice import ETimeOfficeAPI
+from .models import BiometricEmployees, BiometricPunch, COSECAttendanceArguments
+
+logger = logging.getLogger(__name__)
+
+BIOMETRIC_FETCH_WORKERS = getattr(settings, "HORILLA_BIOMETRIC_FETCH_WORKERS", 8)
+PUNCH_BATCH_SIZE = 2000
+ZK_IN_CODES = {0, 3, 4}
+ZK_OUT_CODES = {1, 2, 5}
+ANVIZ_IN_CODES = {0, 128}
+COSEC_IN_CODES = {"1", "3", "5", "7", "9", "0"}
+COSEC_OUT_CODES = {"2", "4", "6", "8", "10"}
+MID_DAY_SECONDS = strtime_seconds("12:00")
+
+Punch = namedtuple("Punch", ["user_id", "punch_time", "direction", "code"])
+
+# Folds of the same employees must not run at once in the process
+_fold_lock = threading.Lock()
+
+
+class BiometricFetchError(Exception):
+    """
+    Raised when a device does not hand back its attendance log
+    """
+
+
+def fetch_marker(device):
+    """
+    Returns the time of the last punch fetched from the device
+    """
+    if device.last_fetch_date and device.last_fetch_time:
+        return datetime.combine(device.last_fetch_date, device.last_fetch_time)
+    return None
+
+
+def save_fetch_marker(device, fetched_at):
+    device.last_fetch_date = fetched_at.date()
+    device.last_fetch_time = fetched_at.time()
+    device.save(update_fields=["last_fetch_date", "last_fetch_time"])
+
+
+def zk_direction(device, punch_code):
+    """
+    Returns the direction of a ZKTeco punch, the in and out devices mark every
+    punch with their own direction
+    """
+    if device.device_direction in ("in", "out"):
+        return device.device_direction
+    if punch_code in ZK_IN_CODES:
+        return "in"
+    if punch_code in ZK_OUT_CODES:
+        return "out"
+    return None
+
+
+def read_zk_punches(device):
+    """
+    Reads the punches of a ZKTeco device after its fetch marker. The protocol
+    cannot ask for the log after a time, the whole log is downloaded and only
+    the new records become punches.
+    """
+    conn = None
+    zk_device = ZK(
+        device.machine_ip,
+        port=device.port,
+        timeout=5,
+        password=int(device.zk_password),
+        force_udp=False,
+        ommit_ping=False,
+    )
+    try:
+        conn = zk_device.connect()
+        conn.enable_device()
+        records = conn.get_attendance() or []
+    finally:
+        if conn:
+            conn.disconnect()
+
+    marker = fetch_marker(device)
+    punches = []
+    last_timestamp = None
+    for record in records:
+        if last_timestamp is None or record.timestamp > last_timestamp:
+            last_timestamp = record.timestamp
+        if marker and record.timestamp <= marker:
+            continue
+        direction = zk_direction(device, record.punch)
+        if direction:
+            punches.append(
+                Punch(
+                    str(record.user_id),
+                    timezone.make_aware(record.timestamp),
+                    direction,
+                    str(record.punch),
+                )
+            )
+
+    def save_marker():
+        if last_timestamp is not None:
+            save_fetch_marker(device, last_timestamp)
+
+    return punches, save_marker
+
+
+def read_anviz_punches(device):
+    """
+    Reads the punches of an Anviz device from the CrossChex Cloud after its
+    fetch marker, the punches are matched by the badge id of the employees
+    """
+    current_utc_time = datetime.utcnow()
+    anviz_device = CrossChexCloudAPI(
+        api_url=device.api_url,
+        api_key=device.api_key,
+        api_secret=device.api_secret,
+        anviz_request_id=device.anviz_request_id,
+    )
+    begin_time = fetch_marker(device) or current_utc_time.replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    records = anviz_device.get_attendance_records(
+        begin_time=begin_time, token=device.api_token
+    )["list"]
+    punches = [
+        Punch(
+            str(record["employee"]["workno"]),
+            datetime.strptime(record["checktime"], "%Y-%m-%dT%H:%M:%S%z"),
+            "in" if record["checktype"] in ANVIZ_IN_CODES else "out",
+            str(record["checktype"]),
+        )
+        for record in records
+    ]
+    return punches, lambda: save_fetch_marker(device, current_utc_time)
+
+
+def read_cosec_punches(device):
+    """
+    Reads the punch events of a COSEC device after the last sequence number
+    fetched
+    """
+    device_args = COSECAttendanceArguments.objects.filter(device_id=device).first()
+    last_fetch_roll_ovr_count = (
+        int(device_args.last_fetch_roll_ovr_count) if device_args else 0
+    )
+    last_fetch_seq_number = int(device_args.last_fetch_seq_number) if device_args else 1
+    cosec = COSECBiometric(
+        device.machine_ip,
+        device.port,
+        device.bio_username,
+        device.bio_password,
+        timeout=10,
+    )
+    events = cosec.get_attendance_events(
+        last_fetch_roll_ovr_count, int(last_fetch_seq_number) + 1
+    )
+    if not isinstance(events, list):
+        raise BiometricFetchError(f"{device.name}: no attendance events returned")
+
+    punches = []
+    for event in events:
+        punch_code = event["detail-2"]
+        if punch_code in COSEC_IN_CODES:
+            direction = "in"
+        elif punch_code in COSEC_OUT_CODES:
+            direction = "out"
+        else:
+            continue
+        punch_time = datetime.strptime(
+            f"{event['date']} {event['time']}", "%d/%m/%Y %H:%M:%S"
+        )
+        punches.append(
+            Punch(
+                str(event["detail-1"]),
+                timezone.make_aware(punch_time),
+                direction,
+                punch_code,
+            )
+        )
+
+    def save_marker():
+        if events:
+            COSECAttendanceArguments.objects.update_or_create(
+                device_id=device,
+                defaults={
+                    "last_fetch_roll_ovr_count": events[-1]["roll-over-count"],
+                    "last_fetch_seq_number": events[-1]["seq-No"],
+                },
+            )
+
+    return punches, save_marker
+
+
+def read_dahua_punches(device):
+    """
+    Reads the card records of a Dahua device after its fetch marker, the
+    records have no direction and alternate between in and out
+    """
+    marker = fetch_marker(device)
+    begin_time = (
+        marker + timedelta(seconds=1)
+        if marker
+        else datetime.combine(datetime.today(), datetime.min.time())
+    )
+    dahua = DahuaAPI(
+        ip=device.machine_ip, username=device.bio_username, password=device.bio_password
+    )
+    logs = dahua.get_control_card_rec(start_time=begin_time)
+    if logs.get("status_code") != 200:
+        raise BiometricFetchError(f"{device.name}: {logs.get('status_code')}")
+
+    records = logs.get("records", [])
+    user_tz = pytz.timezone(settings.TIME_ZONE)
+    punches = [
+        Punch(
+            str(record["user_id"]),
+            record["create_time"].astimezone(user_tz),
+            "toggle",
+            "",
+        )
+        for record in records
+        if record.get("user_id") and isinstance(record.get("create_time"), datetime)
+    ]
+
+    def save_marker():
+        if records:
+            save_fetch_marker(device, records[-1]["create_time"])
+
+    return punches, save_marker
+
+
+def read_etimeoffice_punches(device):
+    """
+    Reads the punches of an eTimeOffice account after its fetch marker, the
+    punches have no direction and alternate between in and out
+    """
+    now = datetime.now()
+    etimeoffice = ETimeOfficeAPI(
+        username=device.bio_username,
+        password=device.bio_password,
+    )
+    marker = fetch_marker(device)
+    from_date = (
+        f"{marker + timedelta(minutes=1):%d/%m/%Y_%H:%M}"
+        if marker
+        else f"{now:%d/%m/%Y}_00:00"
+    )
+    logs = etimeoffice.download_punch_data(
+        from_date=from_date, to_date=f"{now:%d/%m/%Y_%H:%M}"
+    )
+    if logs.get("Msg") != "Success":
+        raise BiometricFetchError(f"{device.name}: {logs.get('Msg')}")
+
+    # The newest punch comes first
+    records = logs.get("PunchData", [])
+    user_tz = pytz.timezone(settings.TIME_ZONE)
+    punches = [
+        Punch(
+            str(record["Empcode"]),
+            record["PunchDate"].astimezone(user_tz),
+            "toggle",
+            "",
+        )
+        for record in reversed(records)
+        if record.get("Empcode") and isinstance(record.get("PunchDate"), datetime)
+    ]
+
+    def save_marker():
+        if records and isinstance(records[0].get("PunchDate"), datetime):
+            save_fetch_marker(device, records[0]["PunchDate"])
+
+    return punches, save_marker
+
+
+PUNCH_READERS = {
+    "zk": read_zk_punches,
+    "anviz": read_anviz_punches,
+    "cosec": read_cosec_punches,
+    "dahua": read_dahua_punches,
+    "etimeoffice": read_etimeoffice_punches,
+}
+
+
+def punch_employees(device, user_ids):
+    """
+    Returns the employee id of each device user id of the device
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return {}
+    if device.machine_type == "anviz":
+        return {
+            badge_id: employee_id
+            for employee_id, badge_id in Employee.objects.entire()
+            .filter(badge_id__in=user_ids)
+            .values_list("id", "badge_id")
+        }
+    if device.machine_type == "cosec":
+        # COSEC users are known by their reference id on every device
+        ref_user_ids = [int(user_id) for user_id in user_ids if user_id.isdigit()]
+        return {
+            str(ref_user_id): employee_id
+            for ref_user_id, employee_id in BiometricEmployees.objects.filter(
+                ref_user_id__in=ref_user_ids
+            ).values_list("ref_user_id", "employee_id")
+        }
+    return dict(
+        BiometricEmployees.objects.filter(
+            device_id=device, user_id__in=user_ids
+        ).values_list("user_id", "employee_id")
+    )
+
+
+def store_punches(device, punches):
+    """
+    Stores the punches of the device, the punches stored before are left as
+    they are. Returns the ids of the employees of the punches.
+    """
+    employees = punch_employees(device, (punch.user_id for punch in punches))
+    with transaction.atomic():
+        for batch in chunked(punches, PUNCH_BATCH_SIZE):
+            BiometricPunch.objects.bulk_create(
+                [
+                    BiometricPunch(
+                        device_id=device,
+                        user_id=punch.user_id,
+                        employee_id_id=employees.get(punch.user_id),
+                        punch_time=punch.punch_time,
+                        direction=punch.direction,
+                        punch_code=punch.code,
+                    )
+                    for punch in batch
+                ],
+                ignore_conflicts=True,
+            )
+    return {employees[punch.user_id] for punch in punches if punch.user_id in employees}
+
+
+def map_stored_punches(device):
+    """
+    Sets the employee of the stored punches of device users mapped to an
+    employee since they were stored, returns the number of punches mapped
+    """
+    unmapped = BiometricPunch.objects.filter(device_id=device, employee_id=None)
+    employees = punch_employees(
+        device, unmapped.values_list("user_id", flat=True).distinct()
+    )
+    return sum(
+        unmapped.filter(user_id=user_id).update(employee_id=employee_id)
+        for user_id, employee_id in employees.items()
+    )
+
+
+def fetch_device_punches(device):
+    """
+    Reads the new punches of the device and stores them, returns the number
+    of punches read and the ids of their employees. The marker is saved after
+    the punches, a fetch failing in between reads them again and they are not
+    stored twice.
+    """
+    punches, save_marker = PUNCH_READERS[device.machine_type](device)
+    employee_ids = store_punches(device, punches)
+    save_marker()
+    return len(punches), employee_ids
+
+
+def _fetch_in_thread(device):
+    try:
+        return fetch_device_punches(device)
+    finally:
+        connection.close()
+
+
+def fetch_devices(devices):
+    """
+    Fetches the punches of the devices, at most BIOMETRIC_FETCH_WORKERS at
+    once, and folds them into the attendances. Returns the number of punches
+    read and the error of every device failing.
+    """
+    devices = list(devices)
+    results = []
+    if len(devices) < 2 or BIOMETRIC_FETCH_WORKERS < 2:
+        for device in devices:
+            try:
+                results.append((device, fetch_device_punches(device), None))
+            except Exception as error:
+                results.append((device, None, error))
+    else:
+        with ThreadPoolExecutor(
+            max_workers=min(BIOMETRIC_FETCH_WORKERS, len(devices)),
+            thread_name_prefix="biometric-fetch",
+        ) as executor:
+            futures = [
+                (device, executor.submit(_fetch_in_thread, device))
+                for device in devices
+            ]
+            for device, future in futures:
+                try:
+                    results.append((device, future.result(), None))
+                except Exception as error:
+                    results.append((device, None, error))
+
+    count = 0
+    employee_ids = set()
+    errors = {}
+    for device, result, error in results:
+        if error is not None:
+            logger.error("Fetching the punches of %s failed", device, exc_info=error)
+            errors[device] = error
+            continue
+        count += result[0]
+        employee_ids |= result[1]
+    fold_punches(employee_ids)
+    return count, errors
+
+
+class ShiftSchedules:
+    """
+    Schedules of the shifts by shift day, looked up once per fold
+    """
+
+    def __init__(self):
+        self.schedules = {}
+
+    def get(self, shift, day_id):
+        """
+        Returns the minimum hour, start and end seconds and night shift flag
+        of the shift on the day, like shift_schedule_today
+        """
+        shift_id = shift.pk if shift else None
+        if shift_id not in self.schedules:
+            schedules = {}
+            for schedule in (
+                EmployeeShiftSchedule.objects.entire()
+                .filter(shift_id=shift_id)
+                .order_by("-id")
+            ):
+                start_time = schedule.start_time or time()
+                end_time = schedule.end_time or time()
+                schedules[schedule.day_id] = (
+                    schedule.minimum_working_hour,
+                    strtime_seconds(start_time.strftime("%H:%M")),
+                    strtime_seconds(end_time.strftime("%H:%M")),
+                    schedule.is_night_shift,
+                )
+            self.schedules[shift_id] = schedules
+        return self.schedules[shift_id].get(day_id, ("00:00", 0, 0, False))
+
+
+class EmployeePunchFold:
+    """
+    Folds the punches of an employee into the attendance activities and
+    attendances. The punches are applied in memory in their order, like
+    clock_in and clock_out would apply them one by one, and written once.
+    """
+
+    def __init__(self, employee, work_info, schedules, punches):
+        self.employee = employee
+        self.shift = work_info.shift_id
+        self.work_type = work_info.work_type_id
+        self.schedules = schedules
+        self.activities = {}
+        self.attendances = {}
+        self.states = {}
+        self.new_activities = []
+        self.changed_activities = set()
+        self.open_activities = []
+        self.order = {}
+
+        first = timezone.localtime(punches[0].punch_time).date() - timedelta(days=1)
+        last = timezone.localtime(punches[-1].punch_time).date()
+        open_dates = set(
+            AttendanceActivity.objects.entire()
+            .filter(employee_id=employee, clock_out__isnull=True)
+            .values_list("attendance_date", flat=True)
+        )
+        dates = Q(attendance_date__range=(first, last)) | Q(
+            attendance_date__in=open_dates
+        )
+        for activity in (
+            AttendanceActivity.objects.entire()
+            .filter(dates, employee_id=employee)
+            .order_by("attendance_date", "id")
+        ):
+            self.add_activity(activity)
+        for attendance in Attendance.objects.entire().filter(
+            dates, employee_id=employee
+        ):
+            self.attendances[attendance.attendance_date] = attendance
+
+    def add_activity(self, activity):
+        self.activities.setdefault(activity.attendance_date, []).append(activity)
+        self.order[id(activity)] = len(self.order)
+        if activity.clock_out is None:
+            self.open_activities.append(activity)
+
+    def close_activity(self, activity, local_time):
+        activity.clock_out = local_time.time()
+        activity.clock_out_date = local_time.date()
+        activity.out_datetime = local_time
+        self.open_activities.remove(activity)
+        if activity.pk:
+            self.changed_activities.add(activity)
+
+    def open_activity(self):
+        """
+        Returns the last activity not clocked out, by attendance date
+        """
+        if not self.open_activities:
+            return None
+        return max(
+            self.open_activities,
+            key=lambda activity: (activity.attendance_date, self.order[id(activity)]),
+        )
+
+    def state(self, attendance):
+        return self.states.setdefault(
+            attendance.attendance_date,
+            {"created": False, "clocked_in": False, "clock_out": None},
+        )
+
+    def apply(self, punch):
+        local_time = timezone.localtime(punch.punch_time)
+        direction = punch.direction
+        if direction == "toggle":
+            direction = "out" if self.open_activity() else "in"
+        if direction == "in":
+            self.clock_in(local_time)
+        else:
+            self.clock_out(local_time)
+
+    def clock_in(self, local_time):
+        date_today = local_time.date()
+        now_sec = local_time.hour * 3600 + local_time.minute * 60
+        attendance_date = date_today
+        day_id = get_shift_day_id(date_today)
+        schedule = self.schedules.get(self.shift, day_id)
+        if schedule[1] > schedule[2] and MID_DAY_SECONDS > now_sec:
+            # A night shift punch before noon belongs to yesterday's shift
+            attendance_date = date_today - timedelta(days=1)
+            day_id = get_shift_day_id(attendance_date)
+            schedule = self.schedules.get(self.shift, day_id)
+
+        for activity in self.activities.get(attendance_date, []):
+            if (
+                activity.clock_out is None
+                and activity.clock_in_date == date_today
+                and activity.shift_day_id == day_id
+            ):
+                self.close_activity(activity, local_time)
+                break
+        activity = AttendanceActivity(
+            employee_id=self.employee,
+            attendance_date=attendance_date,
+            clock_in_date=date_today,
+            shift_day_id=day_id,
+            clock_in=local_time.time(),
+            in_datetime=local_time,
+        )
+        self.add_activity(activity)
+        self.new_activities.append(activity)
+
+        attendance = self.attendances.get(attendance_date)
+        if attendance is None:
+            attendance = Attendance(
+                employee_id=self.employee,
+                shift_id=self.shift,
+                work_type_id=self.work_type,
+                attendance_date=attendance_date,
+                attendance_day_id=day_id,
+                attendance_clock_in=time(local_time.hour, local_time.minute),
+                attendance_clock_in_date=date_today,
+                minimum_hour=schedule[0],
+            )
+            self.attendances[attendance_date] = attendance
+            self.state(attendance).update(created=True, schedule=schedule)
+        else:
+            attendance.attendance_clock_out = None
+            attendance.attendance_clock_out_date = None
+        state = self.state(attendance)
+        state["clocked_in"] = True
+        state["clock_out"] = None
+
+    def clock_out(self, local_time):
+        activity = self.open_activity()
+        if activity is None:
+            logger.error(
+                "No attendance clock in activity of %s found that needs clocking out.",
+                self.employee,
+            )
+            return
+        self.close_activity(activity, local_time)
+        attendance = self.attendances.get(activity.attendance_date)
+        if attendance is None:
+            logger.error(
+                "No attendance of %s on %s found to clock out.",
+                self.employee,
+                activity.attendance_date,
+            )
+            return
+
+        duration = 0
+        for day_activity in self.activities[activity.attendance_date]:
+            if day_activity.clock_out is None:
+                continue
+            in_datetime, out_datetime = activity_datetime(day_activity)
+            duration += int((out_datetime - in_datetime).total_seconds())
+        attendance.attendance_clock_out = time(local_time.hour, local_time.minute)
+        attendance.attendance_clock_out_date = local_time.date()
+        attendance.attendance_worked_hour = format_time(duration)
+        self.state(attendance)["clock_out"] = local_time
+
+    def save(self):
+        """
+        Writes the activities and attendances changed by the punches
+        """
+        for attendance_date, state in self.states.items():
+            attendance = self.attendances[attendance_date]
+            if state["clock_out"] is not None:
+                attendance.attendance_overtime = overtime_calculation(attendance)
+                attendance.attendance_validated = attendance_validate(attendance)
+            attendance.save()
+
+        AttendanceActivity.objects.bulk_create(
+            self.new_activities, batch_size=PUNCH_BATCH_SIZE
+        )
+        AttendanceActivity.objects.bulk_update(
+            list(self.changed_activities),
+            ["clock_out", "clock_out_date", "out_datetime"],
+            batch_size=PUNCH_BATCH_SIZE,
+        )
+
+        for attendance_date, state in self.states.items():
+            attendance = self.attendances[attendance_date]
+            if state["created"]:
+                _minimum_hour, start_time, end_time, _night = state["schedule"]
+                late_come(attendance, start_time, end_time, self.shift)
+            self.check_early_out(attendance, state)
+
+    def check_early_out(self, attendance, state):
+        """
+        Marks the early out of the attendance clocked out last, a clock in
+        after the early out removes it
+        """
+        early_outs = attendance.late_come_early_out.filter(type="early_out")
+        if state["clocked_in"]:
+            early_outs.delete()
+        elif early_outs.exists():
+            return
+        clock_out = state["clock_out"]
+        if clock_out is None:
+            return
+        _minimum_hour, start_time, end_time, is_night_shift = self.schedules.get(
+            self.shift, attendance.attendance_day_id
+        )
+        date_today = clock_out.date()
+        if is_night_shift:
+            now_sec = clock_out.hour * 3600 + clock_out.minute * 60
+            if attendance.attendance_date == date_today or (
+                MID_DAY_SECONDS >= now_sec
+                and date_today == attendance.attendance_date + timedelta(days=1)
+            ):
+                early_out(attendance, start_time, end_time, self.shift)
+        elif attendance.attendance_date == date_today:
+            early_out(attendance, start_time, end_time, self.shift)
+
+
+def fold_employee_punches(employee_id, schedules):
+    """
+    Folds the punches of the employee not folded yet, returns their number
+    """
+    # Folds of the employee in other processes wait for each other
+    employee = (
+        Employee.objects.entire().select_for_update().filter(pk=employee_id).first()
+    )
+    punches = list(
+        BiometricPunch.objects.filter(
+            employee_id=employee_id, processed_at__isnull=True
+        ).order_by("punch_time", "id")
+    )
+    if employee is None or not punches:
+        return 0
+    work_info = EmployeeWorkInformation.objects.entire().filter(employee_id=employee)
+    work_info = work_info.select_related("shift_id__grace_time_id").first()
+    # Punches of employees without work information mark no attendance
+    if work_info is not None:
+        fold = EmployeePunchFold(employee, work_info, schedules, punches)
+        for punch in punches:
+            fold.apply(punch)
+        fold.save()
+    processed_at = timezone.now()
+    for batch in chunked([punch.pk for punch in punches], PUNCH_BATCH_SIZE):
+        BiometricPunch.objects.filter(pk__in=batch).update(processed_at=processed_at)
+    return len(punches)
+
+
+def fold_punches(employee_ids=None):
+    """
+    Folds the stored punches not folded yet into the attendances, of the
+    employees only when employee_ids is given. Returns the number of punches
+    folded.
+    """
+    pending = BiometricPunch.objects.filter(
+        processed_at__isnull=True, employee_id__isnull=False
+    )
+    if employee_ids is not None:
+        pending = pending.filter(employee_id__in=employee_ids)
+    pending = sorted(set(pending.values_list("employee_id", flat=True)))
+    schedules = ShiftSchedules()
+    count = 0
+    with _fold_lock, defer_hour_account_updates():
+        for employee_id in pending:
+            try:
+                with transaction.atomic():
+                    count += fold_employee_punches(employee_id, schedules)
+            except Exception:
+                logger.exception(
+                    "Folding the biometric punches of employee %s failed", employee_id
+                )
+    return count
+
+
+def ingest_live_punch(device, punch):
+    """
+    Stores and folds a punch captured live from the device
+    """
+    employee_ids = store_punches(device, [punch])
+    fold_punches(employee_ids)
+    return bool(employee_ids)
@@ -0,0 +1,207 @@
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from attendance.methods.hour_account import defer_hour_account_updates
+from attendance.methods.utils import Request
+from attendance.views.clock_in_out import clock_in, clock_out
+from biometric import ingestion
+from biometric.models import BiometricDevices, BiometricEmployees, BiometricPunch
+from employee.models import EmployeeWorkInformation
+
+
+class Rollback(Exception):
+    pass
+
+
+Record = namedtuple("Record", ["user_id", "timestamp", "punch"])
+
+# In, lunch out, lunch in and out of a work day, as (hour, minute, punch code)
+DAY_PUNCHES = [(9, 0, 0), (13, 0, 1), (13, 45, 0), (17, 30, 1)]
+
+
+class QueryCounter:
+    """
+    Counts the queries run through the connection
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class FakeZK:
+    """
+    Stands in for the ZK device class, the device serves the records of the
+    benchmark from memory
+    """
+
+    records = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def connect(self):
+        return self
+
+    def enable_device(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def get_attendance(self):
+        return self.records
+
+
+def fake_records(user_ids, start, count):
+    """
+    Returns count records of the users, four punches a day each
+    """
+    records = []
+    day = 0
+    while len(records) < count:
+        current = start + timedelta(days=day)
+        for user_id in user_ids:
+            for hour, minute, punch in DAY_PUNCHES:
+                timestamp = datetime(current.year, current.month, current.day)
+                records.append(
+                    Record(
+                        user_id,
+                        timestamp + timedelta(hours=hour, minutes=minute),
+                        punch,
+                    )
+                )
+        day += 1
+    return records[:count]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the biometric ingestion of a fake ZKTeco device serving the "
+        "punches of the employees, against clock_in/clock_out per punch on a "
+        "sample. Every row created is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--punches",
+            type=int,
+            default=100000,
+            help="Punches served by the fake device (default 100000)",
+        )
+        parser.add_argument(
+            "--employees",
+            type=int,
+            default=100,
+            help="Employees punching on the device (default 100)",
+        )
+        parser.add_argument(
+            "--sample",
+            type=int,
+            default=400,
+            help="Punches marked by clock_in/clock_out per punch (default 400)",
+        )
+
+    def handle(self, *args, **options):
+        work_infos = list(
+            EmployeeWorkInformation.objects.entire()
+            .exclude(employee_id=None)
+            .exclude(employee_id__employee_user_id=None)
+            .select_related("employee_id__employee_user_id")[: options["employees"]]
+        )
+        if not work_infos:
+            raise CommandError(
+                "The benchmark needs employees with a user and work information."
+            )
+        employees = [work_info.employee_id for work_info in work_infos]
+
+        self.stdout.write(
+            f"{'stage':<24} {'punches':>8} {'seconds':>8} {'punches/s':>10} "
+            f"{'queries':>8}"
+        )
+        zk_class = ingestion.ZK
+        ingestion.ZK = FakeZK
+        try:
+            with transaction.atomic():
+                device = BiometricDevices.objects.create(
+                    name="Benchmark", machine_type="zk", zk_password="0"
+                )
+                BiometricEmployees.objects.bulk_create(
+                    [
+                        BiometricEmployees(
+                            user_id=f"bench-{employee.pk}",
+                            employee_id=employee,
+                            device_id=device,
+                        )
+                        for employee in employees
+                    ]
+                )
+                user_ids = [f"bench-{employee.pk}" for employee in employees]
+                FakeZK.records = fake_records(
+                    user_ids, date(2000, 1, 3), options["punches"]
+                )
+
+                self.measure(
+                    "fetch and store",
+                    lambda: ingestion.fetch_device_punches(device)[0],
+                )
+                self.measure("fold", ingestion.fold_punches)
+                device.last_fetch_date = device.last_fetch_time = None
+                self.measure(
+                    "fetch again", lambda: ingestion.fetch_device_punches(device)[0]
+                )
+                stored = BiometricPunch.objects.filter(device_id=device).count()
+                self.stdout.write(f"{'stored punches':<24} {stored:>8}")
+                self.measure_clock_in_out(employees, options["sample"])
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            ingestion.ZK = zk_class
+            FakeZK.records = []
+
+    def measure(self, stage, run):
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            started = time.perf_counter()
+            punches = run()
+            elapsed = time.perf_counter() - started
+        self.write_row(stage, punches, elapsed, queries.count)
+
+    def measure_clock_in_out(self, employees, sample):
+        records = fake_records(
+            [employee.pk for employee in employees], date(1999, 1, 4), sample
+        )
+        users = {employee.pk: employee.employee_user_id for employee in employees}
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            started = time.perf_counter()
+            with defer_hour_account_updates():
+                for record in records:
+                    date_time = timezone.make_aware(record.timestamp)
+                    request = Request(
+                        user=users[record.user_id],
+                        date=date_time.date(),
+                        time=date_time.time(),
+                        datetime=date_time,
+                    )
+                    if record.punch == 0:
+                        clock_in(request)
+                    else:
+                        clock_out(request)
+            elapsed = time.perf_counter() - started
+        self.write_row("clock_in/clock_out", len(records), elapsed, queries.count)
+
+    def write_row(self, stage, punches, elapsed, queries):
+        rate = punches / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{stage:<24} {punches:>8} {elapsed:>8.2f} {rate:>10.0f} {queries:>8}"
+        )
@@ -0,0 +1,140 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from attendance.methods.hour_account import defer_hour_account_updates
+from attendance.models import (
+    Attendance,
+    AttendanceActivity,
+    AttendanceLateComeEarlyOut,
+)
+from biometric.ingestion import fetch_devices, fold_punches, map_stored_punches
+from biometric.models import BiometricDevices, BiometricPunch
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError as error:
+        raise CommandError(f"Invalid date {value}, use YYYY-MM-DD.") from error
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the stored biometric punches into the attendances. Punches of "
+        "device users mapped to an employee since they were stored are mapped "
+        "and every punch not folded yet is folded. --fetch reads the devices "
+        "again, from --since when given, the punches stored before are not "
+        "stored twice. --refold deletes the attendances of the employees on the "
+        "days of --from/--to and folds their punches again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--device", action="append", help="Device id to replay, repeatable"
+        )
+        parser.add_argument(
+            "--employee", type=int, action="append", help="Employee id, repeatable"
+        )
+        parser.add_argument(
+            "--fetch", action="store_true", help="Read the devices before folding"
+        )
+        parser.add_argument(
+            "--since",
+            help="Read the device logs again from this date (YYYY-MM-DD), with --fetch",
+        )
+        parser.add_argument(
+            "--refold",
+            action="store_true",
+            help="Rebuild the attendances of the --from/--to days from the punches",
+        )
+        parser.add_argument("--from", dest="from_date", help="First day (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="to_date", help="Last day (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        if options["since"] and not options["fetch"]:
+            raise CommandError("--since reads the devices again, use it with --fetch.")
+        if options["refold"] and not (options["from_date"] and options["to_date"]):
+            raise CommandError("--refold needs the days to rebuild, --from and --to.")
+
+        devices = BiometricDevices.objects.entire()
+        if options["device"]:
+            devices = devices.filter(id__in=options["device"])
+        devices = list(devices)
+        if not devices:
+            raise CommandError("No biometric device found.")
+        employee_ids = options["employee"]
+
+        mapped = sum(map_stored_punches(device) for device in devices)
+        self.stdout.write(f"Mapped {mapped} stored punches to their employees.")
+
+        if options["fetch"]:
+            if options["since"]:
+                self.rewind_devices(devices, parse_date(options["since"]))
+            count, errors = fetch_devices(devices)
+            self.stdout.write(f"Fetched {count} punches.")
+            for device, error in errors.items():
+                self.stdout.write(self.style.WARNING(f"{device}: {error}"))
+
+        if options["refold"]:
+            from_date = parse_date(options["from_date"])
+            to_date = parse_date(options["to_date"])
+            if from_date > to_date:
+                raise CommandError("--from should not be after --to.")
+            reset = self.reset_punches(devices, employee_ids, from_date, to_date)
+            self.stdout.write(f"Reset {reset} punches to fold again.")
+
+        folded = fold_punches(employee_ids)
+        self.stdout.write(self.style.SUCCESS(f"Folded {folded} punches."))
+
+    def rewind_devices(self, devices, since):
+        """
+        Moves the fetch markers of the devices back to the date
+        """
+        marker = datetime.combine(since, time.min) - timedelta(seconds=1)
+        for device in devices:
+            if device.machine_type == "cosec":
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"{device}: COSEC devices are read by sequence number, "
+                        "--since is ignored."
+                    )
+                )
+                continue
+            device.last_fetch_date = marker.date()
+            device.last_fetch_time = marker.time()
+            device.save(update_fields=["last_fetch_date", "last_fetch_time"])
+
+    def reset_punches(self, devices, employee_ids, from_date, to_date):
+        """
+        Deletes the attendances and activities of the days and marks the punches
+        of those days not folded. Returns the number of punches reset.
+        """
+        punches = BiometricPunch.objects.filter(
+            device_id__in=devices,
+            employee_id__isnull=False,
+            punch_time__gte=timezone.make_aware(datetime.combine(from_date, time.min)),
+            punch_time__lt=timezone.make_aware(
+                datetime.combine(to_date + timedelta(days=1), time.min)
+            ),
+        )
+        if employee_ids:
+            punches = punches.filter(employee_id__in=employee_ids)
+        employees = set(punches.values_list("employee_id", flat=True))
+        attendances = Attendance.objects.entire().filter(
+            employee_id__in=employees,
+            attendance_date__range=(from_date, to_date),
+        )
+        with transaction.atomic(), defer_hour_account_updates():
+            AttendanceLateComeEarlyOut.objects.entire().filter(
+                attendance_id__in=attendances
+            ).delete()
+            for attendance in attendances:
+                attendance.delete()
+            AttendanceActivity.objects.entire().filter(
+                employee_id__in=employees,
+                attendance_date__range=(from_date, to_date),
+            ).delete()
+            return punches.update(processed_at=None)
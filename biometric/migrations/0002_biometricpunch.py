@@ -0,0 +1,73 @@
+# Generated by Django 4.2.21 on 2026-10-18 21:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("employee", "0001_initial"),
+        ("biometric", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BiometricPunch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("user_id", models.CharField(max_length=100, verbose_name="User ID")),
+                ("punch_time", models.DateTimeField(verbose_name="Punch Time")),
+                (
+                    "direction",
+                    models.CharField(
+                        choices=[("in", "In"), ("out", "Out"), ("toggle", "In/Out")],
+                        max_length=10,
+                    ),
+                ),
+                ("punch_code", models.CharField(blank=True, default="", max_length=20)),
+                (
+                    "processed_at",
+                    models.DateTimeField(blank=True, db_index=True, null=True),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "device_id",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="punches",
+                        to="biometric.biometricdevices",
+                    ),
+                ),
+                (
+                    "employee_id",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="employee.employee",
+                        verbose_name="Employee",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Biometric Punch",
+                "verbose_name_plural": "Biometric Punches",
+                "indexes": [
+                    models.Index(
+                        fields=["employee_id", "punch_time"],
+                        name="biometric_b_employe_169580_idx",
+                    )
+                ],
+                "unique_together": {("device_id", "user_id", "punch_time")},
+            },
+        ),
+    ]
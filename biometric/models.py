@@ -300,3 +300,50 @@ class COSECAttendanceArguments(models.Model):
 
     def __str__(self):
         return f"{self.device_id} - {self.last_fetch_roll_ovr_count} - {self.last_fetch_seq_number}"
+
+
+class BiometricPunch(models.Model):
+    """
+    Model: BiometricPunch
+
+    Description:
+    Represents a raw punch read from a biometric device. A punch is stored
+    once per device, device user and time, however often the device log is
+    read, and is folded into the attendance of its employee afterwards.
+    """
+
+    PUNCH_DIRECTION = [
+        ("in", _("In")),
+        ("out", _("Out")),
+        ("toggle", _("In/Out")),
+    ]
+    device_id = models.ForeignKey(
+        BiometricDevices, on_delete=models.CASCADE, related_name="punches"
+    )
+    user_id = models.CharField(max_length=100, verbose_name=_("User ID"))
+    employee_id = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name=_("Employee"),
+    )
+    punch_time = models.DateTimeField(verbose_name=_("Punch Time"))
+    direction = models.CharField(max_length=10, choices=PUNCH_DIRECTION)
+    punch_code = models.CharField(max_length=20, blank=True, default="")
+    processed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    objects = models.Manager()
+
+    def __str__(self):
+        return f"{self.device_id} - {self.user_id} - {self.punch_time}"
+
+    class Meta:
+        """
+        Meta class to add additional options
+        """
+
+        unique_together = ("device_id", "user_id", "punch_time")
+        indexes = [models.Index(fields=["employee_id", "punch_time"])]
+        verbose_name = _("Biometric Punch")
+        verbose_name_plural = _("Biometric Punches")
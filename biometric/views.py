@@ -8,11 +8,10 @@ registered on biometric devices.
 
 import json
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from threading import Event, Thread
 from urllib.parse import parse_qs, unquote
 
-import pytz
 from apscheduler.schedulers.background import BackgroundScheduler
 from django.contrib import messages
 from django.http import HttpResponse, JsonResponse
@@ -24,9 +23,6 @@ from django.utils.translation import gettext_lazy as _
 from zk import ZK
 from zk import exception as zk_exception
 
-from attendance.methods.utils import Request
-from attendance.models import AttendanceActivity
-from attendance.views.clock_in_out import clock_in, clock_out
 from base.methods import get_key_instances, get_pagination
 from employee.models import Employee, EmployeeWorkInformation
 from horilla.decorators import (
@@ -37,9 +33,7 @@ from horilla.decorators import (
 )
 from horilla.filters import HorillaPaginator
 from horilla.horilla_settings import BIO_DEVICE_THREADS
-from horilla.settings import TIME_ZONE
 
-from .anviz import CrossChexCloudAPI
 from .cosec import COSECBiometric
 from .dahua import DahuaAPI
 from .etimeoffice import ETimeOfficeAPI
@@ -53,6 +47,13 @@ from .forms import (
     EmployeeBiometricAddForm,
     MapBioUsers,
 )
+from .ingestion import (
+    COSEC_IN_CODES,
+    COSEC_OUT_CODES,
+    Punch,
+    fetch_devices,
+    ingest_live_punch,
+)
 from .models import BiometricDevices, BiometricEmployees, COSECAttendanceArguments
 
 logger = logging.getLogger(__name__)
@@ -161,52 +162,24 @@ class ZKBioAttendance(Thread):
                         attendances = conn.live_capture()
                         for attendance in attendances:
                             if attendance:
-                                user_id = attendance.user_id
                                 punch_code = attendance.punch
                                 date_time = django_timezone.make_aware(
                                     attendance.timestamp
                                 )
-                                # date_time = attendance.timestamp
-                                date = date_time.date()
-                                time = date_time.time()
-                                device.last_fetch_date = date
-                                device.last_fetch_time = time
+                                device.last_fetch_date = date_time.date()
+                                device.last_fetch_time = date_time.time()
                                 device.save()
-                                bio_id = BiometricEmployees.objects.filter(
-                                    user_id=user_id, device_id=device
-                                ).first()
-                                if bio_id:
-                                    if punch_code in {0, 3, 4}:
-                                        try:
-                                            clock_in(
-                                                Request(
-                                                    user=bio_id.employee_id.employee_user_id,
-                                                    date=date,
-                                                    time=time,
-                                                    datetime=date_time,
-                                                )
-                                            )
-                                        except Exception as error:
-                                            logger.error(
-                                                "Got an error in clock_in %s", error
-                                            )
-
-                                            continue
-                                    else:
-                                        try:
-                                            clock_out(
-                                                Request(
-                                                    user=bio_id.employee_id.employee_user_id,
-                                                    date=date,
-                                                    time=time,
-                                                    datetime=date_time,
-                                                )
-                                            )
-                                        except Exception as error:
-                                            logger.error(
-                                                "Got an error in clock_out", error
-                                            )
-                                            continue
+                                punch = Punch(
+                                    str(attendance.user_id),
+                                    date_time,
+                                    "in" if punch_code in {0, 3, 4} else "out",
+                                    str(punch_code),
+                                )
+                                try:
+                                    ingest_live_punch(device, punch)
+                                except Exception as error:
+                                    logger.error("Got an error in the punch %s", error)
+                                    continue
                             else:
                                 continue
         except ConnectionResetError as error:
@@ -272,35 +245,27 @@ class COSECBioAttendanceThread(Thread):
                     continue
 
                 for attendance in attendances:
-                    ref_user_id = attendance["detail-1"]
-                    employee = BiometricEmployees.objects.filter(
-                        ref_user_id=ref_user_id
-                    ).first()
-                    if not employee:
+                    punch_code = attendance["detail-2"]
+                    if punch_code in COSEC_IN_CODES:
+                        direction = "in"
+                    elif punch_code in COSEC_OUT_CODES:
+                        direction = "out"
+                    else:
                         continue
-
-                    date_str = attendance["date"]
-                    time_str = attendance["time"]
-                    attendance_date = datetime.strptime(date_str, "%d/%m/%Y").date()
-                    attendance_time = datetime.strptime(time_str, "%H:%M:%S").time()
-                    attendance_datetime = datetime.combine(
-                        attendance_date, attendance_time
+                    attendance_datetime = datetime.strptime(
+                        f"{attendance['date']} {attendance['time']}",
+                        "%d/%m/%Y %H:%M:%S",
                     )
-                    punch_code = attendance["detail-2"]
-
-                    request_data = Request(
-                        user=employee.employee_id.employee_user_id,
-                        date=attendance_date,
-                        time=attendance_time,
-                        datetime=django_timezone.make_aware(attendance_datetime),
+                    punch = Punch(
+                        str(attendance["detail-1"]),
+                        django_timezone.make_aware(attendance_datetime),
+                        direction,
+                        punch_code,
                     )
                     try:
-                        if punch_code in ["1", "3", "5", "7", "9", "0"]:
-                            clock_in(request_data)
-                        elif punch_code in ["2", "4", "6", "8", "10"]:
-                            clock_out(request_data)
+                        ingest_live_punch(device, punch)
                     except Exception as error:
-                        logger.error("Error processing attendance: ", error)
+                        logger.error("Error processing attendance: %s", error)
 
                 if attendances:
                     last_attendance = attendances[-1]
@@ -2149,7 +2114,8 @@ def zk_biometric_attendance_logs(device_or_devices):
     """
     Retrieve and process attendance logs from one or more ZKTeco biometric devices.
 
-    Handles scenarios where the same user_id may exist across multiple devices for the same employee.
+    The devices are read concurrently, their punches stored and folded into the
+    attendances by the ingestion pipeline.
 
     :param device_or_devices: A single BiometricDevice instance or a queryset/list of them.
     :return: Tuple (number_of_attendance_processed, error_message or None)
@@ -2161,102 +2127,16 @@ def zk_biometric_attendance_logs(device_or_devices):
     else:
         devices = [device_or_devices]
 
-    errors = []
-    combined_attendances = []
-    patch_direction = {"in": 0, "out": 1}
-
-    bio_id_map = {
-        (bio.device_id_id, bio.user_id): bio
-        for bio in BiometricEmployees.objects.filter(device_id__in=devices)
-    }
-
-    for device in devices:
-        port_no = device.port
-        machine_ip = device.machine_ip
-        conn = None
-        zk_device = ZK(
-            machine_ip,
-            port=port_no,
-            timeout=5,
-            password=int(device.zk_password),
-            force_udp=False,
-            ommit_ping=False,
+    count, errors = fetch_devices(devices)
+    errors = [
+        (
+            f"[{device.name}] ZKError: {str(error)}"
+            if isinstance(error, zk_exception.ZKErrorResponse)
+            else f"[{device.name}] Error: {str(error)}"
         )
-
-        try:
-            conn = zk_device.connect()
-            conn.enable_device()
-            attendances = conn.get_attendance()
-            if not attendances:
-                continue
-
-            last_attendance_datetime = attendances[-1].timestamp
-
-            if device.last_fetch_date and device.last_fetch_time:
-                filtered = [
-                    att
-                    for att in attendances
-                    if (att.timestamp.date() > device.last_fetch_date)
-                    or (
-                        att.timestamp.date() == device.last_fetch_date
-                        and att.timestamp.time() > device.last_fetch_time
-                    )
-                ]
-            else:
-                filtered = attendances
-
-            # Update last fetch markers
-            device.last_fetch_date = last_attendance_datetime.date()
-            device.last_fetch_time = last_attendance_datetime.time()
-            device.save()
-            for attendance in filtered:
-                attendance.device = device  # Attach device info
-                attendance.punch = (
-                    patch_direction[device.device_direction]
-                    if device.device_direction in patch_direction
-                    else attendance.punch
-                )  # Update punch code based on device direction
-                combined_attendances.append(attendance)
-
-        except zk_exception.ZKErrorResponse as e:
-            errors.append(f"[{device.name}] ZKError: {str(e)}")
-        except Exception as e:
-            logger.error(f"[{device.name}] General Error", exc_info=True)
-            errors.append(f"[{device.name}] Error: {str(e)}")
-        finally:
-            if conn:
-                conn.disconnect()
-
-    # Sort all filtered attendances by time
-    combined_attendances.sort(key=lambda a: a.timestamp)
-
-    for attendance in combined_attendances:
-        user_id = attendance.user_id
-        punch_code = attendance.punch
-        date_time = django_timezone.make_aware(attendance.timestamp)
-        date = date_time.date()
-        time = date_time.time()
-        device_id = attendance.device.id
-        bio_id = bio_id_map.get((device_id, user_id))
-        if bio_id:
-            request_data = Request(
-                user=bio_id.employee_id.employee_user_id,
-                date=date,
-                time=time,
-                datetime=date_time,
-            )
-            try:
-                if punch_code in {0, 3, 4}:
-                    clock_in(request_data)
-                elif punch_code in {1, 2, 5}:
-                    clock_out(request_data)
-            except Exception:
-                logger.error(
-                    f"[Device: {attendance.device.name}] Punch processing error",
-                    exc_info=True,
-                )
-
-    return len(combined_attendances), "; ".join(errors) if errors else None
+        for device, error in errors.items()
+    ]
+    return count, "; ".join(errors) if errors else None
 
 
 def zk_biometric_attendance_scheduler(device_id):
@@ -2268,59 +2148,25 @@ def zk_biometric_attendance_scheduler(device_id):
         zk_biometric_attendance_logs(device)
 
 
+def biometric_attendance_logs(device):
+    """
+    Retrieves the attendance logs of a device through the ingestion pipeline.
+
+    :return: The number of logs retrieved, "error" when the device failed.
+    """
+    count, errors = fetch_devices([device])
+    if errors:
+        return "error"
+    return count
+
+
 def anviz_biometric_attendance_logs(device):
     """
     Retrieves attendance records from an Anviz biometric device and processes them.
 
     :param device_id: The Object Id of the Anviz biometric device.
     """
-    current_utc_time = datetime.utcnow()
-    anviz_device = CrossChexCloudAPI(
-        api_url=device.api_url,
-        api_key=device.api_key,
-        api_secret=device.api_secret,
-        anviz_request_id=device.anviz_request_id,
-    )
-    begin_time = (
-        datetime.combine(device.last_fetch_date, device.last_fetch_time)
-        if device.last_fetch_date and device.last_fetch_time
-        else current_utc_time.replace(hour=0, minute=0, second=0, microsecond=0)
-    )
-    attendance_records = anviz_device.get_attendance_records(
-        begin_time=begin_time, token=device.api_token
-    )
-    device.last_fetch_date, device.last_fetch_time = (
-        current_utc_time.date(),
-        current_utc_time.time(),
-    )
-    device.save()
-    for attendance in attendance_records["list"]:
-        badge_id = attendance["employee"]["workno"]
-        punch_code = attendance["checktype"]
-        date_time_utc = datetime.strptime(
-            attendance["checktime"], "%Y-%m-%dT%H:%M:%S%z"
-        )
-        date_time_obj = date_time_utc.astimezone(django_timezone.get_current_timezone())
-        employee = Employee.objects.filter(badge_id=badge_id).first()
-        if employee:
-            request_data = Request(
-                user=employee.employee_user_id,
-                date=date_time_obj.date(),
-                time=date_time_obj.time(),
-                datetime=date_time_obj,
-            )
-            if punch_code in {0, 128}:
-                try:
-                    clock_in(request_data)
-                except Exception as error:
-                    logger.error("Error in clock in ", error)
-            else:
-                try:
-                    # // 1 , 129 check type check out and door close
-                    clock_out(request_data)
-                except Exception as error:
-                    logger.error("Error in clock out ", error)
-    return len(attendance_records["list"])
+    return biometric_attendance_logs(device)
 
 
 def anviz_biometric_attendance_scheduler(device_id):
@@ -2336,66 +2182,7 @@ def cosec_biometric_attendance_logs(device):
     """
     Retrieves and processes attendance logs from a COSEC biometric device.
     """
-    device_args = COSECAttendanceArguments.objects.filter(device_id=device).first()
-    last_fetch_roll_ovr_count = (
-        int(device_args.last_fetch_roll_ovr_count) if device_args else 0
-    )
-    last_fetch_seq_number = int(device_args.last_fetch_seq_number) if device_args else 1
-
-    cosec = COSECBiometric(
-        device.machine_ip,
-        device.port,
-        device.bio_username,
-        device.bio_password,
-        timeout=10,
-    )
-    attendances = cosec.get_attendance_events(
-        last_fetch_roll_ovr_count, int(last_fetch_seq_number) + 1
-    )
-
-    if not isinstance(attendances, list):
-        return
-
-    for attendance in attendances:
-        ref_user_id = attendance["detail-1"]
-        employee = BiometricEmployees.objects.filter(ref_user_id=ref_user_id).first()
-        if not employee:
-            continue
-
-        date_str = attendance["date"]
-        time_str = attendance["time"]
-        attendance_date = datetime.strptime(date_str, "%d/%m/%Y").date()
-        attendance_time = datetime.strptime(time_str, "%H:%M:%S").time()
-        attendance_datetime = datetime.combine(attendance_date, attendance_time)
-        punch_code = attendance["detail-2"]
-
-        request_data = Request(
-            user=employee.employee_id.employee_user_id,
-            date=attendance_date,
-            time=attendance_time,
-            datetime=django_timezone.make_aware(attendance_datetime),
-        )
-
-        try:
-            if punch_code in ["1", "3", "5", "7", "9", "0"]:
-                clock_in(request_data)
-            elif punch_code in ["2", "4", "6", "8", "10"]:
-                clock_out(request_data)
-            else:
-                pass
-        except Exception as error:
-            logger.error("Error processing attendance: ", error)
-
-    if attendances:
-        last_attendance = attendances[-1]
-        COSECAttendanceArguments.objects.update_or_create(
-            device_id=device,
-            defaults={
-                "last_fetch_roll_ovr_count": last_attendance["roll-over-count"],
-                "last_fetch_seq_number": last_attendance["seq-No"],
-            },
-        )
-    return len(attendances)
+    return biometric_attendance_logs(device)
 
 
 def cosec_biometric_attendance_scheduler(device_id):
@@ -2425,65 +2212,9 @@ def dahua_biometric_attendance_logs(device):
         device_id (int): The unique identifier of the biometric device.
 
     Returns:
-        None
+        The number of logs retrieved, "error" when the device failed.
     """
-    begin_time = (
-        datetime.combine(device.last_fetch_date, device.last_fetch_time)
-        + timedelta(seconds=1)
-        if device.last_fetch_date and device.last_fetch_time
-        else datetime.combine(datetime.today(), datetime.min.time())
-    )
-
-    dahua = DahuaAPI(
-        ip=device.machine_ip, username=device.bio_username, password=device.bio_password
-    )
-    logs = dahua.get_control_card_rec(start_time=begin_time)
-
-    if logs.get("status_code") == 200:
-        for log in logs.get("records", []):
-            user_id = log.get("user_id")
-            if not user_id:
-                continue
-
-            employee = BiometricEmployees.objects.filter(
-                user_id=user_id, device_id=device
-            ).first()
-            if not employee:
-                continue
-
-            attendance_datetime = log.get("create_time")
-            user_tz = pytz.timezone(TIME_ZONE)
-            attendance_datetime = attendance_datetime.astimezone(user_tz)
-
-            last_none_activity = (
-                AttendanceActivity.objects.filter(
-                    employee_id=employee.employee_id,
-                    clock_out=None,
-                )
-                .order_by("in_datetime")
-                .last()
-            )
-
-            request_data = Request(
-                user=employee.employee_id.employee_user_id,
-                date=attendance_datetime.date(),
-                time=attendance_datetime.time(),
-                datetime=attendance_datetime,
-            )
-
-            if last_none_activity:
-                clock_out(request_data)
-            else:
-                clock_in(request_data)
-
-        if logs.get("records"):
-            last_log = logs["records"][-1]
-            device.last_fetch_date = last_log["create_time"].date()
-            device.last_fetch_time = last_log["create_time"].time()
-            device.save()
-        return len(logs.get("records", []))
-    else:
-        return "error"
+    return biometric_attendance_logs(device)
 
 
 def dahua_biometric_attendance_scheduler(device_id):
@@ -2499,70 +2230,7 @@ def etimeoffice_biometric_attendance_logs(device):
     """
     Retrieves and processes attendance logs from an eTimeOffice biometric device.
     """
-    now = datetime.now()
-    etimeoffice = ETimeOfficeAPI(
-        username=device.bio_username,
-        password=device.bio_password,
-    )
-
-    from_date = (
-        f"{(datetime.combine(device.last_fetch_date, device.last_fetch_time) + timedelta(minutes=1)):%d/%m/%Y_%H:%M}"
-        if device.last_fetch_date and device.last_fetch_time
-        else f"{now:%d/%m/%Y}_00:00"
-    )
-    to_date = f"{now:%d/%m/%Y_%H:%M}"
-
-    logs = etimeoffice.download_punch_data(from_date=from_date, to_date=to_date)
-    if logs.get("Msg") != "Success":
-        return "error"
-
-    punch_data = logs.get("PunchData", [])
-    if not punch_data:
-        return 0
-
-    user_tz = pytz.timezone(TIME_ZONE)
-
-    employee_map = {
-        emp.user_id: emp for emp in BiometricEmployees.objects.filter(device_id=device)
-    }
-
-    for log in reversed(punch_data):
-        user_id = log.get("Empcode")
-        if not user_id or user_id not in employee_map:
-            continue
-
-        employee = employee_map[user_id]
-        attendance_datetime = log["PunchDate"].astimezone(user_tz)
-
-        request_data = Request(
-            user=employee.employee_id.employee_user_id,
-            date=attendance_datetime.date(),
-            time=attendance_datetime.time(),
-            datetime=attendance_datetime,
-        )
-
-        last_none_activity = (
-            AttendanceActivity.objects.filter(
-                employee_id=employee.employee_id,
-                clock_out=None,
-            )
-            .order_by("in_datetime")
-            .last()
-        )
-
-        if last_none_activity:
-            clock_out(request_data)
-        else:
-            clock_in(request_data)
-
-    last_log = punch_data[0]
-    device.last_fetch_date, device.last_fetch_time = (
-        last_log["PunchDate"].date(),
-        last_log["PunchDate"].time(),
-    )
-    device.save()
-
-    return len(punch_data)
+    return biometric_attendance_logs(device)
 
 
 def etimeoffice_biometric_attendance_scheduler(device_id):
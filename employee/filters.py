@@ -16,10 +16,14 @@ from accessibility.methods import check_is_accessible
 from accessibility.models import DefaultAccessibility
 from base.methods import filtersubordinatesemployeemodel
 from employee.models import DisciplinaryAction, Employee, Policy
-from horilla.filters import FilterSet, HorillaFilterSet, filter_by_name
+from horilla.filters import (
+    FilterSet,
+    HorillaFilterSet,
+    filter_by_name,
+    search_queryset,
+)
 from horilla.horilla_middlewares import _thread_locals
 from horilla_documents.models import Document
-from horilla_views.templatetags.generic_template_filters import getattribute
 
 
 class EmployeeFilter(HorillaFilterSet):
@@ -211,12 +215,7 @@ class EmployeeFilter(HorillaFilterSet):
         if self.data.get("search_field"):
             return queryset
 
-        def _icontains(instance):
-            result = str(getattribute(instance, "get_full_name")).lower()
-            return instance.pk if value in result else None
-
-        ids = list(filter(None, map(_icontains, queryset)))
-        return queryset.filter(id__in=ids)
+        return search_queryset(queryset, "get_full_name", value)
 
 
 class EmployeeReGroup:
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from employee.methods.reporting_hierarchy import rebuild_reporting_hierarchy
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the reporting hierarchy from the reporting managers of the employees"
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild_reporting_hierarchy()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt the reporting hierarchy with {rows} links.")
+        )
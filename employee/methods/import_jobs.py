@@ -0,0 +1,480 @@
+"""
+employee/methods/import_jobs.py
+
+Background employee imports.
+
+The upload is stored on an EmployeeImportJob and read back in chunks of
+chunk_size rows. Every chunk is validated and bulk inserted (users, employees,
+work information and contracts) in one transaction together with the progress
+of the job, so a failed or interrupted job restarts from its first unfinished
+chunk. The lookups of the existing records are built once per run and kept up
+to date with the records the job creates. Reporting managers are resolved
+after the last chunk, they can be employees of later rows.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Value
+from django.db.models.functions import Concat
+from django.http import HttpResponse
+from django.utils import timezone
+
+from base.models import (
+    Company,
+    Department,
+    EmployeeShift,
+    EmployeeType,
+    JobPosition,
+    JobRole,
+    WorkType,
+)
+from employee.methods.methods import (
+    bulk_create_contracts,
+    chunked,
+    convert_nan,
+    error_data_template,
+    process_employee_records,
+)
+from employee.methods.password_hashing import hash_passwords, password_hashing_pool
+from employee.methods.reporting_hierarchy import rebuild_reporting_hierarchy
+from employee.models import Employee, EmployeeImportJob, EmployeeWorkInformation
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_CHUNK_SIZE = 50
+# A running job not updated for this long is considered dead and can restart
+STALE_JOB_TIMEOUT = timedelta(minutes=10)
+
+
+def iter_import_chunks(file, chunk_size):
+    """
+    Yields the rows of the uploaded csv or excel file as data frames of up to
+    chunk_size rows, without loading the whole file
+    """
+    extension = file.name.split(".")[-1].lower()
+    file.open("rb")
+    try:
+        if extension == "csv":
+            yield from pd.read_csv(file, chunksize=chunk_size)
+        elif extension == "xlsx":
+            from openpyxl import load_workbook
+
+            workbook = load_workbook(file, read_only=True, data_only=True)
+            try:
+                rows = workbook.active.iter_rows(values_only=True)
+                header = next(rows, None)
+                if header is None:
+                    return
+                header = [str(title).strip() if title else "" for title in header]
+                while chunk := list(islice(rows, chunk_size)):
+                    frame = pd.DataFrame(chunk, columns=header)
+                    # Empty cells read as NaN, like pd.read_excel
+                    yield frame.where(frame.notna(), np.nan)
+            finally:
+                workbook.close()
+        else:
+            data_frame = pd.read_excel(file)
+            for start in range(0, len(data_frame), chunk_size):
+                yield data_frame.iloc[start : start + chunk_size]
+    finally:
+        file.close()
+
+
+class EmployeeImportLookups:
+    """
+    The existing records an import compares to or links to, built once per
+    job run
+    """
+
+    def __init__(self):
+        employees = Employee.objects.entire()
+        self.badge_ids = set(employees.values_list("badge_id", flat=True))
+        self.usernames = set(User.objects.values_list("username", flat=True))
+        self.name_emails = set(
+            employees.values_list("employee_first_name", "employee_last_name", "email")
+        )
+        self.companies = {company.company: company for company in Company.objects.all()}
+        self.departments = {
+            department.department: department for department in Department.objects.all()
+        }
+        self.job_positions = {
+            (position.department_id_id, position.job_position): position
+            for position in JobPosition.objects.all()
+        }
+        self.job_roles = {
+            (role.job_position_id_id, role.job_role): role
+            for role in JobRole.objects.all()
+        }
+        self.work_types = {
+            work_type.work_type: work_type for work_type in WorkType.objects.all()
+        }
+        self.shifts = {
+            shift.employee_shift: shift for shift in EmployeeShift.objects.all()
+        }
+        self.employee_types = {
+            employee_type.employee_type: employee_type
+            for employee_type in EmployeeType.objects.all()
+        }
+
+    @staticmethod
+    def _create_missing(lookup, model, field, names):
+        missing = {name for name in names if name and name not in lookup}
+        if not missing:
+            return
+        model.objects.bulk_create([model(**{field: name}) for name in missing])
+        for instance in model.objects.filter(**{f"{field}__in": missing}):
+            lookup.setdefault(getattr(instance, field), instance)
+
+    def create_references(self, rows):
+        """
+        Creates the departments, job positions, job roles, work types, shifts
+        and employee types named by the rows that do not exist yet
+        """
+        self._create_missing(
+            self.departments,
+            Department,
+            "department",
+            {convert_nan("Department", row) for row in rows},
+        )
+        self._create_missing(
+            self.work_types,
+            WorkType,
+            "work_type",
+            {convert_nan("Work Type", row) for row in rows},
+        )
+        self._create_missing(
+            self.shifts,
+            EmployeeShift,
+            "employee_shift",
+            {convert_nan("Shift", row) for row in rows},
+        )
+        self._create_missing(
+            self.employee_types,
+            EmployeeType,
+            "employee_type",
+            {convert_nan("Employee Type", row) for row in rows},
+        )
+
+        positions = {
+            (self.departments[department], position)
+            for row in rows
+            if (department := convert_nan("Department", row)) in self.departments
+            and (position := convert_nan("Job Position", row))
+        }
+        new_positions = [
+            JobPosition(job_position=position, department_id=department)
+            for department, position in positions
+            if (department.pk, position) not in self.job_positions
+        ]
+        if new_positions:
+            JobPosition.objects.bulk_create(new_positions)
+            for position in JobPosition.objects.filter(
+                department_id__in={department for department, _ in positions},
+                job_position__in={position for _, position in positions},
+            ):
+                self.job_positions.setdefault(
+                    (position.department_id_id, position.job_position), position
+                )
+
+        roles = {
+            (job_position, role)
+            for row in rows
+            if (job_position := self.job_position(row))
+            and (role := convert_nan("Job Role", row))
+        }
+        new_roles = [
+            JobRole(job_role=role, job_position_id=job_position)
+            for job_position, role in roles
+            if (job_position.pk, role) not in self.job_roles
+        ]
+        if new_roles:
+            JobRole.objects.bulk_create(new_roles)
+            for role in JobRole.objects.filter(
+                job_position_id__in={job_position for job_position, _ in roles},
+                job_role__in={role for _, role in roles},
+            ):
+                self.job_roles.setdefault(
+                    (role.job_position_id_id, role.job_role), role
+                )
+
+    def job_position(self, row):
+        """
+        Returns the job position of the row within its department
+        """
+        department = self.departments.get(convert_nan("Department", row))
+        if department is None:
+            return None
+        return self.job_positions.get((department.pk, convert_nan("Job Position", row)))
+
+    def job_role(self, row):
+        """
+        Returns the job role of the row within its job position
+        """
+        job_position = self.job_position(row)
+        if job_position is None:
+            return None
+        return self.job_roles.get((job_position.pk, convert_nan("Job Role", row)))
+
+
+def import_amount(row, field):
+    """
+    Returns the whole amount of the row field, 0 when it is empty
+    """
+    try:
+        value = float(row.get(field))
+    except (TypeError, ValueError):
+        return 0
+    return 0 if np.isnan(value) else int(value)
+
+
+def import_employee_rows(rows, lookups, pool):
+    """
+    Bulk inserts the validated rows, returns the created employees and the
+    {employee id: reporting manager name} of the rows naming a manager
+    """
+    lookups.create_references(rows)
+
+    passwords = [str(row["Phone"]).strip() for row in rows]
+    hashes = [
+        password
+        for hashed in pool.map(hash_passwords, chunked(passwords, PASSWORD_CHUNK_SIZE))
+        for password in hashed
+    ]
+    User.objects.bulk_create(
+        [
+            User(
+                username=row["Email"],
+                email=row["Email"],
+                password=password,
+                is_superuser=False,
+            )
+            for row, password in zip(rows, hashes)
+        ]
+    )
+    users = {
+        user.username: user
+        for user in User.objects.filter(
+            username__in=[row["Email"] for row in rows]
+        ).only("id", "username")
+    }
+
+    Employee.objects.bulk_create(
+        [
+            Employee(
+                employee_user_id=users[row["Email"]],
+                badge_id=row["Badge ID"],
+                employee_first_name=convert_nan("First Name", row),
+                employee_last_name=convert_nan("Last Name", row),
+                email=row["Email"],
+                phone=row["Phone"],
+                gender=str(row.get("Gender") or "").strip().lower(),
+            )
+            for row in rows
+        ]
+    )
+    employees = {
+        employee.badge_id: employee
+        for employee in Employee.objects.entire()
+        .filter(badge_id__in=[row["Badge ID"] for row in rows])
+        .only("id", "badge_id", "employee_user_id", "phone")
+    }
+
+    work_infos = []
+    managers = {}
+    for row in rows:
+        employee = employees[row["Badge ID"]]
+        reporting_manager = row.get("Reporting Manager")
+        if isinstance(reporting_manager, str) and " " in reporting_manager:
+            managers[employee.pk] = reporting_manager
+        work_infos.append(
+            EmployeeWorkInformation(
+                employee_id=employee,
+                email=row["Email"],
+                department_id=lookups.departments.get(convert_nan("Department", row)),
+                job_position_id=lookups.job_position(row),
+                job_role_id=lookups.job_role(row),
+                work_type_id=lookups.work_types.get(convert_nan("Work Type", row)),
+                employee_type_id=lookups.employee_types.get(
+                    convert_nan("Employee Type", row)
+                ),
+                shift_id=lookups.shifts.get(convert_nan("Shift", row)),
+                company_id=lookups.companies.get(convert_nan("Company", row)),
+                location=convert_nan("Location", row),
+                date_joining=row["Date Joining"] or datetime.today(),
+                contract_end_date=row["Contract End Date"],
+                basic_salary=import_amount(row, "Basic Salary"),
+                salary_hour=import_amount(row, "Salary Hour"),
+            )
+        )
+    EmployeeWorkInformation.objects.bulk_create(work_infos)
+    if apps.is_installed("payroll"):
+        bulk_create_contracts(work_infos)
+    return list(employees.values()), managers
+
+
+def resolve_reporting_managers(job):
+    """
+    Sets the reporting managers named by the imported rows, in one query for
+    all the names, and rebuilds the reporting hierarchy
+    """
+    names = set(job.pending_managers.values())
+    managers = {}
+    if names:
+        for employee_id, full_name in (
+            Employee.objects.entire()
+            .annotate(
+                import_full_name=Concat(
+                    "employee_first_name", Value(" "), "employee_last_name"
+                )
+            )
+            .filter(import_full_name__in=names)
+            .values_list("id", "import_full_name")
+        ):
+            managers.setdefault(full_name, employee_id)
+    work_infos = []
+    for work_info in EmployeeWorkInformation.objects.filter(
+        employee_id__in=[int(employee_id) for employee_id in job.pending_managers]
+    ).only("id", "employee_id", "reporting_manager_id"):
+        manager_id = managers.get(job.pending_managers[str(work_info.employee_id_id)])
+        if manager_id and manager_id != work_info.employee_id_id:
+            work_info.reporting_manager_id_id = manager_id
+            work_infos.append(work_info)
+    EmployeeWorkInformation.objects.bulk_update(
+        work_infos, ["reporting_manager_id"], batch_size=500
+    )
+    rebuild_reporting_hierarchy()
+
+
+def json_row(row):
+    """
+    Returns the row with JSON friendly values for the error report
+    """
+    return {
+        key: (
+            None
+            if value is None or (np.isscalar(value) and pd.isna(value))
+            else value.isoformat() if hasattr(value, "isoformat") else value
+        )
+        for key, value in row.items()
+    }
+
+
+def run_employee_import_job(job_id):
+    """
+    Imports the file of the job, from its first unfinished chunk
+    """
+    if not EmployeeImportJob.objects.filter(pk=job_id, status="queued").update(
+        status="running", error="", updated_at=timezone.now()
+    ):
+        return
+    job = EmployeeImportJob.objects.get(pk=job_id)
+    logger.info("Employee import %s started at chunk %s", job.pk, job.processed_chunks)
+    try:
+        if not job.total_rows:
+            job.total_rows = sum(
+                len(frame) for frame in iter_import_chunks(job.file, job.chunk_size)
+            )
+            job.total_chunks = -(-job.total_rows // job.chunk_size)
+            job.save(update_fields=["total_rows", "total_chunks", "updated_at"])
+        lookups = EmployeeImportLookups()
+        with password_hashing_pool() as pool:
+            for index, data_frame in enumerate(
+                iter_import_chunks(job.file, job.chunk_size)
+            ):
+                if index < job.processed_chunks:
+                    continue
+                success_list, error_list, created_count = process_employee_records(
+                    data_frame, lookups
+                )
+                with transaction.atomic():
+                    if success_list:
+                        _, managers = import_employee_rows(success_list, lookups, pool)
+                        job.pending_managers.update(
+                            {str(pk): name for pk, name in managers.items()}
+                        )
+                    job.processed_chunks = index + 1
+                    job.processed_rows += len(data_frame)
+                    job.created_count += created_count
+                    job.error_count += len(error_list)
+                    job.error_rows.extend(json_row(row) for row in error_list)
+                    job.save()
+        resolve_reporting_managers(job)
+        job.status = "completed"
+        job.finished_at = timezone.now()
+        job.save()
+        logger.info("Employee import %s completed", job.pk)
+    except Exception as error:
+        logger.exception("Employee import %s failed", job_id)
+        EmployeeImportJob.objects.filter(pk=job_id).update(
+            status="failed",
+            error=str(error),
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+    finally:
+        connection.close()
+
+
+def start_employee_import_job(job):
+    """
+    Runs the job on a background thread once the current transaction commits
+    """
+    transaction.on_commit(
+        lambda: threading.Thread(
+            target=run_employee_import_job, args=(job.pk,), daemon=True
+        ).start()
+    )
+
+
+def restart_employee_import_job(job):
+    """
+    Queues a failed or dead job again, it resumes from its first unfinished
+    chunk. Returns False when the job cannot restart.
+    """
+    if not job.file or not job.file.storage.exists(job.file.name):
+        # The upload is read again to resume, without it the job stays failed
+        return False
+    restartable = EmployeeImportJob.objects.filter(pk=job.pk, status="failed") | (
+        EmployeeImportJob.objects.filter(
+            pk=job.pk,
+            status="running",
+            updated_at__lt=timezone.now() - STALE_JOB_TIMEOUT,
+        )
+    )
+    if not restartable.update(status="queued", finished_at=None):
+        return False
+    start_employee_import_job(job)
+    return True
+
+
+def import_error_report(job):
+    """
+    Returns the excel response of the rows the job could not import
+    """
+    error_data = {key: [] for key in error_data_template}
+    for row in job.error_rows:
+        for key, values in error_data.items():
+            values.append(row.get(key))
+    error_data = {
+        key: values
+        for key, values in error_data.items()
+        if any(value is not None for value in values)
+    }
+
+    response = HttpResponse(content_type="application/ms-excel")
+    response["Content-Disposition"] = 'attachment; filename="EmployeesImportError.xlsx"'
+    writer = pd.ExcelWriter(response, engine="xlsxwriter")
+    pd.DataFrame(error_data, columns=error_data.keys()).to_excel(
+        writer, index=False, sheet_name="Sheet1"
+    )
+    writer.sheets["Sheet1"].set_column("A:Z", 30)
+    writer.close()
+    return response
@@ -0,0 +1,44 @@
+"""
+employee/methods/password_hashing.py
+
+Password hashing on a process pool for the employee imports.
+
+The module only depends on django.contrib.auth.hashers, so the pool processes
+can import it before Django is set up in them.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+PASSWORD_HASH_WORKERS = getattr(settings, "EMPLOYEE_IMPORT_HASH_WORKERS", None)
+
+
+def _init_hashing_process():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "horilla.settings")
+        django.setup()
+
+
+def hash_passwords(raw_passwords):
+    """
+    Returns the hashes of the raw passwords, runs in the pool processes
+    """
+    from django.contrib.auth.hashers import make_password
+
+    return [make_password(raw_password) for raw_password in raw_passwords]
+
+
+def password_hashing_pool():
+    """
+    Returns a process pool hashing on every core, or on
+    EMPLOYEE_IMPORT_HASH_WORKERS processes when it is set
+    """
+    return ProcessPoolExecutor(
+        max_workers=PASSWORD_HASH_WORKERS or os.cpu_count(),
+        initializer=_init_hashing_process,
+    )
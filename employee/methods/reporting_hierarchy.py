@@ -0,0 +1,157 @@
+"""
+employee/methods/reporting_hierarchy.py
+
+Maintenance of the ReportingHierarchy closure table.
+
+Every (manager, subordinate) pair of the reporting chain is stored with its
+depth, so all the subordinates of a manager are one indexed lookup instead of
+one query per reporting level.
+"""
+
+import logging
+
+from django.db import transaction
+
+from employee.models import EmployeeWorkInformation, ReportingHierarchy
+
+logger = logging.getLogger(__name__)
+
+
+def subordinate_ids(manager_id):
+    """
+    Returns the queryset of the ids of every employee reporting to the manager
+    directly or through other managers, usable as a subquery
+    """
+    return ReportingHierarchy.objects.filter(manager_id=manager_id).values(
+        "employee_id"
+    )
+
+
+def update_reporting_hierarchy(employee_id, manager_id):
+    """
+    Moves the employee, with everyone reporting to them, under the manager.
+    Returns False when the hierarchy already had that manager.
+
+    A manager reporting to the employee would close a loop, the employee is
+    then kept at the top of its own chain until a later update breaks the loop.
+    """
+    rows = ReportingHierarchy.objects
+    current_manager = (
+        rows.filter(employee_id=employee_id, depth=1)
+        .values_list("manager_id", flat=True)
+        .first()
+    )
+    if current_manager == manager_id:
+        return False
+    with transaction.atomic():
+        former_managers = list(
+            rows.filter(employee_id=employee_id).values_list("manager_id", flat=True)
+        )
+        subtree = dict(
+            rows.filter(manager_id=employee_id).values_list("employee_id", "depth")
+        )
+        subtree[employee_id] = 0
+        rows.filter(employee_id__in=subtree).exclude(manager_id__in=subtree).delete()
+        if manager_id in subtree:
+            logger.warning(
+                "Reporting manager %s of employee %s reports to them, "
+                "the loop is left out of the reporting hierarchy",
+                manager_id,
+                employee_id,
+            )
+        elif manager_id:
+            ancestors = dict(
+                rows.filter(employee_id=manager_id).values_list("manager_id", "depth")
+            )
+            ancestors[manager_id] = 0
+            rows.bulk_create(
+                [
+                    ReportingHierarchy(
+                        manager_id_id=ancestor,
+                        employee_id_id=subordinate,
+                        depth=ancestor_depth + subordinate_depth + 1,
+                    )
+                    for ancestor, ancestor_depth in ancestors.items()
+                    for subordinate, subordinate_depth in subtree.items()
+                ],
+                batch_size=1000,
+            )
+    restore_skipped_managers(former_managers)
+    return True
+
+
+def restore_skipped_managers(employee_ids):
+    """
+    Links the employees left at the top of their chain to avoid a loop back to
+    their reporting manager once the loop is broken
+    """
+    rows = ReportingHierarchy.objects
+    skipped = (
+        EmployeeWorkInformation.objects.entire()
+        .filter(employee_id__in=employee_ids, reporting_manager_id__isnull=False)
+        .exclude(
+            employee_id__in=rows.filter(depth=1).values("employee_id"),
+        )
+        .values_list("employee_id", "reporting_manager_id")
+    )
+    for employee_id, manager_id in skipped:
+        if not rows.filter(manager_id=employee_id, employee_id=manager_id).exists():
+            update_reporting_hierarchy(employee_id, manager_id)
+
+
+def rebuild_reporting_hierarchy():
+    """
+    Rebuilds the whole ReportingHierarchy from the work information, returns
+    the number of rows
+    """
+    managers = dict(
+        EmployeeWorkInformation.objects.entire()
+        .filter(employee_id__isnull=False)
+        .values_list("employee_id", "reporting_manager_id")
+    )
+    # Cut every reporting loop above its employee with the lowest id
+    done = set()
+    for employee_id in managers:
+        path = []
+        current = employee_id
+        while current and current not in done and current not in path:
+            path.append(current)
+            current = managers.get(current)
+        if current in path:
+            loop = path[path.index(current) :]
+            managers[min(loop)] = None
+        done.update(path)
+
+    rows = []
+    for employee_id in managers:
+        manager_id = managers[employee_id]
+        depth = 1
+        while manager_id:
+            rows.append(
+                ReportingHierarchy(
+                    manager_id_id=manager_id, employee_id_id=employee_id, depth=depth
+                )
+            )
+            manager_id = managers.get(manager_id)
+            depth += 1
+    with transaction.atomic():
+        ReportingHierarchy.objects.all().delete()
+        ReportingHierarchy.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def ensure_reporting_hierarchy():
+    """
+    Fills the ReportingHierarchy when it is empty while reporting managers are
+    set, as after the table is created on existing data. Returns the number of
+    rows written.
+    """
+    if ReportingHierarchy.objects.exists():
+        return 0
+    if (
+        not EmployeeWorkInformation.objects.entire()
+        .filter(employee_id__isnull=False, reporting_manager_id__isnull=False)
+        .exists()
+    ):
+        return 0
+    return rebuild_reporting_hierarchy()
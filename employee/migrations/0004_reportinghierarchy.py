@@ -0,0 +1,48 @@
+# Generated by Django 4.2.21 on 2026-10-18 21:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("employee", "0003_add_biometric_fields"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReportingHierarchy",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("depth", models.PositiveIntegerField(default=1)),
+                (
+                    "employee_id",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reporting_ancestors",
+                        to="employee.employee",
+                    ),
+                ),
+                (
+                    "manager_id",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reporting_descendants",
+                        to="employee.employee",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("manager_id", "employee_id")},
+            },
+        ),
+    ]
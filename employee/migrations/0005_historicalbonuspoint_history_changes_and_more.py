@@ -0,0 +1,23 @@
+# Generated by Django 4.2.21 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("employee", "0004_reportinghierarchy"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="historicalbonuspoint",
+            name="history_changes",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="historicalemployeeworkinformation",
+            name="history_changes",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -133,6 +133,11 @@ class Employee(models.Model):
     objects = HorillaCompanyManager(
         related_company_field="employee_work_info__company_id"
     )
+    # Fields the generic search joins for the computed names
+    search_concat_fields = {
+        "get_full_name": ["employee_first_name", "employee_last_name"],
+        "__str__": ["employee_first_name", "employee_last_name", "badge_id"],
+    }
 
     def clean_fields(self, exclude=None):
         errors = {}
@@ -737,6 +742,83 @@ class EmployeeWorkInformation(models.Model):
         return self
 
 
+class ReportingHierarchy(models.Model):
+    """
+    Closure of the reporting chain, one row for every manager above an
+    employee at any depth. Maintained from
+    EmployeeWorkInformation.reporting_manager_id by employee/signals.py
+    """
+
+    manager_id = models.ForeignKey(
+        Employee, on_delete=models.CASCADE, related_name="reporting_descendants"
+    )
+    employee_id = models.ForeignKey(
+        Employee, on_delete=models.CASCADE, related_name="reporting_ancestors"
+    )
+    depth = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ("manager_id", "employee_id")
+
+    def __str__(self) -> str:
+        return f"{self.manager_id} > {self.employee_id} ({self.depth})"
+
+
+class EmployeeImportJob(models.Model):
+    """
+    Background import of an employee file, processed chunk by chunk by
+    employee/methods/import_jobs.py and polled by the import popup
+    """
+
+    STATUS_CHOICES = [
+        ("queued", trans("Queued")),
+        ("running", trans("Running")),
+        ("completed", trans("Completed")),
+        ("failed", trans("Failed")),
+    ]
+
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="employee_import_jobs",
+    )
+    file = models.FileField(upload_to="employee/imports/")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    chunk_size = models.PositiveIntegerField(default=500)
+    total_rows = models.PositiveIntegerField(default=0)
+    total_chunks = models.PositiveIntegerField(default=0)
+    processed_chunks = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    error_rows = models.JSONField(default=list, blank=True)
+    # {employee id: reporting manager name}, resolved after the last chunk
+    pending_managers = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.file.name} ({self.status})"
+
+    def is_finished(self):
+        """
+        Whether the job stopped, successfully or not
+        """
+        return self.status in ("completed", "failed")
+
+    def progress(self):
+        """
+        Percentage of the rows already processed
+        """
+        if not self.total_rows:
+            return 100 if self.status == "completed" else 0
+        return int(self.processed_rows * 100 / self.total_rows)
+
+
 class EmployeeBankDetails(HorillaModel):
     """
     EmployeeBankDetails model
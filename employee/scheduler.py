@@ -1,8 +1,7 @@
 import datetime
-import sys
 from datetime import timedelta
 
-from apscheduler.schedulers.background import BackgroundScheduler
+from horilla.horilla_jobs import register_job
 
 
 def update_experience():
@@ -132,14 +131,5 @@ def block_unblock_disciplinary():
     return
 
 
-if not any(
-    cmd in sys.argv
-    for cmd in ["makemigrations", "migrate", "compilemessages", "flush", "shell"]
-):
-    """
-    Initializes and starts background tasks using APScheduler when the server is running.
-    """
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(update_experience, "interval", hours=4)
-    scheduler.add_job(block_unblock_disciplinary, "interval", seconds=25)
-    scheduler.start()
+register_job(update_experience, "interval", hours=4)
+register_job(block_unblock_disciplinary, "interval", seconds=25)
@@ -0,0 +1,60 @@
+"""
+employee/signals.py
+"""
+
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from employee.methods.reporting_hierarchy import (
+    ensure_reporting_hierarchy,
+    update_reporting_hierarchy,
+)
+from employee.models import EmployeeWorkInformation
+from horilla.signals import post_bulk_update
+
+
+@receiver(post_save, sender=EmployeeWorkInformation)
+def work_info_reporting_hierarchy(sender, instance, **kwargs):
+    """
+    Keeps the reporting hierarchy in line with the reporting manager
+    """
+    if instance.employee_id_id:
+        update_reporting_hierarchy(
+            instance.employee_id_id, instance.reporting_manager_id_id
+        )
+
+
+@receiver(post_delete, sender=EmployeeWorkInformation)
+def work_info_delete_reporting_hierarchy(sender, instance, **kwargs):
+    """
+    The employee without work information reports to nobody
+    """
+    if instance.employee_id_id:
+        update_reporting_hierarchy(instance.employee_id_id, None)
+
+
+@receiver(post_bulk_update, sender=EmployeeWorkInformation)
+def work_info_bulk_reporting_hierarchy(sender, queryset, kwargs=None, **_kwargs):
+    """
+    Applies queryset.update(reporting_manager_id=...) to the reporting hierarchy
+    """
+    if not kwargs or not {"reporting_manager_id", "reporting_manager_id_id"} & set(
+        kwargs
+    ):
+        return
+    for employee_id, manager_id in queryset.values_list(
+        "employee_id", "reporting_manager_id"
+    ):
+        if employee_id:
+            update_reporting_hierarchy(employee_id, manager_id)
+
+
+@receiver(post_migrate)
+def fill_reporting_hierarchy(sender, **kwargs):
+    """
+    Fills the reporting hierarchy of the existing work information once the
+    table exists
+    """
+    if sender.label != "employee":
+        return
+    ensure_reporting_hierarchy()
@@ -168,6 +168,16 @@ urlpatterns = [
     path("employee-import", views.employee_import, name="employee-import"),
     path("employee-export", views.employee_export, name="employee-export"),
     path("work-info-import", views.work_info_import, name="work-info-import"),
+    path(
+        "work-info-import-job/<int:job_id>/",
+        views.work_info_import_job,
+        name="work-info-import-job",
+    ),
+    path(
+        "work-info-import-job-errors/<int:job_id>/",
+        views.work_info_import_job_errors,
+        name="work-info-import-job-errors",
+    ),
     path(
         "work-info-import-file",
         views.work_info_import_file,
@@ -16,7 +16,6 @@ import calendar
 import json
 import operator
 import os
-import threading
 from datetime import date, datetime, timedelta
 from urllib.parse import parse_qs
 
@@ -64,7 +63,6 @@ from base.models import (
     ShiftRequest,
     WorkTypeRequest,
 )
-from base.views import generate_error_report
 from employee.filters import DocumentRequestFilter, EmployeeFilter, EmployeeReGroup
 from employee.forms import (
     BonusPointAddForm,
@@ -81,27 +79,23 @@ from employee.forms import (
     EmployeeWorkInformationUpdateForm,
     excel_columns,
 )
+from employee.methods.import_jobs import (
+    import_error_report,
+    iter_import_chunks,
+    restart_employee_import_job,
+    start_employee_import_job,
+)
 from employee.methods.methods import (
-    bulk_create_department_import,
-    bulk_create_employee_import,
-    bulk_create_employee_types,
-    bulk_create_job_position_import,
-    bulk_create_job_role_import,
-    bulk_create_shifts,
-    bulk_create_user_import,
-    bulk_create_work_info_import,
-    bulk_create_work_types,
-    error_data_template,
     get_ordered_badge_ids,
-    process_employee_records,
-    set_initial_password,
     valid_import_file_headers,
 )
+from employee.methods.reporting_hierarchy import subordinate_ids
 from employee.models import (
     BonusPoint,
     Employee,
     EmployeeBankDetails,
     EmployeeGeneralSetting,
+    EmployeeImportJob,
     EmployeeNote,
     EmployeeTag,
     EmployeeWorkInformation,
@@ -1414,7 +1408,7 @@ def employee_view_update(request, obj_id, **kwargs):
 
     if employee is None:
         employee = emp
-        
+
         work = (
             EmployeeWorkInformation.objects.entire()
             .filter(employee_id=employee)
@@ -2553,87 +2547,88 @@ def work_info_import(request):
             )
 
         file_extension = file.name.split(".")[-1].lower()
+        if file_extension not in ["csv", "xls", "xlsx"]:
+            error_message = _(
+                "Unsupported file format. Please upload a CSV or Excel file."
+            )
+            return render(
+                request,
+                "employee/employee_import.html",
+                {"error_message": error_message},
+            )
 
+        job = EmployeeImportJob.objects.create(created_by=request.user, file=file)
         try:
-            if file_extension == "csv":
-                data_frame = pd.read_csv(file)
-            elif file_extension in ["xls", "xlsx"]:
-                data_frame = pd.read_excel(file)
-            else:
-
-                error_message = _(
-                    "Unsupported file format. Please upload a CSV or Excel file."
-                )
-                return render(
-                    request,
-                    "employee/employee_import.html",
-                    {"error_message": error_message},
-                )
-
+            data_frame = next(iter_import_chunks(job.file, 1), pd.DataFrame())
             valid, error_message = valid_import_file_headers(data_frame)
-            if not valid:
-                return render(
-                    request,
-                    "employee/employee_import.html",
-                    {"error_message": error_message},
-                )
-            success_list, error_list, created_count = process_employee_records(
-                data_frame
+        except Exception as e:
+            logger.error(f"File import error: {e}")
+            valid = False
+            error_message = _(
+                "Failed to read file. Please ensure it is a valid CSV or Excel file. : {}"
+            ).format(e)
+        if not valid:
+            job.file.delete(save=False)
+            job.delete()
+            return render(
+                request,
+                "employee/employee_import.html",
+                {"error_message": error_message},
             )
-            if success_list:
-                try:
-                    users = bulk_create_user_import(success_list)
-                    employees = bulk_create_employee_import(success_list)
-                    bulk_create_department_import(success_list)
-                    bulk_create_job_position_import(success_list)
-                    bulk_create_job_role_import(success_list)
-                    bulk_create_work_types(success_list)
-                    bulk_create_shifts(success_list)
-                    bulk_create_employee_types(success_list)
-                    bulk_create_work_info_import(success_list)
-                    thread = threading.Thread(
-                        target=set_initial_password, args=(employees,)
-                    )
-                    thread.start()
-
-                except Exception as e:
-                    messages.error(request, _("Error Occured {}").format(e))
-                    logger.error(e)
+        start_employee_import_job(job)
+        return render(request, "employee/import_job_status.html", {"job": job})
 
-            path_info = (
-                generate_error_report(
-                    error_list, error_data_template, "EmployeesImportError.xlsx"
-                )
-                if error_list
-                else None
-            )
 
-            context = {
-                "created_count": created_count,
-                "total_count": created_count + len(error_list),
-                "error_count": len(error_list),
-                "model": _("Employees"),
-                "path_info": path_info,
-            }
-            result = render_to_string("import_popup.html", context)
-            result += """
-                        <script>
-                            $('#objectCreateModalTarget').css('max-width', '410px');
-                        </script>
-                    """
-            return HttpResponse(result)
-        except Exception as e:
+@login_required
+@hx_request_required
+@permission_required("employee.add_employee")
+def work_info_import_job(request, job_id):
+    """
+    This method is used to render the progress of a background employee
+    import, or its result once it completed
+    """
+    job = get_object_or_404(EmployeeImportJob, pk=job_id, created_by=request.user)
+    if request.method == "POST" and not restart_employee_import_job(job):
+        if job.status == "failed":
             messages.error(
                 request,
-                _(
-                    "Failed to read file. Please ensure it is a valid CSV or Excel file. : {}"
-                ).format(e),
+                _("The uploaded file is no longer available, upload it again."),
             )
-            logger.error(f"File import error: {e}")
-            error_message = f"File import error: {e}"
-    return render(
-        request, "employee/employee_import.html", {"error_message": error_message}
-    )
+        else:
+            messages.info(request, _("The import is still running."))
+    job.refresh_from_db()
+    if job.status != "completed":
+        return render(request, "employee/import_job_status.html", {"job": job})
+
+    context = {
+        "created_count": job.created_count,
+        "total_count": job.created_count + job.error_count,
+        "error_count": job.error_count,
+        "model": _("Employees"),
+        "path_info": (
+            reverse("work-info-import-job-errors", kwargs={"job_id": job.pk})[1:]
+            if job.error_count
+            else None
+        ),
+    }
+    result = render_to_string("import_popup.html", context)
+    result += """
+                <script>
+                    $('#objectCreateModalTarget').css('max-width', '410px');
+                </script>
+            """
+    return HttpResponse(result)
+
+
+@login_required
+@permission_required("employee.add_employee")
+def work_info_import_job_errors(request, job_id):
+    """
+    This method is used to download the rows a background employee import
+    could not import
+    """
+    job = get_object_or_404(EmployeeImportJob, pk=job_id, created_by=request.user)
+    return import_error_report(job)
 
 
 @login_required
@@ -3338,22 +3333,31 @@ def organisation_chart(request):
 
     entered_req_managers = []
 
-    # Helper function to recursively create the hierarchy structure
     def create_hierarchy(manager):
         """
-        Hierarchy generator method
+        Hierarchy generator method, the whole reporting chain of the manager is
+        fetched in one query and grouped by reporting manager
         """
+        subordinates = {}
+        for employee in (
+            Employee.objects.filter(is_active=True, id__in=subordinate_ids(manager.id))
+            .exclude(id=manager.id)
+            .select_related("employee_work_info__job_position_id")
+        ):
+            subordinates.setdefault(
+                employee.employee_work_info.reporting_manager_id_id, []
+            ).append(employee)
+        return build_hierarchy(manager, subordinates)
+
+    # Helper function to recursively create the hierarchy structure
+    def build_hierarchy(manager, subordinates):
         nodes = []
         # check the manager is a reporting manager if yes, store it into entered_req_managers
         if manager.id in result_dict.keys():
             entered_req_managers.append(manager)
-        # filter the subordinates
-        subordinates = Employee.objects.filter(
-            is_active=True, employee_work_info__reporting_manager_id=manager
-        ).exclude(id=manager.id)
 
         # itrating through subordinates
-        for employee in subordinates:
+        for employee in subordinates.get(manager.id, []):
             if employee in entered_req_managers:
                 continue
             # check the employee is a reporting manager if yes,remove className store
@@ -3365,7 +3369,7 @@ def organisation_chart(request):
                         "title": getattr(
                             employee.get_job_position(), "job_position", _("Not set")
                         ),
-                        "children": create_hierarchy(employee),
+                        "children": build_hierarchy(employee, subordinates),
                     }
                 )
                 entered_req_managers.append(employee)
@@ -3378,7 +3382,7 @@ def organisation_chart(request):
                             employee.get_job_position(), "job_position", _("Not set")
                         ),
                         "className": "middle-level",
-                        "children": create_hierarchy(employee),
+                        "children": build_hierarchy(employee, subordinates),
                     }
                 )
         return nodes
@@ -8,6 +8,9 @@ class GeofencingConfig(AppConfig):
     def ready(self):
         from django.urls import include, path
 
+        # Imported for their receivers, which drop the cached fences and
+        # geocode the address when a fence changes
+        from geofencing import fences, methods  # noqa: F401
         from horilla.urls import urlpatterns
 
         urlpatterns.append(
@@ -0,0 +1,263 @@
+"""
+geofencing/fences.py
+
+Per process cache of the active geofences with a grid index.
+
+The fences are loaded once and bucketed into grid cells of GRID_DEGREES, a
+point is only tested against the fences of its cell. Saving or deleting a
+fence bumps the version in the Django cache, every process reloads when it
+sees a new version or after FENCE_CACHE_TIMEOUT seconds, which bounds the
+staleness when every process keeps its own cache.
+"""
+
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from geofencing.models import GeoFencing
+from horilla.signals import post_bulk_update
+
+GRID_DEGREES = getattr(settings, "GEOFENCING_GRID_DEGREES", 0.05)
+FENCE_CACHE_TIMEOUT = 60
+VERSION_KEY = "geofencing-version"
+# Fences spanning more cells are tested for every point instead
+MAX_FENCE_CELLS = 400
+EARTH_RADIUS_IN_METERS = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_IN_METERS / 180
+
+
+def distance_in_meters(lat1, lng1, lat2, lng2):
+    """
+    Haversine distance between two points
+    """
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_IN_METERS * math.asin(math.sqrt(a))
+
+
+def point_in_polygon(lat, lng, vertices):
+    """
+    Ray casting test of the point against the [latitude, longitude] vertices
+    """
+    inside = False
+    j = len(vertices) - 1
+    for i in range(len(vertices)):
+        lat_i, lng_i = vertices[i]
+        lat_j, lng_j = vertices[j]
+        if (lng_i > lng) != (lng_j > lng) and lat < (lat_j - lat_i) * (lng - lng_i) / (
+            lng_j - lng_i
+        ) + lat_i:
+            inside = not inside
+        j = i
+    return inside
+
+
+class Fence:
+    """
+    Plain copy of an active GeoFencing kept in the cache
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "company_id",
+        "shape",
+        "latitude",
+        "longitude",
+        "radius",
+        "vertices",
+        "bounds",
+        "department_ids",
+        "employee_ids",
+    )
+
+    def __init__(self, geo_fencing, department_ids, employee_ids):
+        self.id = geo_fencing.pk
+        self.name = str(geo_fencing)
+        self.company_id = geo_fencing.company_id_id
+        self.shape = geo_fencing.shape
+        self.latitude = geo_fencing.latitude
+        self.longitude = geo_fencing.longitude
+        self.radius = geo_fencing.radius_in_meters or 0
+        self.vertices = [tuple(vertex) for vertex in geo_fencing.polygon or []]
+        self.department_ids = frozenset(department_ids)
+        self.employee_ids = frozenset(employee_ids)
+        if self.shape == "polygon":
+            lats = [lat for lat, _lng in self.vertices]
+            lngs = [lng for _lat, lng in self.vertices]
+            self.bounds = (min(lats), min(lngs), max(lats), max(lngs))
+        else:
+            lat_delta = self.radius / METERS_PER_DEGREE
+            lng_delta = lat_delta / max(math.cos(math.radians(self.latitude)), 0.01)
+            self.bounds = (
+                self.latitude - lat_delta,
+                self.longitude - lng_delta,
+                self.latitude + lat_delta,
+                self.longitude + lng_delta,
+            )
+
+    def applies_to(self, company_id, department_id, employee_id):
+        """
+        Whether the fence covers the employee, fences without departments and
+        employees cover the whole company
+        """
+        if self.company_id != company_id:
+            return False
+        if not self.department_ids and not self.employee_ids:
+            return True
+        return employee_id in self.employee_ids or department_id in self.department_ids
+
+    def contains(self, lat, lng):
+        min_lat, min_lng, max_lat, max_lng = self.bounds
+        if not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+            return False
+        if self.shape == "polygon":
+            return point_in_polygon(lat, lng, self.vertices)
+        return (
+            distance_in_meters(self.latitude, self.longitude, lat, lng) <= self.radius
+        )
+
+
+def _cell(lat, lng):
+    return (math.floor(lat / GRID_DEGREES), math.floor(lng / GRID_DEGREES))
+
+
+class FenceIndex:
+    """
+    The active fences bucketed into grid cells
+    """
+
+    def __init__(self, fences):
+        self.fences = fences
+        self.company_ids = {fence.company_id for fence in fences}
+        self.cells = {}
+        self.large = []
+        for fence in fences:
+            min_lat, min_lng, max_lat, max_lng = fence.bounds
+            low_lat, low_lng = _cell(min_lat, min_lng)
+            high_lat, high_lng = _cell(max_lat, max_lng)
+            if (high_lat - low_lat + 1) * (high_lng - low_lng + 1) > MAX_FENCE_CELLS:
+                self.large.append(fence)
+                continue
+            for cell_lat in range(low_lat, high_lat + 1):
+                for cell_lng in range(low_lng, high_lng + 1):
+                    self.cells.setdefault((cell_lat, cell_lng), []).append(fence)
+
+    def candidates(self, lat, lng):
+        return self.cells.get(_cell(lat, lng), []) + self.large
+
+
+_lock = threading.Lock()
+_state = {"index": None, "version": None, "loaded_at": 0}
+
+
+def load_fence_index():
+    """
+    Returns a FenceIndex of the active fences read from the database
+    """
+    geo_fencings = GeoFencing.objects.filter(start=True).prefetch_related(
+        "department_id", "employee_id"
+    )
+    fences = []
+    for geo_fencing in geo_fencings:
+        department_ids = [
+            department.pk for department in geo_fencing.department_id.all()
+        ]
+        employee_ids = [employee.pk for employee in geo_fencing.employee_id.all()]
+        fences.append(Fence(geo_fencing, department_ids, employee_ids))
+    return FenceIndex(fences)
+
+
+def fence_index():
+    """
+    Returns the cached FenceIndex, reloaded when the fences changed
+    """
+    version = cache.get(VERSION_KEY)
+    index = _state["index"]
+    if (
+        index is None
+        or version != _state["version"]
+        or time.monotonic() - _state["loaded_at"] > FENCE_CACHE_TIMEOUT
+    ):
+        with _lock:
+            index = load_fence_index()
+            _state.update(index=index, version=version, loaded_at=time.monotonic())
+    return index
+
+
+def fences_changed():
+    """
+    Drops the cached fences of every process once the transaction commits
+    """
+
+    def update():
+        cache.set(VERSION_KEY, time.time(), None)
+        _state["index"] = None
+
+    transaction.on_commit(update)
+
+
+def geofencing_enabled(company):
+    """
+    Whether the company has an active fence
+    """
+    company_id = getattr(company, "pk", company)
+    return company_id in fence_index().company_ids
+
+
+def employee_scope(employee):
+    """
+    Returns the (company id, department id, employee id) the fences of the
+    employee are looked up with
+    """
+    work_info = getattr(employee, "employee_work_info", None)
+    if work_info is None:
+        return None, None, employee.pk
+    return work_info.company_id_id, work_info.department_id_id, employee.pk
+
+
+def employee_fences(scope):
+    """
+    Returns the active fences covering the employee scope
+    """
+    return [fence for fence in fence_index().fences if fence.applies_to(*scope)]
+
+
+def locate(scope, lat, lng, index=None):
+    """
+    Returns the first fence of the employee scope containing the point or None
+    """
+    index = index or fence_index()
+    for fence in index.candidates(lat, lng):
+        if fence.applies_to(*scope) and fence.contains(lat, lng):
+            return fence
+    return None
+
+
+@receiver(post_save, sender=GeoFencing)
+@receiver(post_delete, sender=GeoFencing)
+def geo_fencing_changed(sender, instance, **kwargs):
+    fences_changed()
+
+
+@receiver(m2m_changed, sender=GeoFencing.department_id.through)
+@receiver(m2m_changed, sender=GeoFencing.employee_id.through)
+def geo_fencing_assignment_changed(sender, instance, action, **kwargs):
+    if action.startswith("post_"):
+        fences_changed()
+
+
+def geo_fencing_bulk_updated(sender, queryset, *args, **kwargs):
+    fences_changed()
+
+
+post_bulk_update.connect(geo_fencing_bulk_updated, sender=GeoFencing)
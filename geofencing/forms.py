@@ -10,7 +10,17 @@ class GeoFencingSetupForm(ModelForm):
 
     class Meta:
         model = GeoFencing
-        exclude = ["company_id"]
+        fields = [
+            "name",
+            "shape",
+            "latitude",
+            "longitude",
+            "radius_in_meters",
+            "polygon",
+            "department_id",
+            "employee_id",
+            "start",
+        ]
 
     def as_p(self):
         """
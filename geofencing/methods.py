@@ -0,0 +1,53 @@
+"""
+geofencing/methods.py
+
+Optional reverse geocoding of the fences. When GEOFENCING_REVERSE_GEOCODE is
+set the address of a saved fence is looked up on Nominatim in a background
+thread once the save commits, a failing lookup only leaves it empty.
+"""
+
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from geofencing.models import GeoFencing
+
+logger = logging.getLogger(__name__)
+
+REVERSE_GEOCODE = getattr(settings, "GEOFENCING_REVERSE_GEOCODE", False)
+
+
+def reverse_geocode(geo_fencing_id):
+    """
+    Stores the Nominatim address of the fence center
+    """
+    from geopy.geocoders import Nominatim
+
+    geo_fencing = GeoFencing.objects.filter(pk=geo_fencing_id).first()
+    if geo_fencing is None:
+        return
+    geolocator = Nominatim(user_agent="horilla_geofencing")
+    try:
+        location = geolocator.reverse(
+            (geo_fencing.latitude, geo_fencing.longitude), exactly_one=True, timeout=10
+        )
+    except Exception as e:
+        logger.warning("Reverse geocoding of geofence %s failed: %s", geo_fencing_id, e)
+        return
+    address = location.address[:255] if location else ""
+    GeoFencing.objects.filter(pk=geo_fencing_id).update(address=address)
+
+
+@receiver(post_save, sender=GeoFencing)
+def geo_fencing_geocode(sender, instance, **kwargs):
+    if not REVERSE_GEOCODE:
+        return
+    transaction.on_commit(
+        lambda: threading.Thread(
+            target=reverse_geocode, args=(instance.pk,), daemon=True
+        ).start()
+    )
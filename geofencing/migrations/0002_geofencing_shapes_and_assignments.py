@@ -0,0 +1,96 @@
+# Generated by Django 4.2.21 on 2026-10-18 21:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("base", "0001_initial"),
+        ("employee", "0001_initial"),
+        ("geofencing", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="geofencing",
+            name="unique_company_id_when_not_null_geofencing",
+        ),
+        migrations.AddField(
+            model_name="geofencing",
+            name="address",
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="geofencing",
+            name="department_id",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="geo_fencings",
+                to="base.department",
+                verbose_name="Departments",
+            ),
+        ),
+        migrations.AddField(
+            model_name="geofencing",
+            name="employee_id",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="geo_fencings",
+                to="employee.employee",
+                verbose_name="Employees",
+            ),
+        ),
+        migrations.AddField(
+            model_name="geofencing",
+            name="name",
+            field=models.CharField(blank=True, max_length=100, verbose_name="Name"),
+        ),
+        migrations.AddField(
+            model_name="geofencing",
+            name="polygon",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                help_text="Vertices of the polygon as [[latitude, longitude], ...]",
+                verbose_name="Polygon",
+            ),
+        ),
+        migrations.AddField(
+            model_name="geofencing",
+            name="shape",
+            field=models.CharField(
+                choices=[("circle", "Circle"), ("polygon", "Polygon")],
+                default="circle",
+                max_length=10,
+                verbose_name="Shape",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="geofencing",
+            name="company_id",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="geo_fencings",
+                to="base.company",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="geofencing",
+            name="latitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="geofencing",
+            name="longitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="geofencing",
+            name="radius_in_meters",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
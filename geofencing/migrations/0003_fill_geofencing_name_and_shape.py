@@ -0,0 +1,29 @@
+# Generated by Django 4.2.21 on 2026-10-18 21:05
+
+from django.db import migrations
+
+
+def fill_name_and_shape(apps, schema_editor):
+    """
+    The fences of the one fence per company era are circles, named after their
+    company
+    """
+    GeoFencing = apps.get_model("geofencing", "GeoFencing")
+    fences = list(GeoFencing.objects.filter(name="").select_related("company_id"))
+    for fence in fences:
+        fence.shape = "circle"
+        fence.name = (
+            fence.company_id.company if fence.company_id else f"Circle {fence.pk}"
+        )
+    GeoFencing.objects.bulk_update(fences, ["name", "shape"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("geofencing", "0002_geofencing_shapes_and_assignments"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_name_and_shape, migrations.RunPython.noop),
+    ]
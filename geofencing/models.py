@@ -1,53 +1,99 @@
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models import Q
-from geopy.geocoders import Nominatim
+from django.utils.translation import gettext_lazy as _
 
 
 class GeoFencing(models.Model):
-    latitude = models.FloatField()
-    longitude = models.FloatField()
-    radius_in_meters = models.IntegerField()
-    company_id = models.OneToOneField(
+    """
+    A site of the company, a circle around the latitude and longitude or a
+    polygon of [latitude, longitude] vertices. A fence without departments or
+    employees applies to the whole company.
+    """
+
+    SHAPE_CHOICES = [
+        ("circle", _("Circle")),
+        ("polygon", _("Polygon")),
+    ]
+
+    name = models.CharField(max_length=100, blank=True, verbose_name=_("Name"))
+    shape = models.CharField(
+        max_length=10, choices=SHAPE_CHOICES, default="circle", verbose_name=_("Shape")
+    )
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    radius_in_meters = models.IntegerField(null=True, blank=True)
+    polygon = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name=_("Polygon"),
+        help_text=_("Vertices of the polygon as [[latitude, longitude], ...]"),
+    )
+    company_id = models.ForeignKey(
         "base.Company",
-        related_name="geo_fencing",
+        related_name="geo_fencings",
         on_delete=models.CASCADE,
         blank=True,
         null=True,
     )
+    department_id = models.ManyToManyField(
+        "base.Department",
+        blank=True,
+        related_name="geo_fencings",
+        verbose_name=_("Departments"),
+    )
+    employee_id = models.ManyToManyField(
+        "employee.Employee",
+        blank=True,
+        related_name="geo_fencings",
+        verbose_name=_("Employees"),
+    )
+    address = models.CharField(max_length=255, blank=True, editable=False)
     start = models.BooleanField(default=False)
 
-    def clean(self):
-        if self.company_id is None:
-            qs = GeoFencing.objects.filter(company_id__isnull=True)
-            if self.pk:
-                qs = qs.exclude(pk=self.pk)
-            if qs.exists():
-                raise ValidationError("Only one GeoFencing can have a null company_id.")
-
-        geolocator = Nominatim(
-            user_agent="geo_checker_unique"
-        )  # Unique user-agent is important
+    def __str__(self):
+        return self.name or f"{self.get_shape_display()} {self.pk}"
+
+    def clean_polygon(self):
+        """
+        Returns the polygon vertices as [latitude, longitude] float pairs
+        """
+        vertices = self.polygon or []
         try:
-            location = geolocator.reverse(
-                (self.latitude, self.longitude), exactly_one=True
+            vertices = [[float(lat), float(lng)] for lat, lng in vertices]
+        except (TypeError, ValueError):
+            raise ValidationError(
+                {"polygon": _("Give the vertices as [[latitude, longitude], ...].")}
+            )
+        if len(vertices) < 3:
+            raise ValidationError(
+                {"polygon": _("A polygon needs at least three vertices.")}
             )
-            if not location:
-                raise ValidationError("Invalid location coordinates.")
-        except Exception as e:
-            raise ValidationError(f"Geolocation error: {e}")
+        return vertices
 
+    def clean(self):
+        if self.shape == "polygon":
+            self.polygon = self.clean_polygon()
+            # The center of a polygon is the mean of its vertices
+            self.latitude = sum(lat for lat, _lng in self.polygon) / len(self.polygon)
+            self.longitude = sum(lng for _lat, lng in self.polygon) / len(self.polygon)
+        else:
+            errors = {}
+            for field in ("latitude", "longitude", "radius_in_meters"):
+                if getattr(self, field) is None:
+                    errors[field] = _("This field is required.")
+            if errors:
+                raise ValidationError(errors)
+            if self.radius_in_meters <= 0:
+                raise ValidationError(
+                    {"radius_in_meters": _("The radius should be positive.")}
+                )
+            self.polygon = []
+        if self.latitude is not None and not -90 <= self.latitude <= 90:
+            raise ValidationError({"latitude": _("Invalid latitude.")})
+        if self.longitude is not None and not -180 <= self.longitude <= 180:
+            raise ValidationError({"longitude": _("Invalid longitude.")})
         return super().clean()
 
     def save(self, *args, **kwargs):
         self.full_clean()  # Run clean before save
         super().save(*args, **kwargs)
-
-    class Meta:
-        constraints = [
-            models.UniqueConstraint(
-                fields=["company_id"],
-                name="unique_company_id_when_not_null_geofencing",
-                condition=~Q(company_id=None),
-            )
-        ]
@@ -1,8 +1,10 @@
-from geopy.geocoders import Nominatim
+from django.core.exceptions import ValidationError
 from rest_framework import serializers
 
 from .models import GeoFencing
 
+BATCH_LOCATION_LIMIT = 1000
+
 
 class GeoFencingSetupSerializer(serializers.ModelSerializer):
     class Meta:
@@ -10,19 +12,32 @@ class GeoFencingSetupSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
     def validate(self, data):
-        geolocator = Nominatim(user_agent="geo_checker")  # Use a unique user-agent
+        fields = {
+            field: value
+            for field, value in data.items()
+            if field not in ("department_id", "employee_id")
+        }
+        geo_fencing = GeoFencing(**fields)
+        if self.instance:
+            geo_fencing = self.instance
+            for field, value in fields.items():
+                setattr(geo_fencing, field, value)
         try:
-            latitude = data.get("latitude")
-            longitude = data.get("longitude")
-            location = geolocator.reverse((latitude, longitude), exactly_one=True)
-            if not location:
-                raise serializers.ValidationError("Invalid Location")
-        except Exception as e:
-            raise serializers.ValidationError(e)
+            geo_fencing.clean()
+        except ValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+        for field in ("latitude", "longitude", "polygon"):
+            data[field] = getattr(geo_fencing, field)
         return data
 
 
-class EmployeeLocationSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = GeoFencing
-        fields = ["latitude", "longitude"]
+class EmployeeLocationSerializer(serializers.Serializer):
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+
+
+class EmployeeLocationBatchSerializer(serializers.Serializer):
+    employee_id = serializers.IntegerField(required=False)
+    locations = EmployeeLocationSerializer(
+        many=True, allow_empty=False, max_length=BATCH_LOCATION_LIMIT
+    )
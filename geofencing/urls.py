@@ -7,5 +7,14 @@ urlpatterns = [
     path("setup/<int:pk>/", GeoFencingSetupPutDeleteAPIView.as_view()),
     path("setup-check/", GeoFencingSetUpPermissionCheck.as_view()),
     path("location-check/", GeoFencingEmployeeLocationCheckAPIView.as_view()),
+    path(
+        "location-check/batch/",
+        GeoFencingEmployeeLocationBatchCheckAPIView.as_view(),
+    ),
     path("config/", geo_location_config, name="geo-config"),
+    path(
+        "config/<int:geo_fencing_id>/delete/",
+        geo_location_delete,
+        name="geo-config-delete",
+    ),
 ]
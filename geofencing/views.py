@@ -1,10 +1,9 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
 from django.http import QueryDict
-from django.shortcuts import get_object_or_404, redirect, render
+from django.shortcuts import redirect, render
 from django.utils.decorators import method_decorator
 from django.utils.translation import gettext_lazy as _
-from geopy.distance import geodesic
 from rest_framework import status
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
@@ -12,6 +11,8 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from base.models import Company
+from employee.models import Employee
+from geofencing.fences import employee_fences, employee_scope, fence_index, locate
 from geofencing.forms import GeoFencingSetupForm
 
 from .models import GeoFencing
@@ -27,8 +28,10 @@ class GeoFencingSetupGetPostAPIView(APIView):
     )
     def get(self, request):
         company = request.user.employee_get.get_company()
-        location = get_object_or_404(GeoFencing, pk=company.id)
-        serializer = GeoFencingSetupSerializer(location)
+        locations = GeoFencing.objects.filter(company_id=company).prefetch_related(
+            "department_id", "employee_id"
+        )
+        serializer = GeoFencingSetupSerializer(locations, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @method_decorator(
@@ -43,7 +46,7 @@ class GeoFencingSetupGetPostAPIView(APIView):
             company = request.user.employee_get.get_company()
             if company:
                 data["company_id"] = company.id
-        serializer = GeoFencingSetupSerializer(data=request.data)
+        serializer = GeoFencingSetupSerializer(data=data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -95,45 +98,76 @@ class GeoFencingSetupPutDeleteAPIView(APIView):
 class GeoFencingEmployeeLocationCheckAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def get_company(self, request):
-        try:
-            company = request.user.employee_get.get_company()
-            return company
-        except Exception as e:
-            raise serializers.ValidationError(e)
-
-    def get_company_location(self, request):
-        company = self.get_company(request)
-        try:
-            location = GeoFencing.objects.get(company_id=company)
-            return location
-        except Exception as e:
-            raise serializers.ValidationError(e)
-
     def post(self, request):
         serializer = EmployeeLocationSerializer(data=request.data)
-        company_location = self.get_company_location(request)
-        if company_location.start:
-            if serializer.is_valid():
-                geofence_center = (
-                    company_location.latitude,
-                    company_location.longitude,
-                )
-                employee_location = (
-                    request.data.get("latitude"),
-                    request.data.get("longitude"),
-                )
-                distance = geodesic(geofence_center, employee_location).meters
-                if distance <= company_location.radius_in_meters:
-                    return Response(
-                        {"message": "Inside the geofence"}, status=status.HTTP_200_OK
-                    )
+        scope = employee_scope(request.user.employee_get)
+        if not employee_fences(scope):
+            raise serializers.ValidationError("Geofencing is not yet started..")
+        if serializer.is_valid():
+            fence = locate(
+                scope,
+                serializer.validated_data["latitude"],
+                serializer.validated_data["longitude"],
+            )
+            if fence:
                 return Response(
-                    {"message": "Outside the geofence"},
-                    status=status.HTTP_400_BAD_REQUEST,
+                    {"message": "Inside the geofence", "geofence": fence.name},
+                    status=status.HTTP_200_OK,
                 )
+            return Response(
+                {"message": "Outside the geofence"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class GeoFencingEmployeeLocationBatchCheckAPIView(APIView):
+    """
+    Checks a list of locations against the fences of the employee, the
+    requesting employee unless an employee_id is given
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get_employee(self, request, employee_id):
+        employee = request.user.employee_get
+        if employee_id is None or employee_id == employee.pk:
+            return employee
+        if not request.user.has_perm("geofencing.view_geofencing"):
+            raise serializers.ValidationError("Access Denied..")
+        employee = (
+            Employee.objects.entire()
+            .select_related("employee_work_info")
+            .filter(pk=employee_id)
+            .first()
+        )
+        if employee is None:
+            raise serializers.ValidationError("Employee not found.")
+        return employee
+
+    def post(self, request):
+        serializer = EmployeeLocationBatchSerializer(data=request.data)
+        if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        raise serializers.ValidationError("Geofencing is not yet started..")
+        employee = self.get_employee(
+            request, serializer.validated_data.get("employee_id")
+        )
+        scope = employee_scope(employee)
+        if not employee_fences(scope):
+            raise serializers.ValidationError("Geofencing is not yet started..")
+        index = fence_index()
+        results = []
+        for location in serializer.validated_data["locations"]:
+            fence = locate(scope, location["latitude"], location["longitude"], index)
+            results.append(
+                {
+                    "latitude": location["latitude"],
+                    "longitude": location["longitude"],
+                    "inside": fence is not None,
+                    "geofence": fence.name if fence else None,
+                }
+            )
+        return Response({"results": results}, status=status.HTTP_200_OK)
 
 
 class GeoFencingSetUpPermissionCheck(APIView):
@@ -141,7 +175,8 @@ class GeoFencingSetUpPermissionCheck(APIView):
 
     def get(self, request):
         geo_fencing = GeoFencingSetupGetPostAPIView()
-        if geo_fencing.get(request).status_code == 200:
+        response = geo_fencing.get(request)
+        if response.status_code == 200 and response.data:
             return Response(status=200)
         return Response(status=400)
 
@@ -157,34 +192,46 @@ def get_company(request):
         raise serializers.ValidationError(e)
 
 
-def get_company_location(request):
-    company = get_company(request)
-    try:
-        location = GeoFencing.objects.get(company_id=company)
-        return location
-    except Exception as e:
-        raise serializers.ValidationError(e)
+def get_company_location(request, geo_fencing_id):
+    return GeoFencing.objects.filter(
+        company_id=get_company(request), pk=geo_fencing_id
+    ).first()
+
+
+def render_geo_location_config(request, form):
+    geo_fencings = GeoFencing.objects.filter(
+        company_id=get_company(request)
+    ).prefetch_related("department_id", "employee_id")
+    return render(
+        request, "geo_config.html", {"form": form, "geo_fencings": geo_fencings}
+    )
 
 
 @login_required
 @permission_required("geofencing.add_localbackup")
 def geo_location_config(request):
-    try:
-        form = GeoFencingSetupForm(instance=get_company_location(request))
-    except:
-        form = GeoFencingSetupForm()
+    instance = get_company_location(request, request.GET.get("instance_id"))
+    form = GeoFencingSetupForm(instance=instance)
     if request.method == "POST":
-        try:
-            form = GeoFencingSetupForm(
-                request.POST, instance=get_company_location(request)
-            )
-        except:
-            form = GeoFencingSetupForm(request.POST)
+        form = GeoFencingSetupForm(request.POST, instance=instance)
         if form.is_valid():
             geofencing = form.save(commit=False)
             geofencing.company_id = get_company(request)
             geofencing.save()
+            form.save_m2m()
             messages.success(request, _("Geofencing config created successfully."))
+            form = GeoFencingSetupForm()
         else:
             messages.info(request, "Not valid")
-    return render(request, "geo_config.html", {"form": form})
+    return render_geo_location_config(request, form)
+
+
+@login_required
+@permission_required("geofencing.delete_geofencing")
+def geo_location_delete(request, geo_fencing_id):
+    if request.method == "POST":
+        instance = get_company_location(request, geo_fencing_id)
+        if instance:
+            instance.delete()
+            messages.success(request, _("Geofence deleted successfully."))
+    return render_geo_location_config(request, GeoFencingSetupForm())
@@ -6,8 +6,11 @@ import uuid
 
 import django_filters
 from django import forms
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
 from django.core.paginator import Page, Paginator
 from django.db import models
+from django.db.models.functions import Cast, Concat
 from django_filters.filterset import FILTER_FOR_DBFIELD_DEFAULTS
 
 from base.methods import reload_queryset
@@ -18,6 +21,12 @@ FILTER_FOR_DBFIELD_DEFAULTS[models.ForeignKey][
     "filter_class"
 ] = django_filters.ModelMultipleChoiceFilter
 
+# Rows evaluated per query when a search field can only be computed in Python
+SEARCH_BATCH_SIZE = 2000
+# Accent insensitive search, needs django.contrib.postgres and the unaccent
+# extension on PostgreSQL
+SEARCH_UNACCENT = getattr(settings, "HORILLA_SEARCH_UNACCENT", False)
+
 
 def filter_by_name(queryset, name, value):
     """
@@ -44,6 +53,111 @@ def filter_by_name(queryset, name, value):
     return queryset
 
 
+def resolve_search_field(model, search_field):
+    """
+    Splits a getattribute style search field into its database part.
+
+    Returns (path, field, model, attr, many): the field lookup path, the
+    concrete field it ends on or None when it ends on a relation or a
+    computed attribute, the model of the attr, the remaining computed attr
+    and whether the path crosses a multi valued relation.
+    """
+    parts = search_field.split("__")
+    path = []
+    many = False
+    for index, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            field = None
+        if field is None or (field.is_relation and field.related_model is None):
+            return "__".join(path), None, model, "__".join(parts[index:]), many
+        if field.is_relation:
+            path.append(part)
+            many = many or field.many_to_many or field.one_to_many
+            model = field.related_model
+        elif index == len(parts) - 1:
+            path.append(part)
+            return "__".join(path), field, model, "", many
+        else:
+            return "__".join(path), None, model, "__".join(parts[index:]), many
+    return "__".join(path), None, model, "", many
+
+
+def python_search_lookup(queryset, path, model, attr, search):
+    """
+    Returns the lookup of the records whose computed attribute contains the
+    search, evaluated on the distinct related records of the path, or the
+    records themselves, in batches of SEARCH_BATCH_SIZE
+    """
+    records = queryset
+    if path:
+        records = model._base_manager.filter(pk__in=queryset.values(path))
+    ids = [
+        record.pk
+        for record in records.iterator(chunk_size=SEARCH_BATCH_SIZE)
+        if search in str(getattribute(record, attr) if attr else record).lower()
+    ]
+    return {f"{path}__in" if path else "pk__in": ids}
+
+
+def search_queryset(queryset, search_field, search):
+    """
+    Filters the queryset by the text of the search field containing search.
+
+    Text fields are searched with icontains, other fields on their text cast,
+    get_<field>_display on the matching choices and the attributes listed in
+    the search_concat_fields of the model on the concatenation of their
+    fields. Other computed attributes are evaluated in Python.
+    """
+    path, field, model, attr, many = resolve_search_field(queryset.model, search_field)
+    lookup = "unaccent__icontains" if SEARCH_UNACCENT else "icontains"
+    prefix = f"{path}__" if path else ""
+    concat_fields = getattr(model, "search_concat_fields", {}).get(attr or "__str__")
+    choice_field = None
+    if attr.startswith("get_") and attr.endswith("_display"):
+        try:
+            choice_field = model._meta.get_field(attr[4:-8])
+        except FieldDoesNotExist:
+            pass
+    records = queryset.model._base_manager.all() if many else queryset
+
+    if field is not None and isinstance(field, models.BooleanField):
+        values = [value for value in (True, False) if search in str(value).lower()]
+        records = records.filter(**{f"{path}__in": values})
+    elif field is not None and isinstance(field, (models.CharField, models.TextField)):
+        records = records.filter(**{f"{path}__{lookup}": search})
+    elif field is not None:
+        records = records.alias(
+            horilla_search_text=Cast(path, output_field=models.CharField())
+        ).filter(**{f"horilla_search_text__{lookup}": search})
+    elif concat_fields:
+        expressions = []
+        for concat_field in concat_fields:
+            expressions += [models.F(f"{prefix}{concat_field}"), models.Value(" ")]
+        records = records.alias(
+            horilla_search_text=Concat(
+                *expressions[:-1], output_field=models.CharField()
+            )
+        ).filter(**{f"horilla_search_text__{lookup}": search})
+    elif choice_field is not None and choice_field.choices:
+        values = [
+            value
+            for value, label in choice_field.flatchoices
+            if search in str(label).lower()
+        ]
+        records = records.filter(**{f"{prefix}{choice_field.name}__in": values})
+    else:
+        records = records.filter(
+            **python_search_lookup(queryset, path, model, attr, search)
+        )
+
+    if many:
+        # Filtering across a multi valued relation would repeat the records
+        return queryset.filter(pk__in=records.values("pk"))
+    return records
+
+
 class FilterSet(django_filters.FilterSet):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -121,14 +235,8 @@ class HorillaFilterSet(FilterSet):
         """
         Search in generic method for filter field
         """
-        search = self.data.get("search", "")
+        search = self.data.get("search", "").lower()
         search_field = self.data.get("search_field")
         if not search_field:
             search_field = self.filters[name].field_name
-
-        def _icontains(instance):
-            result = str(getattribute(instance, search_field)).lower()
-            return instance.pk if search in result else None
-
-        ids = list(filter(None, map(_icontains, queryset)))
-        return queryset.filter(id__in=ids)
+        return search_queryset(queryset, search_field, search)
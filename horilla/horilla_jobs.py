@@ -0,0 +1,238 @@
+"""
+horilla_jobs.py
+
+Registry and runner of horilla's scheduled jobs.
+
+Apps register their periodic tasks in their scheduler.py module with
+``register_job``. Nothing is scheduled inside the web workers, the jobs are
+executed by ``python manage.py run_horilla_jobs``. Every runner process
+competes for a leader lease stored in the HorillaJob table and only the leader
+executes the schedules. Each run also claims the job's own row, so a job never
+runs twice at once even while the leadership moves between runners.
+"""
+
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+from importlib import import_module
+from importlib.util import find_spec
+
+from django.apps import apps
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+LEADER_JOB = "horilla_jobs.leader"
+LEADER_LEASE = 60
+DEFAULT_LOCK_TIMEOUT = 60 * 60
+
+JOBS = {}
+
+
+class RegisteredJob:
+    """
+    A job function with its APScheduler trigger
+    """
+
+    def __init__(self, job_id, func, trigger, lock_timeout, run_on_start, options):
+        self.id = job_id
+        self.func = func
+        self.trigger = trigger
+        self.lock_timeout = lock_timeout
+        self.run_on_start = run_on_start
+        self.options = options
+
+    def __repr__(self):
+        return f"<RegisteredJob {self.id}>"
+
+
+def register_job(
+    func,
+    trigger,
+    job_id=None,
+    lock_timeout=DEFAULT_LOCK_TIMEOUT,
+    run_on_start=False,
+    **options,
+):
+    """
+    Registers a scheduled job.
+
+    Args:
+        func: the job function, called without arguments
+        trigger: APScheduler trigger name or instance ("interval", "cron", ...)
+        job_id: unique id of the job, defaults to "<module>.<function>"
+        lock_timeout: seconds after which the claim of a crashed run expires
+        run_on_start: also run the job as soon as the runner starts
+        options: trigger arguments and APScheduler add_job options
+    """
+    job_id = job_id or f"{func.__module__}.{func.__name__}"
+    JOBS[job_id] = RegisteredJob(
+        job_id, func, trigger, lock_timeout, run_on_start, options
+    )
+    return func
+
+
+def autodiscover_jobs():
+    """
+    Imports the scheduler module of every installed app so their jobs register
+    """
+    for app_config in apps.get_app_configs():
+        module_name = f"{app_config.name}.scheduler"
+        if find_spec(module_name) is not None:
+            import_module(module_name)
+    return JOBS
+
+
+def get_runner_id():
+    """
+    Returns the identity of this runner process
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim(name, runner_id, seconds, renew=False):
+    """
+    Claims the HorillaJob row for the given seconds, returns True on success.
+
+    The claim is a single conditional UPDATE, so only one process can win it
+    while the previous claim is still valid.
+    """
+    from base.models import HorillaJob
+
+    now = timezone.now()
+    HorillaJob.objects.get_or_create(name=name)
+    free = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    if renew:
+        free |= Q(locked_by=runner_id)
+    return bool(
+        HorillaJob.objects.filter(free, name=name).update(
+            locked_by=runner_id, locked_until=now + timedelta(seconds=seconds)
+        )
+    )
+
+
+def release(name, runner_id):
+    """
+    Releases the claim of the runner on the HorillaJob row
+    """
+    from base.models import HorillaJob
+
+    HorillaJob.objects.filter(name=name, locked_by=runner_id).update(
+        locked_by="", locked_until=None
+    )
+
+
+def run_job(job, runner_id):
+    """
+    Runs the job once if its row can be claimed and records the run metrics.
+    Returns False when another runner holds the job.
+    """
+    from base.models import HorillaJob
+
+    close_old_connections()
+    if not claim(job.id, runner_id, job.lock_timeout):
+        logger.info("Skipping %s, it is running on another runner", job.id)
+        return False
+    started_at = timezone.now()
+    HorillaJob.objects.filter(name=job.id).update(last_started_at=started_at)
+    start = time.monotonic()
+    error = ""
+    try:
+        job.func()
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception("Scheduled job %s failed", job.id)
+    finally:
+        close_old_connections()
+        HorillaJob.objects.filter(name=job.id, locked_by=runner_id).update(
+            locked_by="",
+            locked_until=None,
+            last_finished_at=timezone.now(),
+            last_duration=time.monotonic() - start,
+            last_error=error,
+            run_count=F("run_count") + 1,
+            failure_count=F("failure_count") + (1 if error else 0),
+        )
+    return True
+
+
+class JobRunner:
+    """
+    Runs the registered jobs on an APScheduler scheduler while this process
+    holds the leader lease
+    """
+
+    def __init__(self, jobs=None, runner_id=None, lease=LEADER_LEASE):
+        self.jobs = jobs if jobs is not None else autodiscover_jobs()
+        self.runner_id = runner_id or get_runner_id()
+        self.lease = lease
+        self.is_leader = False
+        self.scheduler = None
+
+    def renew_leadership(self):
+        """
+        Takes or renews the leader lease, returns True while this runner leads
+        """
+        try:
+            is_leader = claim(LEADER_JOB, self.runner_id, self.lease, renew=True)
+        except Exception:
+            logger.exception("Could not renew the job runner lease")
+            is_leader = False
+        if is_leader != self.is_leader:
+            logger.info(
+                "%s %s the job runner leadership",
+                self.runner_id,
+                "took" if is_leader else "lost",
+            )
+        self.is_leader = is_leader
+        return is_leader
+
+    def execute(self, job):
+        """
+        Scheduler entry point of every job, only the leader runs it
+        """
+        if self.is_leader:
+            run_job(job, self.runner_id)
+
+    def start(self):
+        """
+        Registers every job on a background scheduler and starts it
+        """
+        import pytz
+        from apscheduler.schedulers.background import BackgroundScheduler
+        from django.conf import settings
+
+        self.scheduler = BackgroundScheduler(timezone=pytz.timezone(settings.TIME_ZONE))
+        for job in self.jobs.values():
+            options = dict(job.options)
+            if job.run_on_start:
+                options["next_run_time"] = datetime.now(self.scheduler.timezone)
+            self.scheduler.add_job(
+                self.execute,
+                job.trigger,
+                args=[job],
+                id=job.id,
+                replace_existing=True,
+                **options,
+            )
+        self.scheduler.start()
+
+    def run_forever(self):
+        """
+        Keeps renewing the leader lease until interrupted
+        """
+        self.renew_leadership()
+        self.start()
+        try:
+            while True:
+                time.sleep(self.lease / 3)
+                close_old_connections()
+                self.renew_leadership()
+        finally:
+            self.scheduler.shutdown(wait=False)
+            release(LEADER_JOB, self.runner_id)
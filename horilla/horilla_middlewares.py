@@ -9,11 +9,13 @@ import threading
 from django.http import HttpResponseNotAllowed
 from django.shortcuts import render
 
-from horilla.settings import MIDDLEWARE
+from horilla.settings import DEBUG, MIDDLEWARE
 
 MIDDLEWARE.append("base.middleware.CompanyMiddleware")
 MIDDLEWARE.append("horilla.horilla_middlewares.MethodNotAllowedMiddleware")
 MIDDLEWARE.append("horilla.horilla_middlewares.ThreadLocalMiddleware")
+if DEBUG:
+    MIDDLEWARE.append("base.middleware.CompanyManagerQueryCountMiddleware")
 MIDDLEWARE.append("accessibility.middlewares.AccessibilityMiddleware")
 MIDDLEWARE.append("base.middleware.ForcePasswordChangeMiddleware")
 MIDDLEWARE.append("base.middleware.TwoFactorAuthMiddleware")
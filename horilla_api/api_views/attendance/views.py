@@ -68,7 +68,9 @@ class ClockInAPIView(APIView):
         print("========", request.user.employee_get.check_online())
         if not request.user.employee_get.check_online():
             try:
-                if request.user.employee_get.get_company().geo_fencing.start:
+                from geofencing.fences import geofencing_enabled
+
+                if geofencing_enabled(request.user.employee_get.get_company()):
                     from geofencing.views import GeoFencingEmployeeLocationCheckAPIView
 
                     location_api_view = GeoFencingEmployeeLocationCheckAPIView()
@@ -148,7 +150,9 @@ class ClockOutAPIView(APIView):
     def post(self, request):
 
         try:
-            if request.user.employee_get.get_company().geo_fencing.start:
+            from geofencing.fences import geofencing_enabled
+
+            if geofencing_enabled(request.user.employee_get.get_company()):
                 from geofencing.views import GeoFencingEmployeeLocationCheckAPIView
 
                 location_api_view = GeoFencingEmployeeLocationCheckAPIView()
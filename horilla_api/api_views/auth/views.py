@@ -23,7 +23,9 @@ class LoginAPIView(APIView):
                 except:
                     pass
                 try:
-                    geo_fencing = employee.get_company().geo_fencing.start
+                    from geofencing.fences import geofencing_enabled
+
+                    geo_fencing = geofencing_enabled(employee.get_company())
                 except:
                     pass
                 try:
@@ -4,10 +4,11 @@ methods.py
 This module is used to write methods related to the history
 """
 
-from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
 from django.core.paginator import Paginator
 from django.db import models
 from django.shortcuts import render
+from simple_history.models import ModelChange
 
 from horilla.decorators import apply_decorators
 
@@ -73,23 +74,51 @@ def filter_history(histories, track_fields):
     return histories
 
 
+def history_changes(new_record, old_record):
+    """
+    Returns the changes between two history rows of an instance, from the
+    change set stored with the newer row
+    """
+    field_names = getattr(new_record, "history_changes", None)
+    if field_names is None:
+        # Rows recorded before the change sets were stored are not backfilled,
+        # they are compared field by field as before
+        return new_record.diff_against(old_record).changes
+    changes = []
+    for field_name in field_names:
+        try:
+            field = new_record._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            # A field of the change set was dropped since, compare the rows
+            return new_record.diff_against(old_record).changes
+        changes.append(
+            ModelChange(
+                field_name,
+                field.value_from_object(old_record),
+                field.value_from_object(new_record),
+            )
+        )
+    return changes
+
+
 def get_diff(instance):
     """
     This method is used to find the differences in the history
     """
-    remove_duplicate_history(instance)
-    history = instance.history_set.all()
-    history_list = list(history)
+    history_list = list(
+        instance.history_set.select_related("history_user__employee_get")
+    )
     pairs = [
         [history_list[i], history_list[i + 1]] for i in range(len(history_list) - 1)
     ]
     delta_changes = []
-    create_history = history.filter(history_type="+").first()
+    create_history = next(
+        (history for history in history_list if history.history_type == "+"), None
+    )
+    class_name = instance.__class__
     for pair in pairs:
-        delta = pair[0].diff_against(pair[1])
         diffs = []
-        class_name = pair[0].instance.__class__
-        for change in delta.changes:
+        for change in history_changes(pair[0], pair[1]):
             old = change.old
             new = change.new
             field = instance._meta.get_field(change.field)
@@ -116,11 +145,13 @@ def get_diff(instance):
                     "new": new,
                 }
             )
-        updated_by = (
-            User.objects.get(id=pair[0].history_user.id).employee_get
-            if pair[0].history_user
-            else Bot()
-        )
+        if not diffs:
+            # Duplicate row recorded before the write time de-duplication
+            continue
+        try:
+            updated_by = pair[0].history_user.employee_get
+        except:
+            updated_by = Bot()
         delta_changes.append(
             {
                 "type": "Changes",
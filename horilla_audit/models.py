@@ -19,7 +19,6 @@ from simple_history.signals import (  # pre_create_historical_m2m_records,; post
 
 # from employee.models import Employee
 from horilla.models import HorillaModel
-from horilla_audit.methods import remove_duplicate_history
 
 # Create your models here.
 
@@ -65,16 +64,58 @@ class HorillaAuditInfo(models.Model):
 class HorillaAuditLog(HistoricalRecords):
     """
     Model to store additional information for historical records.
+
+    Changes are detected before the history row is written, against the last
+    history row of the instance. Saves without changes of the tracked fields
+    are not recorded and the changed fields are stored with the row, so the
+    history views do not diff the records again.
     """
 
     # def __init__(self, *args, bases=None, **kwargs):
     #     super(HorillaAuditLog, self).__init__(*args, **kwargs)
     #     self.is_horilla_audit_log = True
 
-    pass
-
     # history_comments = models.ManyToManyField("HistoryComment", blank=True)
 
+    def get_extra_fields(self, model, fields):
+        extra_fields = super().get_extra_fields(model, fields)
+        extra_fields["history_changes"] = models.JSONField(
+            null=True, blank=True, editable=False
+        )
+        return extra_fields
+
+    def changed_fields(self, instance):
+        """
+        Returns the names of the tracked fields changed since the last history
+        row of the instance, None when the instance has no history yet
+        """
+        last_record = (
+            getattr(instance, self.manager_name)
+            .order_by("-history_date", "-history_id")
+            .first()
+        )
+        if last_record is None:
+            return None
+        return sorted(
+            field.name
+            for field in self.fields_included(instance)
+            if field.editable
+            and field.value_from_object(instance)
+            != field.value_from_object(last_record)
+        )
+
+    def create_historical_record(self, instance, history_type, using=None):
+        changes = None
+        if history_type == "~":
+            changes = self.changed_fields(instance)
+            if changes == []:
+                return
+        instance._history_changes = changes
+        try:
+            super().create_historical_record(instance, history_type, using=using)
+        finally:
+            del instance._history_changes
+
 
 @receiver(pre_create_historical_record)
 def pre_create_horilla_audit_log(sender, instance, *args, **kwargs):
@@ -83,6 +124,7 @@ def pre_create_horilla_audit_log(sender, instance, *args, **kwargs):
     """
     try:
         history_instance = kwargs["history_instance"]
+        history_instance.history_changes = getattr(instance, "_history_changes", None)
         history_instance.history_title = HistoricalRecords.thread.request.POST.get(
             "history_title"
         )
@@ -111,7 +153,6 @@ def post_create_horilla_audit_log(sender, instance, *_args, **kwargs):
         )
         if isinstance(history_instance, HorillaAuditLog):
             history_instance.history_title = "Demo Title"
-            remove_duplicate_history(instance)
             if instance.skip_history:
                 instance.history_set.filter(pk=history_instance.pk).delete()
             kwargs["history_instance"] = None
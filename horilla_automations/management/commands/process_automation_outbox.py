@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from horilla_automations.methods.outbox import BATCH_SIZE, process_automation_outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver the pending mail automations of the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Number of outbox rows claimed and sent over one connection",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep polling the outbox every INTERVAL seconds instead of exiting",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_automation_outbox(options["batch_size"])
+            if not options["interval"]:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Processed {processed} outbox rows.")
+                )
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,427 @@
+"""
+horilla_automations/methods/outbox.py
+
+Delivery of the mail automations through the AutomationOutbox table.
+
+The signal handlers only write an outbox row per triggered automation, in the
+transaction of the change, with the values of the fields referenced by the
+automation conditions before and after it. The rows are delivered here, by a
+bounded in-process worker pool woken when the change commits, by the
+``process_automation_outbox`` command and by the scheduled retry job. Every
+batch claims its rows with a conditional UPDATE and sends its mails over one
+SMTP connection per mail configuration. Failed deliveries are retried with an
+exponential backoff.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from bs4 import BeautifulSoup
+from django import template
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections as db_connections
+from django.db import models
+from django.db.models import Q
+from django.http import HttpRequest
+from django.utils import timezone
+
+from horilla.horilla_middlewares import _thread_locals
+from notifications.signals import notify
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 60
+CLAIM_TIMEOUT = 10 * 60
+# m2m fields are saved after the instance, give them a moment before rendering
+SETTLE_DELAY = 0.1
+OUTBOX_WORKERS = getattr(settings, "AUTOMATION_OUTBOX_WORKERS", 2)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending_drains = threading.Semaphore(OUTBOX_WORKERS or 1)
+
+
+def automation_applicable(query_strings, values):
+    """
+    Evaluates the automation conditions on the snapshot of the record values
+    """
+    from horilla_automations.methods.methods import evaluate_condition, operator_map
+
+    applicable = False
+    and_exists = False
+    false_exists = False
+    for condition in query_strings:
+        if condition.getlist("condition"):
+            attr = condition.getlist("condition")[0]
+            operator = condition.getlist("condition")[1]
+            value = condition.getlist("condition")[2]
+
+            if value == "on":
+                value = True
+            elif value == "off":
+                value = False
+            instance_value = values.get(attr)
+
+            if not condition.get("logic"):
+                applicable = evaluate_condition(instance_value, operator, value)
+            logic = condition.get("logic")
+            if logic:
+                applicable = operator_map[logic](
+                    applicable,
+                    evaluate_condition(instance_value, operator, value),
+                )
+            if not applicable:
+                false_exists = True
+            if logic == "and":
+                and_exists = True
+            if false_exists and and_exists:
+                applicable = False
+                break
+    return applicable
+
+
+def outbox_request(user):
+    """
+    Returns a request standing for the user who triggered the automation, the
+    mail configuration and the templates are resolved through it
+    """
+    request = HttpRequest()
+    request.user = user or AnonymousUser()
+    request.session = {}
+    request.is_filtering = False
+    return request
+
+
+def send_mail(request, automation, instance, connection=None):
+    """
+    mail sending method, raises when the mail could not be delivered
+    """
+    from base.methods import eval_validate, generate_pdf
+    from employee.models import Employee
+    from horilla_automations.methods.methods import (
+        get_model_class,
+        get_related_field_model,
+    )
+    from horilla_views.templatetags.generic_template_filters import getattribute
+
+    mail_template = automation.mail_template
+    employees = []
+    to_emails = []
+
+    pk_or_text = getattribute(instance, automation.mail_details)
+    model_class = get_model_class(automation.model)
+    model_class = get_related_field_model(model_class, automation.mail_details)
+    context_instance = None
+    if isinstance(pk_or_text, int):
+        context_instance = model_class.objects.filter(pk=pk_or_text).first()
+
+    for mapping in eval_validate(automation.mail_to):
+        result = getattribute(instance, mapping)
+        if isinstance(result, list):
+            to_emails.extend(result)
+        else:
+            to_emails.append(result)
+
+    to_emails = list(filter(None, set(to_emails)))
+
+    employees = Employee.objects.filter(
+        models.Q(email__in=to_emails)
+        | models.Q(employee_work_info__email__in=to_emails)
+    ).select_related("employee_work_info")
+
+    employees = list(employees)
+    also_sent_to = []
+    try:
+        also_sent_to = automation.also_sent_to.select_related(
+            "employee_work_info"
+        ).all()
+        if also_sent_to.exists():
+            employees.extend(emp for emp in also_sent_to if emp)
+    except Exception as e:
+        logger.error(e)
+
+    cc_emails = [str(emp.get_mail()) for emp in also_sent_to if emp and emp.get_mail()]
+    user_ids = [emp.employee_user_id for emp in employees]
+
+    to = to_emails
+    cc = cc_emails
+
+    connection = connection or get_connection()
+    default_email = getattr(
+        connection,
+        "dynamic_from_email_with_display_name",
+        settings.DEFAULT_FROM_EMAIL,
+    )
+
+    from_email = default_email
+    reply_to = [default_email]
+
+    if request and hasattr(request, "user") and hasattr(request.user, "employee_get"):
+        try:
+            user = request.user.employee_get
+            display_email_name = f"{user.get_full_name()} <{user.email}>"
+            from_email = display_email_name
+            reply_to = [display_email_name]
+        except Exception as e:
+            logger.error(f"Error generating user-based email display name: {e}")
+
+    if not (pk_or_text and request and to_emails):
+        return False
+    attachments = []
+    try:
+        sender = request.user.employee_get
+    except:
+        sender = None
+    if context_instance:
+        if template_attachments := automation.template_attachments.all():
+            for template_attachment in template_attachments:
+                template_bdy = template.Template(template_attachment.body)
+                context = template.Context(
+                    {
+                        "instance": context_instance,
+                        "self": sender,
+                        "model_instance": instance,
+                        "request": request,
+                    }
+                )
+                render_bdy = template_bdy.render(context)
+                attachments.append(
+                    (
+                        "Document",
+                        generate_pdf(
+                            render_bdy, {}, path=False, title="Document"
+                        ).content,
+                        "application/pdf",
+                    )
+                )
+
+        template_bdy = template.Template(mail_template.body)
+    else:
+        template_bdy = template.Template(pk_or_text)
+    context = template.Context(
+        {
+            "instance": context_instance,
+            "self": sender,
+            "model_instance": instance,
+            "request": request,
+        }
+    )
+    render_bdy = template_bdy.render(context)
+
+    title_template = template.Template(automation.title)
+    title_context = template.Context(
+        {"instance": instance, "self": sender, "request": request}
+    )
+    render_title = title_template.render(title_context)
+    soup = BeautifulSoup(render_bdy, "html.parser")
+    plain_text = soup.get_text(separator="\n")
+
+    if automation.delivery_channel != "notification":
+        email = EmailMessage(
+            subject=render_title,
+            body=render_bdy,
+            to=to,
+            cc=cc,
+            from_email=from_email,
+            reply_to=reply_to,
+            connection=connection,
+        )
+        email.content_subtype = "html"
+        email.attachments = attachments
+        if not connection.send_messages([email]):
+            raise RuntimeError(f"The mail of the automation {automation} was not sent")
+        logger.info(
+            f"Automation <Mail> {automation.title} is triggered by {request.user}"
+        )
+
+    if automation.delivery_channel != "email":
+        notify.send(
+            sender,
+            recipient=user_ids,
+            verb=f"{plain_text}",
+            icon="person-remove",
+            redirect="",
+        )
+        logger.info(
+            f"Automation <Notification> {automation.title} is triggered by {request.user}"
+        )
+    logger.info(
+        f"Automation Triggered | {automation.get_delivery_channel_display()} | {automation}"
+    )
+    return True
+
+
+def claim_outbox_batch(batch_size=BATCH_SIZE):
+    """
+    Claims up to batch_size due outbox rows for this worker and returns them
+    """
+    from horilla_automations.models import AutomationOutbox
+
+    now = timezone.now()
+    due = Q(status="pending", next_attempt_at__lte=now) | Q(
+        status="processing", locked_until__lt=now
+    )
+    ids = list(
+        AutomationOutbox.objects.filter(due)
+        .order_by("id")
+        .values_list("id", flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    AutomationOutbox.objects.filter(due, id__in=ids).update(
+        status="processing",
+        locked_by=token,
+        locked_until=now + timedelta(seconds=CLAIM_TIMEOUT),
+    )
+    return list(
+        AutomationOutbox.objects.filter(locked_by=token, status="processing")
+        .select_related("automation__mail_template", "triggered_by")
+        .order_by("id")
+    )
+
+
+def deliver_outbox_entry(entry, connections):
+    """
+    Evaluates the automation of the outbox row and sends its mail, returns the
+    final status of the row
+    """
+    from horilla_automations.methods.methods import (
+        get_model_class,
+        split_query_string,
+    )
+
+    automation = entry.automation
+    if not automation.is_active:
+        return "skipped"
+    query_strings = split_query_string(
+        automation.condition_querystring.replace("automation_multiple_", "")
+    )
+    if not automation_applicable(query_strings, entry.current_values):
+        return "skipped"
+    if not (
+        (entry.created and automation.trigger == "on_create")
+        or (
+            automation.trigger == "on_update"
+            and entry.previous_values != entry.current_values
+        )
+    ):
+        return "skipped"
+
+    instance = (
+        get_model_class(automation.model)._base_manager.filter(pk=entry.object_pk)
+    ).first()
+    if instance is None:
+        return "skipped"
+
+    request = outbox_request(entry.triggered_by)
+    previous_request = getattr(_thread_locals, "request", None)
+    _thread_locals.request = request
+    try:
+        company = None
+        if getattr(entry.triggered_by, "employee_get", None):
+            company = entry.triggered_by.employee_get.get_company()
+        key = getattr(company, "pk", None)
+        if key not in connections:
+            connections[key] = get_connection()
+            connections[key].open()
+        sent = send_mail(request, automation, instance, connections[key])
+    finally:
+        _thread_locals.request = previous_request
+    return "sent" if sent else "skipped"
+
+
+def process_outbox_batch(batch_size=BATCH_SIZE):
+    """
+    Delivers one claimed batch of the outbox, returns the number of rows
+    """
+    from horilla_automations.models import AutomationOutbox
+
+    entries = claim_outbox_batch(batch_size)
+    connections = {}
+    try:
+        for entry in entries:
+            now = timezone.now()
+            try:
+                status = deliver_outbox_entry(entry, connections)
+                error = ""
+            except Exception:
+                logger.exception("Mail automation outbox row %s failed", entry.pk)
+                error = traceback.format_exc()
+                attempts = entry.attempts + 1
+                status = "failed" if attempts >= MAX_ATTEMPTS else "pending"
+                AutomationOutbox.objects.filter(pk=entry.pk).update(
+                    status=status,
+                    attempts=attempts,
+                    next_attempt_at=now
+                    + timedelta(seconds=RETRY_DELAY * 2 ** (attempts - 1)),
+                    locked_by="",
+                    locked_until=None,
+                    last_error=error,
+                )
+                continue
+            AutomationOutbox.objects.filter(pk=entry.pk).update(
+                status=status,
+                attempts=entry.attempts + 1,
+                locked_by="",
+                locked_until=None,
+                last_error=error,
+                processed_at=now,
+            )
+    finally:
+        for connection in connections.values():
+            try:
+                connection.close()
+            except Exception:
+                logger.exception("Could not close the mail connection")
+    return len(entries)
+
+
+def process_automation_outbox(batch_size=BATCH_SIZE):
+    """
+    Delivers every due row of the outbox, batch after batch
+    """
+    total = 0
+    while True:
+        processed = process_outbox_batch(batch_size)
+        total += processed
+        if processed < batch_size:
+            return total
+
+
+def _drain_outbox():
+    _pending_drains.release()
+    try:
+        time.sleep(SETTLE_DELAY)
+        process_automation_outbox()
+    except Exception:
+        logger.exception("Mail automation outbox worker failed")
+    finally:
+        db_connections.close_all()
+
+
+def wake_outbox_worker():
+    """
+    Schedules a drain of the outbox on the in-process worker pool. At most one
+    drain per worker waits in the queue, the running ones pick up the new rows.
+    """
+    global _executor
+    if not OUTBOX_WORKERS or not _pending_drains.acquire(blocking=False):
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=OUTBOX_WORKERS, thread_name_prefix="automation-outbox"
+            )
+    _executor.submit(_drain_outbox)
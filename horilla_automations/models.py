@@ -1,5 +1,7 @@
+from django.contrib.auth.models import User
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _trans
 
 from base.methods import eval_validate
@@ -143,3 +145,46 @@ class MailAutomation(HorillaModel):
     def trigger_display(self):
         """"""
         return self.get_trigger_display()
+
+
+class AutomationOutbox(models.Model):
+    """
+    A change of a record that may trigger a mail automation, written in the
+    transaction of the change and delivered by the outbox workers
+    """
+
+    STATUS = [
+        ("pending", "Pending"),
+        ("processing", "Processing"),
+        ("sent", "Sent"),
+        ("skipped", "Skipped"),
+        ("failed", "Failed"),
+    ]
+
+    automation = models.ForeignKey(
+        MailAutomation, on_delete=models.CASCADE, related_name="outbox"
+    )
+    object_pk = models.CharField(max_length=64)
+    created = models.BooleanField(default=False)
+    # Values of the fields referenced by the automation conditions
+    previous_values = models.JSONField(default=dict)
+    current_values = models.JSONField(default=dict)
+    triggered_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    status = models.CharField(max_length=20, choices=STATUS, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=150, blank=True, default="")
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    objects = models.Manager()
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return f"{self.automation} | {self.object_pk} | {self.status}"
@@ -0,0 +1,13 @@
+from horilla.horilla_jobs import register_job
+
+
+def retry_automation_outbox():
+    """
+    Delivers the outbox rows left by failed deliveries or stopped workers
+    """
+    from horilla_automations.methods.outbox import process_automation_outbox
+
+    process_automation_outbox()
+
+
+register_job(retry_automation_outbox, "interval", minutes=1)
@@ -2,6 +2,8 @@
 horilla/cbv_methods.py
 """
 
+import copy
+import hashlib
 import json
 import types
 import uuid
@@ -10,17 +12,19 @@ from typing import Any
 from urllib.parse import urlencode
 from venv import logger
 
+from bs4 import BeautifulSoup
 from django import forms, template
 from django.contrib import messages
 from django.core.cache import cache as CACHE
 from django.core.paginator import Page, Paginator
 from django.db import models
+from django.db.models import Q
 from django.db.models.fields.related import ForeignKey
 from django.db.models.fields.related_descriptors import (
     ForwardManyToOneDescriptor,
     ReverseOneToOneDescriptor,
 )
-from django.http import HttpResponse
+from django.http import HttpResponse, QueryDict
 from django.middleware.csrf import get_token
 from django.shortcuts import redirect, render
 from django.template import loader
@@ -29,6 +33,7 @@ from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils.functional import lazy
 from django.utils.html import format_html
+from django.utils.module_loading import import_string
 from django.utils.safestring import SafeString
 from django.utils.translation import gettext_lazy as _
 from openpyxl import Workbook
@@ -260,16 +265,23 @@ def csrf_token(context):
     return csrf_input_lazy(request)
 
 
+_context_processors = []
+
+
 def get_all_context_variables(request) -> dict:
     """
     This method will return dictionary format of context processors
     """
     if getattr(request, "all_context_variables", None) is None:
         all_context_variables = {}
-        for processor_path in settings.TEMPLATES[0]["OPTIONS"]["context_processors"]:
-            module_path, func_name = processor_path.rsplit(".", 1)
-            module = __import__(module_path, fromlist=[func_name])
-            func = getattr(module, func_name)
+        if not _context_processors:
+            _context_processors.extend(
+                import_string(processor_path)
+                for processor_path in settings.TEMPLATES[0]["OPTIONS"][
+                    "context_processors"
+                ]
+            )
+        for func in _context_processors:
             context = func(request)
             all_context_variables.update(context)
         all_context_variables["csrf_token"] = csrf_token(all_context_variables)
@@ -290,11 +302,11 @@ def render_template(
 
     request = getattr(_thread_locals, "request", None)
     context.update(get_all_context_variables(request))
-    template_loader = loader.get_template(path)
-    template_body = template_loader.template.source
-    template_bdy = template.Template(template_body)
+    # The cached template loader keeps the compiled template of each path
+    # (reloaded on change while DEBUG), render it instead of parsing again
+    compiled_template = loader.get_template(path).template
     context_instance = template.Context(context)
-    rendered_content = template_bdy.render(context_instance)
+    rendered_content = compiled_template.render(context_instance)
     return HttpResponse(rendered_content, status=status).content.decode(decoding)
 
 
@@ -440,6 +452,196 @@ def update_saved_filter_cache(request, cache):
     return cache
 
 
+class OrderedNavigation:
+    """
+    Previous/next navigation over the filtered and sorted records of a list.
+
+    The list stores the filter and sort parameters of its query in the
+    session, the detail views rebuild the query from them and look up the
+    neighbours of a record with keyset queries instead of walking a list of
+    every id.
+    """
+
+    def __init__(self, signature, queryset, keys):
+        self.signature = signature
+        self.queryset = queryset
+        self.keys = keys
+
+    def _adjacent(self, values, forward):
+        condition = Q(pk__in=[])
+        equal = Q()
+        for name, descending in self.keys:
+            value = values[name]
+            if descending == forward:
+                after = (
+                    Q(**{f"{name}__isnull": False})
+                    if value is None
+                    else Q(**{f"{name}__lt": value})
+                )
+            else:
+                # Nulls sort as the largest value, nothing comes after them
+                after = (
+                    Q(pk__in=[])
+                    if value is None
+                    else Q(**{f"{name}__gt": value}) | Q(**{f"{name}__isnull": True})
+                )
+            condition |= equal & after
+            equal &= (
+                Q(**{f"{name}__isnull": True}) if value is None else Q(**{name: value})
+            )
+        queryset = self.queryset if forward else self.queryset.reverse()
+        pk = queryset.filter(condition).values_list("pk", flat=True).first()
+        if pk is None:
+            # Wrap around the ends of the list
+            pk = queryset.values_list("pk", flat=True).first()
+        return pk
+
+    def adjacent_ids(self, pk):
+        """
+        Returns the (previous_id, next_id) of the record, None when the record
+        is not in the list
+        """
+        values = (
+            self.queryset.filter(pk=pk).values(*[name for name, _ in self.keys]).first()
+        )
+        if values is None:
+            return None
+        return self._adjacent(values, False), self._adjacent(values, True)
+
+
+def _navigation_keys(queryset, sort_key=None, sort_order="asc"):
+    """
+    Returns the (expression, descending) keys ordering the queryset, the sort
+    key first and the primary key last
+    """
+    keys = []
+    if sort_key:
+        keys.append((models.F(sort_key), sort_order == "desc"))
+    ordering = queryset.query.order_by or (
+        queryset.query.get_meta().ordering if queryset.query.default_ordering else []
+    )
+    for item in ordering:
+        if isinstance(item, str):
+            if item == "?":
+                continue
+            keys.append((models.F(item.lstrip("-")), item.startswith("-")))
+        elif isinstance(item, models.OrderBy):
+            keys.append((item.expression, item.descending))
+        elif hasattr(item, "resolve_expression"):
+            keys.append((item, False))
+    keys.append((models.F("pk"), False))
+    return keys
+
+
+def _ordered_queryset(queryset, sort_key=None, sort_order="asc"):
+    """
+    Returns the queryset annotated with its navigation keys and ordered by
+    them, with the (name, descending) of the keys
+    """
+    annotations = {}
+    ordering = []
+    names = []
+    for index, (expression, descending) in enumerate(
+        _navigation_keys(queryset, sort_key, sort_order)
+    ):
+        name = f"_nav_{index}"
+        annotations[name] = expression
+        names.append((name, descending))
+        ordering.append(
+            models.F(name).desc(nulls_first=True)
+            if descending
+            else models.F(name).asc(nulls_last=True)
+        )
+    return queryset.annotate(**annotations).order_by(*ordering), names
+
+
+def _view_queryset(stored):
+    """
+    Returns the queryset of the list from the parameters stored by
+    remember_ordered_queryset, built by the list view's own get_queryset
+    """
+    current = getattr(_thread_locals, "request", None)
+    if current is None:
+        return None
+    request = copy.copy(current)
+    request.GET = QueryDict(stored["query"])
+    request.POST = QueryDict()
+    request.path = request.path_info = stored["path"]
+    view = import_string(stored["view"])()
+    view.setup(request, **stored["kwargs"])
+    queryset = view.get_queryset()
+    return queryset if isinstance(queryset, models.QuerySet) else None
+
+
+def remember_ordered_queryset(
+    view, queryset, sort_key: str = None, sort_order: str = "asc"
+):
+    """
+    Stores the parameters the list view built its queryset from in the session
+    under the view's ordered_ids_key, get_ordered_navigation rebuilds the
+    ordered query from them in any process
+
+    Args:
+        view: the list view, its get_queryset rebuilds the list
+        queryset: filtered queryset of the list before pagination
+        sort_key: field path the list is sorted by, if any
+        sort_order: "asc" or "desc"
+    """
+    request = view.request
+    key = view.ordered_ids_key
+    if not isinstance(queryset, models.QuerySet):
+        request.session.pop(key, None)
+        return None
+    if sort_key and isinstance(
+        getmodelattribute(queryset.model, sort_key), types.FunctionType
+    ):
+        # Sorted by a python method, navigate in the filtered order instead
+        sort_key = None
+    try:
+        ordered, _keys = _ordered_queryset(queryset, sort_key, sort_order)
+        str(ordered.query)
+    except Exception as error:
+        # Empty lists and lists sorted by an unknown key have no navigation
+        logger.debug("No navigation for the list: %s", error)
+        request.session.pop(key, None)
+        return None
+    stored = {
+        "model": queryset.model._meta.label,
+        "view": f"{view.__class__.__module__}.{view.__class__.__qualname__}",
+        "kwargs": view.kwargs,
+        "path": request.path,
+        "query": request.GET.urlencode(),
+        "sort_key": sort_key,
+        "sort_order": sort_order,
+    }
+    stored["signature"] = hashlib.sha1(
+        json.dumps(stored, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    if request.session.get(key) != stored:
+        request.session[key] = stored
+    return stored["signature"]
+
+
+def get_ordered_navigation(stored: dict, model) -> OrderedNavigation:
+    """
+    Returns the OrderedNavigation of the list from the parameters stored by
+    remember_ordered_queryset, None when the list is unknown
+    """
+    if not isinstance(stored, dict) or stored.get("model") != model._meta.label:
+        return None
+    try:
+        queryset = _view_queryset(stored)
+        if queryset is None:
+            return None
+        queryset, keys = _ordered_queryset(
+            queryset, stored["sort_key"], stored["sort_order"]
+        )
+    except Exception as error:
+        logger.debug("No navigation for the list: %s", error)
+        return None
+    return OrderedNavigation(stored["signature"], queryset, keys)
+
+
 def get_nested_field(model_class: models.Model, field_name: str) -> object:
     """
     Recursion function to execute nested field logic
@@ -524,6 +726,52 @@ def merge_dicts(dict1, dict2):
     return merged_dict
 
 
+def clean_export_text(text):
+    """
+    Clean the text of an exported cell:
+    - If it's a <select> element, extract the selected option's value.
+    - If it's an <input> or <textarea>, extract its 'value'.
+    - Otherwise, remove blank spaces, keep line breaks, and handle <li> tags.
+    """
+    text = str(text)
+    if "<" not in text and "&" not in text:
+        # Plain text, nothing to parse
+        return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+    soup = BeautifulSoup(text, "html.parser")
+
+    # Handle <select> tag
+    select_tag = soup.find("select")
+    if select_tag:
+        selected_option = select_tag.find("option", selected=True)
+        if selected_option:
+            return selected_option["value"]
+        else:
+            first_option = select_tag.find("option")
+            return first_option["value"] if first_option else ""
+
+    # Handle <input> tag
+    input_tag = soup.find("input")
+    if input_tag:
+        return input_tag.get("value", "")
+
+    # Handle <textarea> tag
+    textarea_tag = soup.find("textarea")
+    if textarea_tag:
+        return textarea_tag.text.strip()
+
+    # Default: clean normal text and <li> handling
+    for li in soup.find_all("li"):
+        li.insert_before("\n")
+        li.unwrap()
+
+    text = soup.get_text()
+    lines = text.splitlines()
+    non_blank_lines = [line.strip() for line in lines if line.strip()]
+    cleaned_text = "\n".join(non_blank_lines)
+    return cleaned_text
+
+
 def flatten_dict(d, parent_key=""):
     """Recursively flattens a nested dictionary"""
     items = []
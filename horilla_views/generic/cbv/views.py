@@ -8,7 +8,6 @@ import logging
 from typing import Any
 from urllib.parse import parse_qs
 
-from bs4 import BeautifulSoup
 from django import forms
 from django.contrib import messages
 from django.core.cache import cache as CACHE
@@ -23,25 +22,39 @@ from django.utils.translation import gettext_lazy as _
 from django.views.generic import DetailView, FormView, ListView, TemplateView
 from xhtml2pdf import pisa
 
-from base.methods import closest_numbers, eval_validate, get_key_instances
+from base.exports import export_response, iter_export_rows
+from base.methods import eval_validate, get_key_instances
 from horilla.filters import FilterSet
 from horilla.group_by import group_by_queryset
 from horilla.horilla_middlewares import _thread_locals
 from horilla_views import models
 from horilla_views.cbv_methods import (  # update_initial_cache,
+    clean_export_text,
     export_xlsx,
+    get_ordered_navigation,
     get_short_uuid,
     hx_request_required,
     paginator_qry,
+    remember_ordered_queryset,
     sortby,
     structured,
     update_saved_filter_cache,
 )
 from horilla_views.forms import DynamicBulkUpdateForm, ToggleColumnForm
 from horilla_views.templatetags.generic_template_filters import getattribute
+from horilla_views.view_handles import register_view
 
 logger = logging.getLogger(__name__)
 
+_profile_tab_urls = set()
+
+
+def list_view_action_path(handle, action):
+    """
+    Returns the path, without the leading slash, of a list view action
+    """
+    return reverse("list-view-action", kwargs={"handle": handle, "action": action})[1:]
+
 
 @method_decorator(hx_request_required, name="dispatch")
 class HorillaListView(ListView):
@@ -392,16 +405,21 @@ class HorillaListView(ListView):
             is_first_sort = True
             query_dict = self._saved_filters
 
+        filtered_queryset = queryset
         if query_dict.get(self.sortby_key):
             queryset = sortby(
                 query_dict, queryset, self.sortby_key, is_first_sort=is_first_sort
             )
 
-        ordered_ids = []
         if not self._saved_filters.get("field"):
-            for instance in queryset:
-                ordered_ids.append(instance.pk)
-        self.request.session[self.ordered_ids_key] = ordered_ids
+            remember_ordered_queryset(
+                self,
+                filtered_queryset,
+                getattr(request, "sort_key", None),
+                getattr(request, "sort_order", "asc"),
+            )
+        else:
+            self.request.session.pop(self.ordered_ids_key, None)
         context["queryset"] = paginator_qry(
             queryset, self._saved_filters.get("page"), self.records_per_page
         )
@@ -426,33 +444,15 @@ class HorillaListView(ListView):
             #         ordered_ids.append(instance.pk)
 
         # CACHE.get(self.request.session.session_key + "cbv")[HorillaListView] = context
-        from horilla.urls import path, urlpatterns
-
-        self.export_path = f"export-list-view-{get_short_uuid(4)}/"
-
-        urlpatterns.append(path(self.export_path, self.export_data))
+        # Export and bulk update are served by the fixed list-view-action
+        # endpoint through a handle to this view
+        handle = register_view(self, self.request)
+        self.export_path = list_view_action_path(handle, "export")
         context["export_path"] = self.export_path
 
         if self.bulk_update_fields and self.bulk_update_accessibility():
-            get_bulk_path = (
-                f"get-bulk-update-{self.view_id}-{self.request.session.session_key}/"
-            )
-            post_bulk_path = (
-                f"post-bulk-update-{self.view_id}-{self.request.session.session_key}/"
-            )
-            self.post_bulk_path = post_bulk_path
-            urlpatterns.append(
-                path(
-                    get_bulk_path,
-                    self.serve_bulk_form,
-                )
-            )
-            urlpatterns.append(
-                path(
-                    post_bulk_path,
-                    self.handle_bulk_submission,
-                )
-            )
+            get_bulk_path = list_view_action_path(handle, "bulk-form")
+            self.post_bulk_path = list_view_action_path(handle, "bulk-update")
             context["bulk_update_fields"] = self.bulk_update_fields
             context["bulk_path"] = get_bulk_path
         context["export_formats"] = self.export_formats
@@ -468,98 +468,17 @@ class HorillaListView(ListView):
         """
         Export list view visible columns
         """
-        from import_export import fields, resources
-
         request = getattr(_thread_locals, "request", None)
         ids = eval_validate(request.POST["ids"])
         _columns = eval_validate(request.POST["columns"])
         export_format = request.POST.get("format", "xlsx")
         queryset = self.model.objects.filter(id__in=ids)
+        headers = [field_tuple[0] for field_tuple in _columns]
+        keys = [field_tuple[1] for field_tuple in _columns]
 
-        _model = self.model
-
-        class HorillaListViewResorce(resources.ModelResource):
-            """
-            Instant Resource class
-            """
-
-            id = fields.Field(column_name="ID")
-
-            class Meta:
-                """
-                Meta class for additional option
-                """
-
-                model = _model
-                fields = [field[1] for field in _columns]  # 773
-
-            def dehydrate_id(self, instance):
-                """
-                Dehydrate method for id field
-                """
-                return instance.pk
-
-            for field_tuple in _columns:
-                dynamic_fn_str = f"def dehydrate_{field_tuple[1]}(self, instance):return self.remove_extra_spaces(getattribute(instance, '{field_tuple[1]}'),{field_tuple})"
-                exec(dynamic_fn_str)
-                dynamic_fn = locals()[f"dehydrate_{field_tuple[1]}"]
-                locals()[field_tuple[1]] = fields.Field(column_name=field_tuple[0])
+        def export_cell(instance, key):
+            return clean_export_text(getattribute(instance, key))
 
-            def remove_extra_spaces(self, text, field_tuple):
-                """
-                Clean the text:
-                - If it's a <select> element, extract the selected option's value.
-                - If it's an <input> or <textarea>, extract its 'value'.
-                - Otherwise, remove blank spaces, keep line breaks, and handle <li> tags.
-                """
-                soup = BeautifulSoup(str(text), "html.parser")
-
-                # Handle <select> tag
-                select_tag = soup.find("select")
-                if select_tag:
-                    selected_option = select_tag.find("option", selected=True)
-                    if selected_option:
-                        return selected_option["value"]
-                    else:
-                        first_option = select_tag.find("option")
-                        return first_option["value"] if first_option else ""
-
-                # Handle <input> tag
-                input_tag = soup.find("input")
-                if input_tag:
-                    return input_tag.get("value", "")
-
-                # Handle <textarea> tag
-                textarea_tag = soup.find("textarea")
-                if textarea_tag:
-                    return textarea_tag.text.strip()
-
-                # Default: clean normal text and <li> handling
-                for li in soup.find_all("li"):
-                    li.insert_before("\n")
-                    li.unwrap()
-
-                text = soup.get_text()
-                lines = text.splitlines()
-                non_blank_lines = [line.strip() for line in lines if line.strip()]
-                cleaned_text = "\n".join(non_blank_lines)
-                return cleaned_text
-
-        book_resource = HorillaListViewResorce()
-
-        # Export the data using the resource
-        dataset = book_resource.export(queryset)
-
-        # excel_data = dataset.export("xls")
-
-        # Set the response headers
-        # file_name = self.export_file_name
-        # if not file_name:
-        #     file_name = "quick_export"
-        # response = HttpResponse(excel_data, content_type="application/vnd.ms-excel")
-        # response["Content-Disposition"] = f'attachment; filename="{file_name}.xls"'
-        # return response
-        json_data = json.loads(dataset.export("json"))
         merged = []
 
         for item in _columns:
@@ -600,6 +519,22 @@ class HorillaListView(ListView):
                 column = (column[0], column[1])
             columns.append(column)
 
+        nested = any(len(column) >= 3 for column in columns)
+        if export_format == "csv" or (export_format == "xlsx" and not nested):
+            return export_response(
+                request,
+                queryset,
+                headers,
+                keys,
+                export_cell,
+                self.export_file_name,
+                export_format,
+            )
+
+        json_data = [
+            dict(zip(headers, row))
+            for row in iter_export_rows(queryset, keys, export_cell)
+        ]
         if export_format == "json":
             response = HttpResponse(
                 json.dumps(json_data, indent=4), content_type="application/json"
@@ -608,25 +543,14 @@ class HorillaListView(ListView):
                 f'attachment; filename="{self.export_file_name}.json"'
             )
             return response
-        # CSV
-        elif export_format == "csv":
-            csv_data = dataset.export("csv")
-            response = HttpResponse(csv_data, content_type="text/csv")
-            response["Content-Disposition"] = (
-                f'attachment; filename="{self.export_file_name}.csv"'
-            )
-            return response
         elif export_format == "pdf":
 
-            headers = dataset.headers
-            rows = dataset.dict
-
             # Render to HTML using a template
             html_string = render_to_string(
                 "generic/export_pdf.html",
                 {
                     "headers": headers,
-                    "rows": rows,
+                    "rows": json_data,
                 },
             )
 
@@ -643,7 +567,7 @@ class HorillaListView(ListView):
                 f'attachment; filename="{self.export_file_name}.pdf"'
             )
             return response
-        return export_xlsx(json_data, columns)
+        return export_xlsx(json_data, columns, self.export_file_name)
 
 
 class HorillaSectionView(TemplateView):
@@ -726,30 +650,27 @@ class HorillaDetailedView(DetailView):
 
     def get_context_data(self, **kwargs: Any):
         context = super().get_context_data(**kwargs)
-        instance_ids = self.request.session.get(self.ordered_ids_key, [])
         if not context.get("object", False):
             return context
 
         pk = context["object"].pk
-        # if instance_ids:
-        #     context["object"].ordered_ids = instance_ids
         context["instance"] = context["object"]
 
-        url = resolve(self.request.path)
-        key = list(url.kwargs.keys())[0]
-
-        url_name = url.url_name
-
-        previous_id, next_id = closest_numbers(instance_ids, pk)
+        navigation = get_ordered_navigation(
+            self.request.session.get(self.ordered_ids_key), self.model
+        )
+        adjacent_ids = navigation.adjacent_ids(pk) if navigation else None
+        if adjacent_ids:
+            url = resolve(self.request.path)
+            key = list(url.kwargs.keys())[0]
+            url_name = url.url_name
+            previous_id, next_id = adjacent_ids
 
-        next_url = reverse(url_name, kwargs={key: next_id})
-        previous_url = reverse(url_name, kwargs={key: previous_id})
-        if instance_ids:
-            context["instance_ids"] = str(instance_ids)
+            context["instance_ids"] = navigation.signature
             context["ids_key"] = self.ids_key
 
-            context["next_url"] = next_url
-            context["previous_url"] = previous_url
+            context["next_url"] = reverse(url_name, kwargs={key: next_id})
+            context["previous_url"] = reverse(url_name, kwargs={key: previous_id})
 
         context["title"] = self.title
         context["header"] = self.header
@@ -917,12 +838,10 @@ class HorillaCardView(ListView):
 
             context["filter_dict"] = data_dict
 
-        ordered_ids = list(queryset.values_list("id", flat=True))
-        ordered_ids = []
         if not self._saved_filters.get("field"):
-            for instance in queryset:
-                ordered_ids.append(instance.pk)
-        self.request.session[self.ordered_ids_key] = ordered_ids
+            remember_ordered_queryset(self, queryset)
+        else:
+            self.request.session.pop(self.ordered_ids_key, None)
 
         # CACHE.get(self.request.session.session_key + "cbv")[HorillaCardView] = context
         referrer = self.request.GET.get("referrer", "")
@@ -1087,17 +1006,20 @@ class HorillaFormView(FormView):
             pk = self.form.instance.pk
         # next/previous option in the forms
         if pk and self.request.GET.get(self.ids_key):
-            instance_ids = self.request.session.get(self.ordered_ids_key, [])
-            url = resolve(self.request.path)
-            key = list(url.kwargs.keys())[0]
-            url_name = url.url_name
-            if instance_ids:
-                previous_id, next_id = closest_numbers(instance_ids, pk)
+            navigation = get_ordered_navigation(
+                self.request.session.get(self.ordered_ids_key), self.model
+            )
+            adjacent_ids = navigation.adjacent_ids(pk) if navigation else None
+            if adjacent_ids:
+                url = resolve(self.request.path)
+                key = list(url.kwargs.keys())[0]
+                url_name = url.url_name
+                previous_id, next_id = adjacent_ids
 
                 next_url = reverse(url_name, kwargs={key: next_id})
                 previous_url = reverse(url_name, kwargs={key: previous_id})
 
-                self.form.instance_ids = str(instance_ids)
+                self.form.instance_ids = navigation.signature
                 self.form.ids_key = self.ids_key
 
                 self.form.next_url = next_url
@@ -1383,12 +1305,15 @@ class HorillaProfileView(DetailView):
         for tab in self.tabs:
             if not tab.get("url"):
                 url = f"{self.url_prefix}-{tab['title']}"
-                urlpatterns.append(
-                    path(
-                        url + "/<int:pk>/",
-                        tab["view"],
+                if url not in _profile_tab_urls:
+                    # Register each tab path once per process
+                    _profile_tab_urls.add(url)
+                    urlpatterns.append(
+                        path(
+                            url + "/<int:pk>/",
+                            tab["view"],
+                        )
                     )
-                )
                 tab["url"] = "/" + url + "/{pk}/"
 
         # hidden columns configuration
@@ -1451,18 +1376,16 @@ class HorillaProfileView(DetailView):
         if active_tab:
             context["active_target"] = active_tab.tab_target
 
-        instance_ids = self.request.session.get(self.ordered_ids_key, [])
-
-        if instance_ids:
-            CACHE.set(
-                f"{self.request.session.session_key}hpv-instance-ids", instance_ids
-            )
+        stored = self.request.session.get(self.ordered_ids_key)
+        if stored:
+            self.request.session["hpv_instance_ids"] = stored
         else:
-            instance_ids = CACHE.get(
-                f"{self.request.session.session_key}hpv-instance-ids"
-            )
-            instance_ids = instance_ids if instance_ids else []
-        instances = self.model.objects.filter(id__in=instance_ids)
+            stored = self.request.session.get("hpv_instance_ids")
+        navigation = get_ordered_navigation(stored, self.model)
+        adjacent_ids = (
+            navigation.adjacent_ids(context["instance"].pk) if navigation else None
+        )
+        instances = navigation.queryset if adjacent_ids else self.model.objects.none()
         context["instances"] = instances
         balance_count = instances.count() - 6
         if balance_count > 9:
@@ -1472,21 +1395,21 @@ class HorillaProfileView(DetailView):
         else:
             display_count = None
 
-        previous_id, next_id = closest_numbers(instance_ids, context["instance"].pk)
-        url = resolve(self.request.path)
-        key = list(url.kwargs.keys())[0]
-
-        url_name = url.url_name
-        next_url = reverse(url_name, kwargs={key: next_id})
-        previous_url = reverse(url_name, kwargs={key: previous_id})
-        push_url_next = reverse(self.push_url, kwargs={self.key_name: next_id})
-        push_url_prev = reverse(self.push_url, kwargs={self.key_name: previous_id})
-        context["instance_ids"] = str(instance_ids)
-        if instance_ids:
-            context["next_url"] = next_url
-            context["previous_url"] = previous_url
-            context["push_url_next"] = push_url_next
-            context["push_url_prev"] = push_url_prev
+        context["instance_ids"] = navigation.signature if adjacent_ids else ""
+        if adjacent_ids:
+            previous_id, next_id = adjacent_ids
+            url = resolve(self.request.path)
+            key = list(url.kwargs.keys())[0]
+
+            url_name = url.url_name
+            context["next_url"] = reverse(url_name, kwargs={key: next_id})
+            context["previous_url"] = reverse(url_name, kwargs={key: previous_id})
+            context["push_url_next"] = reverse(
+                self.push_url, kwargs={self.key_name: next_id}
+            )
+            context["push_url_prev"] = reverse(
+                self.push_url, kwargs={self.key_name: previous_id}
+            )
 
         context["display_count"] = display_count
         context["actions"] = self.actions
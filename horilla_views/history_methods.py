@@ -4,12 +4,12 @@ methods.py
 This module is used to write methods related to the history
 """
 
-from django.contrib.auth.models import User
 from django.core.paginator import Paginator
 from django.db import models
 from django.shortcuts import render
 
 from horilla.decorators import apply_decorators
+from horilla_audit.methods import history_changes
 
 
 class Bot:
@@ -80,19 +80,22 @@ def get_diff(instance, history_related_name):
     """
     This method is used to find the differences in the history
     """
-    remove_duplicate_history(instance, history_related_name)
-    history = getattr(instance, history_related_name).all()
-    history_list = list(history)
+    history_list = list(
+        getattr(instance, history_related_name).select_related(
+            "history_user__employee_get"
+        )
+    )
     pairs = [
         [history_list[i], history_list[i + 1]] for i in range(len(history_list) - 1)
     ]
     delta_changes = []
-    create_history = history.filter(history_type="+").first()
+    create_history = next(
+        (history for history in history_list if history.history_type == "+"), None
+    )
+    class_name = instance.__class__
     for pair in pairs:
-        delta = pair[0].diff_against(pair[1])
         diffs = []
-        class_name = pair[0].instance.__class__
-        for change in delta.changes:
+        for change in history_changes(pair[0], pair[1]):
             old = change.old
             new = change.new
             field = instance._meta.get_field(change.field)
@@ -119,11 +122,13 @@ def get_diff(instance, history_related_name):
                     "new": new,
                 }
             )
-        updated_by = (
-            User.objects.get(id=pair[0].history_user.id).employee_get
-            if pair[0].history_user
-            else Bot()
-        )
+        if not diffs:
+            # Duplicate row recorded before the write time de-duplication
+            continue
+        try:
+            updated_by = pair[0].history_user.employee_get
+        except:
+            updated_by = Bot()
         delta_changes.append(
             {
                 "type": "Changes",
@@ -40,6 +40,11 @@ urlpatterns = [
         views.LastAppliedFilter.as_view(),
         name="last-applied-filter",
     ),
+    path(
+        "list-view-action/<str:handle>/<str:action>/",
+        views.ListViewAction.as_view(),
+        name="list-view-action",
+    ),
     path(
         "generic-delete",
         views.HorillaDeleteConfirmationView.as_view(),
@@ -0,0 +1,88 @@
+"""
+horilla_views/view_handles.py
+
+Handles to rendered generic views for the fixed list action endpoint.
+
+A list view used to register a new url pattern for its export and bulk update
+actions on every render. Instead the rendered view is kept in a bounded,
+expiring in-process store and addressed by a signed handle. When the handle is
+unknown to the serving process (another worker, evicted, restarted) the view
+is rebuilt from the class path signed into the handle.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.core import signing
+from django.utils.module_loading import import_string
+
+from horilla_views.cbv_methods import get_short_uuid
+
+HANDLE_SALT = "horilla_views.view_handles"
+HANDLE_TTL = 60 * 60
+MAX_HANDLES = 500
+
+_views = OrderedDict()
+_views_lock = threading.Lock()
+
+
+def _evict(now):
+    while _views and (
+        len(_views) > MAX_HANDLES or next(iter(_views.values()))[0] < now - HANDLE_TTL
+    ):
+        _views.popitem(last=False)
+
+
+def register_view(view, request):
+    """
+    Stores the rendered view and returns its signed handle
+    """
+    key = get_short_uuid(8, prefix="")
+    view_class = view.__class__
+    payload = {
+        "key": key,
+        "user": request.user.pk,
+        "view": (
+            f"{view_class.__module__}.{view_class.__qualname__}"
+            if "<locals>" not in view_class.__qualname__
+            else None
+        ),
+    }
+    # Keep the configuration of the view, not the rendered records
+    view = copy.copy(view)
+    view.request = None
+    view.queryset = None
+    view.object_list = None
+    now = time.monotonic()
+    with _views_lock:
+        _views[key] = (now, view)
+        _evict(now)
+    return signing.dumps(payload, salt=HANDLE_SALT, compress=True)
+
+
+def resolve_view(handle, request):
+    """
+    Returns a copy of the view registered under the handle bound to the
+    request, None when the handle is invalid, expired or of another user
+    """
+    try:
+        payload = signing.loads(handle, salt=HANDLE_SALT, max_age=HANDLE_TTL)
+    except signing.BadSignature:
+        return None
+    if payload.get("user") != request.user.pk:
+        return None
+    with _views_lock:
+        stored = _views.get(payload["key"])
+    if stored is not None:
+        view = copy.copy(stored[1])
+    elif payload.get("view"):
+        try:
+            view = import_string(payload["view"])()
+        except Exception:
+            return None
+    else:
+        return None
+    view.request = request
+    return view
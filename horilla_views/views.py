@@ -10,6 +10,7 @@ from django.db import router
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
 from django.utils.decorators import method_decorator
+from django.utils.translation import gettext_lazy as _
 from django.views import View
 from django.views.decorators.csrf import csrf_protect
 
@@ -18,7 +19,12 @@ from horilla.signals import post_generic_delete, pre_generic_delete
 from horilla_views import models
 from horilla_views.cbv_methods import get_short_uuid, login_required, merge_dicts
 from horilla_views.forms import SavedFilterForm
-from horilla_views.generic.cbv.views import HorillaFormView, HorillaListView
+from horilla_views.generic.cbv.views import (
+    HorillaFormView,
+    HorillaListView,
+    list_view_action_path,
+)
+from horilla_views.view_handles import resolve_view
 
 # Create your views here.
 
@@ -297,6 +303,46 @@ class DynamiListView(HorillaListView):
         return filter(_search_filter, self.instances)
 
 
+@method_decorator(login_required, name="dispatch")
+class ListViewAction(View):
+    """
+    Fixed endpoint serving the export and bulk update actions of the rendered
+    list views, the view is addressed by the handle of view_handles
+    """
+
+    actions = {
+        "export": "export_data",
+        "bulk-form": "serve_bulk_form",
+        "bulk-update": "handle_bulk_submission",
+    }
+
+    def run_action(self, handle, action):
+        """
+        Resolves the handle and runs the action on the list view
+        """
+        request = self.request
+        if action not in self.actions:
+            return HttpResponse(status=404)
+        view = resolve_view(handle, request)
+        if view is None:
+            messages.info(request, _("The page has expired, reload it and try again."))
+            return HttpResponse("<script>window.location.reload()</script>")
+        view.post_bulk_path = list_view_action_path(handle, "bulk-update")
+        return getattr(view, self.actions[action])(request)
+
+    def get(self, *args, handle=None, action=None, **kwargs):
+        """
+        GET method
+        """
+        return self.run_action(handle, action)
+
+    def post(self, *args, handle=None, action=None, **kwargs):
+        """
+        POST method
+        """
+        return self.run_action(handle, action)
+
+
 class HorillaDeleteConfirmationView(View):
     """
     Generic Delete Confirmation View
@@ -0,0 +1,98 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from employee.models import EmployeeWorkInformation
+from leave.models import LeaveRequest, LeaveType
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the leave request save latency as the leave history grows. "
+        "Every row created is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--history",
+            default="100,1000,5000",
+            help="Comma separated history sizes to measure (default 100,1000,5000)",
+        )
+        parser.add_argument(
+            "--saves",
+            type=int,
+            default=20,
+            help="Leave requests saved per history size (default 20)",
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options["history"].split(","))
+        work_infos = list(
+            EmployeeWorkInformation.objects.entire()
+            .exclude(employee_id=None)
+            .select_related("employee_id")[:20]
+        )
+        leave_type = LeaveType.objects.entire().first()
+        if not work_infos or leave_type is None:
+            raise CommandError(
+                "The benchmark needs employees with work information and a leave type."
+            )
+
+        self.stdout.write("history  ms/save  queries/save")
+        try:
+            with transaction.atomic():
+                history = 0
+                start = date(2000, 1, 3)
+                for size in sizes:
+                    # Old, non overlapping history spread over the employees
+                    LeaveRequest.objects.bulk_create(
+                        [
+                            LeaveRequest(
+                                employee_id=work_infos[
+                                    index % len(work_infos)
+                                ].employee_id,
+                                leave_type_id=leave_type,
+                                start_date=start + timedelta(days=index),
+                                end_date=start + timedelta(days=index),
+                                requested_days=1,
+                                leave_clashes_count=0,
+                                description="benchmark",
+                            )
+                            for index in range(history, size)
+                        ],
+                        batch_size=1000,
+                    )
+                    history = size
+                    self.measure(size, work_infos, leave_type, options["saves"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def measure(self, size, work_infos, leave_type, saves):
+        today = date.today()
+        elapsed = 0
+        # Every size saves the same requests on top of its own history only
+        with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+            for index in range(saves):
+                leave_request = LeaveRequest(
+                    employee_id=work_infos[index % len(work_infos)].employee_id,
+                    leave_type_id=leave_type,
+                    start_date=today + timedelta(days=index % 5),
+                    end_date=today + timedelta(days=index % 5 + 1),
+                    description="benchmark",
+                )
+                started = time.perf_counter()
+                leave_request.save()
+                elapsed += time.perf_counter() - started
+            transaction.set_rollback(True)
+        self.stdout.write(
+            f"{size:>7}  {elapsed * 1000 / saves:>7.1f}  "
+            f"{len(queries.captured_queries) / saves:>12.1f}"
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from leave.methods import rebuild_leave_rollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild the leave dashboard rollup from the approved leave requests"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rollup rows written per INSERT (default 1000)",
+        )
+
+    def handle(self, *args, **options):
+        rows = rebuild_leave_rollup(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} leave rollup rows."))
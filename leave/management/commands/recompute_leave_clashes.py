@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from leave.methods import recompute_all_leave_clashes
+
+
+class Command(BaseCommand):
+    help = "Recompute the leave clashes count of every leave request"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of leave requests written per UPDATE (default 500)",
+        )
+
+    def handle(self, *args, **options):
+        updated = recompute_all_leave_clashes(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Updated the clashes count of {updated} leave requests."
+            )
+        )
@@ -1,8 +1,9 @@
 import calendar
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
 
 from django.apps import apps
-from django.db.models import Q
+from django.db.models import F, Q
 
 from employee.models import Employee
 from horilla.methods import get_horilla_model_class
@@ -158,3 +159,395 @@ def filter_conditional_leave_request(request):
         else:
             leave_request_ids.append(instance.leave_request_id.id)
     return LeaveRequest.objects.filter(pk__in=leave_request_ids)
+
+
+INACTIVE_LEAVE_STATUSES = ["cancelled", "rejected"]
+
+_CLASH_FIELDS = {
+    "work_info": "employee_id__employee_work_info__id",
+    "department": "employee_id__employee_work_info__department_id",
+    "job_position": "employee_id__employee_work_info__job_position_id",
+    "company": "employee_id__employee_work_info__company_id",
+}
+
+
+def _clash_scope_q(department_id, job_position_id, company_id):
+    """
+    Q matching the leave requests of the employees sharing the department or
+    the job position, in the same company (None matches None as in
+    LeaveRequest.count_leave_clashes)
+    """
+    return (
+        Q(**{_CLASH_FIELDS["department"]: department_id})
+        | Q(**{_CLASH_FIELDS["job_position"]: job_position_id})
+    ) & Q(**{_CLASH_FIELDS["company"]: company_id})
+
+
+def _clash_rows(queryset):
+    return list(
+        queryset.exclude(status__in=INACTIVE_LEAVE_STATUSES).values(
+            "id",
+            "start_date",
+            "end_date",
+            "leave_clashes_count",
+            **{key: F(field) for key, field in _CLASH_FIELDS.items()},
+        )
+    )
+
+
+def leave_clash_scope(leave_request):
+    """
+    Returns the (start_date, end_date, department_id, job_position_id,
+    company_id) a leave request clashes in, None when it can not clash
+    """
+    from employee.models import EmployeeWorkInformation
+
+    if leave_request.status in INACTIVE_LEAVE_STATUSES:
+        return None
+    work_info = (
+        EmployeeWorkInformation.objects.filter(employee_id=leave_request.employee_id)
+        .values_list("department_id", "job_position_id", "company_id")
+        .first()
+    )
+    if work_info is None:
+        return None
+    return (
+        leave_request.start_date,
+        leave_request.end_date or leave_request.start_date,
+        *work_info,
+    )
+
+
+def update_overlapping_leave_clashes(scopes, exclude_ids=()):
+    """
+    Recomputes the clash count of the active leave requests overlapping any of
+    the given leave_clash_scope() ranges, returns the number of rows updated.
+
+    Only the requests in the date ranges are read, so a change costs the same
+    however many leave requests exist.
+    """
+    from leave.models import LeaveRequest
+
+    scopes = [scope for scope in scopes if scope]
+    if not scopes:
+        return 0
+    requests = LeaveRequest.objects.entire()
+    affected_q = Q()
+    for start_date, end_date, *scope in scopes:
+        affected_q |= Q(start_date__lte=end_date, end_date__gte=start_date) & (
+            _clash_scope_q(*scope)
+        )
+    affected = [
+        row
+        for row in _clash_rows(requests.filter(affected_q).exclude(id__in=exclude_ids))
+        if row["work_info"]
+    ]
+    if not affected:
+        return 0
+
+    # Every request clashing with an affected one, read in a single range query
+    candidates_q = Q()
+    for row in affected:
+        candidates_q |= _clash_scope_q(
+            row["department"], row["job_position"], row["company"]
+        )
+    candidates = [
+        row
+        for row in _clash_rows(
+            requests.filter(
+                candidates_q,
+                start_date__lte=max(row["end_date"] for row in affected),
+                end_date__gte=min(row["start_date"] for row in affected),
+            )
+        )
+        if row["work_info"]
+    ]
+
+    to_update = []
+    for row in affected:
+        count = sum(
+            1
+            for other in candidates
+            if other["id"] != row["id"]
+            and other["company"] == row["company"]
+            and (
+                other["department"] == row["department"]
+                or other["job_position"] == row["job_position"]
+            )
+            and other["start_date"] <= row["end_date"]
+            and other["end_date"] >= row["start_date"]
+        )
+        if count != row["leave_clashes_count"]:
+            to_update.append(LeaveRequest(id=row["id"], leave_clashes_count=count))
+    LeaveRequest.objects.entire().bulk_update(
+        to_update, ["leave_clashes_count"], batch_size=500
+    )
+    return len(to_update)
+
+
+def recompute_all_leave_clashes(batch_size=500):
+    """
+    Recomputes the clash count of every leave request, returns the number of
+    rows updated.
+
+    Used after migrations and imports. The overlaps of a request are counted
+    with binary searches over the sorted dates of its company's department,
+    job position and department + job position groups.
+    """
+    from leave.models import LeaveRequest
+
+    rows = list(
+        LeaveRequest.objects.entire()
+        .values_list(
+            "id",
+            "start_date",
+            "end_date",
+            "status",
+            "leave_clashes_count",
+            *_CLASH_FIELDS.values(),
+        )
+        .iterator(chunk_size=2000)
+    )
+    active = [
+        row
+        for row in rows
+        if row[3] not in INACTIVE_LEAVE_STATUSES and row[5] and row[2] is not None
+    ]
+    groups = {}
+    for row in active:
+        _id, start_date, end_date, _status, _count, _info, department, job, company = (
+            row
+        )
+        for key in (
+            ("department", company, department),
+            ("job_position", company, job),
+            ("both", company, department, job),
+        ):
+            dates = groups.setdefault(key, ([], []))
+            dates[0].append(start_date)
+            dates[1].append(end_date)
+    for starts, ends in groups.values():
+        starts.sort()
+        ends.sort()
+
+    def overlaps(key, start_date, end_date):
+        starts, ends = groups[key]
+        return bisect_right(starts, end_date) - bisect_left(ends, start_date)
+
+    counts = {}
+    for (
+        _id,
+        start_date,
+        end_date,
+        _status,
+        _count,
+        _info,
+        department,
+        job,
+        company,
+    ) in active:
+        # The request overlaps itself once in the union of the groups
+        counts[_id] = (
+            overlaps(("department", company, department), start_date, end_date)
+            + overlaps(("job_position", company, job), start_date, end_date)
+            - overlaps(("both", company, department, job), start_date, end_date)
+            - 1
+        )
+    to_update = [
+        LeaveRequest(id=row[0], leave_clashes_count=counts.get(row[0], 0))
+        for row in rows
+        if row[4] != counts.get(row[0], 0)
+    ]
+    LeaveRequest.objects.entire().bulk_update(
+        to_update, ["leave_clashes_count"], batch_size=batch_size
+    )
+    return len(to_update)
+
+
+ROLLUP_FIELDS = (
+    "employee_id",
+    "leave_type_id",
+    "start_date",
+    "end_date",
+    "start_date_breakdown",
+    "end_date_breakdown",
+    "requested_days",
+    "status",
+)
+
+# Work information fields copied onto the LeaveDayRollup rows
+ROLLUP_WORK_INFO_FIELDS = (
+    "department_id",
+    "department_id_id",
+    "company_id",
+    "company_id_id",
+)
+
+
+def leave_rollup_days(start_date, end_date, start_breakdown, end_breakdown, days):
+    """
+    Returns {date: days} of an approved leave request, its requested days
+    spread over its dates, the half day breakdowns weighing half a day
+    """
+    end_date = end_date or start_date
+    weights = {
+        start_date + timedelta(i): 1.0 for i in range((end_date - start_date).days + 1)
+    }
+    if start_breakdown != "full_day":
+        weights[start_date] = 0.5
+    if end_breakdown != "full_day":
+        weights[end_date] = 0.5
+    total = sum(weights.values())
+    if days is None:
+        days = total
+    return {day: weight * days / total for day, weight in weights.items()}
+
+
+def leave_rollup_scope(leave_request):
+    """
+    Returns the (employee id, leave type id, start date, end date) of the
+    LeaveDayRollup rows a leave request contributes to
+    """
+    if leave_request is None:
+        return None
+    return (
+        leave_request.employee_id_id,
+        leave_request.leave_type_id_id,
+        leave_request.start_date,
+        leave_request.end_date or leave_request.start_date,
+    )
+
+
+def _rollup_rows(requests, work_infos, start_date=None, end_date=None):
+    """
+    Returns the LeaveDayRollup rows of the approved requests, values of
+    ROLLUP_FIELDS, restricted to the dates between start_date and end_date
+    """
+    from leave.models import LeaveDayRollup
+
+    rows = {}
+    for request in requests:
+        department_id, company_id = work_infos.get(request["employee_id"], (None, None))
+        for day, days in leave_rollup_days(
+            request["start_date"],
+            request["end_date"],
+            request["start_date_breakdown"],
+            request["end_date_breakdown"],
+            request["requested_days"],
+        ).items():
+            if (start_date and day < start_date) or (end_date and day > end_date):
+                continue
+            key = (request["employee_id"], request["leave_type_id"], day)
+            row = rows.get(key)
+            if row is None:
+                row = rows[key] = LeaveDayRollup(
+                    employee_id_id=request["employee_id"],
+                    leave_type_id_id=request["leave_type_id"],
+                    department_id_id=department_id,
+                    company_id_id=company_id,
+                    date=day,
+                )
+            row.days += days
+            row.leave_count += 1
+    return list(rows.values())
+
+
+def _rollup_work_infos(employee_ids=None):
+    from employee.models import EmployeeWorkInformation
+
+    work_infos = EmployeeWorkInformation.objects.entire()
+    if employee_ids is not None:
+        work_infos = work_infos.filter(employee_id__in=employee_ids)
+    return {
+        employee_id: (department_id, company_id)
+        for employee_id, department_id, company_id in work_infos.values_list(
+            "employee_id", "department_id", "company_id"
+        )
+    }
+
+
+def update_leave_rollup(scopes):
+    """
+    Recomputes the LeaveDayRollup rows of the leave_rollup_scope() ranges from
+    the approved leave requests overlapping them
+    """
+    from django.db import transaction
+
+    from leave.models import LeaveDayRollup, LeaveRequest
+
+    for scope in set(filter(None, scopes)):
+        employee_id, leave_type_id, start_date, end_date = scope
+        requests = (
+            LeaveRequest.objects.entire()
+            .filter(
+                Q(end_date__gte=start_date)
+                | Q(end_date__isnull=True, start_date__gte=start_date),
+                employee_id=employee_id,
+                leave_type_id=leave_type_id,
+                status="approved",
+                start_date__lte=end_date,
+            )
+            .values(*ROLLUP_FIELDS)
+        )
+        rows = _rollup_rows(
+            requests, _rollup_work_infos([employee_id]), start_date, end_date
+        )
+        with transaction.atomic():
+            LeaveDayRollup.objects.entire().filter(
+                employee_id=employee_id,
+                leave_type_id=leave_type_id,
+                date__range=(start_date, end_date),
+            ).delete()
+            LeaveDayRollup.objects.bulk_create(rows)
+
+
+def rebuild_leave_rollup(batch_size=1000):
+    """
+    Rebuilds the whole LeaveDayRollup from the approved leave requests,
+    returns the number of rows
+    """
+    from django.db import transaction
+
+    from leave.models import LeaveDayRollup, LeaveRequest
+
+    requests = (
+        LeaveRequest.objects.entire()
+        .filter(status="approved")
+        .values(*ROLLUP_FIELDS)
+        .iterator(chunk_size=2000)
+    )
+    rows = _rollup_rows(requests, _rollup_work_infos())
+    with transaction.atomic():
+        LeaveDayRollup.objects.entire().delete()
+        LeaveDayRollup.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def ensure_leave_rollup():
+    """
+    Fills the LeaveDayRollup when it is empty while approved leave requests
+    exist, as after the table is created on existing data. Returns the number
+    of rows written.
+    """
+    from leave.models import LeaveDayRollup, LeaveRequest
+
+    if LeaveDayRollup.objects.entire().exists():
+        return 0
+    if not LeaveRequest.objects.entire().filter(status="approved").exists():
+        return 0
+    return rebuild_leave_rollup()
+
+
+def refresh_leave_rollup_work_info(employee_ids):
+    """
+    Copies the current department and company of the employees onto their
+    LeaveDayRollup rows
+    """
+    from leave.models import LeaveDayRollup
+
+    for employee_id, (department_id, company_id) in _rollup_work_infos(
+        employee_ids
+    ).items():
+        LeaveDayRollup.objects.entire().filter(employee_id=employee_id).exclude(
+            department_id=department_id, company_id=company_id
+        ).update(department_id=department_id, company_id=company_id)
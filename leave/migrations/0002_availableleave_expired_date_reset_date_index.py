@@ -0,0 +1,47 @@
+# Generated by Django 4.2.21 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("leave", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="availableleave",
+            name="expired_date",
+            field=models.DateField(
+                blank=True,
+                db_index=True,
+                null=True,
+                verbose_name="CarryForward Expired Date",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="availableleave",
+            name="reset_date",
+            field=models.DateField(
+                blank=True, db_index=True, null=True, verbose_name="Leave Reset Date"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="historicalavailableleave",
+            name="expired_date",
+            field=models.DateField(
+                blank=True,
+                db_index=True,
+                null=True,
+                verbose_name="CarryForward Expired Date",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="historicalavailableleave",
+            name="reset_date",
+            field=models.DateField(
+                blank=True, db_index=True, null=True, verbose_name="Leave Reset Date"
+            ),
+        ),
+    ]
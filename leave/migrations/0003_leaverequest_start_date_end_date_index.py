@@ -0,0 +1,37 @@
+# Generated by Django 4.2.21 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("leave", "0002_availableleave_expired_date_reset_date_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="historicalleaverequest",
+            name="end_date",
+            field=models.DateField(
+                blank=True, db_index=True, null=True, verbose_name="End Date"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="historicalleaverequest",
+            name="start_date",
+            field=models.DateField(db_index=True, verbose_name="Start Date"),
+        ),
+        migrations.AlterField(
+            model_name="leaverequest",
+            name="end_date",
+            field=models.DateField(
+                blank=True, db_index=True, null=True, verbose_name="End Date"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="leaverequest",
+            name="start_date",
+            field=models.DateField(db_index=True, verbose_name="Start Date"),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.21 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("leave", "0003_leaverequest_start_date_end_date_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="historicalavailableleave",
+            name="history_changes",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="historicalcompensatoryleaverequest",
+            name="history_changes",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="historicalleaveallocationrequest",
+            name="history_changes",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="historicalleaverequest",
+            name="history_changes",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
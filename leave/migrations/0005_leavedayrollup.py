@@ -0,0 +1,82 @@
+# Generated by Django 4.2.21 on 2026-10-18 21:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("base", "0001_initial"),
+        ("employee", "0001_initial"),
+        ("leave", "0004_historicalavailableleave_history_changes_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaveDayRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("days", models.FloatField(default=0)),
+                ("leave_count", models.PositiveIntegerField(default=0)),
+                (
+                    "company_id",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="leave_day_rollups",
+                        to="base.company",
+                    ),
+                ),
+                (
+                    "department_id",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="leave_day_rollups",
+                        to="base.department",
+                    ),
+                ),
+                (
+                    "employee_id",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="leave_day_rollups",
+                        to="employee.employee",
+                    ),
+                ),
+                (
+                    "leave_type_id",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="leave_day_rollups",
+                        to="leave.leavetype",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["date", "department_id"],
+                        name="leave_leave_date_cf3a34_idx",
+                    ),
+                    models.Index(
+                        fields=["date", "leave_type_id"],
+                        name="leave_leave_date_2539fd_idx",
+                    ),
+                ],
+                "unique_together": {("employee_id", "leave_type_id", "date")},
+            },
+        ),
+    ]
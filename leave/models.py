@@ -30,9 +30,14 @@ from horilla.models import HorillaModel
 from horilla_audit.methods import get_diff
 from horilla_audit.models import HorillaAuditInfo, HorillaAuditLog
 from leave.methods import (
+    INACTIVE_LEAVE_STATUSES,
     calculate_requested_days,
     company_leave_dates_list,
     holiday_dates_list,
+    leave_clash_scope,
+    leave_rollup_scope,
+    update_leave_rollup,
+    update_overlapping_leave_clashes,
 )
 
 logger = logging.getLogger(__name__)
@@ -416,10 +421,13 @@ class AvailableLeave(HorillaModel):
         default=timezone.now, verbose_name=_("Assigned Date")
     )
     reset_date = models.DateField(
-        blank=True, null=True, verbose_name=_("Leave Reset Date")
+        blank=True, null=True, db_index=True, verbose_name=_("Leave Reset Date")
     )
     expired_date = models.DateField(
-        blank=True, null=True, verbose_name=_("CarryForward Expired Date")
+        blank=True,
+        null=True,
+        db_index=True,
+        verbose_name=_("CarryForward Expired Date"),
     )
     objects = HorillaCompanyManager(
         related_company_field="employee_id__employee_work_info__company_id"
@@ -550,10 +558,11 @@ class AvailableLeave(HorillaModel):
 
         # Logic for expired_date
         if self.leave_type_id.carryforward_type == "carryforward expire":
-            expiry_date = self.assigned_date
             if self.leave_type_id.carryforward_expire_date:
-                expiry_date = self.leave_type_id.carryforward_expire_date
-            self.expired_date = expiry_date
+                self.expired_date = self.leave_type_id.carryforward_expire_date
+            elif self.expired_date is None:
+                # The expiry moved on by leave_reset is kept
+                self.expired_date = self.assigned_date
 
         # Compute total_leave_days and ensure carryforward_days >= 0
         self.total_leave_days = round(
@@ -628,14 +637,18 @@ class LeaveRequest(HorillaModel):
     leave_type_id = models.ForeignKey(
         LeaveType, on_delete=models.PROTECT, verbose_name=_("Leave Type")
     )
-    start_date = models.DateField(null=False, verbose_name=_("Start Date"))
+    start_date = models.DateField(
+        null=False, db_index=True, verbose_name=_("Start Date")
+    )
     start_date_breakdown = models.CharField(
         max_length=30,
         choices=BREAKDOWN,
         default="full_day",
         verbose_name=_("Start Date Breakdown"),
     )
-    end_date = models.DateField(null=True, blank=True, verbose_name=_("End Date"))
+    end_date = models.DateField(
+        null=True, blank=True, db_index=True, verbose_name=_("End Date")
+    )
     end_date_breakdown = models.CharField(
         max_length=30,
         choices=BREAKDOWN,
@@ -846,14 +859,23 @@ class LeaveRequest(HorillaModel):
         else:
             self.exclude_leaves()
 
-        if self.status in ["cancelled", "rejected"]:
+        if self.status in INACTIVE_LEAVE_STATUSES:
             self.leave_clashes_count = 0
         else:
             self.leave_clashes_count = self.count_leave_clashes()
 
+        previous = (
+            LeaveRequest.objects.entire().filter(pk=self.pk).first()
+            if self.pk
+            else None
+        )
         super().save(*args, **kwargs)
 
-        self.update_leave_clashes_count()
+        self.update_leave_clashes_count(previous)
+        if "approved" in (self.status, getattr(previous, "status", None)):
+            update_leave_rollup(
+                [leave_rollup_scope(previous), leave_rollup_scope(self)]
+            )
         work_info = EmployeeWorkInformation.objects.filter(employee_id=self.employee_id)
         department_id = None
         conditions = None
@@ -1134,10 +1156,11 @@ class LeaveRequest(HorillaModel):
 
     def delete(self, *args, **kwargs):
         if self.status == "requested":
+            scope = leave_clash_scope(self)
             super().delete(*args, **kwargs)
 
-            # Update the leave clashes count for all relevant leave requests
-            self.update_leave_clashes_count()
+            # Update the leave clashes count of the overlapping leave requests
+            update_overlapping_leave_clashes([scope])
         else:
             request = getattr(horilla_middlewares._thread_locals, "request", None)
             if request:
@@ -1147,20 +1170,17 @@ class LeaveRequest(HorillaModel):
                     _("The {} leave request cannot be deleted !").format(self.status),
                 )
 
-    def update_leave_clashes_count(self):
+    def update_leave_clashes_count(self, previous=None):
         """
-        Update the leave clashes count for all leave requests.
+        Update the leave clashes count of the leave requests overlapping the
+        previous or the current dates of this leave request.
         """
-        leave_requests_to_update = LeaveRequest.objects.exclude(
-            Q(id=self.id) | Q(status="cancelled") | Q(status="rejected")
-        )
-
-        for leave_request in leave_requests_to_update:
-            leave_request.leave_clashes_count = leave_request.count_leave_clashes()
-
-        # Bulk update leave clashes count for all leave requests
-        LeaveRequest.objects.bulk_update(
-            leave_requests_to_update, ["leave_clashes_count"]
+        update_overlapping_leave_clashes(
+            [
+                leave_clash_scope(previous) if previous else None,
+                leave_clash_scope(self),
+            ],
+            exclude_ids=[self.id],
         )
 
     def count_leave_clashes(self):
@@ -1171,7 +1191,8 @@ class LeaveRequest(HorillaModel):
         work_info = EmployeeWorkInformation.objects.filter(employee_id=self.employee_id)
         if work_info.exists() and self.status not in ["cancelled", "rejected"]:
             overlapping_requests = (
-                LeaveRequest.objects.exclude(id=self.id)
+                LeaveRequest.objects.entire()
+                .exclude(id=self.id)
                 .filter(
                     (
                         Q(
@@ -1187,13 +1208,57 @@ class LeaveRequest(HorillaModel):
                     start_date__lte=self.end_date,
                     end_date__gte=self.start_date,
                 )
-                .exclude(Q(status="cancelled") | Q(status="rejected"))
+                .exclude(status__in=INACTIVE_LEAVE_STATUSES)
             )
 
             return overlapping_requests.count()
         return 0
 
 
+class LeaveDayRollup(models.Model):
+    """
+    Approved leave days per employee, leave type and date, with the department
+    and company of the employee, read by the leave dashboard charts.
+    Maintained from the approved LeaveRequest records by
+    leave.methods.update_leave_rollup
+    """
+
+    employee_id = models.ForeignKey(
+        Employee, on_delete=models.CASCADE, related_name="leave_day_rollups"
+    )
+    leave_type_id = models.ForeignKey(
+        LeaveType, on_delete=models.CASCADE, related_name="leave_day_rollups"
+    )
+    department_id = models.ForeignKey(
+        Department,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="leave_day_rollups",
+    )
+    company_id = models.ForeignKey(
+        Company,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="leave_day_rollups",
+    )
+    date = models.DateField()
+    days = models.FloatField(default=0)
+    leave_count = models.PositiveIntegerField(default=0)
+    objects = HorillaCompanyManager(related_company_field="company_id")
+
+    class Meta:
+        unique_together = ("employee_id", "leave_type_id", "date")
+        indexes = [
+            models.Index(fields=["date", "department_id"]),
+            models.Index(fields=["date", "leave_type_id"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.employee_id} | {self.leave_type_id} | {self.date} ({self.days})"
+
+
 class LeaverequestFile(models.Model):
     file = models.FileField(upload_to="leave/request_files")
 
@@ -1,59 +1,76 @@
 import calendar
 import datetime as dt
-import sys
 from datetime import datetime, timedelta
 
-from apscheduler.schedulers.background import BackgroundScheduler
 from dateutil.relativedelta import relativedelta
+from django.db import transaction
+
+from horilla.horilla_jobs import register_job
+
+LEAVE_RESET_BATCH_SIZE = 500
+
+
+def _due_available_leaves(today_date, **due_filter):
+    """
+    Yields batches of the available leaves due on or before today, the
+    reset_date and expired_date indexes keep the lookup away from the rows
+    that are not due
+    """
+    from leave.models import AvailableLeave
+
+    queryset = (
+        AvailableLeave.objects.entire()
+        .filter(leave_type_id__reset=True, **due_filter)
+        .select_related("leave_type_id")
+        .order_by("pk")
+    )
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:LEAVE_RESET_BATCH_SIZE])
+        if not batch:
+            return
+        last_pk = batch[-1].pk
+        yield batch
 
 
 def leave_reset():
+    """
+    Resets the available leaves whose reset date is due and expires the due
+    carryforward days.
+
+    Only the due rows are loaded, in bounded batches. Each row is saved with
+    save() so its history and audit log are written. A processed row gets a
+    reset or expiry date after today, so running it again on the same day
+    changes nothing and a missed day is caught up on the next run.
+    """
     from leave.models import LeaveType
 
-    today = datetime.now()
-    today_date = today.date()
-    leave_types = LeaveType.objects.filter(reset=True)
-    # Looping through filtered leave types with reset is true
-    for leave_type in leave_types:
-        # Looping through all available leaves
-        available_leaves = leave_type.employee_available_leave.all()
-
-        for available_leave in available_leaves:
-            reset_date = available_leave.reset_date
-            expired_date = available_leave.expired_date
-            if reset_date == today_date:
+    today_date = datetime.now().date()
+    # Move the expiry of the leave types first, the expiry of their available
+    # leaves is derived from it
+    for leave_type in LeaveType.objects.entire().filter(
+        reset=True, carryforward_expire_date__lte=today_date
+    ):
+        LeaveType.objects.entire().filter(pk=leave_type.pk).update(
+            carryforward_expire_date=leave_type.set_expired_date(today_date)
+        )
+
+    for batch in _due_available_leaves(today_date, reset_date__lte=today_date):
+        with transaction.atomic():
+            for available_leave in batch:
                 available_leave.update_carryforward()
-                # new_reset_date = available_leave.set_reset_date(assigned_date=today_date,available_leave = available_leave)
-                new_reset_date = available_leave.set_reset_date(
+                available_leave.reset_date = available_leave.set_reset_date(
                     assigned_date=today_date, available_leave=available_leave
                 )
-                available_leave.reset_date = new_reset_date
                 available_leave.save()
-            if expired_date and expired_date <= today_date:
-                new_expired_date = available_leave.set_expired_date(
+
+    for batch in _due_available_leaves(today_date, expired_date__lte=today_date):
+        with transaction.atomic():
+            for available_leave in batch:
+                available_leave.expired_date = available_leave.set_expired_date(
                     available_leave=available_leave, assigned_date=today_date
                 )
-                available_leave.expired_date = new_expired_date
                 available_leave.save()
 
-        if (
-            leave_type.carryforward_expire_date
-            and leave_type.carryforward_expire_date <= today_date
-        ):
-            leave_type.carryforward_expire_date = leave_type.set_expired_date(
-                today_date
-            )
-            leave_type.save()
-
-
-if not any(
-    cmd in sys.argv
-    for cmd in ["makemigrations", "migrate", "compilemessages", "flush", "shell"]
-):
-    """
-    Initializes and starts background tasks using APScheduler when the server is running.
-    """
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(leave_reset, "interval", seconds=20)
 
-    scheduler.start()
+register_job(leave_reset, "cron", hour=0, minute=5, run_on_start=True)
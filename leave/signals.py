@@ -7,7 +7,17 @@ from django.db.models.signals import post_migrate, post_save, pre_delete, pre_sa
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
+from employee.models import EmployeeWorkInformation
+from horilla.horilla_middlewares import _thread_locals
 from horilla.methods import get_horilla_model_class
+from horilla.signals import post_bulk_update, pre_bulk_update
+from leave.methods import (
+    ROLLUP_FIELDS,
+    ROLLUP_WORK_INFO_FIELDS,
+    ensure_leave_rollup,
+    refresh_leave_rollup_work_info,
+    update_leave_rollup,
+)
 from leave.models import LeaveRequest
 
 if apps.is_installed("attendance"):
@@ -130,3 +140,97 @@ def add_missing_leave_to_workrecords(sender, **kwargs):
 
     except Exception as e:
         print(f"Error in leave/work records sync: {e}")
+
+
+def _rollup_scopes(rows):
+    return [
+        (
+            row["employee_id"],
+            row["leave_type_id"],
+            row["start_date"],
+            row["end_date"] or row["start_date"],
+        )
+        for row in rows
+    ]
+
+
+@receiver(pre_bulk_update, sender=LeaveRequest)
+def leave_rollup_pre_bulk_update(sender, queryset, *args, **kwargs):
+    """
+    Captures the leave rollup scopes of the requests a queryset update changes
+    """
+    fields = set(kwargs.get("kwargs") or {})
+    if not fields.intersection(ROLLUP_FIELDS):
+        return
+    records = getattr(_thread_locals, "leave_rollup_bulk_records", {})
+    records[id(queryset)] = list(
+        queryset.values("id", "employee_id", "leave_type_id", "start_date", "end_date")
+    )
+    _thread_locals.leave_rollup_bulk_records = records
+
+
+@receiver(post_bulk_update, sender=LeaveRequest)
+def leave_rollup_post_bulk_update(sender, queryset, *args, **kwargs):
+    """
+    Recomputes the leave rollup of the requests changed by a queryset update,
+    in their previous and current scopes
+    """
+    records = getattr(_thread_locals, "leave_rollup_bulk_records", {})
+    previous = records.pop(id(queryset), None)
+    if not previous:
+        return
+    current = (
+        LeaveRequest.objects.entire()
+        .filter(id__in=[row["id"] for row in previous])
+        .values("employee_id", "leave_type_id", "start_date", "end_date")
+    )
+    update_leave_rollup(_rollup_scopes(previous) + _rollup_scopes(current))
+
+
+@receiver(post_save, sender=EmployeeWorkInformation)
+def leave_rollup_work_info_post_save(sender, instance, **kwargs):
+    """
+    Moves the leave rollup of the employee to their current department and
+    company
+    """
+    if instance.employee_id_id:
+        refresh_leave_rollup_work_info([instance.employee_id_id])
+
+
+@receiver(pre_bulk_update, sender=EmployeeWorkInformation)
+def leave_rollup_work_info_pre_bulk_update(sender, queryset, *args, **kwargs):
+    """
+    Captures the employees whose department or company a queryset update of
+    the work information changes
+    """
+    fields = set(kwargs.get("kwargs") or {})
+    if not fields.intersection(ROLLUP_WORK_INFO_FIELDS):
+        return
+    records = getattr(_thread_locals, "leave_rollup_work_info_records", {})
+    records[id(queryset)] = list(
+        queryset.exclude(employee_id=None).values_list("employee_id", flat=True)
+    )
+    _thread_locals.leave_rollup_work_info_records = records
+
+
+@receiver(post_bulk_update, sender=EmployeeWorkInformation)
+def leave_rollup_work_info_post_bulk_update(sender, queryset, *args, **kwargs):
+    """
+    Moves the leave rollup of the employees changed by a queryset update to
+    their current department and company
+    """
+    records = getattr(_thread_locals, "leave_rollup_work_info_records", {})
+    employee_ids = records.pop(id(queryset), None)
+    if employee_ids:
+        refresh_leave_rollup_work_info(employee_ids)
+
+
+@receiver(post_migrate)
+def fill_leave_rollup(sender, **kwargs):
+    """
+    Fills the leave rollup of the existing approved leave requests once the
+    table exists
+    """
+    if sender.label != "leave":
+        return
+    ensure_leave_rollup()
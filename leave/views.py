@@ -3,6 +3,7 @@ views.py
 """
 
 import ast
+import calendar
 import contextlib
 import json
 from collections import defaultdict
@@ -15,7 +16,7 @@ from django.apps import apps
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db import transaction
-from django.db.models import ProtectedError, Q
+from django.db.models import ProtectedError, Q, Sum
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
@@ -1632,19 +1633,19 @@ def leave_assign(request):
             if new_assignments:
                 with transaction.atomic():
                     AvailableLeave.objects.bulk_create(new_assignments)
-                    for user_id in success_messages:
-                        with contextlib.suppress(Exception):
-                            notify.send(
-                                request.user.employee_get,
-                                recipient=user_id,
-                                verb="New leave type is assigned to you",
-                                verb_ar="تم تعيين نوع إجازة جديد لك",
-                                verb_de="Dir wurde ein neuer Urlaubstyp zugewiesen",
-                                verb_es="Se te ha asignado un nuevo tipo de permiso",
-                                verb_fr="Un nouveau type de congé vous a été attribué",
-                                icon="people-circle",
-                                redirect=reverse("user-request-view"),
-                            )
+                    with contextlib.suppress(Exception):
+                        notify.send(
+                            request.user.employee_get,
+                            recipient=list(success_messages),
+                            verb="New leave type is assigned to you",
+                            verb_ar="تم تعيين نوع إجازة جديد لك",
+                            verb_de="Dir wurde ein neuer Urlaubstyp zugewiesen",
+                            verb_es="Se te ha asignado un nuevo tipo de permiso",
+                            verb_fr="Un nouveau type de congé vous a été attribué",
+                            icon="people-circle",
+                            redirect=reverse("user-request-view"),
+                            defer=True,
+                        )
                     messages.success(request, _("Leave types assigned successfully."))
 
             if info_messages:
@@ -2857,15 +2858,17 @@ def available_leave_chart(request):
     GET : return Json response of labels, dataset, message.
     """
     user = Employee.objects.get(employee_user_id=request.user)
-    available_leaves = AvailableLeave.objects.filter(employee_id=user).exclude(
-        available_days=0
+    available_leaves = (
+        AvailableLeave.objects.filter(employee_id=user)
+        .exclude(available_days=0)
+        .values_list("leave_type_id__name", "available_days", "carryforward_days")
     )
     leave_count = []
     labels = []
-    for leave in available_leaves:
-        leave_count.append(leave.available_days + leave.carryforward_days)
+    for name, available_days, carryforward_days in available_leaves:
+        leave_count.append(available_days + carryforward_days)
 
-        labels.append(leave.leave_type_id.name)
+        labels.append(name)
     dataset = [
         {
             "label": _("Total leaves available"),
@@ -2880,6 +2883,19 @@ def available_leave_chart(request):
     return JsonResponse(response)
 
 
+def month_leave_rollup(request):
+    """
+    Returns the LeaveDayRollup rows of the month in the date GET parameter,
+    the current month by default
+    """
+    day = date.today()
+    if request.GET.get("date"):
+        day = datetime.strptime(request.GET.get("date"), "%Y-%m").date()
+    month_start = day.replace(day=1)
+    month_end = day.replace(day=calendar.monthrange(day.year, day.month)[1])
+    return LeaveDayRollup.objects.filter(date__range=(month_start, month_end))
+
+
 @login_required
 def employee_leave_chart(request):
     """
@@ -2891,59 +2907,39 @@ def employee_leave_chart(request):
     Returns:
     GET : return Json response of labels, dataset, message.
     """
-
-    day = date.today()
-    if request.GET.get("date"):
-        day = request.GET.get("date")
-        day = datetime.strptime(day, "%Y-%m")
-
-    leave_requests = LeaveRequest.objects.filter(
-        employee_id__is_active=True, status="approved"
-    )
-    leave_requests = leave_requests.filter(
-        start_date__month=day.month, start_date__year=day.year
-    )
-
-    leave_types = leave_requests.values_list("leave_type_id__name", flat=True)
-
-    labels = []
-    dataset = []
-    for employee in leave_requests.filter(
-        start_date__month=day.month, start_date__year=day.year
-    ):
-        labels.append(employee.employee_id)
-
-    for leave_type in list(set(leave_types)):
-        dataset.append(
-            {
-                "label": leave_type,
-                "data": [],
-            }
+    totals = (
+        month_leave_rollup(request)
+        .filter(employee_id__is_active=True)
+        .values(
+            "employee_id",
+            "employee_id__employee_first_name",
+            "employee_id__employee_last_name",
+            "leave_type_id__name",
         )
+        .annotate(total=Sum("days"))
+        .order_by()
+    )
 
-    labels = list(set(labels))
+    employees = {}
     total_leave_with_type = defaultdict(lambda: defaultdict(float))
-
-    for label in labels:
-        leaves = leave_requests.filter(
-            employee_id=label, start_date__month=day.month, start_date__year=day.year
+    for row in totals:
+        employees[row["employee_id"]] = (
+            f"{row['employee_id__employee_first_name']} "
+            f"{row['employee_id__employee_last_name']}"
         )
-        for leave in leaves:
-            total_leave_with_type[leave.leave_type_id.name][label] += round(
-                leave.requested_days, 2
-            )
-
-    for data in dataset:
-        dataset_label = data["label"]
-        data["data"] = [total_leave_with_type[dataset_label][label] for label in labels]
-
-    employee_label = []
-    for employee in list(set(labels)):
-        employee_label.append(
-            f"{employee.employee_first_name} {employee.employee_last_name}"
+        total_leave_with_type[row["leave_type_id__name"]][row["employee_id"]] += round(
+            row["total"], 2
         )
+
+    dataset = [
+        {
+            "label": leave_type,
+            "data": [employee_totals[employee] for employee in employees],
+        }
+        for leave_type, employee_totals in total_leave_with_type.items()
+    ]
     response = {
-        "labels": employee_label,
+        "labels": list(employees.values()),
         "dataset": dataset,
         "message": _("No leave request this month"),
     }
@@ -2961,32 +2957,19 @@ def department_leave_chart(request):
     Returns:
     GET : return Json response of labels, dataset.
     """
-    day = date.today()
-    if request.GET.get("date"):
-        day = request.GET.get("date")
-        day = datetime.strptime(day, "%Y-%m")
-
-    departments = Department.objects.all()
-    department_counts = {dep.department: 0 for dep in departments}
-    leave_request = LeaveRequest.objects.filter(status="approved")
-    leave_request = leave_request.filter(
-        start_date__month=day.month, start_date__year=day.year
+    totals = (
+        month_leave_rollup(request)
+        .filter(department_id__isnull=False)
+        .values("department_id__department")
+        .annotate(total=Sum("days"))
+        .exclude(total=0)
+        .order_by("department_id")
     )
-    leave_dates = []
     labels = []
-    for leave in leave_request:
-        for leave_date in leave.requested_dates():
-            leave_dates.append(leave_date.strftime("%Y-%m-%d"))
-
-        for dep in departments:
-            if dep == leave.employee_id.employee_work_info.department_id:
-                department_counts[dep.department] += leave.requested_days
-
-    for department, count in department_counts.items():
-        if count != 0:
-            labels.append(department)
-    values = list(department_counts.values())
-    values = [value for value in values if value != 0]
+    values = []
+    for row in totals:
+        labels.append(row["department_id__department"])
+        values.append(row["total"])
     dataset = [
         {
             "label": _(""),
@@ -3012,29 +2995,18 @@ def leave_type_chart(request):
     Returns:
     GET : return Json response of labels, dataset.
     """
-    day = date.today()
-    if request.GET.get("date"):
-        day = request.GET.get("date")
-        day = datetime.strptime(day, "%Y-%m")
-
-    leave_types = LeaveType.objects.all()
-    leave_type_count = {types.name: 0 for types in leave_types}
-    leave_request = LeaveRequest.objects.filter(status="approved")
-    leave_request = leave_request.filter(
-        start_date__month=day.month, start_date__year=day.year
+    totals = (
+        month_leave_rollup(request)
+        .values("leave_type_id__name")
+        .annotate(total=Sum("days"))
+        .exclude(total=0)
+        .order_by("leave_type_id")
     )
-    for leave in leave_request:
-        for lev in leave_types:
-            if lev == leave.leave_type_id:
-                leave_type_count[lev.name] += leave.requested_days
-
-    # labels = [leave_type.name for leave_type in leave_types]
     labels = []
-    for leave_type, count in leave_type_count.items():
-        if count != 0:
-            labels.append(leave_type)
-    values = list(leave_type_count.values())
-    values = [value for value in values if value != 0]
+    values = []
+    for row in totals:
+        labels.append(row["leave_type_id__name"])
+        values.append(row["total"])
 
     response = {
         "labels": labels,
@@ -3063,25 +3035,18 @@ def leave_over_period(request):
     start_of_week = today - timedelta(days=today.weekday())
     week_dates = [start_of_week + timedelta(days=i) for i in range(6)]
 
-    leave_in_week = []
-
-    leave_request = LeaveRequest.objects.filter(status="approved")
-    leave_dates = []
-    for leave in leave_request:
-        for leave_date in leave.requested_dates():
-            leave_dates.append(leave_date)
-
-    filtered_dates = [
-        day
-        for day in leave_dates
-        if day.month == today.month and day.year == today.year
-    ]
-    for week_date in week_dates:
-        days = []
-        for filtered_date in filtered_dates:
-            if filtered_date == week_date:
-                days.append(filtered_date)
-        leave_in_week.append(len(days))
+    leave_counts = dict(
+        LeaveDayRollup.objects.filter(
+            date__range=(week_dates[0], week_dates[-1]),
+            date__month=today.month,
+            date__year=today.year,
+        )
+        .values("date")
+        .annotate(total=Sum("leave_count"))
+        .values_list("date", "total")
+        .order_by()
+    )
+    leave_in_week = [leave_counts.get(week_date, 0) for week_date in week_dates]
 
     dataset = (
         {
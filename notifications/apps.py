@@ -11,6 +11,7 @@ class Config(AppConfig):
     def ready(self):
         super(Config, self).ready()
         # this is for backwards compability
+        import notifications.counters
         import notifications.signals
 
         notifications.notify = notifications.signals.notify
@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
 # pylint: disable=too-many-lines
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from distutils.version import (  # pylint: disable=no-name-in-module,import-error
     StrictVersion,
 )
@@ -9,7 +13,7 @@ from django.conf import settings
 from django.contrib.auth.models import Group
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ImproperlyConfigured
-from django.db import models
+from django.db import connections, models, transaction
 from django.db.models import JSONField
 from django.db.models.query import QuerySet
 from django.utils import timezone
@@ -27,6 +31,12 @@ else:
 
 
 EXTRA_DATA = notifications_settings.get_config()["USE_JSONFIELD"]
+NOTIFY_BATCH_SIZE = 1000
+NOTIFY_WORKERS = 2
+
+logger = logging.getLogger(__name__)
+_notify_executor = None
+_notify_executor_lock = threading.Lock()
 
 
 def is_soft_delete():
@@ -270,14 +280,92 @@ class AbstractNotification(models.Model):
             self.save()
 
 
+def _recipient_ids(recipient):
+    """
+    Returns the user ids of a notification recipient, a user, a user id, a
+    Group or a list or queryset of users or user ids
+    """
+    Notification = load_model("notifications", "Notification")
+    user_model = Notification._meta.get_field("recipient").related_model
+    if isinstance(recipient, Group):
+        return list(recipient.user_set.values_list("pk", flat=True))
+    if isinstance(recipient, QuerySet):
+        if not issubclass(recipient.model, user_model):
+            raise ValueError(f"Cannot notify {recipient.model.__name__} records")
+        return list(recipient.values_list("pk", flat=True))
+    if not isinstance(recipient, (list, tuple, set)):
+        recipient = [recipient]
+    recipient_ids = []
+    for user in recipient:
+        if isinstance(user, models.Model):
+            if not isinstance(user, user_model):
+                raise ValueError(f"Cannot notify {user.__class__.__name__} records")
+            user = user.pk
+        if user is not None:
+            recipient_ids.append(user)
+    return recipient_ids
+
+
+def create_notifications(recipient_ids, fields, batch_size=NOTIFY_BATCH_SIZE):
+    """
+    Inserts one notification per recipient with the given field values, in
+    chunks of batch_size rows
+    """
+    from notifications.counters import notifications_created
+
+    Notification = load_model("notifications", "Notification")
+    notifications = [
+        Notification(recipient_id=recipient_id, **fields)
+        for recipient_id in recipient_ids
+    ]
+    Notification.objects.bulk_create(notifications, batch_size=batch_size)
+    if fields.get("unread", True) and not fields.get("deleted", False):
+        notifications_created(Counter(recipient_ids))
+    return notifications
+
+
+def _create_deferred_notifications(recipient_ids, fields):
+    try:
+        create_notifications(recipient_ids, fields)
+    except Exception:
+        logger.exception(
+            "Deferred notifications to %s users failed", len(recipient_ids)
+        )
+    finally:
+        connections.close_all()
+
+
+def defer_notifications(recipient_ids, fields):
+    """
+    Writes the notifications on the background notification worker once the
+    current transaction commits
+    """
+    global _notify_executor
+    with _notify_executor_lock:
+        if _notify_executor is None:
+            _notify_executor = ThreadPoolExecutor(
+                max_workers=NOTIFY_WORKERS, thread_name_prefix="notifications"
+            )
+    transaction.on_commit(
+        lambda: _notify_executor.submit(
+            _create_deferred_notifications, recipient_ids, fields
+        )
+    )
+
+
 def notify_handler(verb, **kwargs):
     """
     Handler function to create Notification instance upon action signal call.
+
+    The notifications of every recipient are inserted together. Pass
+    ``defer=True`` to write them on the background notification worker, the
+    handler then returns an empty list.
     """
     # Pull the options out of kwargs
     kwargs.pop("signal", None)
     recipient = kwargs.pop("recipient")
     actor = kwargs.pop("sender")
+    defer = bool(kwargs.pop("defer", False))
     optional_objs = [
         (kwargs.pop(opt, None), opt) for opt in ("target", "action_object")
     ]
@@ -287,48 +375,34 @@ def notify_handler(verb, **kwargs):
     Notification = load_model("notifications", "Notification")
     level = kwargs.pop("level", Notification.LEVELS.info)
 
-    # Check if User or Group
-    if isinstance(recipient, Group):
-        recipients = recipient.user_set.all()
-    elif isinstance(recipient, (QuerySet, list)):
-        recipients = recipient
-    else:
-        recipients = [recipient]
-
-    new_notifications = []
-
-    for recipient in recipients:
-        newnotify = Notification(
-            recipient=recipient,
-            actor_content_type=ContentType.objects.get_for_model(actor),
-            actor_object_id=actor.pk,
-            verb=str(verb),
-            public=public,
-            description=description,
-            timestamp=timestamp,
-            level=level,
-        )
-
-        # Set optional objects
-        for obj, opt in optional_objs:
-            if obj is not None:
-                setattr(newnotify, "%s_object_id" % opt, obj.pk)
-                setattr(
-                    newnotify,
-                    "%s_content_type" % opt,
-                    ContentType.objects.get_for_model(obj),
-                )
-
-        if kwargs and EXTRA_DATA:
-            newnotify.data = kwargs
-            newnotify.verb_ar = newnotify.data.get("verb_ar", None)
-            newnotify.verb_de = newnotify.data.get("verb_de", None)
-            newnotify.verb_es = newnotify.data.get("verb_es", None)
-            newnotify.verb_fr = newnotify.data.get("verb_fr", None)
-        newnotify.save()
-        new_notifications.append(newnotify)
-
-    return new_notifications
+    fields = {
+        "actor_content_type": ContentType.objects.get_for_model(actor),
+        "actor_object_id": actor.pk,
+        "verb": str(verb),
+        "public": public,
+        "description": description,
+        "timestamp": timestamp,
+        "level": level,
+    }
+
+    # Set optional objects
+    for obj, opt in optional_objs:
+        if obj is not None:
+            fields["%s_object_id" % opt] = obj.pk
+            fields["%s_content_type" % opt] = ContentType.objects.get_for_model(obj)
+
+    if kwargs and EXTRA_DATA:
+        fields["data"] = kwargs
+        fields["verb_ar"] = kwargs.get("verb_ar", None)
+        fields["verb_de"] = kwargs.get("verb_de", None)
+        fields["verb_es"] = kwargs.get("verb_es", None)
+        fields["verb_fr"] = kwargs.get("verb_fr", None)
+
+    recipient_ids = _recipient_ids(recipient)
+    if defer:
+        defer_notifications(recipient_ids, fields)
+        return []
+    return create_notifications(recipient_ids, fields)
 
 
 # connect the signal
@@ -0,0 +1,127 @@
+"""
+notifications/counters.py
+
+Cached per user unread notification counters.
+
+Creating notifications increments the counter of their recipients, reading,
+marking or deleting them drops it so the next read counts again. Every change
+also stamps the user's change marker watched by the notification stream.
+The counters expire after UNREAD_COUNT_TIMEOUT seconds, which bounds their
+staleness when every process keeps its own cache.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from swapper import get_model_name, load_model
+
+from horilla.horilla_middlewares import _thread_locals
+from horilla.signals import post_bulk_update, pre_bulk_update
+
+UNREAD_COUNT_TIMEOUT = 60
+CHANGE_MARKER_TIMEOUT = 60 * 60
+
+
+def _count_key(user_id):
+    return f"notifications-unread-{user_id}"
+
+
+def change_marker_key(user_id):
+    """
+    Cache key of the marker stamped on every notification change of the user
+    """
+    return f"notifications-changed-{user_id}"
+
+
+def unread_count(user):
+    """
+    Returns the unread notification count of the user or user id
+    """
+    user_id = getattr(user, "pk", user)
+    key = _count_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        Notification = load_model("notifications", "Notification")
+        count = Notification.objects.filter(recipient_id=user_id).unread().count()
+        cache.set(key, count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def _stamp(user_ids):
+    now = time.time()
+    cache.set_many(
+        {change_marker_key(user_id): now for user_id in user_ids},
+        CHANGE_MARKER_TIMEOUT,
+    )
+
+
+def notifications_created(counts):
+    """
+    Adds the new unread notifications, {user id: count}, to the counters once
+    the current transaction commits
+    """
+
+    def update():
+        for user_id, count in counts.items():
+            try:
+                cache.incr(_count_key(user_id), count)
+            except ValueError:
+                # Not cached, counted on the next read
+                pass
+        _stamp(counts)
+
+    if counts:
+        transaction.on_commit(update)
+
+
+def notifications_changed(user_ids):
+    """
+    Drops the counters of the users once the current transaction commits
+    """
+    user_ids = set(user_ids)
+
+    def update():
+        cache.delete_many([_count_key(user_id) for user_id in user_ids])
+        _stamp(user_ids)
+
+    if user_ids:
+        transaction.on_commit(update)
+
+
+@receiver(post_save, sender=get_model_name("notifications", "Notification"))
+def notification_saved(sender, instance, created, **kwargs):
+    if created and instance.unread and not instance.deleted:
+        notifications_created({instance.recipient_id: 1})
+    elif not created:
+        notifications_changed([instance.recipient_id])
+
+
+@receiver(post_delete, sender=get_model_name("notifications", "Notification"))
+def notification_deleted(sender, instance, **kwargs):
+    notifications_changed([instance.recipient_id])
+
+
+def notification_pre_bulk_update(sender, queryset, *args, **kwargs):
+    records = getattr(_thread_locals, "notification_bulk_recipients", {})
+    records[id(queryset)] = set(
+        queryset.order_by().values_list("recipient_id", flat=True).distinct()
+    )
+    _thread_locals.notification_bulk_recipients = records
+
+
+def notification_post_bulk_update(sender, queryset, *args, **kwargs):
+    records = getattr(_thread_locals, "notification_bulk_recipients", {})
+    notifications_changed(records.pop(id(queryset), ()))
+
+
+pre_bulk_update.connect(
+    notification_pre_bulk_update,
+    sender=load_model("notifications", "Notification"),
+)
+post_bulk_update.connect(
+    notification_post_bulk_update,
+    sender=load_model("notifications", "Notification"),
+)
@@ -1,6 +1,7 @@
 var notify_badge_class;
 var notify_menu_class;
 var notify_api_url;
+var notify_stream_url;
 var notify_fetch_count;
 var notify_unread_url;
 var notify_mark_all_unread_url;
@@ -40,6 +41,35 @@ function register_notifier(func) {
     registered_functions.push(func);
 }
 
+function dispatch_notification_data(data) {
+    for (var i = 0; i < registered_functions.length; i++) {
+        registered_functions[i](data);
+    }
+}
+
+function open_notification_stream() {
+    // The server pushes the unread list on every change, it answers 204 when
+    // it cannot stream and the page falls back to polling
+    if (
+        !notify_stream_url ||
+        typeof EventSource === "undefined" ||
+        registered_functions.length === 0
+    ) {
+        return false;
+    }
+    var source = new EventSource(notify_stream_url);
+    source.addEventListener("message", function (event) {
+        consecutive_misfires = 0;
+        dispatch_notification_data(JSON.parse(event.data));
+    });
+    source.addEventListener("error", function () {
+        if (source.readyState === EventSource.CLOSED) {
+            fetch_api_data();
+        }
+    });
+    return true;
+}
+
 function fetch_api_data() {
     if (registered_functions.length > 0) {
         //only fetch data if a function is setup
@@ -48,10 +78,7 @@ function fetch_api_data() {
             if (this.readyState === 4) {
                 if (this.status === 200) {
                     consecutive_misfires = 0;
-                    var data = JSON.parse(r.responseText);
-                    for (var i = 0; i < registered_functions.length; i++) {
-                        registered_functions[i](data);
-                    }
+                    dispatch_notification_data(JSON.parse(r.responseText));
                 } else {
                     consecutive_misfires++;
                 }
@@ -73,4 +100,8 @@ function fetch_api_data() {
     }
 }
 
-setTimeout(fetch_api_data, 1000);
+setTimeout(function () {
+    if (!open_notification_stream()) {
+        fetch_api_data();
+    }
+}, 1000);
@@ -9,6 +9,8 @@ from django import get_version
 from django.template import Library
 from django.utils.html import format_html
 
+from notifications.counters import unread_count
+
 try:
     from django.urls import reverse
 except ImportError:
@@ -23,7 +25,7 @@ def notifications_unread(context):
     user = user_context(context)
     if not user:
         return ""
-    return user.notifications.unread().count()
+    return unread_count(user)
 
 
 if StrictVersion(get_version()) >= StrictVersion("2.0"):
@@ -39,7 +41,7 @@ else:
 @register.filter
 def has_notification(user):
     if user:
-        return user.notifications.unread().exists()
+        return unread_count(user) > 0
     return False
 
 
@@ -55,8 +57,12 @@ def register_notify_callbacks(
 ):
     refresh_period = int(refresh_period) * 1000
 
+    stream_url = ""
     if api_name == "list":
         api_url = reverse("notifications:live_unread_notification_list")
+        stream_url = "{}?max={}".format(
+            reverse("notifications:live_unread_notification_stream"), fetch
+        )
     elif api_name == "count":
         api_url = reverse("notifications:live_unread_notification_count")
     else:
@@ -65,6 +71,7 @@ def register_notify_callbacks(
         notify_badge_class='{badge_class}';
         notify_menu_class='{menu_class}';
         notify_api_url='{api_url}';
+        notify_stream_url='{stream_url}';
         notify_fetch_count='{fetch_count}';
         notify_unread_url='{unread_url}';
         notify_mark_all_unread_url='{mark_all_unread_url}';
@@ -74,6 +81,7 @@ def register_notify_callbacks(
         menu_class=menu_class,
         refresh=refresh_period,
         api_url=api_url,
+        stream_url=stream_url,
         unread_url=reverse("notifications:unread"),
         mark_all_unread_url=reverse("notifications:mark_all_as_read"),
         fetch_count=fetch,
@@ -93,7 +101,7 @@ def live_notify_badge(context, badge_class="live_notify_badge"):
         return ""
 
     html = "<span class='{badge_class}'>{unread}</span>".format(
-        badge_class=badge_class, unread=user.notifications.unread().count()
+        badge_class=badge_class, unread=unread_count(user)
     )
     return format_html(html)
 
@@ -1,13 +1,20 @@
 # -*- coding: utf-8 -*-
 """ Django Notifications example views """
+import asyncio
+import json
+import time
 from distutils.version import (  # pylint: disable=no-name-in-module,import-error
     StrictVersion,
 )
 
+from asgiref.sync import sync_to_async
 from django import get_version
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
 from django.forms import model_to_dict
-from django.http import HttpResponse  # noqa
+from django.http import HttpResponse, StreamingHttpResponse  # noqa
 from django.shortcuts import get_object_or_404, redirect
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import never_cache
@@ -16,6 +23,7 @@ from swapper import load_model
 
 from base.models import NotificationSound
 from notifications import settings
+from notifications.counters import change_marker_key, unread_count
 from notifications.settings import get_config
 from notifications.utils import id2slug, slug2id
 
@@ -25,8 +33,6 @@ if StrictVersion(get_version()) >= StrictVersion("1.7.0"):
     from django.http import JsonResponse  # noqa
 else:
     # Django 1.6 doesn't have a proper JsonResponse
-    import json
-
     def date_handler(obj):
         return obj.isoformat() if hasattr(obj, "isoformat") else obj
 
@@ -132,6 +138,44 @@ def delete(request, slug=None):
     return redirect("notifications:all")
 
 
+def notification_struct(notification):
+    """
+    Returns the json struct of the notification
+    """
+    struct = model_to_dict(notification)
+    struct["slug"] = id2slug(notification.id)
+    if notification.actor:
+        struct["actor"] = str(notification.actor)
+    if notification.target:
+        struct["target"] = str(notification.target)
+    if notification.action_object:
+        struct["action_object"] = str(notification.action_object)
+    if notification.data:
+        struct["data"] = notification.data
+    return struct
+
+
+def unread_notification_data(user, num_to_fetch, mark_as_read=False):
+    """
+    Returns the unread count and the latest unread notifications of the user,
+    the generic relations of the notifications are fetched per content type
+    """
+    notifications = (
+        Notification.objects.filter(recipient=user)
+        .unread()
+        .prefetch_related("actor", "target", "action_object")[0:num_to_fetch]
+    )
+    unread_list = []
+    for notification in notifications:
+        unread_list.append(notification_struct(notification))
+        if mark_as_read:
+            notification.mark_as_read()
+    return {
+        "unread_count": unread_count(user),
+        "unread_list": unread_list,
+    }
+
+
 @never_cache
 def live_unread_notification_count(request):
     try:
@@ -143,7 +187,7 @@ def live_unread_notification_count(request):
         data = {"unread_count": 0}
     else:
         data = {
-            "unread_count": request.user.notifications.unread().count(),
+            "unread_count": unread_count(request.user),
         }
     return JsonResponse(data)
 
@@ -170,26 +214,9 @@ def live_unread_notification_list(request):
     except ValueError:  # If casting to an int fails.
         num_to_fetch = default_num_to_fetch
 
-    unread_list = []
-
-    for notification in request.user.notifications.unread()[0:num_to_fetch]:
-        struct = model_to_dict(notification)
-        struct["slug"] = id2slug(notification.id)
-        if notification.actor:
-            struct["actor"] = str(notification.actor)
-        if notification.target:
-            struct["target"] = str(notification.target)
-        if notification.action_object:
-            struct["action_object"] = str(notification.action_object)
-        if notification.data:
-            struct["data"] = notification.data
-        unread_list.append(struct)
-        if request.GET.get("mark_as_read"):
-            notification.mark_as_read()
-    data = {
-        "unread_count": request.user.notifications.unread().count(),
-        "unread_list": unread_list,
-    }
+    data = unread_notification_data(
+        request.user, num_to_fetch, bool(request.GET.get("mark_as_read"))
+    )
     return JsonResponse(data)
 
 
@@ -217,18 +244,10 @@ def live_all_notification_list(request):
 
     all_list = []
 
-    for notification in request.user.notifications.all()[0:num_to_fetch]:
-        struct = model_to_dict(notification)
-        struct["slug"] = id2slug(notification.id)
-        if notification.actor:
-            struct["actor"] = str(notification.actor)
-        if notification.target:
-            struct["target"] = str(notification.target)
-        if notification.action_object:
-            struct["action_object"] = str(notification.action_object)
-        if notification.data:
-            struct["data"] = notification.data
-        all_list.append(struct)
+    for notification in request.user.notifications.all().prefetch_related(
+        "actor", "target", "action_object"
+    )[0:num_to_fetch]:
+        all_list.append(notification_struct(notification))
         if request.GET.get("mark_as_read"):
             notification.mark_as_read()
     data = {"all_count": request.user.notifications.count(), "all_list": all_list}
@@ -250,6 +269,75 @@ def live_all_notification_count(request):
     return JsonResponse(data)
 
 
+STREAM_POLL_INTERVAL = 2
+STREAM_CHECK_INTERVAL = 30
+STREAM_KEEPALIVE_INTERVAL = 15
+STREAM_DURATION = 5 * 60
+
+
+async def _unread_notification_events(user, num_to_fetch):
+    """
+    Yields a server sent event with the unread notification data whenever it
+    changes. The change marker of the user is read from the cache every
+    STREAM_POLL_INTERVAL seconds, the database only when it moved or every
+    STREAM_CHECK_INTERVAL seconds for changes made in other processes.
+    """
+    yield f"retry: {STREAM_CHECK_INTERVAL * 1000}\n\n"
+    started = last_sent = time.monotonic()
+    marker = last_check = last_state = None
+    while time.monotonic() - started < STREAM_DURATION:
+        now = time.monotonic()
+        current_marker = await cache.aget(change_marker_key(user.pk))
+        if (
+            last_check is None
+            or current_marker != marker
+            or now - last_check >= STREAM_CHECK_INTERVAL
+        ):
+            marker, last_check = current_marker, now
+            data = await sync_to_async(unread_notification_data)(user, num_to_fetch)
+            state = (
+                data["unread_count"],
+                [struct["id"] for struct in data["unread_list"]],
+            )
+            if state != last_state:
+                last_state, last_sent = state, now
+                yield f"data: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+        if now - last_sent >= STREAM_KEEPALIVE_INTERVAL:
+            last_sent = now
+            yield ": keepalive\n\n"
+        await asyncio.sleep(STREAM_POLL_INTERVAL)
+
+
+async def live_unread_notification_stream(request):
+    """
+    Server sent event stream of the unread notification data, in the format of
+    live_unread_notification_list. The stream needs the ASGI application, under
+    WSGI it answers 204 and the clients keep polling. Streams end after
+    STREAM_DURATION seconds, the clients reconnect.
+    """
+    user = await sync_to_async(
+        lambda: request.user if request.user.is_authenticated else None
+    )()
+    if user is None or not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    default_num_to_fetch = get_config()["NUM_TO_FETCH"]
+    try:
+        num_to_fetch = int(request.GET.get("max", default_num_to_fetch))
+        if not (1 <= num_to_fetch <= 100):
+            num_to_fetch = default_num_to_fetch
+    except ValueError:
+        num_to_fetch = default_num_to_fetch
+
+    response = StreamingHttpResponse(
+        _unread_notification_events(user, num_to_fetch),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @login_required
 def notification_sound(request):
     employee = request.user.employee_get
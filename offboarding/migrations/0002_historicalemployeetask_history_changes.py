@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("offboarding", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="historicalemployeetask",
+            name="history_changes",
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -26,13 +26,5 @@ class PayrollConfig(AppConfig):
         urlpatterns.append(
             path("payroll/", include("payroll.urls.urls")),
         )
-        try:
-            from payroll.scheduler import auto_payslip_generate
-
-            auto_payslip_generate()
-        except:
-            """
-            Migrations are not affected
-            """
 
         return ready
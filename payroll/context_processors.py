@@ -4,24 +4,31 @@ context_processor.py
 This module is used to register context processor`
 """
 
+from base.context_processors import cached_context_processor
 from employee.models import Employee
 from payroll.models import tax_models as models
 from payroll.models.models import Deduction
 
 
+@cached_context_processor("payroll_currency", models=["payroll.PayrollSettings"])
+def _payroll_currency(request):
+    settings = models.PayrollSettings.objects.first()
+    if settings is None:
+        settings = models.PayrollSettings()
+        settings.currency_symbol = "$"
+        settings.save()
+        settings = models.PayrollSettings.objects.first()
+    return {"currency": settings.currency_symbol, "position": settings.position}
+
+
 def default_currency(request):
     """
     This method will return the currency
     """
-    if models.PayrollSettings.objects.first() is None:
-        settings = models.PayrollSettings()
-        settings.currency_symbol = "$"
-        settings.save()
-    symbol = models.PayrollSettings.objects.first().currency_symbol
-    position = models.PayrollSettings.objects.first().position
+    currency = _payroll_currency(request)
     return {
-        "currency": request.session.get("currency", symbol),
-        "position": request.session.get("position", position),
+        "currency": request.session.get("currency", currency["currency"]),
+        "position": request.session.get("position", currency["position"]),
     }
 
 
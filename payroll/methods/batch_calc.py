@@ -0,0 +1,474 @@
+"""
+batch_calc.py
+
+This module is used to compute payslips for a whole cohort of employees.
+
+The per-employee payroll methods query contracts, pay heads, leaves, attendance
+and tax brackets on every call. While a ``PayrollBatch`` is active those methods
+read from the data prefetched here once for the whole cohort, so the same
+``payslip_data`` dictionaries are produced with a handful of queries.
+"""
+
+import json
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Q
+
+from base.methods import get_company_leave_dates, get_holiday_dates, get_working_days
+from horilla.methods import get_horilla_model_class
+from payroll.models.models import Allowance, Contract, Deduction, Payslip
+from payroll.models.tax_models import TaxBracket
+
+_batch_locals = threading.local()
+
+
+def get_active_batch():
+    """
+    Returns the PayrollBatch active on the current thread, if any
+    """
+    return getattr(_batch_locals, "batch", None)
+
+
+@contextmanager
+def payroll_batch(employees, start_date, end_date):
+    """
+    Activate a prefetched PayrollBatch for the current thread
+
+    Args:
+        employees (iterable): Employee instances, ids or queryset
+        start_date (date): The earliest start date of the payslips in the batch
+        end_date (date): The end date of the payslips in the batch
+    """
+    previous = get_active_batch()
+    batch = PayrollBatch(employees, start_date, end_date)
+    _batch_locals.batch = batch
+    try:
+        yield batch
+    finally:
+        _batch_locals.batch = previous
+
+
+def _in_period(component, start_date, end_date):
+    """
+    Mirrors the one_time_date exclusion applied to allowance/deduction querysets
+    """
+    one_time_date = component.one_time_date
+    return one_time_date is None or start_date <= one_time_date <= end_date
+
+
+class PayrollBatch:
+    """
+    Prefetched payroll data for a cohort of employees over a pay period
+    """
+
+    def __init__(self, employees, start_date, end_date):
+        from employee.models import Employee
+
+        employee_ids = [getattr(employee, "pk", employee) for employee in employees]
+        self.start_date = start_date
+        self.end_date = end_date
+        self.employees = list(
+            Employee.objects.filter(id__in=employee_ids)
+            .select_related(
+                "employee_user_id",
+                "employee_work_info",
+                "employee_work_info__department_id",
+                "employee_work_info__job_position_id",
+                "employee_work_info__job_role_id",
+                "employee_work_info__shift_id",
+                "employee_work_info__work_type_id",
+                "employee_work_info__employee_type_id",
+                "employee_work_info__reporting_manager_id",
+                "employee_work_info__company_id",
+            )
+            .order_by("id")
+        )
+        employee_ids = [employee.id for employee in self.employees]
+
+        self._working_days = {}
+        self._holiday_dates = {}
+        self._company_leave_dates = {}
+
+        self.contracts = {}
+        self.active_contracts = {}
+        for contract in (
+            Contract.objects.filter(
+                employee_id__in=employee_ids, contract_status="active"
+            )
+            .select_related("filing_status")
+            .order_by("id")
+        ):
+            self.contracts.setdefault(contract.employee_id_id, contract)
+            if contract.is_active:
+                self.active_contracts.setdefault(contract.employee_id_id, contract)
+
+        self.allowances = list(
+            Allowance.objects.exclude(one_time_date__lt=start_date)
+            .exclude(one_time_date__gt=end_date)
+            .prefetch_related("specific_employees", "exclude_employees")
+            .order_by("id")
+        )
+        self.deductions = list(
+            Deduction.objects.exclude(one_time_date__lt=start_date)
+            .exclude(one_time_date__gt=end_date)
+            .prefetch_related("specific_employees", "exclude_employees")
+            .order_by("id")
+        )
+        self.conditions = {}
+        for model, components in (
+            (Allowance, self.allowances),
+            (Deduction, self.deductions),
+        ):
+            through = model.other_conditions.through
+            component_field = f"{model._meta.model_name}_id"
+            for row in through.objects.filter(
+                **{f"{component_field}__in": [component.id for component in components]}
+            ).values_list(
+                component_field,
+                "multiplecondition__field",
+                "multiplecondition__condition",
+                "multiplecondition__value",
+            ):
+                self.conditions.setdefault((model, row[0]), []).append(row[1:])
+        for component in self.allowances + self.deductions:
+            component.specific_ids = {
+                employee.id for employee in component.specific_employees.all()
+            }
+            component.exclude_ids = {
+                employee.id for employee in component.exclude_employees.all()
+            }
+
+        filing_ids = {
+            contract.filing_status_id
+            for contract in self.contracts.values()
+            if contract.filing_status_id
+        }
+        self.tax_brackets = defaultdict(list)
+        for bracket in (
+            TaxBracket.objects.filter(filing_status_id__in=filing_ids)
+            .order_by("min_income")
+            .values("filing_status_id", "tax_rate", "min_income", "max_income")
+        ):
+            self.tax_brackets[bracket.pop("filing_status_id")].append(bracket)
+
+        self.leaves = defaultdict(list)
+        if apps.is_installed("leave"):
+            LeaveRequest = get_horilla_model_class(
+                app_label="leave", model="leaverequest"
+            )
+            for leave in LeaveRequest.objects.filter(
+                Q(end_date__gte=start_date)
+                | Q(end_date__isnull=True, start_date__gte=start_date),
+                employee_id__in=employee_ids,
+                status="approved",
+                start_date__lte=end_date,
+            ).select_related("leave_type_id"):
+                self.leaves[leave.employee_id_id].append(leave)
+
+        self.attendances = defaultdict(list)
+        if apps.is_installed("attendance"):
+            Attendance = get_horilla_model_class(
+                app_label="attendance", model="attendance"
+            )
+            for attendance in Attendance.objects.filter(
+                employee_id__in=employee_ids,
+                attendance_date__range=(start_date, end_date),
+            ):
+                self.attendances[attendance.employee_id_id].append(attendance)
+
+    def working_days(self, start_date, end_date):
+        """
+        Memoized base.methods.get_working_days
+        """
+        key = (start_date, end_date)
+        if key not in self._working_days:
+            self._working_days[key] = get_working_days(start_date, end_date)
+        return self._working_days[key]
+
+    def holiday_dates(self, start_date, end_date):
+        """
+        Memoized base.methods.get_holiday_dates
+        """
+        key = (start_date, end_date)
+        if key not in self._holiday_dates:
+            self._holiday_dates[key] = get_holiday_dates(start_date, end_date)
+        return self._holiday_dates[key]
+
+    def company_leave_dates(self, year):
+        """
+        Memoized base.methods.get_company_leave_dates
+        """
+        if year not in self._company_leave_dates:
+            self._company_leave_dates[year] = get_company_leave_dates(year)
+        return self._company_leave_dates[year]
+
+    def contract(self, employee, is_active=False):
+        """
+        The first active-status contract of the employee
+        """
+        contracts = self.active_contracts if is_active else self.contracts
+        return contracts.get(getattr(employee, "pk", employee))
+
+    def approved_leaves(self, employee):
+        """
+        Approved leave requests of the employee overlapping the batch period
+        """
+        return self.leaves.get(employee.pk, [])
+
+    def unpaid_half_day_count(self, employee, date_range):
+        """
+        Mirrors the half day leave counts of the daily/monthly computations
+        """
+        date_range = set(date_range)
+        count = 0
+        for leave in self.approved_leaves(employee):
+            if leave.leave_type_id.payment != "unpaid":
+                continue
+            if (
+                leave.start_date in date_range
+                and leave.start_date_breakdown != "full_day"
+            ):
+                count += 1
+            if (
+                leave.end_date in date_range
+                and leave.end_date_breakdown != "full_day"
+                and leave.start_date != leave.end_date
+            ):
+                count += 1
+        return count
+
+    def filter_attendances(self, employee, start_date, end_date, **conditions):
+        """
+        Attendances of the employee in the period matching the attribute conditions
+        """
+        return [
+            attendance
+            for attendance in self.attendances.get(employee.pk, [])
+            if start_date <= attendance.attendance_date <= end_date
+            and all(
+                getattr(attendance, attr) == value for attr, value in conditions.items()
+            )
+        ]
+
+    def component_conditions(self, component):
+        """
+        The (field, condition, value) rows of the component other_conditions
+        """
+        return list(self.conditions.get((type(component), component.id), []))
+
+    def _components_for(
+        self, components, employee, start_date, end_date, conditional=True
+    ):
+        employee_id = employee.pk
+        return [
+            component
+            for component in components
+            if _in_period(component, start_date, end_date)
+            and (
+                employee_id in component.specific_ids
+                or (
+                    employee_id not in component.exclude_ids
+                    and (
+                        (conditional and component.is_condition_based)
+                        or component.include_active_employees
+                    )
+                )
+            )
+        ]
+
+    def allowances_for(self, employee, start_date, end_date):
+        """
+        Allowances targeted to the employee in the period
+        """
+        return self._components_for(self.allowances, employee, start_date, end_date)
+
+    def deductions_for(self, employee, start_date, end_date, is_pretax, is_tax):
+        """
+        Deductions targeted to the employee in the period
+        """
+        deductions = [
+            deduction
+            for deduction in self.deductions
+            if deduction.is_pretax == is_pretax
+            and deduction.is_tax == is_tax
+            and deduction.update_compensation is None
+        ]
+        # Tax deductions are never picked up by their conditions
+        return self._components_for(
+            deductions, employee, start_date, end_date, conditional=not is_tax
+        )
+
+    def compensation_deductions_for(
+        self, employee, compensation_type, start_date, end_date
+    ):
+        """
+        Deductions updating the basic/gross/net pay of the employee
+        """
+        return [
+            deduction
+            for deduction in self.deductions
+            if deduction.update_compensation == compensation_type
+            and employee.pk in deduction.specific_ids
+            and _in_period(deduction, start_date, end_date)
+        ]
+
+
+def payroll_calculation_batch(employees, start_date, end_date):
+    """
+    Calculate the payslip data of a cohort of employees for the period.
+
+    The start date is moved to the contract start date per employee just like
+    the single payslip creation does. Employees without an active contract or
+    whose contract starts after the period are skipped.
+
+    Args:
+        employees (iterable): Employee instances, ids or queryset
+        start_date (date): The start date of the payroll period.
+        end_date (date): The end date of the payroll period.
+
+    Returns:
+        list: The payslip_data dictionaries of payroll_calculation
+    """
+    from payroll.views.component_views import payroll_calculation
+
+    payslips = []
+    with payroll_batch(employees, start_date, end_date) as batch:
+        for employee in batch.employees:
+            contract = batch.contract(employee)
+            if contract is None or end_date < contract.contract_start_date:
+                continue
+            employee_start_date = max(start_date, contract.contract_start_date)
+            payslips.append(
+                payroll_calculation(employee, employee_start_date, end_date)
+            )
+    return payslips
+
+
+def save_payslip_batch(payslips, status="draft", group_name=None):
+    """
+    Save the payslip data of payroll_calculation_batch with bulk queries.
+
+    Existing draft payslips of the same employee and period are updated, the
+    others are created with bulk_create, their history rows are written in
+    bulk too. Payslips already in review, confirmed or paid are left as they
+    are.
+
+    Returns:
+        tuple: The saved Payslip instances in the order of the payslip data
+            and the payslip data skipped for a payslip that is not a draft
+    """
+    from payroll.methods.methods import calculate_employer_contribution
+
+    if not payslips:
+        return [], []
+    employee_ids = [payslip["employee"].id for payslip in payslips]
+    deductions = Deduction.objects.in_bulk(
+        {
+            deduction["deduction_id"]
+            for payslip in payslips
+            for key in (
+                "pretax_deductions",
+                "post_tax_deductions",
+                "tax_deductions",
+                "net_deductions",
+            )
+            for deduction in payslip[key]
+            if deduction.get("deduction_id")
+        }
+    )
+    existing = {
+        (payslip.employee_id_id, payslip.start_date, payslip.end_date): payslip
+        for payslip in Payslip.objects.entire().filter(
+            employee_id__in=employee_ids,
+            end_date__in={payslip["end_date"] for payslip in payslips},
+        )
+    }
+    instances = []
+    new_instances = []
+    updated_instances = []
+    skipped = []
+    installments = {}
+    for payslip_data in payslips:
+        employee = payslip_data["employee"]
+        key = (employee.id, payslip_data["start_date"], payslip_data["end_date"])
+        instance = existing.get(key)
+        if instance is not None and instance.status != "draft":
+            skipped.append(payslip_data)
+            continue
+        data = {
+            "pay_data": json.loads(payslip_data["json_data"]),
+        }
+        calculate_employer_contribution(data, deduction_instances=deductions)
+        if instance is None:
+            instance = Payslip()
+            new_instances.append(instance)
+        else:
+            updated_instances.append(instance)
+        instance.employee_id = employee
+        instance.group_name = group_name
+        instance.start_date = payslip_data["start_date"]
+        instance.end_date = payslip_data["end_date"]
+        instance.status = status
+        instance.basic_pay = round(payslip_data["basic_pay"], 2)
+        instance.contract_wage = round(payslip_data["contract_wage"], 2)
+        instance.gross_pay = round(payslip_data["gross_pay"], 2)
+        instance.deduction = round(payslip_data["total_deductions"], 2)
+        instance.net_pay = round(payslip_data["net_pay"], 2)
+        instance.pay_head_data = data["pay_data"]
+        installments[key] = payslip_data["installments"]
+        instances.append(instance)
+
+    through = Payslip.installment_ids.through
+    with transaction.atomic():
+        created = Payslip.objects.bulk_create(new_instances, batch_size=500)
+        if created and created[0].pk is None:
+            # Backends that do not return primary keys from bulk inserts
+            saved = {
+                (payslip.employee_id_id, payslip.start_date, payslip.end_date): payslip
+                for payslip in Payslip.objects.entire().filter(
+                    employee_id__in=employee_ids,
+                    end_date__in={instance.end_date for instance in new_instances},
+                )
+            }
+            for instance in new_instances:
+                instance.pk = saved[
+                    (instance.employee_id_id, instance.start_date, instance.end_date)
+                ].pk
+        Payslip.objects.bulk_update(
+            updated_instances,
+            [
+                "group_name",
+                "status",
+                "basic_pay",
+                "contract_wage",
+                "gross_pay",
+                "deduction",
+                "net_pay",
+                "pay_head_data",
+            ],
+            batch_size=500,
+        )
+        # The bulk queries skip the save signals, the history rows are written
+        # as bulk_create_with_history and bulk_update_with_history would
+        Payslip.history.bulk_history_create(new_instances, batch_size=500)
+        Payslip.history.bulk_history_create(
+            updated_instances, batch_size=500, update=True
+        )
+        through.objects.filter(
+            payslip_id__in=[instance.pk for instance in updated_instances]
+        ).delete()
+        through.objects.bulk_create(
+            [
+                through(payslip_id=instance.pk, deduction_id=deduction.pk)
+                for instance in instances
+                for deduction in installments[
+                    (instance.employee_id_id, instance.start_date, instance.end_date)
+                ]
+            ],
+            batch_size=1000,
+        )
+    return instances, skipped
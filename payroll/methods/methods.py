@@ -22,6 +22,7 @@ from base.methods import (
 )
 from base.models import CompanyLeaves, Holidays
 from horilla.methods import get_horilla_model_class
+from payroll.methods.batch_calc import get_active_batch
 from payroll.models.models import Contract, Deduction, Payslip
 
 
@@ -46,6 +47,16 @@ def get_total_days(start_date, end_date):
     return total_days
 
 
+def working_days_on_period(start_date, end_date):
+    """
+    get_working_days served from the active payroll batch when there is one
+    """
+    batch = get_active_batch()
+    if batch is not None:
+        return batch.working_days(start_date, end_date)
+    return get_working_days(start_date, end_date)
+
+
 def get_leaves(employee, start_date, end_date):
     """
     This method is used to return all the leaves taken by the employee
@@ -56,7 +67,10 @@ def get_leaves(employee, start_date, end_date):
         start_date (obj): the start date from the data needed
         end_date (obj): the end date till the date needed
     """
-    if apps.is_installed("leave"):
+    batch = get_active_batch()
+    if batch is not None:
+        approved_leaves = batch.approved_leaves(employee)
+    elif apps.is_installed("leave"):
         approved_leaves = employee.leaverequest_set.filter(status="approved")
     else:
         approved_leaves = None
@@ -66,9 +80,11 @@ def get_leaves(employee, start_date, end_date):
     unpaid_half = 0
     paid_leave_dates = []
     unpaid_leave_dates = []
-    company_leave_dates = get_working_days(start_date, end_date)["company_leave_dates"]
+    company_leave_dates = working_days_on_period(start_date, end_date)[
+        "company_leave_dates"
+    ]
 
-    if approved_leaves and approved_leaves.exists():
+    if approved_leaves:
         for instance in approved_leaves:
             if instance.leave_type_id.payment == "paid":
                 # if the taken leave is paid
@@ -122,16 +138,34 @@ if apps.is_installed("attendance"):
             start_date (obj): start date of the period
             end_date (obj): end date of the period
         """
-        Attendance = get_horilla_model_class(app_label="attendance", model="attendance")
-        attendances_on_period = Attendance.objects.filter(
-            employee_id=employee,
-            attendance_date__range=(start_date, end_date),
-            attendance_validated=True,
-        )
+        batch = get_active_batch()
+        if batch is not None:
+            attendances_on_period = batch.filter_attendances(
+                employee, start_date, end_date, attendance_validated=True
+            )
+            holiday_dates = set(batch.holiday_dates(start_date, end_date))
+            company_leave_dates = set(
+                batch.company_leave_dates(start_date.year)
+                + batch.company_leave_dates(end_date.year)
+            )
+        else:
+            Attendance = get_horilla_model_class(
+                app_label="attendance", model="attendance"
+            )
+            attendances_on_period = Attendance.objects.filter(
+                employee_id=employee,
+                attendance_date__range=(start_date, end_date),
+                attendance_validated=True,
+            )
+            holiday_dates = set(get_holiday_dates(start_date, end_date))
+            company_leave_dates = set(
+                get_company_leave_dates(start_date.year)
+                + get_company_leave_dates(end_date.year)
+            )
         present_on = [
             attendance.attendance_date for attendance in attendances_on_period
         ]
-        working_days_between_range = get_working_days(start_date, end_date)[
+        working_days_between_range = working_days_on_period(start_date, end_date)[
             "working_days_on"
         ]
         leave_dates = get_leaves(employee, start_date, end_date)["leave_dates"]
@@ -143,14 +177,7 @@ if apps.is_installed("attendance"):
         conflict_dates = conflict_dates + [
             date
             for date in present_on
-            if date in get_holiday_dates(start_date, end_date)
-            or date
-            in list(
-                set(
-                    get_company_leave_dates(start_date.year)
-                    + get_company_leave_dates(end_date.year)
-                )
-            )
+            if date in holiday_dates or date in company_leave_dates
         ]
 
         return {
@@ -233,42 +260,48 @@ def daily_computation(employee, wage, start_date, end_date):
         start_date (obj): start of the pay period
         end_date (obj): end date of the period
     """
-    working_day_data = get_working_days(start_date, end_date)
+    working_day_data = working_days_on_period(start_date, end_date)
     total_working_days = working_day_data["total_working_days"]
 
     leave_data = get_leaves(employee, start_date, end_date)
 
-    contract = employee.contract_set.filter(contract_status="active").first()
     basic_pay = wage * total_working_days
     loss_of_pay = 0
 
     date_range = get_date_range(start_date, end_date)
-    half_day_leaves_between_period_on_start_date = (
-        employee.leaverequest_set.filter(
-            leave_type_id__payment="unpaid",
-            start_date__in=date_range,
-            status="approved",
+    batch = get_active_batch()
+    if batch is not None:
+        unpaid_half_leaves = batch.unpaid_half_day_count(employee, date_range) * 0.5
+        contract = batch.contract(employee, is_active=True)
+    else:
+        half_day_leaves_between_period_on_start_date = (
+            employee.leaverequest_set.filter(
+                leave_type_id__payment="unpaid",
+                start_date__in=date_range,
+                status="approved",
+            )
+            .exclude(start_date_breakdown="full_day")
+            .count()
         )
-        .exclude(start_date_breakdown="full_day")
-        .count()
-    )
 
-    half_day_leaves_between_period_on_end_date = (
-        employee.leaverequest_set.filter(
-            leave_type_id__payment="unpaid", end_date__in=date_range, status="approved"
+        half_day_leaves_between_period_on_end_date = (
+            employee.leaverequest_set.filter(
+                leave_type_id__payment="unpaid",
+                end_date__in=date_range,
+                status="approved",
+            )
+            .exclude(end_date_breakdown="full_day")
+            .exclude(start_date=F("end_date"))
+            .count()
         )
-        .exclude(end_date_breakdown="full_day")
-        .exclude(start_date=F("end_date"))
-        .count()
-    )
-    unpaid_half_leaves = (
-        half_day_leaves_between_period_on_start_date
-        + half_day_leaves_between_period_on_end_date
-    ) * 0.5
+        unpaid_half_leaves = (
+            half_day_leaves_between_period_on_start_date
+            + half_day_leaves_between_period_on_end_date
+        ) * 0.5
 
-    contract = employee.contract_set.filter(
-        is_active=True, contract_status="active"
-    ).first()
+        contract = employee.contract_set.filter(
+            is_active=True, contract_status="active"
+        ).first()
 
     unpaid_leaves = leave_data["unpaid_leaves"] - unpaid_half_leaves
     if contract.calculate_daily_leave_amount:
@@ -294,7 +327,7 @@ def get_daily_salary(wage, wage_date) -> dict:
     last_day = calendar.monthrange(wage_date.year, wage_date.month)[1]
     end_date = date(wage_date.year, wage_date.month, last_day)
     start_date = date(wage_date.year, wage_date.month, 1)
-    working_days = get_working_days(start_date, end_date)["total_working_days"]
+    working_days = working_days_on_period(start_date, end_date)["total_working_days"]
     day_wage = (
         wage / working_days if working_days else 0.0
     )  # if working_days != 0 else 0 #769
@@ -329,7 +362,7 @@ def months_between_range(wage, start_date, end_date):
         # Calculate the end date for the current month
         current_end_date = current_date + relativedelta(day=days_in_month)
         current_end_date = min(current_end_date, end_date)
-        working_days_on_month = get_working_days(
+        working_days_on_month = working_days_on_period(
             current_date.replace(day=1), current_date.replace(day=days_in_month)
         )["total_working_days"]
 
@@ -338,7 +371,7 @@ def months_between_range(wage, start_date, end_date):
             if start_date < date(year=year, month=month, day=1)
             else start_date
         )
-        total_working_days_on_period = get_working_days(
+        total_working_days_on_period = working_days_on_period(
             month_start_date, current_end_date
         )["total_working_days"]
 
@@ -431,10 +464,13 @@ def monthly_computation(employee, wage, start_date, end_date, *args, **kwargs):
             data["working_days_on_period"] * data["per_day_amount"]
         )
 
-    contract = employee.contract_set.filter(contract_status="active").first()
     loss_of_pay = 0
     date_range = get_date_range(start_date, end_date)
-    if apps.is_installed("leave"):
+    batch = get_active_batch()
+    if batch is not None:
+        start_date_leaves = batch.unpaid_half_day_count(employee, date_range)
+        end_date_leaves = 0
+    elif apps.is_installed("leave"):
         start_date_leaves = (
             employee.leaverequest_set.filter(
                 leave_type_id__payment="unpaid",
@@ -467,9 +503,12 @@ def monthly_computation(employee, wage, start_date, end_date, *args, **kwargs):
         + half_day_leaves_between_period_on_end_date
     ) * 0.5
 
-    contract = employee.contract_set.filter(
-        is_active=True, contract_status="active"
-    ).first()
+    if batch is not None:
+        contract = batch.contract(employee, is_active=True)
+    else:
+        contract = employee.contract_set.filter(
+            is_active=True, contract_status="active"
+        ).first()
     unpaid_leaves = abs(leave_data["unpaid_leaves"] - unpaid_half_leaves)
     paid_days = month_data[0]["working_days_on_period"] - unpaid_leaves
     daily_computed_salary = get_daily_salary(wage=wage, wage_date=start_date)[
@@ -502,9 +541,13 @@ def compute_salary_on_period(employee, start_date, end_date, wage=None):
         start_date (obj): start date of the period
         end_date (obj): end date of the period
     """
-    contract = Contract.objects.filter(
-        employee_id=employee, contract_status="active"
-    ).first()
+    batch = get_active_batch()
+    if batch is not None:
+        contract = batch.contract(employee)
+    else:
+        contract = Contract.objects.filter(
+            employee_id=employee, contract_status="active"
+        ).first()
     if contract is None:
         return contract
 
@@ -536,9 +579,13 @@ def paginator_qry(qryset, page_number):
     return qryset
 
 
-def calculate_employer_contribution(data):
+def calculate_employer_contribution(data, deduction_instances=None):
     """
     This method is used to calculate the employer contribution
+
+    Args:
+        data (dict): The payslip data with the "pay_data" key
+        deduction_instances (dict): Optional prefetched Deduction instances by id
     """
     pay_head_data = data["pay_data"]
     deductions_to_process = [
@@ -555,9 +602,13 @@ def calculate_employer_contribution(data):
                     deduction.get("deduction_id")
                     and deduction.get("employer_contribution_rate", 0) > 0
                 ):
-                    object = Deduction.objects.filter(
-                        id=deduction.get("deduction_id")
-                    ).first()
+                    object = (
+                        deduction_instances.get(deduction.get("deduction_id"))
+                        if deduction_instances is not None
+                        else Deduction.objects.filter(
+                            id=deduction.get("deduction_id")
+                        ).first()
+                    )
                     if object:
                         amount = pay_head_data.get(object.based_on)
                         employer_contribution_amount = (
@@ -12,6 +12,7 @@ from django.apps import apps
 
 # from attendance.models import Attendance
 from horilla.methods import get_horilla_model_class
+from payroll.methods.batch_calc import get_active_batch
 from payroll.methods.deductions import update_compensation_deduction
 from payroll.methods.limits import compute_limit
 from payroll.models import models
@@ -40,33 +41,25 @@ operator_mapping = {
 }
 filter_mapping = {
     "work_type_id": {
-        "filter": lambda employee, allowance, start_date, end_date: {
-            "employee_id": employee,
-            "work_type_id__id": allowance.work_type_id.id,
-            "attendance_date__range": (start_date, end_date),
+        "filter": lambda allowance: {
+            "work_type_id_id": allowance.work_type_id_id,
             "attendance_validated": True,
         }
     },
     "shift_id": {
-        "filter": lambda employee, allowance, start_date, end_date: {
-            "employee_id": employee,
-            "shift_id__id": allowance.shift_id.id,
-            "attendance_date__range": (start_date, end_date),
+        "filter": lambda allowance: {
+            "shift_id_id": allowance.shift_id_id,
             "attendance_validated": True,
         }
     },
     "overtime": {
-        "filter": lambda employee, allowance, start_date, end_date: {
-            "employee_id": employee,
-            "attendance_date__range": (start_date, end_date),
+        "filter": lambda allowance: {
             "attendance_overtime_approve": True,
             "attendance_validated": True,
         }
     },
     "attendance": {
-        "filter": lambda employee, allowance, start_date, end_date: {
-            "employee_id": employee,
-            "attendance_date__range": (start_date, end_date),
+        "filter": lambda allowance: {
             "attendance_validated": True,
         }
     },
@@ -201,6 +194,87 @@ def dynamic_attr(obj, attribute_path):
     return obj
 
 
+def component_conditions(component):
+    """
+    Returns the (field, condition, value) conditions of a condition based
+    allowance or deduction, including its primary condition
+    """
+    batch = get_active_batch()
+    if batch is not None:
+        conditions = batch.component_conditions(component)
+    else:
+        conditions = list(
+            component.other_conditions.values_list("field", "condition", "value")
+        )
+    conditions.append(
+        (
+            component.field,
+            component.condition,
+            component.value.lower().replace(" ", "_"),
+        )
+    )
+    return conditions
+
+
+def employee_deductions(employee, start_date, end_date, is_pretax, is_tax):
+    """
+    Returns the deductions targeted to the employee in the period along with
+    the installment deductions among them
+    """
+    batch = get_active_batch()
+    if batch is not None:
+        deductions = batch.deductions_for(
+            employee, start_date, end_date, is_pretax, is_tax
+        )
+        return deductions, {
+            deduction for deduction in deductions if deduction.is_installment
+        }
+    specific_deductions = models.Deduction.objects.filter(
+        specific_employees=employee, is_pretax=is_pretax, is_tax=is_tax
+    )
+    active_employee_deduction = models.Deduction.objects.filter(
+        include_active_employees=True, is_pretax=is_pretax, is_tax=is_tax
+    ).exclude(exclude_employees=employee)
+    deductions = specific_deductions | active_employee_deduction
+    if not is_tax:
+        conditional_deduction = models.Deduction.objects.filter(
+            is_condition_based=True, is_pretax=is_pretax, is_tax=is_tax
+        ).exclude(exclude_employees=employee)
+        deductions = deductions | conditional_deduction
+    deductions = (
+        deductions.exclude(one_time_date__lt=start_date)
+        .exclude(one_time_date__gt=end_date)
+        .exclude(update_compensation__isnull=False)
+    )
+    return deductions, deductions.filter(is_installment=True)
+
+
+def filter_attendances(employee, start_date, end_date, **conditions):
+    """
+    Returns the attendances of the employee in the period matching the conditions
+    """
+    batch = get_active_batch()
+    if batch is not None:
+        return batch.filter_attendances(employee, start_date, end_date, **conditions)
+    Attendance = get_horilla_model_class(app_label="attendance", model="attendance")
+    return Attendance.objects.filter(
+        employee_id=employee,
+        attendance_date__range=(start_date, end_date),
+        **conditions,
+    )
+
+
+def count_attendances(employee, start_date, end_date, **conditions):
+    """
+    Returns the count of the attendances of the employee in the period matching
+    the conditions
+    """
+    attendances = filter_attendances(employee, start_date, end_date, **conditions)
+    if isinstance(attendances, list):
+        return len(attendances)
+    return attendances.count()
+
+
 def calculate_gross_pay(*_args, **kwargs):
     """
     Calculate the gross pay for an employee within a given date range.
@@ -281,21 +355,25 @@ def calculate_allowance(**kwargs):
     end_date = kwargs["end_date"]
     basic_pay = kwargs["basic_pay"]
     day_dict = kwargs["day_dict"]
-    specific_allowances = Allowance.objects.filter(specific_employees=employee)
-    conditional_allowances = Allowance.objects.filter(is_condition_based=True).exclude(
-        exclude_employees=employee
-    )
-    active_employees = Allowance.objects.filter(include_active_employees=True).exclude(
-        exclude_employees=employee
-    )
-
-    allowances = specific_allowances | conditional_allowances | active_employees
-
-    allowances = (
-        allowances.exclude(one_time_date__lt=start_date)
-        .exclude(one_time_date__gt=end_date)
-        .distinct()
-    )
+    batch = get_active_batch()
+    if batch is not None:
+        allowances = batch.allowances_for(employee, start_date, end_date)
+    else:
+        specific_allowances = Allowance.objects.filter(specific_employees=employee)
+        conditional_allowances = Allowance.objects.filter(
+            is_condition_based=True
+        ).exclude(exclude_employees=employee)
+        active_employees = Allowance.objects.filter(
+            include_active_employees=True
+        ).exclude(exclude_employees=employee)
+
+        allowances = specific_allowances | conditional_allowances | active_employees
+
+        allowances = (
+            allowances.exclude(one_time_date__lt=start_date)
+            .exclude(one_time_date__gt=end_date)
+            .distinct()
+        )
 
     employee_allowances = []
     tax_allowances = []
@@ -305,13 +383,7 @@ def calculate_allowance(**kwargs):
     # Append allowances based on condition, or unconditionally to employee
     for allowance in allowances:
         if allowance.is_condition_based:
-            conditions = list(
-                allowance.other_conditions.values_list("field", "condition", "value")
-            )
-            condition_field = allowance.field
-            condition_operator = allowance.condition
-            condition_value = allowance.value.lower().replace(" ", "_")
-            conditions.append((condition_field, condition_operator, condition_value))
+            conditions = component_conditions(allowance)
             applicable = True
             for condition in conditions:
                 val = dynamic_attr(employee, condition[0])
@@ -331,15 +403,11 @@ def calculate_allowance(**kwargs):
                 employee_allowances.append(allowance)
         else:
             if allowance.based_on in filter_mapping:
-                filter_params = filter_mapping[allowance.based_on]["filter"](
-                    employee, allowance, start_date, end_date
-                )
-                if apps.is_installed("attendance"):
-                    Attendance = get_horilla_model_class(
-                        app_label="attendance", model="attendance"
-                    )
-                    if Attendance.objects.filter(**filter_params):
-                        employee_allowances.append(allowance)
+                conditions = filter_mapping[allowance.based_on]["filter"](allowance)
+                if apps.is_installed("attendance") and count_attendances(
+                    employee, start_date, end_date, **conditions
+                ):
+                    employee_allowances.append(allowance)
             else:
                 employee_allowances.append(allowance)
     # Filter and append taxable allowance and not taxable allowance
@@ -443,17 +511,8 @@ def calculate_tax_deduction(*_args, **kwargs):
     employee = kwargs["employee"]
     start_date = kwargs["start_date"]
     end_date = kwargs["end_date"]
-    specific_deductions = models.Deduction.objects.filter(
-        specific_employees=employee, is_pretax=False, is_tax=True
-    )
-    active_employee_deduction = models.Deduction.objects.filter(
-        include_active_employees=True, is_pretax=False, is_tax=True
-    ).exclude(exclude_employees=employee)
-    deductions = specific_deductions | active_employee_deduction
-    deductions = (
-        deductions.exclude(one_time_date__lt=start_date)
-        .exclude(one_time_date__gt=end_date)
-        .exclude(update_compensation__isnull=False)
+    deductions, _installments = employee_deductions(
+        employee, start_date, end_date, is_pretax=False, is_tax=True
     )
     deductions_amt = []
     serialized_deductions = []
@@ -505,24 +564,10 @@ def calculate_pre_tax_deduction(*_args, **kwargs):
     start_date = kwargs["start_date"]
     end_date = kwargs["end_date"]
 
-    specific_deductions = models.Deduction.objects.filter(
-        specific_employees=employee, is_pretax=True, is_tax=False
-    )
-    conditional_deduction = models.Deduction.objects.filter(
-        is_condition_based=True, is_pretax=True, is_tax=False
-    ).exclude(exclude_employees=employee)
-    active_employee_deduction = models.Deduction.objects.filter(
-        include_active_employees=True, is_pretax=True, is_tax=False
-    ).exclude(exclude_employees=employee)
-
-    deductions = specific_deductions | conditional_deduction | active_employee_deduction
-    deductions = (
-        deductions.exclude(one_time_date__lt=start_date)
-        .exclude(one_time_date__gt=end_date)
-        .exclude(update_compensation__isnull=False)
+    # Installment deductions are returned along with the deductions
+    deductions, installments = employee_deductions(
+        employee, start_date, end_date, is_pretax=True, is_tax=False
     )
-    # Installment deductions
-    installments = deductions.filter(is_installment=True)
 
     pre_tax_deductions = []
     pre_tax_deductions_amt = []
@@ -530,14 +575,7 @@ def calculate_pre_tax_deduction(*_args, **kwargs):
 
     for deduction in deductions:
         if deduction.is_condition_based:
-            conditions = list(
-                deduction.other_conditions.values_list("field", "condition", "value")
-            )
-            condition_field = deduction.field
-            condition_operator = deduction.condition
-            condition_value = deduction.value.lower().replace(" ", "_")
-            conditions.append((condition_field, condition_operator, condition_value))
-            operator_func = operator_mapping.get(condition_operator)
+            conditions = component_conditions(deduction)
             applicable = True
             for condition in conditions:
                 val = dynamic_attr(employee, condition[0])
@@ -613,23 +651,10 @@ def calculate_post_tax_deduction(*_args, **kwargs):
     total_allowance = kwargs["total_allowance"]
     basic_pay = kwargs["basic_pay"]
     day_dict = kwargs["day_dict"]
-    specific_deductions = models.Deduction.objects.filter(
-        specific_employees=employee, is_pretax=False, is_tax=False
+    # Installment deductions are returned along with the deductions
+    deductions, installments = employee_deductions(
+        employee, start_date, end_date, is_pretax=False, is_tax=False
     )
-    conditional_deduction = models.Deduction.objects.filter(
-        is_condition_based=True, is_pretax=False, is_tax=False
-    ).exclude(exclude_employees=employee)
-    active_employee_deduction = models.Deduction.objects.filter(
-        include_active_employees=True, is_pretax=False, is_tax=False
-    ).exclude(exclude_employees=employee)
-    deductions = specific_deductions | conditional_deduction | active_employee_deduction
-    deductions = (
-        deductions.exclude(one_time_date__lt=start_date)
-        .exclude(one_time_date__gt=end_date)
-        .exclude(update_compensation__isnull=False)
-    )
-    # Installment deductions
-    installments = deductions.filter(is_installment=True)
 
     post_tax_deductions = []
     post_tax_deductions_amt = []
@@ -883,18 +908,13 @@ def calculate_based_on_attendance(*_args, **kwargs):
     if not apps.is_installed("attendance"):
         return 0
 
-    Attendance = get_horilla_model_class(app_label="attendance", model="attendance")
     employee = kwargs["employee"]
     start_date = kwargs["start_date"]
     end_date = kwargs["end_date"]
     component = kwargs["component"]
     day_dict = kwargs["day_dict"]
 
-    count = Attendance.objects.filter(
-        employee_id=employee,
-        attendance_date__range=(start_date, end_date),
-        attendance_validated=True,
-    ).count()
+    count = count_attendances(employee, start_date, end_date, attendance_validated=True)
     amount = count * component.per_attendance_fixed_amount
     amount = compute_limit(component, amount, day_dict)
     return amount
@@ -917,7 +937,6 @@ def calculate_based_on_shift(*_args, **kwargs):
     if not apps.is_installed("attendance"):
         return 0
 
-    Attendance = get_horilla_model_class(app_label="attendance", model="attendance")
     employee = kwargs["employee"]
     start_date = kwargs["start_date"]
     end_date = kwargs["end_date"]
@@ -925,12 +944,13 @@ def calculate_based_on_shift(*_args, **kwargs):
     day_dict = kwargs["day_dict"]
 
     shift_id = component.shift_id.id
-    count = Attendance.objects.filter(
-        employee_id=employee,
-        shift_id=shift_id,
-        attendance_date__range=(start_date, end_date),
+    count = count_attendances(
+        employee,
+        start_date,
+        end_date,
+        shift_id_id=shift_id,
         attendance_validated=True,
-    ).count()
+    )
     amount = count * component.shift_per_attendance_amount
 
     amount = compute_limit(component, amount, day_dict)
@@ -954,17 +974,14 @@ def calculate_based_on_overtime(*_args, **kwargs):
     if not apps.is_installed("attendance"):
         return 0
 
-    Attendance = get_horilla_model_class(app_label="attendance", model="attendance")
     employee = kwargs["employee"]
     start_date = kwargs["start_date"]
     end_date = kwargs["end_date"]
     component = kwargs["component"]
     day_dict = kwargs["day_dict"]
 
-    attendances = Attendance.objects.filter(
-        employee_id=employee,
-        attendance_date__range=(start_date, end_date),
-        attendance_overtime_approve=True,
+    attendances = filter_attendances(
+        employee, start_date, end_date, attendance_overtime_approve=True
     )
     overtime = sum(attendance.overtime_second for attendance in attendances)
     amount_per_hour = component.amount_per_one_hr
@@ -996,7 +1013,6 @@ def calculate_based_on_work_type(*_args, **kwargs):
     if not apps.is_installed("attendance"):
         return 0
 
-    Attendance = get_horilla_model_class(app_label="attendance", model="attendance")
     employee = kwargs["employee"]
     start_date = kwargs["start_date"]
     end_date = kwargs["end_date"]
@@ -1004,12 +1020,13 @@ def calculate_based_on_work_type(*_args, **kwargs):
     day_dict = kwargs["day_dict"]
 
     work_type_id = component.work_type_id.id
-    count = Attendance.objects.filter(
-        employee_id=employee,
-        work_type_id=work_type_id,
-        attendance_date__range=(start_date, end_date),
+    count = count_attendances(
+        employee,
+        start_date,
+        end_date,
+        work_type_id_id=work_type_id,
         attendance_validated=True,
-    ).count()
+    )
     amount = count * component.work_type_per_attendance_amount
 
     amount = compute_limit(component, amount, day_dict)
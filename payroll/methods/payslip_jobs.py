@@ -0,0 +1,229 @@
+"""
+payslip_jobs.py
+
+This module is used to generate payslips in the background.
+
+The selected employees are stored on a PayslipGenerationJob and processed in
+chunks of chunk_size employees. The payslip data of the chunks is calculated
+on a process pool, the background thread saves the chunks in their order, each
+in one transaction together with the progress of the job, so a failed or
+interrupted job restarts from its first unfinished chunk. Employees failing
+or skipped are logged on the job instead of failing the whole run.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from datetime import timedelta
+from itertools import repeat
+
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from employee.methods.methods import chunked
+from employee.models import Employee
+from notifications.signals import notify
+from payroll.methods.payslip_workers import (
+    PAYSLIP_JOB_WORKERS,
+    calculate_payslip_chunk,
+    payslip_calculation_pool,
+)
+from payroll.models.models import PayslipGenerationJob
+
+logger = logging.getLogger(__name__)
+
+# A running job not updated for this long is considered dead and can restart
+STALE_JOB_TIMEOUT = timedelta(minutes=10)
+
+
+def calculate_payslip_chunks(chunks, start_date, end_date):
+    """
+    Yields the calculate_payslip_chunk results of the chunks in their order,
+    calculated on PAYSLIP_JOB_WORKERS processes when there is more than one
+    chunk
+    """
+    if PAYSLIP_JOB_WORKERS < 2 or len(chunks) < 2:
+        for chunk in chunks:
+            yield calculate_payslip_chunk(chunk, start_date, end_date)
+        return
+    pool = payslip_calculation_pool(len(chunks))
+    try:
+        yield from pool.map(
+            calculate_payslip_chunk, chunks, repeat(start_date), repeat(end_date)
+        )
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def save_payslip_chunk(job, payslips):
+    """
+    Saves the payslips of a chunk as drafts. Draft payslips of the same
+    employee and period are updated, the payslips already in review, confirmed
+    or paid are left as they are. Returns the saved instances and the skipped
+    payslip data.
+    """
+    from payroll.methods.batch_calc import save_payslip_batch
+
+    employee_ids = [payslip["employee"].id for payslip in payslips]
+    # Jobs saving payslips of the same employees wait for each other
+    list(
+        Employee.objects.entire()
+        .select_for_update()
+        .filter(id__in=employee_ids)
+        .values_list("id", flat=True)
+    )
+    return save_payslip_batch(payslips, status="draft", group_name=job.group_name)
+
+
+def log_entry(employee_id, employee, status, message):
+    return {
+        "employee_id": employee_id,
+        "employee": employee,
+        "status": status,
+        "message": message,
+    }
+
+
+def notify_payslips(job, instances):
+    """
+    Notifies the employees of their generated payslips
+    """
+    sender = getattr(job.created_by, "employee_get", None)
+    if sender is None:
+        return
+    for instance in instances:
+        notify.send(
+            sender,
+            recipient=instance.employee_id.employee_user_id,
+            verb="Payslip has been generated for you.",
+            verb_ar="تم إصدار كشف راتب لك.",
+            verb_de="Gehaltsabrechnung wurde für Sie erstellt.",
+            verb_es="Se ha generado la nómina para usted.",
+            verb_fr="La fiche de paie a été générée pour vous.",
+            redirect=reverse(
+                "view-created-payslip", kwargs={"payslip_id": instance.id}
+            ),
+            icon="close",
+        )
+
+
+def run_payslip_generation_job(job_id):
+    """
+    Generates the payslips of the job, from its first unfinished chunk
+    """
+    if not PayslipGenerationJob.objects.filter(pk=job_id, status="queued").update(
+        status="running", error="", updated_at=timezone.now()
+    ):
+        return
+    job = PayslipGenerationJob.objects.select_related("created_by").get(pk=job_id)
+    logger.info(
+        "Payslip generation %s started at chunk %s", job.pk, job.processed_chunks
+    )
+    try:
+        chunks = list(chunked(job.employee_ids, job.chunk_size))
+        results = calculate_payslip_chunks(
+            chunks[job.processed_chunks :], job.start_date, job.end_date
+        )
+        for index, (payslips, skipped, failed) in enumerate(
+            results, job.processed_chunks
+        ):
+            with transaction.atomic():
+                instances, locked = save_payslip_chunk(job, payslips)
+                log = [
+                    log_entry(employee_id, employee, "skipped", message)
+                    for employee_id, employee, message in skipped
+                ]
+                log += [
+                    log_entry(
+                        payslip["employee"].id,
+                        str(payslip["employee"]),
+                        "skipped",
+                        "A payslip of the period is no longer a draft",
+                    )
+                    for payslip in locked
+                ]
+                log += [
+                    log_entry(employee_id, employee, "failed", message)
+                    for employee_id, employee, message in failed
+                ]
+                job.processed_chunks = index + 1
+                job.processed_count += len(chunks[index])
+                job.created_count += len(instances)
+                job.skipped_count += len(skipped) + len(locked)
+                job.failed_count += len(failed)
+                job.error_log.extend(log)
+                job.save()
+            notify_payslips(job, instances)
+        job.status = "completed"
+        job.finished_at = timezone.now()
+        job.save()
+        logger.info("Payslip generation %s completed", job.pk)
+    except Exception as error:
+        logger.exception("Payslip generation %s failed", job_id)
+        PayslipGenerationJob.objects.filter(pk=job_id).update(
+            status="failed",
+            error=str(error),
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+    finally:
+        connection.close()
+
+
+def start_payslip_generation_job(job):
+    """
+    Runs the job on a background thread once the current transaction commits
+    """
+    transaction.on_commit(
+        lambda: threading.Thread(
+            target=run_payslip_generation_job, args=(job.pk,), daemon=True
+        ).start()
+    )
+
+
+def create_payslip_generation_job(user, employees, start_date, end_date, group_name):
+    """
+    Creates and starts the job generating the payslips of the employees. The
+    unfinished job of the same employees, period and batch name is returned
+    instead when the form is submitted again.
+    """
+    employee_ids = sorted(employee.pk for employee in employees)
+    key = hashlib.sha256(
+        json.dumps([employee_ids, str(start_date), str(end_date), group_name]).encode()
+    ).hexdigest()
+    job = PayslipGenerationJob.objects.filter(
+        key=key, status__in=["queued", "running"]
+    ).first()
+    if job is not None:
+        return job
+    job = PayslipGenerationJob.objects.create(
+        created_by=user,
+        key=key,
+        group_name=group_name,
+        start_date=start_date,
+        end_date=end_date,
+        employee_ids=employee_ids,
+        total_count=len(employee_ids),
+    )
+    start_payslip_generation_job(job)
+    return job
+
+
+def restart_payslip_generation_job(job):
+    """
+    Queues a failed or dead job again, it resumes from its first unfinished
+    chunk. Returns False when the job cannot restart.
+    """
+    restartable = PayslipGenerationJob.objects.filter(pk=job.pk, status="failed") | (
+        PayslipGenerationJob.objects.filter(
+            pk=job.pk,
+            status="running",
+            updated_at__lt=timezone.now() - STALE_JOB_TIMEOUT,
+        )
+    )
+    if not restartable.update(status="queued", finished_at=None):
+        return False
+    start_payslip_generation_job(job)
+    return True
@@ -0,0 +1,80 @@
+"""
+payslip_workers.py
+
+Payslip calculation on a process pool for the payslip generation jobs.
+
+The module only imports the payroll code inside its functions, so the
+spawned pool processes can import it before Django is set up in them.
+"""
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PAYSLIP_JOB_WORKERS = getattr(settings, "HORILLA_PAYSLIP_JOB_WORKERS", None) or min(
+    4, os.cpu_count() or 1
+)
+
+
+def _init_payslip_process():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "horilla.settings")
+        django.setup()
+
+
+def calculate_payslip_chunk(employee_ids, start_date, end_date):
+    """
+    Returns the payslip data of the employees, with the employees skipped and
+    failed as (employee id, employee, message). Runs in the pool processes.
+    """
+    from payroll.methods.batch_calc import payroll_batch
+    from payroll.views.component_views import payroll_calculation
+
+    payslips = []
+    skipped = []
+    failed = []
+    with payroll_batch(employee_ids, start_date, end_date) as batch:
+        found = {employee.id for employee in batch.employees}
+        for employee_id in employee_ids:
+            if employee_id not in found:
+                skipped.append((employee_id, "", "Employee not found"))
+        for employee in batch.employees:
+            contract = batch.contract(employee)
+            if contract is None or end_date < contract.contract_start_date:
+                skipped.append(
+                    (employee.id, str(employee), "No active contract for the period")
+                )
+                continue
+            try:
+                payslip = payroll_calculation(
+                    employee, max(start_date, contract.contract_start_date), end_date
+                )
+            except Exception as error:
+                logger.exception("Payslip calculation of %s failed", employee.id)
+                failed.append((employee.id, str(employee), str(error)))
+                continue
+            # Query sets do not cross the process boundary
+            payslip["installments"] = list(payslip["installments"])
+            payslips.append(payslip)
+    return payslips, skipped, failed
+
+
+def payslip_calculation_pool(chunk_count):
+    """
+    Returns a process pool of up to PAYSLIP_JOB_WORKERS processes for the
+    chunks
+    """
+    return ProcessPoolExecutor(
+        max_workers=min(PAYSLIP_JOB_WORKERS, chunk_count),
+        # Forked processes would share the database connections of this one
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_payslip_process,
+    )
@@ -1918,3 +1918,63 @@ class PayslipAutoGenerate(models.Model):
 
     def __str__(self) -> str:
         return f"{self.generate_day} | {self.company_id} "
+
+
+class PayslipGenerationJob(models.Model):
+    """
+    Background bulk payslip generation, processed chunk by chunk by
+    payroll/methods/payslip_jobs.py and polled by the bulk payslip popup
+    """
+
+    STATUS_CHOICES = [
+        ("queued", _("Queued")),
+        ("running", _("Running")),
+        ("completed", _("Completed")),
+        ("failed", _("Failed")),
+    ]
+
+    created_by = models.ForeignKey(
+        "auth.User",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="payslip_generation_jobs",
+    )
+    # Hash of the period, batch name and employees, an unfinished job with
+    # the same key is reused instead of generating the payslips twice
+    key = models.CharField(max_length=64, db_index=True)
+    group_name = models.CharField(max_length=50, null=True, blank=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    employee_ids = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    chunk_size = models.PositiveIntegerField(default=100)
+    total_count = models.PositiveIntegerField(default=0)
+    processed_chunks = models.PositiveIntegerField(default=0)
+    processed_count = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    # [{"employee_id", "employee", "status": "skipped" or "failed", "message"}]
+    error_log = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.group_name} {self.start_date} - {self.end_date} ({self.status})"
+
+    def is_finished(self):
+        """
+        Whether the job stopped, successfully or not
+        """
+        return self.status in ("completed", "failed")
+
+    def progress(self):
+        """
+        Percentage of the employees already processed
+        """
+        if not self.total_count:
+            return 100 if self.status == "completed" else 0
+        return int(self.processed_count * 100 / self.total_count)
@@ -4,15 +4,12 @@ scheduler.py
 This module is used to register scheduled tasks
 """
 
-import json
-import sys
 from datetime import date, timedelta
 
-from apscheduler.schedulers.background import BackgroundScheduler
 from dateutil.relativedelta import relativedelta
 
-from payroll.methods.methods import calculate_employer_contribution, save_payslip
-from payroll.views.component_views import payroll_calculation
+from horilla.horilla_jobs import register_job
+from payroll.methods.batch_calc import payroll_calculation_batch, save_payslip_batch
 
 from .models.models import Contract, Payslip
 
@@ -56,36 +53,15 @@ def generate_payslip(date, companies, all):
     # find the date range
     start_date = date - relativedelta(months=1)
     end_date = date - timedelta(days=1)
-    # Payslip creation
-    for employee in active_employees:
-        payslip = Payslip.objects.filter(
-            employee_id=employee, start_date=start_date, end_date=end_date
-        ).first()
-        if payslip:
-            continue
-        contract = Contract.objects.filter(
-            employee_id=employee, contract_status="active"
-        ).first()
-        if end_date < contract.contract_start_date:
-            continue
-        if start_date < contract.contract_start_date:
-            start_date = contract.contract_start_date
-        payslip_data = payroll_calculation(employee, start_date, end_date)
-        payslip_data["payslip"] = payslip
-        data = {}
-        data["employee"] = employee
-        data["start_date"] = payslip_data["start_date"]
-        data["end_date"] = payslip_data["end_date"]
-        data["status"] = "draft"
-        data["contract_wage"] = payslip_data["contract_wage"]
-        data["basic_pay"] = payslip_data["basic_pay"]
-        data["gross_pay"] = payslip_data["gross_pay"]
-        data["deduction"] = payslip_data["total_deductions"]
-        data["net_pay"] = payslip_data["net_pay"]
-        data["pay_data"] = json.loads(payslip_data["json_data"])
-        calculate_employer_contribution(data)
-        data["installments"] = payslip_data["installments"]
-        payslip_data["instance"] = save_payslip(**data)
+    # Skip employees who already have a payslip for the period
+    active_employees = active_employees.exclude(
+        id__in=Payslip.objects.entire()
+        .filter(start_date__gte=start_date, end_date=end_date)
+        .values("employee_id")
+    )
+    # Payslip creation for the whole cohort at once
+    payslips = payroll_calculation_batch(active_employees, start_date, end_date)
+    save_payslip_batch(payslips, status="draft")
 
 
 def is_last_day_of_month(date):
@@ -138,11 +114,5 @@ def auto_payslip_generate():
                 generate_payslip(date=date.today(), companies=companies, all=False)
 
 
-if not any(
-    cmd in sys.argv
-    for cmd in ["makemigrations", "migrate", "compilemessages", "flush", "shell"]
-):
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(expire_contract, "interval", hours=4)
-    scheduler.add_job(auto_payslip_generate, "interval", hours=3)
-    scheduler.start()
+register_job(expire_contract, "interval", hours=4)
+register_job(auto_payslip_generate, "interval", hours=3, run_on_start=True)
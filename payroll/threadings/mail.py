@@ -13,7 +13,7 @@ from django.template.loader import render_to_string
 from base.backends import ConfiguredEmailBackend
 from employee.models import EmployeeWorkInformation
 from payroll.models.models import Payslip
-from payroll.views.views import payslip_pdf
+from payroll.views.views import payslip_pdfs
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +33,14 @@ class MailSendThread(Thread):
 
     def run(self) -> None:
         super().run()
-        for record in list(self.result_dict.values()):
+        records = list(self.result_dict.values())
+        # The PDFs of the next records render while a mail is sent
+        pdfs = payslip_pdfs(
+            self.request,
+            [instance for record in records for instance in record["instances"]],
+            return_exceptions=True,
+        )
+        for record in records:
             html_message = render_to_string(
                 "payroll/mail_templates/default.html",
                 {
@@ -43,17 +50,21 @@ class MailSendThread(Thread):
                 },
                 request=self.request,
             )
-            attachments = []
-            for instance in record["instances"]:
-                response = payslip_pdf(self.request, instance.id)
-                attachments.append(
-                    (
-                        f"{instance.get_payslip_title()}.pdf",
-                        response.content,
-                        "application/pdf",
-                    )
-                )
             employee = record["instances"][0].employee_id
+            pdf_files = [next(pdfs) for _instance in record["instances"]]
+            error = next((pdf for pdf in pdf_files if isinstance(pdf, Exception)), None)
+            if error:
+                # Only this employee goes without the mail
+                logger.error(
+                    "Payslip mail to %s skipped, its PDF failed to render",
+                    employee,
+                    exc_info=error,
+                )
+                continue
+            attachments = [
+                (f"{instance.get_payslip_title()}.pdf", pdf, "application/pdf")
+                for instance, pdf in zip(record["instances"], pdf_files)
+            ]
             email_backend = ConfiguredEmailBackend()
             display_email_name = email_backend.dynamic_from_email_with_display_name
             if self.request:
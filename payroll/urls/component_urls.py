@@ -70,6 +70,11 @@ urlpatterns = [
         name="check-contract-start-date",
     ),
     path("generate-payslip", component_views.generate_payslip, name="generate-payslip"),
+    path(
+        "payslip-generation-job/<int:job_id>/",
+        component_views.payslip_generation_job,
+        name="payslip-generation-job",
+    ),
     path(
         "validate-start-date",
         component_views.validate_start_date,
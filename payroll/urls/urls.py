@@ -52,6 +52,7 @@ urlpatterns = [
         name="single-contract-view",
     ),
     path("payslip-pdf/<int:id>", views.payslip_pdf, name="payslip-pdf"),
+    path("payslip-pdf-zip/", views.payslip_pdf_zip, name="payslip-pdf-zip"),
     path("contract-filter", views.contract_filter, name="contract-filter"),
     path("settings", views.settings, name="payroll-settings"),
     path(
@@ -16,7 +16,7 @@ from django.apps import apps
 from django.contrib import messages
 from django.db.models import Sum
 from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, QueryDict
-from django.shortcuts import redirect, render
+from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
@@ -74,6 +74,10 @@ from payroll.methods.payslip_calc import (
     calculate_tax_deduction,
     calculate_taxable_gross_pay,
 )
+from payroll.methods.payslip_jobs import (
+    create_payslip_generation_job,
+    restart_payslip_generation_job,
+)
 from payroll.methods.tax_calc import calculate_taxable_amount
 from payroll.models.models import (
     Allowance,
@@ -81,6 +85,7 @@ from payroll.models.models import (
     Deduction,
     LoanAccount,
     Payslip,
+    PayslipGenerationJob,
     Reimbursement,
     ReimbursementMultipleAttachment,
 )
@@ -729,6 +734,8 @@ def generate_payslip(request):
     Generate payslips for selected employees within a specified date range.
 
     Requires the user to be logged in and have the 'payroll.add_payslip' permission.
+    The payslips are generated by a background job, the request redirects to
+    its progress.
 
     """
     if (
@@ -741,66 +748,40 @@ def generate_payslip(request):
             "payroll/payslip/bulk_create_payslip.html",
             {"bulk_form": bulk_form},
         )
-    payslips = []
-    json_data = []
     form = forms.GeneratePayslipForm()
     if request.method == "POST":
         form = forms.GeneratePayslipForm(request.POST)
         if form.is_valid():
-            instances = []
             employees = form.cleaned_data["employee_id"]
             start_date = form.cleaned_data["start_date"]
             end_date = form.cleaned_data["end_date"]
 
             group_name = form.cleaned_data["group_name"]
-            for employee in employees:
-                contract = Contract.objects.filter(
-                    employee_id=employee, contract_status="active"
-                ).first()
-                if start_date < contract.contract_start_date:
-                    start_date = contract.contract_start_date
-                payslip = payroll_calculation(employee, start_date, end_date)
-                payslips.append(payslip)
-                json_data.append(payslip["json_data"])
-
-                payslip["payslip"] = payslip
-                data = {}
-                data["employee"] = employee
-                data["group_name"] = group_name
-                data["start_date"] = payslip["start_date"]
-                data["end_date"] = payslip["end_date"]
-                data["status"] = "draft"
-                data["contract_wage"] = payslip["contract_wage"]
-                data["basic_pay"] = payslip["basic_pay"]
-                data["gross_pay"] = payslip["gross_pay"]
-                data["deduction"] = payslip["total_deductions"]
-                data["net_pay"] = payslip["net_pay"]
-                data["pay_data"] = json.loads(payslip["json_data"])
-                calculate_employer_contribution(data)
-                data["installments"] = payslip["installments"]
-                instance = save_payslip(**data)
-                instances.append(instance)
-                notify.send(
-                    request.user.employee_get,
-                    recipient=employee.employee_user_id,
-                    verb="Payslip has been generated for you.",
-                    verb_ar="تم إصدار كشف راتب لك.",
-                    verb_de="Gehaltsabrechnung wurde für Sie erstellt.",
-                    verb_es="Se ha generado la nómina para usted.",
-                    verb_fr="La fiche de paie a été générée pour vous.",
-                    redirect=reverse(
-                        "view-created-payslip", kwargs={"payslip_id": instance.id}
-                    ),
-                    icon="close",
-                )
-            messages.success(request, f"{employees.count()} payslip saved as draft")
-            return redirect(
-                f"/payroll/view-payslip?group_by=group_name&active_group={group_name}"
+            job = create_payslip_generation_job(
+                request.user, employees, start_date, end_date, group_name
             )
+            return redirect("payslip-generation-job", job_id=job.pk)
 
     return render(request, "payroll/common/form.html", {"form": form})
 
 
+@login_required
+@permission_required("payroll.add_payslip")
+def payslip_generation_job(request, job_id):
+    """
+    This method is used to render the progress of a background payslip
+    generation, posting to it resumes a failed job
+    """
+    job = get_object_or_404(PayslipGenerationJob, pk=job_id, created_by=request.user)
+    if request.method == "POST" and not restart_payslip_generation_job(job):
+        messages.info(request, _("The payslip generation is still running."))
+    job.refresh_from_db()
+    template = "payroll/payslip/payslip_generation_job.html"
+    if request.headers.get("HX-Request"):
+        template = "payroll/payslip/payslip_generation_job_status.html"
+    return render(request, template, {"job": job})
+
+
 @login_required
 @hx_request_required
 def check_contract_start_date(request):
@@ -11,10 +11,15 @@ from itertools import groupby
 from urllib.parse import parse_qs
 
 import pandas as pd
-import pdfkit
 from django.contrib import messages
 from django.db.models import ProtectedError, Q
-from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.urls import reverse
@@ -31,6 +36,7 @@ from base.methods import (
     sortby,
 )
 from base.models import Company
+from base.pdf_rendering import render_pdf, render_pdfs, stream_zip
 from employee.models import Employee, EmployeeWorkInformation
 from horilla.decorators import (
     hx_request_required,
@@ -1458,22 +1464,8 @@ def generate_payslip_pdf(template_path, context, html=False):
         if html:
             return HttpResponse(html_content, content_type="text/html")
 
-        # PDF options for pdfkit
-        pdf_options = {
-            "page-size": "A4",
-            "margin-top": "10mm",
-            "margin-bottom": "10mm",
-            "margin-left": "10mm",
-            "margin-right": "10mm",
-            "encoding": "UTF-8",
-            "enable-local-file-access": None,  # Required to load local CSS/images
-            "dpi": 300,
-            "zoom": 1.3,
-            "footer-center": "[page]/[topage]",  # Required to load local CSS/images
-        }
-
-        # Generate the PDF as binary content
-        pdf = pdfkit.from_string(html_content, False, options=pdf_options)
+        # The payslip template carries its own styles
+        pdf = render_pdf(html_content, stylesheet=False)
 
         # Return an HttpResponse containing the PDF content
         response = HttpResponse(pdf, content_type="application/pdf")
@@ -1484,6 +1476,112 @@ def generate_payslip_pdf(template_path, context, html=False):
         return HttpResponse(f"Error generating PDF: {str(e)}", status=500)
 
 
+def payslip_date_format(user):
+    """
+    Returns the date format of the company of the user
+    """
+    info = EmployeeWorkInformation.objects.filter(
+        employee_id__employee_user_id=user
+    ).first()
+    company = info.company_id if info else None
+    return company.date_format if company and company.date_format else "MMM. D, YYYY"
+
+
+def payslip_pdf_context(
+    request, payslip, date_format=None, company=None, currency=None
+):
+    """
+    Returns the context of the payslip PDF template, date_format, company and
+    currency are looked up when they are not given
+    """
+    if date_format is None:
+        date_format = payslip_date_format(request.user)
+    if company is None:
+        company = Company.objects.filter(hq=True).first()
+    if currency is None:
+        currency = PayrollSettings.objects.first().currency_symbol
+
+    data = payslip.pay_head_data
+    start_date_str = data["start_date"]
+    end_date_str = data["end_date"]
+
+    # Convert the string to a datetime.date object
+    start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+    end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+
+    # Format the start and end dates
+    format_string = HORILLA_DATE_FORMATS.get(date_format, "%b. %d, %Y")
+    formatted_start_date = start_date.strftime(format_string)
+    formatted_end_date = end_date.strftime(format_string)
+
+    # Prepare context for the template
+    data.update(
+        {
+            "month_start_name": start_date.strftime("%B %d, %Y"),
+            "month_end_name": end_date.strftime("%B %d, %Y"),
+            "formatted_start_date": formatted_start_date,
+            "formatted_end_date": formatted_end_date,
+            "employee": payslip.employee_id,
+            "payslip": payslip,
+            "json_data": data.copy(),
+            "currency": currency,
+            "all_deductions": [],
+            "all_allowances": data["allowances"].copy(),
+            "host": request.get_host(),
+            "protocol": "https" if request.is_secure() else "http",
+            "company": company,
+        }
+    )
+
+    # Merge deductions and allowances for display
+    for deduction_list in [
+        data["basic_pay_deductions"],
+        data["gross_pay_deductions"],
+        data["pretax_deductions"],
+        data["post_tax_deductions"],
+        data["tax_deductions"],
+        data["net_deductions"],
+    ]:
+        data["all_deductions"].extend(deduction_list)
+
+    equalize_lists_length(data["allowances"], data["all_deductions"])
+    data["zipped_data"] = zip(data["allowances"], data["all_deductions"])
+    return data
+
+
+def payslip_pdf_htmls(request, payslips, return_exceptions=False):
+    """
+    Yields the html of the PDF of every payslip, or the error of a payslip that
+    fails to render with return_exceptions
+    """
+    date_format = payslip_date_format(request.user)
+    company = Company.objects.filter(hq=True).first()
+    currency = PayrollSettings.objects.first().currency_symbol
+    for payslip in payslips:
+        try:
+            context = payslip_pdf_context(
+                request, payslip, date_format, company, currency
+            )
+            html = render_to_string("payroll/payslip/payslip_pdf.html", context)
+        except Exception as error:
+            if not return_exceptions:
+                raise
+            html = error
+        yield html
+
+
+def payslip_pdfs(request, payslips, return_exceptions=False):
+    """
+    Yields the PDF of every payslip, rendered in parallel. With
+    return_exceptions the error of a payslip is yielded in place of its PDF.
+    """
+    return render_pdfs(
+        payslip_pdf_htmls(request, payslips, return_exceptions),
+        stylesheet=False,
+        return_exceptions=return_exceptions,
+    )
+
+
 def payslip_pdf(request, id):
     """
     Generate the payslip as a PDF and return it in an HttpResponse.
@@ -1500,75 +1598,11 @@ def payslip_pdf(request, id):
 
     if Payslip.objects.filter(id=id).exists():
         payslip = Payslip.objects.get(id=id)
-        company = Company.objects.filter(hq=True).first()
         if (
             request.user.has_perm("payroll.view_payslip")
             or payslip.employee_id.employee_user_id == request.user
         ):
-            user = request.user
-            employee = user.employee_get
-
-            # Taking the company_name of the user
-            info = EmployeeWorkInformation.objects.filter(employee_id=employee)
-            if info.exists():
-                for data in info:
-                    employee_company = data.company_id
-                company_name = Company.objects.filter(company=employee_company)
-                emp_company = company_name.first()
-
-                # Access the date_format attribute directly
-                date_format = (
-                    emp_company.date_format
-                    if emp_company and emp_company.date_format
-                    else "MMM. D, YYYY"
-                )
-
-            data = payslip.pay_head_data
-            start_date_str = data["start_date"]
-            end_date_str = data["end_date"]
-
-            # Convert the string to a datetime.date object
-            start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-            end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
-
-            # Format the start and end dates
-            for format_name, format_string in HORILLA_DATE_FORMATS.items():
-                if format_name == date_format:
-                    formatted_start_date = start_date.strftime(format_string)
-                    formatted_end_date = end_date.strftime(format_string)
-
-            # Prepare context for the template
-            data.update(
-                {
-                    "month_start_name": start_date.strftime("%B %d, %Y"),
-                    "month_end_name": end_date.strftime("%B %d, %Y"),
-                    "formatted_start_date": formatted_start_date,
-                    "formatted_end_date": formatted_end_date,
-                    "employee": payslip.employee_id,
-                    "payslip": payslip,
-                    "json_data": data.copy(),
-                    "currency": PayrollSettings.objects.first().currency_symbol,
-                    "all_deductions": [],
-                    "all_allowances": data["allowances"].copy(),
-                    "host": request.get_host(),
-                    "protocol": "https" if request.is_secure() else "http",
-                    "company": company,
-                }
-            )
-
-            # Merge deductions and allowances for display
-            for deduction_list in [
-                data["basic_pay_deductions"],
-                data["gross_pay_deductions"],
-                data["pretax_deductions"],
-                data["post_tax_deductions"],
-                data["tax_deductions"],
-                data["net_deductions"],
-            ]:
-                data["all_deductions"].extend(deduction_list)
-
-            equalize_lists_length(data["allowances"], data["all_deductions"])
-            data["zipped_data"] = zip(data["allowances"], data["all_deductions"])
+            data = payslip_pdf_context(request, payslip)
             template_path = "payroll/payslip/payslip_pdf.html"
 
             return generate_payslip_pdf(template_path, context=data, html=False)
@@ -1576,6 +1610,37 @@ def payslip_pdf(request, id):
     return render(request, "405.html")
 
 
+@login_required
+def payslip_pdf_zip(request):
+    """
+    Streams a zip of the PDFs of the payslips of the id parameters, users
+    without the view permission only get their own payslips
+    """
+    ids = request.GET.getlist("id")
+    if not all(payslip_id.isdigit() for payslip_id in ids):
+        return HttpResponseBadRequest("Invalid payslip id parameter.")
+    payslips = Payslip.objects.filter(id__in=ids)
+    if not request.user.has_perm("payroll.view_payslip"):
+        payslips = payslips.filter(employee_id__employee_user_id=request.user)
+    payslips = list(payslips.select_related("employee_id").order_by("id"))
+
+    names = set()
+    file_names = []
+    for payslip in payslips:
+        name = payslip.get_payslip_title()
+        if name in names:
+            name = f"{name} ({payslip.id})"
+        names.add(name)
+        file_names.append(f"{name}.pdf")
+
+    response = StreamingHttpResponse(
+        stream_zip(zip(file_names, payslip_pdfs(request, payslips))),
+        content_type="application/zip",
+    )
+    response["Content-Disposition"] = 'attachment; filename="payslips.zip"'
+    return response
+
+
 @login_required
 @permission_required("payroll.view_contract")
 def contract_select(request):
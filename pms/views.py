@@ -1450,18 +1450,17 @@ def send_feedback_notifications(request, feedback):
             icon="chatbox-ellipses",
         )
     all_employees = feedback.requested_employees()
-    for employee in all_employees:
-        notify.send(
-            request.user.employee_get,
-            recipient=employee.employee_user_id,
-            verb="You have been requested to provide feedback!",
-            verb_ar="لقد طُلب منك تقديم ملاحظات!",
-            verb_de="Sie wurden gebeten, Feedback zu geben!",
-            verb_es="Se le ha solicitado que proporcione comentarios.",
-            verb_fr="Il vous a été demandé de fournir des commentaires.",
-            redirect=reverse("feedback-detailed-view", kwargs={"id": feedback.id}),
-            icon="chatbox-ellipses",
-        )
+    notify.send(
+        request.user.employee_get,
+        recipient=[employee.employee_user_id for employee in all_employees],
+        verb="You have been requested to provide feedback!",
+        verb_ar="لقد طُلب منك تقديم ملاحظات!",
+        verb_de="Sie wurden gebeten, Feedback zu geben!",
+        verb_es="Se le ha solicitado que proporcione comentarios.",
+        verb_fr="Il vous a été demandé de fournir des commentaires.",
+        redirect=reverse("feedback-detailed-view", kwargs={"id": feedback.id}),
+        icon="chatbox-ellipses",
+    )
 
 
 @login_required
@@ -1,11 +1,11 @@
 import calendar
 import datetime as dt
-import sys
 from datetime import datetime, timedelta
 
-from apscheduler.schedulers.background import BackgroundScheduler
 from dateutil.relativedelta import relativedelta
 
+from horilla.horilla_jobs import register_job
+
 today = datetime.now()
 
 
@@ -47,15 +47,5 @@ def candidate_convert():
             cand.save()
 
 
-if not any(
-    cmd in sys.argv
-    for cmd in ["makemigrations", "migrate", "compilemessages", "flush", "shell"]
-):
-    """
-    Initializes and starts background tasks using APScheduler when the server is running.
-    """
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(candidate_convert, "interval", minutes=5)
-    scheduler.add_job(recruitment_close, "interval", hours=1)
-
-    scheduler.start()
+register_job(candidate_convert, "interval", minutes=5)
+register_job(recruitment_close, "interval", hours=1)